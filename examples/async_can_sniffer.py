@@ -10,6 +10,7 @@ Usage:
     python examples/async_can_sniffer.py [-i can0|vcan0|...] [--source HEX]
                                          [-v|--verbose] [--no-fd]
                                          [--decorate] [--record-fields PATH]
+                                         [--schema-cache DIR]
 
 Stop with Ctrl+C.
 """
@@ -22,6 +23,7 @@ import time
 
 from python_thingset import (
     AsyncThingSetCANReportReceiver,
+    SchemaCache,
     SchemaNode,
     SchemaTree,
     ThingSetCAN,
@@ -119,8 +121,10 @@ class _SchemaCache:
         self,
         bus: str,
         static_fields: dict[int, str] | None = None,
+        disk_cache: SchemaCache | None = None,
     ) -> None:
         self._bus = bus
+        self._disk_cache = disk_cache
         self._trees: dict[int, SchemaTree | None] = {}
         self._fetching: set[int] = set()
         self._resolved_ids: dict[int, set[int]] = {}
@@ -187,9 +191,18 @@ class _SchemaCache:
         try:
             async with self._client_lock:
                 client = await self._ensure_client()
+                if self._disk_cache is None:
+                    walk = asyncio.to_thread(client.discover_schema, 0, source)
+                else:
+                    walk = asyncio.to_thread(
+                        client.discover_schema_cached,
+                        self._disk_cache,
+                        f"{self._bus}:{source:02x}",
+                        0,
+                        source,
+                    )
                 tree = await asyncio.wait_for(
-                    asyncio.to_thread(client.discover_schema, 0, source),
-                    timeout=self.SCHEMA_FETCH_TIMEOUT_S,
+                    walk, timeout=self.SCHEMA_FETCH_TIMEOUT_S
                 )
             self._merge_static_fields(tree)
             self._trees[source] = tree
@@ -297,6 +310,7 @@ async def main(
     verbose: bool,
     decorate: bool,
     static_fields: dict[int, str] | None,
+    schema_cache_dir: str | None = None,
 ) -> None:
     src_str = (
         f", source=0x{source_filter:02X}" if source_filter is not None else ""
@@ -309,14 +323,19 @@ async def main(
     )
     count = 0
     started = time.perf_counter()
+    disk_cache = SchemaCache(schema_cache_dir) if schema_cache_dir else None
     schema_cache = (
-        _SchemaCache(bus=bus, static_fields=static_fields) if decorate else None
+        _SchemaCache(bus=bus, static_fields=static_fields, disk_cache=disk_cache)
+        if decorate
+        else None
     )
     try:
-        async with AsyncThingSetCANReportReceiver(bus=bus, fd=fd) as receiver:
+        # The source filter runs in the kernel's CAN filters
+        sources = None if source_filter is None else {source_filter}
+        async with AsyncThingSetCANReportReceiver(
+            bus=bus, fd=fd, sources=sources
+        ) as receiver:
             async for (source, _bus_name), report in receiver:
-                if source_filter is not None and source != source_filter:
-                    continue
                 count += 1
                 elapsed = time.perf_counter() - started
 
@@ -418,6 +437,17 @@ if __name__ == "__main__":
             "Only used when --decorate is active."
         ),
     )
+    parser.add_argument(
+        "--schema-cache",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help=(
+            "Keep fetched schemas in DIR, keyed by bus and node address "
+            "plus firmware fingerprint, so a restart only re-walks nodes "
+            "whose firmware changed. Only used when --decorate is active."
+        ),
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -446,6 +476,7 @@ if __name__ == "__main__":
                 verbose=args.verbose,
                 decorate=args.decorate,
                 static_fields=static_fields,
+                schema_cache_dir=args.schema_cache,
             )
         )
     except KeyboardInterrupt:
@@ -5,6 +5,7 @@ schedule (no subscribe handshake). Bind on the same subnet and you
 should see reports land as the device publishes them.
 
 Usage:  python examples/async_udp_sniffer.py [-v | --verbose] [--port 9002]
+                                            [--decorate [--schema-cache DIR]]
 Stop with Ctrl+C.
 """
 
@@ -16,6 +17,7 @@ import time
 from python_thingset import (
     AsyncThingSetTCP,
     AsyncThingSetUDPReceiver,
+    SchemaCache,
     SchemaNode,
     SchemaTree,
     ThingSetStatus,
@@ -185,7 +187,12 @@ class _SchemaCache:
     SCHEMA_FETCH_TIMEOUT_S = 10.0
     METADATA_FETCH_TIMEOUT_S = 2.0
 
-    def __init__(self, static_fields: dict[int, str] | None = None) -> None:
+    def __init__(
+        self,
+        static_fields: dict[int, str] | None = None,
+        disk_cache: SchemaCache | None = None,
+    ) -> None:
+        self._disk_cache = disk_cache
         self._trees: dict[_SchemaKey, SchemaTree | None] = {}
         self._fetching: set[_SchemaKey] = set()
         self._resolved_ids: dict[_SchemaKey, set[int]] = {}
@@ -228,7 +235,8 @@ class _SchemaCache:
         label = _key_label(key)
         try:
             tree = await asyncio.wait_for(
-                self._discover(ip, eui), timeout=self.SCHEMA_FETCH_TIMEOUT_S
+                self._discover(ip, eui, self._disk_cache),
+                timeout=self.SCHEMA_FETCH_TIMEOUT_S,
             )
             self._merge_static_fields(tree)
             self._trees[key] = tree
@@ -323,9 +331,15 @@ class _SchemaCache:
             )
 
     @staticmethod
-    async def _discover(ip: str, target_eui: int | None) -> SchemaTree:
+    async def _discover(
+        ip: str, target_eui: int | None, disk_cache: SchemaCache | None
+    ) -> SchemaTree:
         async with AsyncThingSetTCP(ip, target_eui=target_eui) as client:
-            return await client.discover_schema()
+            if disk_cache is None:
+                return await client.discover_schema()
+            # Module reports are keyed by their EUI; direct reports by IP.
+            device_key = target_eui if target_eui is not None else ip
+            return await client.discover_schema_cached(disk_cache, device_key)
 
     @staticmethod
     async def _fetch_metadata(ip: str, target_eui: int | None, ids: list[int]):
@@ -377,6 +391,7 @@ async def main(
     filter_eui: int | None,
     decorate: bool,
     static_fields: dict[int, str] | None,
+    schema_cache_dir: str | None = None,
 ) -> None:
     mode = "verbose" if verbose else "summary"
     eui_str = f", filter EUI={filter_eui:016x}" if filter_eui is not None else ""
@@ -387,7 +402,12 @@ async def main(
     )
     count = 0
     started = time.perf_counter()
-    schema_cache = _SchemaCache(static_fields=static_fields) if decorate else None
+    disk_cache = SchemaCache(schema_cache_dir) if schema_cache_dir else None
+    schema_cache = (
+        _SchemaCache(static_fields=static_fields, disk_cache=disk_cache)
+        if decorate
+        else None
+    )
     async with AsyncThingSetUDPReceiver(port=port) as receiver:
         async for addr, report in receiver:
             if filter_eui is not None and not _report_matches_eui(report, filter_eui):
@@ -489,6 +509,17 @@ if __name__ == "__main__":
             "Only used when --decorate is active."
         ),
     )
+    parser.add_argument(
+        "--schema-cache",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help=(
+            "Keep fetched schemas in DIR, keyed by EUI (or IP) and "
+            "firmware fingerprint, so a restart only re-walks devices "
+            "whose firmware changed. Only used when --decorate is active."
+        ),
+    )
     args = parser.parse_args()
 
     static_fields: dict[int, str] | None = None
@@ -505,6 +536,7 @@ if __name__ == "__main__":
                 args.filter_eui,
                 args.decorate,
                 static_fields,
+                args.schema_cache,
             )
         )
     except KeyboardInterrupt:
@@ -0,0 +1,116 @@
+"""Replay recorded ThingSet traffic through a report receiver.
+
+Reads a capture file (CaptureWriter), a candump log or a pcap file of
+UDP reports, pushes it through a receiver at the recording's pace,
+``--speed`` times faster, or as fast as possible, and prints the
+throughput, latency and drop figures.
+
+Usage:  python examples/replay.py site.tscap [--speed 10 | --fast]
+        python examples/replay.py candump.log --fast
+        python examples/replay.py site.pcap --to udp --port 9002
+        python examples/replay.py site.tscap --can --fast
+        python examples/replay.py candump.log --to can --interface vcan0
+
+By default reports go straight into an in-process receiver, with no
+socket or bus, measuring decoding alone. ``--to udp`` sends the
+datagrams to a receiver on 127.0.0.1 instead, and ``--to can`` puts
+the frames on a SocketCAN interface with a receiver listening on it.
+A capture's UDP reports are replayed unless ``--can`` is given.
+"""
+
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+
+import can
+
+from python_thingset import (
+    AsyncThingSetCANReportReceiver,
+    AsyncThingSetUDPReceiver,
+    read_candump,
+    read_capture,
+    read_pcap,
+    replay,
+)
+
+
+_PCAP_MAGICS = (
+    b"\xd4\xc3\xb2\xa1",
+    b"\xa1\xb2\xc3\xd4",
+    b"\x4d\x3c\xb2\xa1",
+    b"\xa1\xb2\x3c\x4d",
+    b"\x0a\x0d\x0d\x0a",
+)
+
+
+def _items(args):
+    """The recording's items, and whether they are CAN traffic."""
+    if not args.file.exists():
+        # Rotated captures: site.00000.tscap, ...
+        return read_capture(args.file), args.can
+    with open(args.file, "rb") as f:
+        magic = f.read(8)
+    if magic == b"TSCAPTUR":
+        return read_capture(args.file), args.can
+    if magic[:4] in _PCAP_MAGICS:
+        return read_pcap(args.file, args.port), False
+    return read_candump(args.file), True
+
+
+async def main(args) -> None:
+    items, is_can = _items(args)
+    speed = None if args.fast else args.speed
+    bus = None
+    if is_can:
+        if args.to == "can":
+            receiver = AsyncThingSetCANReportReceiver(
+                bus=args.interface, fd=True, queue_reports=False
+            )
+            await receiver.start()
+            bus = can.Bus(channel=args.interface, interface="socketcan", fd=True)
+            into = bus
+        else:
+            receiver = AsyncThingSetCANReportReceiver(
+                bus="replay", interface="virtual", fd=True, queue_reports=False
+            )
+            into = receiver
+    else:
+        if args.to == "udp":
+            receiver = AsyncThingSetUDPReceiver(
+                bind="127.0.0.1", port=args.port, queue_reports=False
+            )
+            await receiver.start()
+            into = ("127.0.0.1", args.port)
+        else:
+            receiver = AsyncThingSetUDPReceiver(queue_reports=False)
+            into = receiver
+    try:
+        stats = await replay(items, into, speed, receiver=receiver)
+    finally:
+        await receiver.close()
+        if bus is not None:
+            bus.shutdown()
+    print(stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file", type=Path, help="capture, candump log or pcap file")
+    parser.add_argument("--speed", type=float, default=1.0, help="times real time")
+    parser.add_argument("--fast", action="store_true", help="as fast as possible")
+    parser.add_argument(
+        "--to",
+        choices=("receiver", "udp", "can"),
+        default="receiver",
+        help="in-process receiver, loopback UDP or a SocketCAN interface",
+    )
+    parser.add_argument(
+        "--can", action="store_true", help="replay a capture's CAN reports"
+    )
+    parser.add_argument("--port", type=int, default=9002, help="UDP report port")
+    parser.add_argument("--interface", default="vcan0", help="CAN interface for --to can")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    asyncio.run(main(args))
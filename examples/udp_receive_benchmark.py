@@ -0,0 +1,143 @@
+"""Compare the UDP report receiver's datagram paths under a local flood.
+
+A child process floods 127.0.0.1 with framed ThingSet reports as fast
+as it can; the receiver counts what it decodes, once with the default
+asyncio datagram transport and once per ``--batch-size`` with the
+batched reader. Reports go to a callback rather than the queue, so the
+figures are the receive path's own.
+
+Usage:  python examples/udp_receive_benchmark.py [--reports 200000]
+            [--values 20] [--fragments 1] [--batch-size 16 64 256]
+            [--workers 2 4 8]
+
+With ``--workers``, ShardedThingSetUDPReceiver is measured too, with
+reports forwarded to and counted in the parent process.
+
+Lost reports are ones the kernel dropped because the receiver fell
+behind; raise net.core.rmem_max to separate throughput from buffer
+size.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import socket
+import time
+
+import cbor2
+
+from python_thingset import AsyncThingSetUDPReceiver, ShardedThingSetUDPReceiver
+
+
+def _datagrams(values: int, fragments: int, msg_num: int):
+    body = (
+        bytes([0x1F])
+        + cbor2.dumps(0x400)
+        + cbor2.dumps({0x1000 + i: i * 0.5 for i in range(values)})
+    )
+    if fragments == 1:
+        return [bytes([0x30, msg_num]) + body]
+    size = -(-len(body) // fragments)
+    chunks = [body[i : i + size] for i in range(0, len(body), size)]
+    out = []
+    for seq, chunk in enumerate(chunks):
+        msg_type = 0x00 if seq == 0 else 0x20 if seq == len(chunks) - 1 else 0x10
+        out.append(bytes([msg_type | (seq & 0x0F), msg_num]) + chunk)
+    return out
+
+
+def _flood(port: int, reports: int, values: int, fragments: int) -> None:
+    messages = [_datagrams(values, fragments, msg_num) for msg_num in range(256)]
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect(("127.0.0.1", port))
+        for i in range(reports):
+            for datagram in messages[i & 0xFF]:
+                sock.send(datagram)
+
+
+async def _run(args, batch_size=None, workers=0) -> None:
+    received = 0
+    last = 0.0
+
+    def on_report(addr, report):
+        nonlocal received, last
+        received += 1
+        last = time.perf_counter()
+
+    async def count_batches():
+        nonlocal received, last
+        async for batch in receiver.batches(max_items=1024, max_latency=0.01):
+            received += len(batch)
+            last = time.perf_counter()
+
+    counter = None
+    if workers:
+        receiver = ShardedThingSetUDPReceiver(
+            workers=workers, bind="127.0.0.1", port=0, queue_size=1 << 20
+        )
+        await receiver.start()
+        port = receiver.address[1]
+        counter = asyncio.create_task(count_batches())
+        label = f"{workers} workers"
+    else:
+        receiver = AsyncThingSetUDPReceiver(
+            bind="127.0.0.1", port=0, queue_reports=False, batch_size=batch_size
+        )
+        receiver.add_callback(on_report, budget=1.0)
+        await receiver.start()
+        port = receiver._transport.get_extra_info("sockname")[1]
+        label = (
+            "datagram transport" if batch_size is None else f"batch_size={batch_size}"
+        )
+    flood = multiprocessing.Process(
+        target=_flood, args=(port, args.reports, args.values, args.fragments)
+    )
+    started = time.perf_counter()
+    flood.start()
+    while flood.is_alive():
+        await asyncio.sleep(0.05)
+    # Drain what is still buffered
+    settled = received - 1
+    while settled != received:
+        settled = received
+        await asyncio.sleep(0.5)
+    await receiver.close()
+    if counter is not None:
+        counter.cancel()
+
+    elapsed = (last or time.perf_counter()) - started
+    print(
+        f"{label:<20} {received:>8} reports  {received / elapsed:>10,.0f}/s  "
+        f"lost {args.reports - received:>7} ({(args.reports - received) / args.reports:.1%})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reports", type=int, default=200000)
+    parser.add_argument("--values", type=int, default=20, help="values per report")
+    parser.add_argument("--fragments", type=int, default=1, help="datagrams per report")
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="*",
+        default=[],
+        help="also run ShardedThingSetUDPReceiver with these worker counts",
+    )
+    args = parser.parse_args()
+    # Fragments the kernel drops show up as lost reports; don't log each
+    logging.getLogger("python_thingset.log").setLevel(logging.ERROR)
+    print(
+        f"{args.reports} reports of {args.values} values in "
+        f"{args.fragments} fragment(s) each"
+    )
+    for batch_size in [None, *args.batch_size]:
+        asyncio.run(_run(args, batch_size=batch_size))
+    for workers in args.workers:
+        asyncio.run(_run(args, workers=workers))
+
+
+if __name__ == "__main__":
+    main()
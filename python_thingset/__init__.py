@@ -1,21 +1,62 @@
 from ._protocol import ParsedResponse, ThingSetProtocol, WireFormat
 from .async_client import AsyncThingSetClient
+from .capture import CaptureReader, CaptureWriter, CapturedRpc, capture_files
+from .hub import ReportHub
+from .lazy_schema import AsyncLazySchemaTree, LazySchemaNode, LazySchemaTree
+from .observe import Change, Deadband, LiveValues
+from .query import FetchPlan
 from .report import ThingSetReport
+from .replay import (
+    Datagram,
+    ReplayStats,
+    read_candump,
+    read_capture,
+    read_pcap,
+    replay,
+)
+from .report_queue import OverflowPolicy, ReportQueue
 from .response import ThingSetRequest, ThingSetResponse, ThingSetStatus, ThingSetValue
-from .schema import SchemaNode, SchemaTree
+from .schema import SchemaDiff, SchemaNode, SchemaTree
+from .schema_cache import SchemaCache
+from .shm_ring import RawReport, ReportRing
+from .shm_table import ValueTable
 from .transport import ThingSetCAN, ThingSetSerial, ThingSetTCP, ThingSetTransport
 from .transport.async_can import AsyncThingSetCANReportReceiver
-from .transport.async_tcp import AsyncThingSetTCP
+from .transport.async_tcp import AsyncThingSetTCP, ConnectionState
 from .transport.async_udp import AsyncThingSetUDPReceiver
+from .transport.sharded_udp import ShardedThingSetUDPReceiver
+from .twin import DeviceTwin
 
 __all__ = [
+    "AsyncLazySchemaTree",
     "AsyncThingSetCANReportReceiver",
     "AsyncThingSetClient",
     "AsyncThingSetTCP",
     "AsyncThingSetUDPReceiver",
+    "CaptureReader",
+    "CaptureWriter",
+    "CapturedRpc",
+    "Change",
+    "ConnectionState",
+    "Datagram",
+    "Deadband",
+    "DeviceTwin",
+    "FetchPlan",
+    "LazySchemaNode",
+    "LazySchemaTree",
+    "LiveValues",
+    "OverflowPolicy",
     "ParsedResponse",
+    "RawReport",
+    "ReplayStats",
+    "ReportHub",
+    "ReportQueue",
+    "ReportRing",
+    "SchemaCache",
+    "SchemaDiff",
     "SchemaNode",
     "SchemaTree",
+    "ShardedThingSetUDPReceiver",
     "ThingSetCAN",
     "ThingSetProtocol",
     "ThingSetReport",
@@ -26,5 +67,11 @@ __all__ = [
     "ThingSetTCP",
     "ThingSetTransport",
     "ThingSetValue",
+    "ValueTable",
     "WireFormat",
+    "capture_files",
+    "read_candump",
+    "read_capture",
+    "read_pcap",
+    "replay",
 ]
@@ -0,0 +1,273 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""CBOR decoding that keeps numeric arrays packed.
+
+cbor2 turns an array of 1000 float32s into a list of 1000 Python
+floats. :func:`loads` decodes the same document, but returns every
+homogeneous array of ``float32`` (or ``float64``) items, and every
+RFC 8746 typed array (tags 64-86), as an ``array.array`` or a NumPy
+array instead:
+
+- ``"numpy"`` returns read-only views over the payload buffer, with no
+  copy at all: a strided big-endian view for a CBOR float array, a
+  plain view over the byte string for a typed array;
+- ``"array"`` copies each array into an ``array.array`` in one pass,
+  without creating a Python object per element.
+
+Everything else decodes exactly as ``cbor2.loads`` decodes it. Arrays
+shorter than ``min_length``, arrays mixing float widths and integer
+arrays (whose items vary in width on the wire) stay lists. Documents
+without anything to pack are handed to cbor2 whole, after a regex scan
+for a run of float items or a typed-array tag.
+"""
+
+import array
+import io
+import re
+import struct
+import sys
+from functools import lru_cache
+from typing import Any, Dict, Tuple, Union
+
+import cbor2
+
+from .codec import _numpy
+
+
+ARRAY_DECODE_MODES = ("array", "numpy")
+
+# Arrays shorter than this aren't worth converting.
+DEFAULT_MIN_LENGTH = 8
+
+# RFC 8746 typed array tags: (array typecode, item size, NumPy dtype).
+# Half floats have no array.array typecode; they are widened to "f".
+_TYPED_ARRAYS: Dict[int, Tuple[str, int, str]] = {
+    64: ("B", 1, "u1"),
+    65: ("H", 2, ">u2"),
+    66: ("I", 4, ">u4"),
+    67: ("Q", 8, ">u8"),
+    68: ("B", 1, "u1"),  # uint8, clamped
+    69: ("H", 2, "<u2"),
+    70: ("I", 4, "<u4"),
+    71: ("Q", 8, "<u8"),
+    72: ("b", 1, "i1"),
+    73: ("h", 2, ">i2"),
+    74: ("i", 4, ">i4"),
+    75: ("q", 8, ">i8"),
+    77: ("h", 2, "<i2"),
+    78: ("i", 4, "<i4"),
+    79: ("q", 8, "<i8"),
+    80: ("e", 2, ">f2"),
+    81: ("f", 4, ">f4"),
+    82: ("d", 8, ">f8"),
+    84: ("e", 2, "<f2"),
+    85: ("f", 4, "<f4"),
+    86: ("d", 8, "<f8"),
+}
+
+# CBOR float markers, by item size: (initial byte, array typecode, dtype)
+_FLOAT_ITEMS = {5: (0xFA, "f", ">f4"), 9: (0xFB, "d", ">f8")}
+
+
+class _Indefinite(Exception):
+    """An indefinite-length item; hand the document to cbor2."""
+
+
+def loads(
+    data: bytes,
+    mode: str,
+    min_length: int = DEFAULT_MIN_LENGTH,
+) -> Any:
+    """Decode the first CBOR item in ``data``, packing numeric arrays
+    as ``mode`` (``"array"`` or ``"numpy"``) asks."""
+    return load(data, 0, mode, min_length)[0]
+
+
+def load(
+    data: bytes,
+    offset: int,
+    mode: str,
+    min_length: int = DEFAULT_MIN_LENGTH,
+) -> Tuple[Any, int]:
+    """Decode the CBOR item at ``offset``; returns it and the offset
+    just past it."""
+    if mode not in ARRAY_DECODE_MODES:
+        raise ValueError(
+            f"array_decode must be one of {', '.join(ARRAY_DECODE_MODES)}"
+        )
+    data = bytes(data)
+    if any(p.search(data, offset) for p in _candidates(max(min_length, 1))):
+        try:
+            return _Decoder(data, mode, min_length).item(offset)
+        except _Indefinite:
+            # Rare in ThingSet traffic; not worth a streaming decoder here
+            pass
+    stream = io.BytesIO(data)
+    stream.seek(offset)
+    return cbor2.load(stream), stream.tell()
+
+
+@lru_cache(maxsize=None)
+def _candidates(min_length: int) -> Tuple["re.Pattern[bytes]", ...]:
+    """Patterns matching wherever a packable array might start:
+    ``min_length`` float32 or float64 items in a row, or a typed-array
+    tag. Each starts with a literal byte, which ``re`` scans for
+    quickly; an alternation of them would be several times slower."""
+    repeat = min_length - 1
+    return (
+        re.compile(rb"\xfa(?:[\s\S]{4}\xfa){%d}" % repeat),
+        re.compile(rb"\xfb(?:[\s\S]{8}\xfb){%d}" % repeat),
+        re.compile(rb"\xd8[\x40-\x56]"),
+    )
+
+
+class _Decoder:
+    def __init__(self, data: bytes, mode: str, min_length: int) -> None:
+        self.data = data
+        self.numpy = mode == "numpy"
+        self.min_length = max(min_length, 1)
+
+    def _need(self, end: int) -> None:
+        if end > len(self.data):
+            raise cbor2.CBORDecodeEOF("premature end of stream")
+
+    def _head(self, pos: int) -> Tuple[int, int, int]:
+        """Major type, argument and the offset after the head."""
+        self._need(pos + 1)
+        initial = self.data[pos]
+        major, info = initial >> 5, initial & 0x1F
+        if info < 24:
+            return major, info, pos + 1
+        if info == 31:
+            raise _Indefinite
+        if info > 27:
+            raise cbor2.CBORDecodeValueError(
+                f"invalid additional information {info}"
+            )
+        size = 1 << (info - 24)
+        self._need(pos + 1 + size)
+        return major, int.from_bytes(self.data[pos + 1 : pos + 1 + size], "big"), (
+            pos + 1 + size
+        )
+
+    def item(self, pos: int) -> Tuple[Any, int]:
+        start = pos
+        major, arg, pos = self._head(pos)
+        if major == 0:
+            return arg, pos
+        if major == 1:
+            return -1 - arg, pos
+        if major in (2, 3):
+            end = pos + arg
+            self._need(end)
+            raw = self.data[pos:end]
+            if major == 2:
+                return raw, end
+            try:
+                return raw.decode("utf-8"), end
+            except UnicodeDecodeError as e:
+                raise cbor2.CBORDecodeValueError(f"invalid text string: {e}") from e
+        if major == 4:
+            packed = self._float_array(pos, arg)
+            if packed is not None:
+                return packed
+            items = []
+            for _ in range(arg):
+                value, pos = self.item(pos)
+                items.append(value)
+            return items, pos
+        if major == 5:
+            out: Dict[Any, Any] = {}
+            for _ in range(arg):
+                key, pos = self.item(pos)
+                value, pos = self.item(pos)
+                try:
+                    out[tuple(key) if isinstance(key, list) else key] = value
+                except TypeError as e:
+                    raise cbor2.CBORDecodeValueError(f"unhashable map key: {e}") from e
+            return out, pos
+        if major == 6:
+            if arg in _TYPED_ARRAYS:
+                typed = self._typed_array(arg, pos)
+                if typed is not None:
+                    return typed
+            # Anything else (timestamps, bignums, ...) as cbor2 decodes it
+            _, end = self.item(pos)
+            return cbor2.loads(self.data[start:end]), end
+        return self._simple(start)
+
+    def _simple(self, pos: int) -> Tuple[Any, int]:
+        info = self.data[pos] & 0x1F
+        if info == 20:
+            return False, pos + 1
+        if info == 21:
+            return True, pos + 1
+        if info == 22:
+            return None, pos + 1
+        if info == 23:
+            return cbor2.undefined, pos + 1
+        if info < 24:
+            return cbor2.CBORSimpleValue(info), pos + 1
+        if info == 24:
+            self._need(pos + 2)
+            return cbor2.CBORSimpleValue(self.data[pos + 1]), pos + 2
+        fmt, size = {25: (">e", 2), 26: (">f", 4), 27: (">d", 8)}[info]
+        self._need(pos + 1 + size)
+        return struct.unpack_from(fmt, self.data, pos + 1)[0], pos + 1 + size
+
+    def _float_array(self, pos: int, length: int) -> Union[Tuple[Any, int], None]:
+        if length < self.min_length or pos >= len(self.data):
+            return None
+        stride = {0xFA: 5, 0xFB: 9}.get(self.data[pos])
+        if stride is None:
+            return None
+        marker, typecode, dtype = _FLOAT_ITEMS[stride]
+        end = pos + stride * length
+        if end > len(self.data):
+            return None
+        if self.data[pos:end:stride] != bytes([marker]) * length:
+            return None
+        if self.numpy:
+            view = _numpy().ndarray(
+                (length,),
+                dtype=dtype,
+                buffer=self.data,
+                offset=pos + 1,
+                strides=(stride,),
+            )
+            return view, end
+        size = stride - 1
+        raw = bytearray(size * length)
+        for byte in range(size):
+            raw[byte::size] = self.data[pos + 1 + byte : end : stride]
+        out = array.array(typecode)
+        out.frombytes(raw)
+        if sys.byteorder == "little":
+            out.byteswap()
+        return out, end
+
+    def _typed_array(self, tag: int, pos: int) -> Union[Tuple[Any, int], None]:
+        major, length, start = self._head(pos)
+        typecode, size, dtype = _TYPED_ARRAYS[tag]
+        if major != 2 or length % size:
+            return None
+        end = start + length
+        self._need(end)
+        if self.numpy:
+            view = _numpy().frombuffer(
+                self.data, dtype=dtype, count=length // size, offset=start
+            )
+            return view, end
+        raw = self.data[start:end]
+        byteorder = "little" if dtype[0] == "<" else "big"
+        if typecode == "e":
+            fmt = f"{'<' if byteorder == 'little' else '>'}{length // 2}e"
+            return array.array("f", struct.unpack(fmt, raw)), end
+        out = array.array(typecode)
+        out.frombytes(raw)
+        if size > 1 and byteorder != sys.byteorder:
+            out.byteswap()
+        return out, end
@@ -0,0 +1,230 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Sans-io pieces of schema discovery shared by the sync and async clients.
+
+Discovery walks the object tree breadth-first. For each depth the
+client fetches the child-ID list of every group at that depth, then
+asks the metadata overlay (``fetch(0x19, ids)``) about all of those
+children at once, split into as few requests as fit the frame limit.
+This module builds the resulting :class:`SchemaNode` objects; the
+clients only perform the fetches.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+from .response import ThingSetResponse, ThingSetStatus
+from .schema import SchemaDiff, SchemaNode, SchemaTree
+
+
+# Builds a node from SchemaNode's constructor arguments. The lazy
+# schema tree substitutes nodes that expand themselves on access.
+NodeFactory = Callable[..., SchemaNode]
+
+# Binary ThingSet metadata overlay
+METADATA_OVERLAY = 0x19
+METADATA_KEY_NAME = 26  # 0x1A
+METADATA_KEY_TYPE = 27  # 0x1B
+METADATA_KEY_ACCESS = 28  # 0x1C
+
+# Types whose metadata advertises a parent node we can descend into.
+# "group" is the conventional namespace; "record"/"record[]" appear when
+# a property exposes a struct or array-of-struct (see TS++ ThingSetType.hpp:
+# the ThingSetType default is "record" and array suffixes append "[]"),
+# and the inner record members are registered as parent-scoped children.
+RECURSIVE_TYPES = frozenset({"group", "record", "record[]"})
+
+# How many IDs one metadata fetch asks about. Each answer is a small
+# map (name, type, access) of roughly 30-50 bytes, so 64 keeps a
+# response comfortably inside the 4095-byte ThingSet frame limit.
+DEFAULT_METADATA_BATCH = 64
+
+# Metadata failures that suggest the batch was too big to answer; the
+# batch is split in half and retried. Other errors, timeouts included,
+# are taken at face value so a device without the overlay, or a link
+# that has gone down, isn't hammered with retries.
+_SPLIT_ON_STATUS = frozenset(
+    {ThingSetStatus.REQUEST_TOO_LARGE, ThingSetStatus.INTERNAL_ERROR}
+)
+
+
+def child_ids_from(resp: ThingSetResponse) -> List[int]:
+    """Child IDs from a ``fetch(group, [])`` response, or ``[]``."""
+    if not resp.values:
+        return []
+    ids = resp.values[0].value
+    if not isinstance(ids, list):
+        return []
+    return [i for i in ids if isinstance(i, int) and not isinstance(i, bool)]
+
+
+def metadata_batches(ids: Sequence[int], batch_size: int) -> List[List[int]]:
+    """Split ``ids`` (deduplicated, order kept) into overlay requests."""
+    unique = list(dict.fromkeys(ids))
+    size = max(1, batch_size)
+    return [unique[i : i + size] for i in range(0, len(unique), size)]
+
+
+def should_split(resp: ThingSetResponse, batch: Sequence[int]) -> bool:
+    return len(batch) > 1 and resp.status_code in _SPLIT_ON_STATUS
+
+
+def metadata_from(
+    batch: Sequence[int], resp: ThingSetResponse
+) -> Dict[int, Dict[int, Any]]:
+    """``{id: metadata map}`` for every ID the overlay described."""
+    if resp.status_code != ThingSetStatus.CONTENT or not resp.values:
+        return {}
+    out: Dict[int, Dict[int, Any]] = {}
+    for idx, cid in enumerate(batch):
+        md = resp.values[idx].value if idx < len(resp.values) else None
+        if isinstance(md, dict):
+            out[cid] = md
+    return out
+
+
+def split(batch: List[int]) -> Tuple[List[int], List[int]]:
+    mid = len(batch) // 2
+    return batch[:mid], batch[mid:]
+
+
+def build_children(
+    groups: Iterable[Tuple[int, str]],
+    child_lists: Iterable[List[int]],
+    metadata: Dict[int, Dict[int, Any]],
+    by_id: Dict[int, SchemaNode],
+    by_path: Dict[str, SchemaNode],
+    node_factory: NodeFactory = SchemaNode,
+) -> List[List[SchemaNode]]:
+    """Create the child nodes of each ``(group_id, path)`` in ``groups``.
+
+    Children without metadata are skipped, as the depth-first walker
+    always did. New nodes are registered in ``by_id`` / ``by_path``.
+    """
+    out: List[List[SchemaNode]] = []
+    for (_, path_prefix), child_ids in zip(groups, child_lists):
+        nodes: List[SchemaNode] = []
+        for cid in child_ids:
+            md = metadata.get(cid)
+            if md is None:
+                continue
+            node = node_from_metadata(cid, md, path_prefix, node_factory)
+            nodes.append(node)
+            by_id[cid] = node
+            by_path[node.path] = node
+        out.append(nodes)
+    return out
+
+
+def node_from_metadata(
+    node_id: int,
+    md: Dict[int, Any],
+    path_prefix: str,
+    node_factory: NodeFactory = SchemaNode,
+) -> SchemaNode:
+    name = md.get(METADATA_KEY_NAME, "")
+    return node_factory(
+        id=node_id,
+        name=name,
+        type=md.get(METADATA_KEY_TYPE, ""),
+        access=md.get(METADATA_KEY_ACCESS, 0),
+        path=f"{path_prefix}/{name}" if path_prefix else name,
+    )
+
+
+def is_recursive(node: Union[SchemaNode, None]) -> bool:
+    return node is not None and node.type in RECURSIVE_TYPES
+
+
+class Revalidation:
+    """Bookkeeping for refreshing a known tree against the device.
+
+    The client fetches the child list of every group, a depth at a
+    time, starting from ``start()``. IDs still under the same parent
+    keep their existing node; only IDs that are new, or that moved,
+    are returned by ``unknown()`` for a metadata fetch. ``apply()``
+    builds the depth's children and returns the next depth's groups,
+    and ``finish()`` installs the result in the tree and reports the
+    differences.
+
+    A node whose name or type changed while keeping its ID and parent
+    isn't detected, since that would need its metadata re-fetched.
+    """
+
+    def __init__(self, tree: SchemaTree, root_id: int) -> None:
+        self._tree = tree
+        self._root_id = root_id
+        self._old: Dict[int, SchemaNode] = dict(tree.by_id)
+        self._old_parent: Dict[int, int] = {}
+        for node in tree.root:
+            self._old_parent[node.id] = root_id
+        for node in tree:
+            for child in node.children:
+                self._old_parent[child.id] = node.id
+        self._root: List[SchemaNode] = []
+        self._by_id: Dict[int, SchemaNode] = {}
+        self._by_path: Dict[str, SchemaNode] = {}
+        self._diff = SchemaDiff()
+
+    def start(self) -> List[Tuple[int, str]]:
+        return [(self._root_id, "")]
+
+    def unknown(
+        self, groups: Sequence[Tuple[int, str]], child_lists: Iterable[List[int]]
+    ) -> List[int]:
+        """IDs in ``child_lists`` whose metadata must be fetched."""
+        return [
+            cid
+            for (group_id, _), ids in zip(groups, child_lists)
+            for cid in ids
+            if self._old_parent.get(cid) != group_id
+        ]
+
+    def apply(
+        self,
+        groups: Sequence[Tuple[int, str]],
+        child_lists: Iterable[List[int]],
+        metadata: Dict[int, Dict[int, Any]],
+    ) -> List[Tuple[int, str]]:
+        next_groups: List[Tuple[int, str]] = []
+        for (group_id, prefix), ids in zip(groups, child_lists):
+            children: List[SchemaNode] = []
+            for cid in ids:
+                old = self._old.get(cid)
+                if cid in metadata:
+                    node = node_from_metadata(cid, metadata[cid], prefix)
+                    if old is None:
+                        self._diff.added.append(node)
+                    else:
+                        self._diff.changed.append(node)
+                elif old is not None and self._old_parent.get(cid) == group_id:
+                    node = old
+                    path = f"{prefix}/{node.name}" if prefix else node.name
+                    if node.path != path:
+                        node.path = path
+                        self._diff.changed.append(node)
+                else:
+                    continue
+                children.append(node)
+                self._by_id[cid] = node
+                self._by_path[node.path] = node
+                if is_recursive(node):
+                    next_groups.append((cid, node.path))
+            if group_id == self._root_id and not prefix:
+                self._root = children
+            else:
+                self._by_id[group_id].children = children
+        return next_groups
+
+    def finish(self) -> SchemaDiff:
+        self._diff.removed = [
+            node for cid, node in self._old.items() if cid not in self._by_id
+        ]
+        self._tree.root = self._root
+        self._tree.by_id.clear()
+        self._tree.by_id.update(self._by_id)
+        self._tree.by_path.clear()
+        self._tree.by_path.update(self._by_path)
+        return self._diff
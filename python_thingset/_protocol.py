@@ -15,10 +15,12 @@ import io
 import json
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Tuple, Union
+from typing import Any, Callable, NamedTuple, Tuple, Union
 
 import cbor2
 
+from . import _cbor_arrays
+from .codec import _numpy
 from .encoders import ThingSetBinaryEncoder, ThingSetTextEncoder
 from .report import ThingSetReport
 from .response import ThingSetStatus
@@ -43,15 +45,102 @@ REPORT_TYPE_ENHANCED = 0x1E
 REQUEST_FORWARD = 0x1C
 
 
+class ReportHeader(NamedTuple):
+    type: int
+    eui: Union[int, None]
+    subset_id: int
+    # Where the value map starts in the payload
+    offset: int
+
+
+def peek_report_header(payload: bytes) -> Union[ReportHeader, None]:
+    """Read a report's type byte, EUI and subset ID without decoding
+    its value map.
+
+    Returns ``None`` if ``payload`` is not a report or ends before the
+    header does — a first fragment may be that short.
+    """
+    if not payload:
+        return None
+    type_byte = payload[0]
+    if type_byte not in (REPORT_TYPE_STANDARD, REPORT_TYPE_ENHANCED):
+        return None
+    try:
+        eui: Union[int, None] = None
+        offset = 1
+        if type_byte == REPORT_TYPE_ENHANCED:
+            eui, offset = _read_uint(payload, offset)
+        subset_id, offset = _read_uint(payload, offset)
+    except (IndexError, ValueError):
+        return None
+    return ReportHeader(type_byte, eui, subset_id, offset)
+
+
+def _read_uint(data: bytes, offset: int) -> Tuple[int, int]:
+    """A CBOR unsigned integer at ``offset``, and the offset after it."""
+    initial = data[offset]
+    if initial < 0x18:
+        return initial, offset + 1
+    if initial > 0x1B:
+        raise ValueError("not a CBOR unsigned integer")
+    size = 1 << (initial - 0x18)
+    end = offset + 1 + size
+    if end > len(data):
+        raise IndexError("truncated CBOR unsigned integer")
+    return int.from_bytes(data[offset + 1 : end], "big"), end
+
+
 class ThingSetProtocol:
-    def __init__(self, wire_format: WireFormat):
+    def __init__(
+        self,
+        wire_format: WireFormat,
+        typed_arrays: bool = False,
+        array_decode: Union[str, None] = None,
+    ):
         self.wire_format = wire_format
         if wire_format is WireFormat.BINARY:
-            self._encoder = ThingSetBinaryEncoder()
+            self._encoder = ThingSetBinaryEncoder(typed_arrays)
         elif wire_format is WireFormat.TEXT:
             self._encoder = ThingSetTextEncoder()
         else:
             raise ValueError(f"Unknown wire format: {wire_format}")
+        self._array_decode: Union[str, None] = None
+        self.array_decode = array_decode
+
+    @property
+    def typed_arrays(self) -> bool:
+        """Whether float buffers are sent as RFC 8746 typed arrays
+        (binary only)."""
+        return getattr(self._encoder, "typed_arrays", False)
+
+    @typed_arrays.setter
+    def typed_arrays(self, enabled: bool) -> None:
+        if self.wire_format is not WireFormat.BINARY:
+            raise ValueError("typed arrays require the binary wire format")
+        self._encoder.typed_arrays = enabled
+
+    @property
+    def array_decode(self) -> Union[str, None]:
+        """How numeric arrays in responses and reports are decoded:
+        ``None`` (lists, as cbor2 returns them), ``"array"`` for
+        ``array.array`` or ``"numpy"`` for NumPy views over the payload.
+        Float arrays and RFC 8746 typed arrays are packed; see
+        :mod:`python_thingset._cbor_arrays`. Binary only."""
+        return self._array_decode
+
+    @array_decode.setter
+    def array_decode(self, mode: Union[str, None]) -> None:
+        if mode is not None:
+            if self.wire_format is not WireFormat.BINARY:
+                raise ValueError("array_decode requires the binary wire format")
+            if mode not in _cbor_arrays.ARRAY_DECODE_MODES:
+                raise ValueError(
+                    "array_decode must be None or one of "
+                    + ", ".join(_cbor_arrays.ARRAY_DECODE_MODES)
+                )
+            if mode == "numpy":
+                _numpy()
+        self._array_decode = mode
 
     def encode_get(self, value_id) -> bytes:
         return self._encoder.encode_get(value_id)
@@ -59,11 +148,19 @@ class ThingSetProtocol:
     def encode_fetch(self, parent_id, ids) -> bytes:
         return self._encoder.encode_fetch(parent_id, ids)
 
-    def encode_exec(self, value_id, args) -> bytes:
-        return self._encoder.encode_exec(value_id, args)
+    def encode_exec(self, value_id, args, coerce: bool = True) -> bytes:
+        """``coerce=False`` sends ``args`` exactly as given, for values
+        already typed by a schema codec (binary only)."""
+        if coerce:
+            return self._encoder.encode_exec(value_id, args)
+        return self._encoder.encode_exec(value_id, args, coerce=False)
 
-    def encode_update(self, parent_id, value_id, value) -> bytes:
-        return self._encoder.encode_update(parent_id, value_id, value)
+    def encode_update(self, parent_id, value_id, value, coerce: bool = True) -> bytes:
+        """``coerce=False`` sends ``value`` exactly as given, for a value
+        already typed by a schema codec (binary only)."""
+        if coerce:
+            return self._encoder.encode_update(parent_id, value_id, value)
+        return self._encoder.encode_update(parent_id, value_id, value, coerce=False)
 
     def wrap_forward(self, inner: bytes, target_eui: int) -> bytes:
         """Wrap ``inner`` in a gateway-forward envelope targeting
@@ -88,7 +185,11 @@ class ThingSetProtocol:
             return self._parse_binary(data)
         return self._parse_text(data)
 
-    def parse_report(self, payload: bytes) -> Union[ThingSetReport, None]:
+    def parse_report(
+        self,
+        payload: bytes,
+        accept: Union[Callable[[Union[int, None], int], bool], None] = None,
+    ) -> Union[ThingSetReport, None]:
         """Parse a reassembled report payload (no UDP framing header).
 
         Returns ``None`` if the payload is empty, of an unknown type,
@@ -97,32 +198,36 @@ class ThingSetProtocol:
         - ``[0x1F][CBOR uint: subset_id][CBOR map: {id: value}]``
         - ``[0x1E][CBOR uint64: eui][CBOR uint: subset_id][CBOR map: {id: value}]``
 
+        ``accept(eui, subset_id)`` is called with the header before
+        the value map is decoded; if it returns false, so does this,
+        having done no more work.
+
         Binary only; the publish/subscribe path doesn't exist on text
         transports.
         """
         if self.wire_format is not WireFormat.BINARY:
             raise ValueError("parse_report is binary only")
-        if not payload:
+        header = peek_report_header(payload)
+        if header is None:
             return None
-        type_byte = payload[0]
-        if type_byte not in (REPORT_TYPE_STANDARD, REPORT_TYPE_ENHANCED):
+        if accept is not None and not accept(header.eui, header.subset_id):
             return None
 
-        stream = io.BytesIO(payload[1:])
         try:
-            eui: Union[int, None] = None
-            if type_byte == REPORT_TYPE_ENHANCED:
-                eui = cbor2.load(stream)
-            subset_id = cbor2.load(stream)
-            values = cbor2.load(stream)
+            if self._array_decode is None:
+                stream = io.BytesIO(payload)
+                stream.seek(header.offset)
+                values = cbor2.load(stream)
+            else:
+                values, _ = self._load(payload, header.offset)
         except (cbor2.CBORDecodeError, cbor2.CBORDecodeEOF):
             return None
 
-        if not isinstance(subset_id, int) or not isinstance(values, dict):
-            return None
-        if eui is not None and not isinstance(eui, int):
+        if not isinstance(values, dict):
             return None
-        return ThingSetReport(subset_id=subset_id, values=values, eui=eui)
+        return ThingSetReport(
+            subset_id=header.subset_id, values=values, eui=header.eui
+        )
 
     def build_single_frame_report(
         self, data_id: int, payload: bytes
@@ -144,7 +249,7 @@ class ThingSetProtocol:
         if not payload:
             return None
         try:
-            value = cbor2.loads(payload)
+            value = self._loads(payload)
         except (cbor2.CBORDecodeError, cbor2.CBORDecodeEOF):
             return None
         return ThingSetReport(subset_id=None, values={data_id: value}, eui=None)
@@ -193,11 +298,19 @@ class ThingSetProtocol:
         parsed: Any = None
         if len(payload) > 0:
             try:
-                parsed = cbor2.loads(payload)
+                parsed = self._loads(payload)
             except cbor2.CBORDecodeEOF as e:
                 parsed = e
         return ParsedResponse(status_code, status_string, parsed, data)
 
+    def _loads(self, payload: bytes) -> Any:
+        if self._array_decode is None:
+            return cbor2.loads(payload)
+        return _cbor_arrays.loads(payload, self._array_decode)
+
+    def _load(self, payload: bytes, offset: int) -> Tuple[Any, int]:
+        return _cbor_arrays.load(payload, offset, self._array_decode)
+
     def _parse_text(self, data: Union[bytes, str]) -> ParsedResponse:
         if isinstance(data, bytes):
             data = data.decode()
@@ -17,37 +17,91 @@ whole point — the Device Bridge keeps running other coroutines while
 a ThingSet RPC is in flight.
 """
 
+import asyncio
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
+from . import _discovery
 from ._protocol import ParsedResponse, ThingSetProtocol, WireFormat
+from .client import RpcSink, _raw_response
+from .codec import FunctionCodec, ValueCodec
+from .lazy_schema import AsyncLazySchemaTree
+from .path_index import Address, PathIndex, child_path
 from .response import ThingSetResponse, ThingSetStatus, ThingSetValue
-from .schema import SchemaNode, SchemaTree
-
-
-# Binary ThingSet metadata overlay (used by discover_schema)
-_METADATA_OVERLAY = 0x19
-_METADATA_KEY_NAME = 26  # 0x1A
-_METADATA_KEY_TYPE = 27  # 0x1B
-_METADATA_KEY_ACCESS = 28  # 0x1C
-_RECURSIVE_TYPE = "group"
+from .schema import SchemaDiff, SchemaNode, SchemaTree
+from .schema_cache import DEFAULT_FINGERPRINT_ID, SchemaCache, schema_fingerprint
 
 
 class AsyncThingSetClient(ABC):
     _protocol: ThingSetProtocol
+    _path_indexes: Union[Dict[Union[int, None], PathIndex], None] = None
+    # Attached by a first path lookup: addresses only, no codecs
+    _lazy_indexes: Union[Dict[Union[int, None], PathIndex], None] = None
+    # As for ThingSetClient
+    rpc_sink: Union[RpcSink, None] = None
 
     @property
     def wire_format(self) -> WireFormat:
         return self._protocol.wire_format
 
+    @property
+    def typed_arrays(self) -> bool:
+        """Send float buffers as RFC 8746 typed arrays (binary only)."""
+        return self._protocol.typed_arrays
+
+    @typed_arrays.setter
+    def typed_arrays(self, enabled: bool) -> None:
+        self._protocol.typed_arrays = enabled
+
+    @property
+    def array_decode(self) -> Union[str, None]:
+        """Return numeric arrays in responses packed: ``"array"`` or
+        ``"numpy"`` (binary only; see :class:`ThingSetProtocol`)."""
+        return self._protocol.array_decode
+
+    @array_decode.setter
+    def array_decode(self, mode: Union[str, None]) -> None:
+        self._protocol.array_decode = mode
+
+    def attach_schema(
+        self,
+        tree: SchemaTree,
+        node_id: Union[int, None] = None,
+        root_id: int = 0,
+        *,
+        decode: Union[str, None] = None,
+    ) -> None:
+        """Address ``node_id``'s values by path using ``tree``, and
+        check, encode and decode them by type; see
+        :meth:`ThingSetClient.attach_schema`. Without an attached tree,
+        paths are looked up in a :meth:`lazy_schema`, for addressing
+        only.
+        """
+        if self._path_indexes is None:
+            self._path_indexes = {}
+        self._path_indexes[node_id] = PathIndex(tree, root_id, decode)
+        if self._lazy_indexes is not None:
+            self._lazy_indexes.pop(node_id, None)
+
     async def fetch(
         self,
         parent_id: Union[int, str],
         ids: List[Union[int, str]],
         node_id: Union[int, None] = None,
     ) -> ThingSetResponse:
-        parsed = await self._rpc(
-            self._protocol.encode_fetch(parent_id, ids), node_id
+        wire_parent: Union[int, str] = parent_id
+        wire_ids: List[Union[int, str]] = ids
+        if self.wire_format is WireFormat.BINARY and (
+            isinstance(parent_id, str) or any(isinstance(i, str) for i in ids)
+        ):
+            wire_parent = await self._wire_id(parent_id, node_id)
+            wire_ids = [
+                await self._wire_id(child_path(parent_id, i), node_id)
+                for i in ids
+            ]
+        parsed = await self._exchange(
+            self._protocol.encode_fetch(wire_parent, wire_ids), node_id
         )
         values: List[ThingSetValue] = []
         if (
@@ -56,10 +110,16 @@ class AsyncThingSetClient(ABC):
             and parsed.status_code <= ThingSetStatus.CONTENT
         ):
             if len(ids) == 0:
-                values.append(self._build_value(parent_id, parsed.data))
+                values.append(
+                    self._build_value(parent_id, parsed.data, wire_parent, node_id)
+                )
             else:
                 for idx, vid in enumerate(ids):
-                    values.append(self._build_value(vid, parsed.data[idx]))
+                    values.append(
+                        self._build_value(
+                            vid, parsed.data[idx], wire_ids[idx], node_id
+                        )
+                    )
         return self._to_response(parsed, values)
 
     async def get(
@@ -67,14 +127,17 @@ class AsyncThingSetClient(ABC):
         value_id: Union[int, str],
         node_id: Union[int, None] = None,
     ) -> ThingSetResponse:
-        parsed = await self._rpc(self._protocol.encode_get(value_id), node_id)
+        wire_id = value_id
+        if self.wire_format is WireFormat.BINARY:
+            wire_id = await self._wire_id(value_id, node_id)
+        parsed = await self._exchange(self._protocol.encode_get(wire_id), node_id)
         values: List[ThingSetValue] = []
         if (
             parsed is not None
             and parsed.status_code is not None
             and parsed.status_code <= ThingSetStatus.CONTENT
         ):
-            values.append(self._build_value(value_id, parsed.data))
+            values.append(self._build_value(value_id, parsed.data, wire_id, node_id))
         return self._to_response(parsed, values)
 
     async def update(
@@ -82,10 +145,20 @@ class AsyncThingSetClient(ABC):
         value_id: Union[int, str],
         value: Any,
         node_id: Union[int, None] = None,
-        parent_id: Union[int, None] = None,
+        parent_id: Union[int, str, None] = None,
     ) -> ThingSetResponse:
-        parsed = await self._rpc(
-            self._protocol.encode_update(parent_id, value_id, value), node_id
+        coerce = True
+        if self.wire_format is WireFormat.BINARY:
+            if isinstance(value_id, str):
+                parent, value_id = await self._address(value_id, node_id)
+                if parent_id is None:
+                    parent_id = parent
+            parent_id = await self._wire_id(parent_id, node_id)
+            codec = self._codec(value_id, node_id)
+            if codec is not None:
+                value, coerce = codec.encode(value), False
+        parsed = await self._exchange(
+            self._protocol.encode_update(parent_id, value_id, value, coerce), node_id
         )
         return self._to_response(parsed)
 
@@ -95,8 +168,14 @@ class AsyncThingSetClient(ABC):
         args: Union[List[Any], None],
         node_id: Union[int, None] = None,
     ) -> ThingSetResponse:
-        parsed = await self._rpc(
-            self._protocol.encode_exec(value_id, args), node_id
+        coerce = True
+        if self.wire_format is WireFormat.BINARY:
+            value_id = await self._wire_id(value_id, node_id)
+            codec = self._codec(value_id, node_id)
+            if isinstance(codec, FunctionCodec):
+                args, coerce = codec.encode(args), False
+        parsed = await self._exchange(
+            self._protocol.encode_exec(value_id, args, coerce), node_id
         )
         return self._to_response(parsed)
 
@@ -104,74 +183,246 @@ class AsyncThingSetClient(ABC):
         self,
         root_id: int = 0,
         node_id: Union[int, None] = None,
+        *,
+        metadata_batch_size: int = _discovery.DEFAULT_METADATA_BATCH,
     ) -> SchemaTree:
+        """Async counterpart of :meth:`ThingSetClient.discover_schema`.
+
+        The child-list fetches for all groups at one depth, and the
+        metadata batches that follow, are issued concurrently. A
+        transport that can only carry one request at a time still
+        serialises them, but back-to-back with no walker round-trip
+        in between.
+        """
         if self.wire_format is not WireFormat.BINARY:
             raise ValueError(
                 "discover_schema requires a binary wire format (TCP or CAN)"
             )
         by_id: Dict[int, SchemaNode] = {}
         by_path: Dict[str, SchemaNode] = {}
-        root = await self._walk_schema(root_id, "", node_id, by_id, by_path)
+        root = (
+            await self._expand_groups(
+                [(root_id, "")], node_id, by_id, by_path, metadata_batch_size
+            )
+        )[0]
+        frontier = [n for n in root if _discovery.is_recursive(n)]
+        while frontier:
+            levels = await self._expand_groups(
+                [(n.id, n.path) for n in frontier],
+                node_id,
+                by_id,
+                by_path,
+                metadata_batch_size,
+            )
+            for node, children in zip(frontier, levels):
+                node.children = children
+            frontier = [
+                c for children in levels for c in children
+                if _discovery.is_recursive(c)
+            ]
         return SchemaTree(root=root, by_id=by_id, by_path=by_path)
 
-    async def _walk_schema(
+    async def lazy_schema(
+        self,
+        root_id: int = 0,
+        node_id: Union[int, None] = None,
+        *,
+        metadata_batch_size: int = _discovery.DEFAULT_METADATA_BATCH,
+    ) -> AsyncLazySchemaTree:
+        """Async counterpart of :meth:`ThingSetClient.lazy_schema`.
+
+        Returns an :class:`AsyncLazySchemaTree` with its top level
+        loaded; deeper nodes are discovered through its coroutines.
+        """
+        tree = AsyncLazySchemaTree(
+            self, root_id, node_id, metadata_batch_size=metadata_batch_size
+        )
+        await tree.load_root()
+        return tree
+
+    async def discover_schema_cached(
         self,
-        group_id: int,
-        path_prefix: str,
+        cache: SchemaCache,
+        device_key: Union[int, str],
+        root_id: int = 0,
+        node_id: Union[int, None] = None,
+        *,
+        fingerprint_id: int = DEFAULT_FINGERPRINT_ID,
+        metadata_batch_size: int = _discovery.DEFAULT_METADATA_BATCH,
+        revalidate: bool = False,
+    ) -> SchemaTree:
+        """Like :meth:`discover_schema`, but reuse the tree stored in
+        ``cache`` for ``device_key`` while the device's firmware is
+        unchanged.
+
+        The firmware is identified by the value of ``fingerprint_id``,
+        so a warm cache costs a single ``get``. When that value
+        differs from the one recorded with the cached tree, the tree
+        is walked again and the cache entry replaced. With
+        ``revalidate``, the cached tree is revalidated instead (see
+        :meth:`revalidate_schema`), which is cheaper but misses nodes
+        renamed or retyped in place. If the fingerprint can't be read,
+        the tree is walked and not cached.
+        """
+        if self.wire_format is not WireFormat.BINARY:
+            raise ValueError(
+                "discover_schema requires a binary wire format (TCP or CAN)"
+            )
+        resp = await self.get(fingerprint_id, node_id)
+        if resp.status_code != ThingSetStatus.CONTENT:
+            return await self.discover_schema(
+                root_id, node_id, metadata_batch_size=metadata_batch_size
+            )
+        fingerprint = schema_fingerprint(resp.data)
+        cached = await asyncio.to_thread(cache.load, device_key)
+        if (
+            cached is not None
+            and cached.fingerprint == fingerprint
+            and cached.root_id == root_id
+        ):
+            return cached.tree
+        if revalidate and cached is not None and cached.root_id == root_id:
+            tree = cached.tree
+            await self.revalidate_schema(
+                tree, root_id, node_id, metadata_batch_size=metadata_batch_size
+            )
+        else:
+            tree = await self.discover_schema(
+                root_id, node_id, metadata_batch_size=metadata_batch_size
+            )
+        await asyncio.to_thread(
+            cache.store, device_key, fingerprint, tree, root_id
+        )
+        return tree
+
+    async def revalidate_schema(
+        self,
+        tree: SchemaTree,
+        root_id: int = 0,
+        node_id: Union[int, None] = None,
+        *,
+        metadata_batch_size: int = _discovery.DEFAULT_METADATA_BATCH,
+    ) -> SchemaDiff:
+        """Async counterpart of :meth:`ThingSetClient.revalidate_schema`."""
+        if self.wire_format is not WireFormat.BINARY:
+            raise ValueError(
+                "revalidate_schema requires a binary wire format (TCP or CAN)"
+            )
+        revalidation = _discovery.Revalidation(tree, root_id)
+        groups = revalidation.start()
+        while groups:
+            responses = await asyncio.gather(
+                *(self.fetch(group_id, [], node_id) for group_id, _ in groups)
+            )
+            child_lists = [_discovery.child_ids_from(r) for r in responses]
+            metadata: Dict[int, Dict[int, Any]] = {}
+            for md in await asyncio.gather(
+                *(
+                    self._fetch_metadata(batch, node_id)
+                    for batch in _discovery.metadata_batches(
+                        revalidation.unknown(groups, child_lists),
+                        metadata_batch_size,
+                    )
+                )
+            ):
+                metadata.update(md)
+            groups = revalidation.apply(groups, child_lists, metadata)
+        return revalidation.finish()
+
+    async def _expand_groups(
+        self,
+        groups: List[Tuple[int, str]],
         node_id: Union[int, None],
         by_id: Dict[int, SchemaNode],
         by_path: Dict[str, SchemaNode],
-    ) -> List[SchemaNode]:
-        fresp = await self.fetch(group_id, [], node_id)
-        if not fresp.values:
-            return []
-        child_ids = fresp.values[0].value
-        if not isinstance(child_ids, list) or not child_ids:
-            return []
-
-        mresp = await self.fetch(_METADATA_OVERLAY, child_ids, node_id)
-        if mresp.status_code != ThingSetStatus.CONTENT or not mresp.values:
-            return []
-
-        nodes: List[SchemaNode] = []
-        for idx, cid in enumerate(child_ids):
-            md = mresp.values[idx].value if idx < len(mresp.values) else None
-            if not isinstance(md, dict):
-                continue
-            name = md.get(_METADATA_KEY_NAME, "")
-            type_str = md.get(_METADATA_KEY_TYPE, "")
-            access = md.get(_METADATA_KEY_ACCESS, 0)
-            full_path = f"{path_prefix}/{name}" if path_prefix else name
-
-            children: List[SchemaNode] = []
-            if type_str == _RECURSIVE_TYPE:
-                children = await self._walk_schema(
-                    cid, full_path, node_id, by_id, by_path
+        metadata_batch_size: int,
+        node_factory: _discovery.NodeFactory = SchemaNode,
+    ) -> List[List[SchemaNode]]:
+        responses = await asyncio.gather(
+            *(self.fetch(group_id, [], node_id) for group_id, _ in groups)
+        )
+        child_lists = [_discovery.child_ids_from(r) for r in responses]
+        metadata: Dict[int, Dict[int, Any]] = {}
+        for md in await asyncio.gather(
+            *(
+                self._fetch_metadata(batch, node_id)
+                for batch in _discovery.metadata_batches(
+                    [cid for ids in child_lists for cid in ids],
+                    metadata_batch_size,
                 )
+            )
+        ):
+            metadata.update(md)
+        return _discovery.build_children(
+            groups, child_lists, metadata, by_id, by_path, node_factory
+        )
+
+    async def _fetch_metadata(
+        self, batch: List[int], node_id: Union[int, None]
+    ) -> Dict[int, Dict[int, Any]]:
+        resp = await self.fetch(_discovery.METADATA_OVERLAY, batch, node_id)
+        if _discovery.should_split(resp, batch):
+            first, second = _discovery.split(batch)
+            halves = await asyncio.gather(
+                self._fetch_metadata(first, node_id),
+                self._fetch_metadata(second, node_id),
+            )
+            return {**halves[0], **halves[1]}
+        return _discovery.metadata_from(batch, resp)
 
-            node = SchemaNode(
-                id=cid,
-                name=name,
-                type=type_str,
-                access=access,
-                path=full_path,
-                children=children,
+    async def _path_index(self, node_id: Union[int, None]) -> PathIndex:
+        if self._path_indexes is not None and node_id in self._path_indexes:
+            return self._path_indexes[node_id]
+        if self._lazy_indexes is None:
+            self._lazy_indexes = {}
+        index = self._lazy_indexes.get(node_id)
+        if index is None:
+            index = self._lazy_indexes[node_id] = PathIndex(
+                await self.lazy_schema(node_id=node_id)
             )
-            nodes.append(node)
-            by_id[cid] = node
-            by_path[full_path] = node
+        return index
 
-        return nodes
+    async def _address(self, path: str, node_id: Union[int, None]) -> Address:
+        index = await self._path_index(node_id)
+        address = index.get(path)
+        if address is None:
+            if isinstance(index.tree, AsyncLazySchemaTree):
+                await index.tree.resolve(path)
+            address = index[path]
+        return address
+
+    async def _wire_id(self, value_id: Any, node_id: Union[int, None]) -> Any:
+        if isinstance(value_id, str):
+            if not value_id.lstrip("/"):
+                return (await self._path_index(node_id)).id_of(value_id)
+            return (await self._address(value_id, node_id))[1]
+        return value_id
 
     def _build_value(
         self,
         value_id: Union[int, str],
         value: Any,
+        wire_id: Union[int, str, None] = None,
+        node_id: Union[int, None] = None,
     ) -> ThingSetValue:
         if self.wire_format is WireFormat.TEXT:
             return ThingSetValue(None, value, value_id)
+        if self._path_indexes and node_id in self._path_indexes:
+            value = self._path_indexes[node_id].decode_value(
+                value_id if wire_id is None else wire_id, value
+            )
+        if isinstance(value_id, str):
+            return ThingSetValue(wire_id, value, value_id)
         return ThingSetValue(value_id, value, None)
 
+    def _codec(
+        self, value_id: Any, node_id: Union[int, None]
+    ) -> Union[ValueCodec, None]:
+        """Codec for ``value_id`` if an attached schema knows its type."""
+        if not self._path_indexes or node_id not in self._path_indexes:
+            return None
+        return self._path_indexes[node_id].codec(value_id)
+
     @staticmethod
     def _to_response(
         parsed: Union[ParsedResponse, None],
@@ -187,6 +438,17 @@ class AsyncThingSetClient(ABC):
             raw=parsed.raw,
         )
 
+    async def _exchange(
+        self, request: bytes, node_id: Union[int, None]
+    ) -> Union[ParsedResponse, None]:
+        sink = self.rpc_sink
+        if sink is None:
+            return await self._rpc(request, node_id)
+        started = time.perf_counter()
+        parsed = await self._rpc(request, node_id)
+        sink(request, _raw_response(parsed), time.perf_counter() - started, node_id)
+        return parsed
+
     @abstractmethod
     async def close(self) -> None:
         pass
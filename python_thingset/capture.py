@@ -0,0 +1,623 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Recording reports and RPC traffic to capture files.
+
+A :class:`CaptureWriter` appends what the receivers and clients see on
+the wire — reassembled report payloads with their source and receive
+time, and RPC requests and responses with their round-trip time — to
+a compact file, so a field problem can be looked at (or replayed)
+later::
+
+    capture = CaptureWriter("site.tscap", max_bytes=64 << 20, max_files=20)
+    receiver = AsyncThingSetUDPReceiver(payload_sink=capture.report)
+    client.rpc_sink = capture.rpc
+    ...
+    capture.close()
+
+    for record in CaptureReader("site.00000.tscap"):
+        ...
+
+Records are gathered into blocks of about ``block_size`` bytes, and
+each block is compressed (``zlib``, ``lzma`` or not at all) and
+written by a background thread, so recording a report costs the
+receiver only a ``struct.pack`` and a copy. If the disk can't keep up,
+at most ``max_pending`` blocks wait; further blocks are dropped, and
+their records counted in :attr:`CaptureWriter.dropped`, rather than
+holding up the receiver or growing without bound. The open block is
+written when it fills, when a record arrives ``flush_interval``
+seconds after it was started, on :meth:`CaptureWriter.flush` and on
+close.
+
+Files are append-only: a header, then self-contained blocks, then on
+close an index of the blocks' offsets and time ranges. A file cut
+short (by a crash, or while still being written) has no index; the
+reader then walks the blocks instead, up to the last complete one.
+With ``max_bytes``, a file that grows past it is closed and the next
+one started; ``site.tscap`` becomes ``site.00000.tscap``,
+``site.00001.tscap``, ... and with ``max_files`` the oldest are
+removed. A writer started again carries on after the newest file
+left by the last; without ``max_bytes`` an existing file is an error
+(``FileExistsError``) rather than overwritten. :func:`capture_files`
+lists the files in order.
+
+:class:`CaptureReader` maps a file into memory and decompresses only
+the blocks a query needs.
+"""
+
+import lzma
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Tuple,
+    Union,
+)
+
+from ._protocol import peek_report_header
+from .log import get_logger
+from .shm_ring import RawReport, _pack_source, _unpack_source
+
+
+logger = get_logger()
+
+
+_FILE_MAGIC = b"TSCAPTUR"
+_VERSION = 1
+
+# File header: magic, version, compression, created
+_FILE_HEADER = struct.Struct("<8sBB6xd")
+
+# Block header: magic, uncompressed size, compressed size, records,
+# CRC-32 of the compressed data, first and last timestamps
+_BLOCK_MAGIC = b"TSBK"
+_BLOCK_HEADER = struct.Struct("<4sIIIIdd")
+
+# Index entry per block: offset, records, first and last timestamps;
+# then a trailer: index offset, blocks, magic
+_INDEX_ENTRY = struct.Struct("<QIdd")
+_INDEX_MAGIC = b"TSIX"
+_TRAILER = struct.Struct("<QI4s")
+
+# Record: kind, source kind, flags, payload (or request) length,
+# response length, timestamp, data ID (or node ID), latency, source
+_RECORD = struct.Struct("<BBBxIIdId16s")
+
+_KIND_REPORT = 1
+_KIND_RPC = 2
+
+_HAS_DATA_ID = 0x01
+_HAS_NODE_ID = 0x02
+_HAS_RESPONSE = 0x04
+
+_COMPRESSION = {"none": 0, "zlib": 1, "lzma": 2}
+_COMPRESSION_NAMES = {code: name for name, code in _COMPRESSION.items()}
+
+DEFAULT_BLOCK_SIZE = 256 << 10
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_PENDING = 16
+
+# Cached packed sources; cleared when it grows past this
+_MAX_SOURCES = 4096
+
+_WARNING_INTERVAL = 1.0
+
+
+@dataclass
+class CapturedRpc:
+    timestamp: float
+    node_id: Union[int, None]
+    request: bytes
+    # None if the request timed out
+    response: Union[bytes, None]
+    latency: float
+
+
+CaptureRecord = Union[RawReport, CapturedRpc]
+
+
+class BlockInfo(NamedTuple):
+    offset: int
+    records: int
+    first: float
+    last: float
+
+
+class CaptureWriter:
+    """Appends report payloads and RPC exchanges to capture files.
+
+    :meth:`report` is usable as a receiver's ``payload_sink`` and
+    :meth:`rpc` as a client's ``rpc_sink``. Neither is thread-safe;
+    record from one thread (the event loop).
+    """
+
+    def __init__(
+        self,
+        path: Union[str, "os.PathLike[str]"],
+        compression: str = "zlib",
+        level: Union[int, None] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_bytes: Union[int, None] = None,
+        max_files: Union[int, None] = None,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ) -> None:
+        if compression not in _COMPRESSION:
+            raise ValueError(
+                f"unknown compression {compression!r}; expected one of "
+                + ", ".join(_COMPRESSION)
+            )
+        if max_files is not None and max_bytes is None:
+            raise ValueError("max_files needs max_bytes to rotate by")
+        self._path = Path(path)
+        self._compression = compression
+        self._level = level
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+
+        self._block = bytearray()
+        self._block_records = 0
+        self._block_first = 0.0
+        self._block_last = 0.0
+        self._block_started = 0.0
+        self._sources: Dict[Any, Tuple[int, bytes]] = {}
+
+        self.records = 0
+        self.blocks = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self._last_warning = float("-inf")
+        self._dropped_since_warning = 0
+
+        self._file: Any = None
+        self._index: List[BlockInfo] = []
+        # Files from earlier runs count towards max_files, and numbering
+        # carries on after them
+        self.files: List[Path] = []
+        self._file_index = 0
+        if max_bytes is not None:
+            self.files = _rotated_files(self._path)
+            if self.files:
+                self._file_index = _rotation_index(self.files[-1]) + 1
+        self._open_next()
+
+        self._pending: "queue.Queue[Union[Tuple[bytes, int, float, float], None]]" = (
+            queue.Queue(max_pending)
+        )
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._write_blocks, name="thingset-capture", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def path(self) -> Path:
+        """The file being written."""
+        return self.files[-1]
+
+    # -- Recording ------------------------------------------------------
+
+    def report(
+        self,
+        addr: Any,
+        payload: bytes,
+        timestamp: Union[float, None] = None,
+        data_id: Union[int, None] = None,
+    ) -> None:
+        """Record a report payload from ``addr``: a reassembled
+        envelope, or with ``data_id`` a CAN single-frame value."""
+        source = self._sources.get(addr)
+        if source is None:
+            if len(self._sources) >= _MAX_SOURCES:
+                self._sources.clear()
+            source = self._sources[addr] = _pack_source(addr)
+        if timestamp is None:
+            timestamp = time.time()
+        self._append(
+            _RECORD.pack(
+                _KIND_REPORT,
+                source[0],
+                0 if data_id is None else _HAS_DATA_ID,
+                len(payload),
+                0,
+                timestamp,
+                data_id or 0,
+                0.0,
+                source[1],
+            ),
+            payload,
+            timestamp,
+        )
+
+    def rpc(
+        self,
+        request: bytes,
+        response: Union[bytes, None],
+        latency: float,
+        node_id: Union[int, None] = None,
+        timestamp: Union[float, None] = None,
+    ) -> None:
+        """Record an RPC: its request and response bytes (``None`` for
+        a timeout) and round trip in seconds."""
+        flags = 0 if node_id is None else _HAS_NODE_ID
+        if response is not None:
+            flags |= _HAS_RESPONSE
+        if timestamp is None:
+            timestamp = time.time()
+        self._append(
+            _RECORD.pack(
+                _KIND_RPC,
+                0,
+                flags,
+                len(request),
+                len(response or b""),
+                timestamp,
+                node_id or 0,
+                latency,
+                b"",
+            ),
+            request + (response or b""),
+            timestamp,
+        )
+
+    def flush(self) -> None:
+        """Hand the open block to the writer thread."""
+        if self._block_records:
+            self._seal()
+
+    def close(self) -> None:
+        """Write what is left and the index, and close the file."""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        while self._thread.is_alive():
+            try:
+                self._pending.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                # The writer thread is still draining, or died
+                continue
+        self._thread.join()
+
+    def __enter__(self) -> "CaptureWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    # -- Internals ------------------------------------------------------
+
+    def _append(self, header: bytes, data: bytes, timestamp: float) -> None:
+        if self._closed:
+            raise ValueError("capture is closed")
+        block = self._block
+        if not self._block_records:
+            self._block_first = timestamp
+            self._block_started = time.monotonic()
+        block += header
+        block += data
+        self._block_records += 1
+        self._block_last = timestamp
+        self.records += 1
+        if (
+            len(block) >= self.block_size
+            or time.monotonic() - self._block_started >= self.flush_interval
+        ):
+            self._seal()
+
+    def _seal(self) -> None:
+        item = (
+            bytes(self._block),
+            self._block_records,
+            self._block_first,
+            self._block_last,
+        )
+        self._block.clear()
+        self._block_records = 0
+        try:
+            self._pending.put_nowait(item)
+        except queue.Full:
+            self.dropped += item[1]
+            self._dropped_since_warning += item[1]
+            now = time.monotonic()
+            if now - self._last_warning >= _WARNING_INTERVAL:
+                logger.warning(
+                    "ThingSet capture falling behind; dropped %d records",
+                    self._dropped_since_warning,
+                )
+                self._last_warning = now
+                self._dropped_since_warning = 0
+
+    def _compress(self, data: bytes) -> bytes:
+        if self._compression == "zlib":
+            return zlib.compress(data, 1 if self._level is None else self._level)
+        if self._compression == "lzma":
+            return lzma.compress(
+                data, preset=0 if self._level is None else self._level
+            )
+        return data
+
+    def _write_blocks(self) -> None:
+        """Writer thread: compress and write blocks until closed."""
+        try:
+            while True:
+                item = self._pending.get()
+                if item is None:
+                    break
+                data, records, first, last = item
+                compressed = self._compress(data)
+                self._index.append(BlockInfo(self._file.tell(), records, first, last))
+                self._file.write(
+                    _BLOCK_HEADER.pack(
+                        _BLOCK_MAGIC,
+                        len(data),
+                        len(compressed),
+                        records,
+                        zlib.crc32(compressed),
+                        first,
+                        last,
+                    )
+                )
+                self._file.write(compressed)
+                self._file.flush()
+                self.blocks += 1
+                self.bytes_written += _BLOCK_HEADER.size + len(compressed)
+                if self.max_bytes is not None and self._file.tell() >= self.max_bytes:
+                    self._finish_file()
+                    self._open_next()
+        except Exception:
+            logger.exception("ThingSet capture writer failed")
+        finally:
+            self._finish_file()
+
+    def _open_next(self) -> None:
+        if self.max_bytes is None:
+            path = self._path
+        else:
+            path = _rotated(self._path, self._file_index)
+            self._file_index += 1
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Never overwrite an earlier capture
+        self._file = open(path, "xb")
+        self._file.write(
+            _FILE_HEADER.pack(
+                _FILE_MAGIC, _VERSION, _COMPRESSION[self._compression], time.time()
+            )
+        )
+        self._index = []
+        self.files.append(path)
+        if self.max_files is not None:
+            while len(self.files) > self.max_files:
+                old = self.files.pop(0)
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+    def _finish_file(self) -> None:
+        """Append the block index and close the current file."""
+        if self._file is None or self._file.closed:
+            return
+        offset = self._file.tell()
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+        self._file.write(_TRAILER.pack(offset, len(self._index), _INDEX_MAGIC))
+        self._file.close()
+
+
+class CaptureReader:
+    """A capture file, mapped into memory.
+
+    Iterate for every record in order, or use :meth:`records` to pick
+    by time and kind; blocks outside the range are not decompressed.
+    """
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"]) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _FILE_HEADER.size:
+                raise ValueError(f"{self.path} is not a ThingSet capture")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, compression, created = _FILE_HEADER.unpack_from(self._map, 0)
+        if magic != _FILE_MAGIC or version != _VERSION:
+            self._map.close()
+            raise ValueError(f"{self.path} is not a ThingSet capture")
+        if compression not in _COMPRESSION_NAMES:
+            self._map.close()
+            raise ValueError(f"{self.path} uses unknown compression {compression}")
+        self.compression = _COMPRESSION_NAMES[compression]
+        self.created = created
+        self.blocks = self._read_index()
+        # False if the file was cut short and had to be walked
+        self.complete = self._complete
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> "CaptureReader":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(block.records for block in self.blocks)
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        return self.records()
+
+    @property
+    def start(self) -> Union[float, None]:
+        """Time of the first record."""
+        return min((b.first for b in self.blocks), default=None)
+
+    @property
+    def end(self) -> Union[float, None]:
+        """Time of the last record."""
+        return max((b.last for b in self.blocks), default=None)
+
+    def records(
+        self,
+        start: Union[float, None] = None,
+        end: Union[float, None] = None,
+        kinds: Union[Collection[str], None] = None,
+    ) -> Iterator[CaptureRecord]:
+        """Records from ``start`` up to ``end`` (times as
+        ``time.time()``), of ``kinds`` — ``"report"``, ``"rpc"`` — or
+        all."""
+        wanted = None
+        if kinds is not None:
+            names = {"report": _KIND_REPORT, "rpc": _KIND_RPC}
+            try:
+                wanted = {names[kind] for kind in kinds}
+            except KeyError as e:
+                raise ValueError(f"unknown record kind {e.args[0]!r}") from None
+        for block in self.blocks:
+            if start is not None and block.last < start:
+                continue
+            if end is not None and block.first > end:
+                continue
+            for record in self._block_records(block, wanted):
+                if start is not None and record.timestamp < start:
+                    continue
+                if end is not None and record.timestamp > end:
+                    continue
+                yield record
+
+    def _block_records(
+        self, block: BlockInfo, wanted: Union[Collection[int], None]
+    ) -> Iterator[CaptureRecord]:
+        _, raw_size, size, _, crc, _, _ = _BLOCK_HEADER.unpack_from(
+            self._map, block.offset
+        )
+        begin = block.offset + _BLOCK_HEADER.size
+        compressed = self._map[begin : begin + size]
+        if zlib.crc32(compressed) != crc:
+            logger.warning(
+                "ThingSet capture %s: corrupt block at %d", self.path, block.offset
+            )
+            return
+        if self.compression == "zlib":
+            data = zlib.decompress(compressed)
+        elif self.compression == "lzma":
+            data = lzma.decompress(compressed)
+        else:
+            data = compressed
+        pos = 0
+        while pos < len(data):
+            (
+                kind,
+                source_kind,
+                flags,
+                length,
+                response_length,
+                timestamp,
+                value_id,
+                latency,
+                source,
+            ) = _RECORD.unpack_from(data, pos)
+            pos += _RECORD.size
+            body = data[pos : pos + length + response_length]
+            pos += length + response_length
+            if wanted is not None and kind not in wanted:
+                continue
+            if kind == _KIND_REPORT:
+                yield _report(
+                    timestamp,
+                    _unpack_source(source_kind, source),
+                    value_id if flags & _HAS_DATA_ID else None,
+                    body,
+                )
+            elif kind == _KIND_RPC:
+                yield CapturedRpc(
+                    timestamp,
+                    value_id if flags & _HAS_NODE_ID else None,
+                    body[:length],
+                    body[length:] if flags & _HAS_RESPONSE else None,
+                    latency,
+                )
+
+    def _read_index(self) -> List[BlockInfo]:
+        size = len(self._map)
+        self._complete = False
+        if size >= _FILE_HEADER.size + _TRAILER.size:
+            offset, count, magic = _TRAILER.unpack_from(self._map, size - _TRAILER.size)
+            if (
+                magic == _INDEX_MAGIC
+                and offset + count * _INDEX_ENTRY.size + _TRAILER.size == size
+            ):
+                self._complete = True
+                return [
+                    BlockInfo(*entry)
+                    for entry in _INDEX_ENTRY.iter_unpack(
+                        self._map[offset : offset + count * _INDEX_ENTRY.size]
+                    )
+                ]
+        return self._walk_blocks()
+
+    def _walk_blocks(self) -> List[BlockInfo]:
+        """The complete blocks of a file without an index."""
+        blocks = []
+        offset = _FILE_HEADER.size
+        size = len(self._map)
+        while offset + _BLOCK_HEADER.size <= size:
+            magic, _, length, records, _, first, last = _BLOCK_HEADER.unpack_from(
+                self._map, offset
+            )
+            end = offset + _BLOCK_HEADER.size + length
+            if magic != _BLOCK_MAGIC or end > size:
+                break
+            blocks.append(BlockInfo(offset, records, first, last))
+            offset = end
+        return blocks
+
+
+def _report(
+    timestamp: float, source: Any, data_id: Union[int, None], payload: bytes
+) -> RawReport:
+    if data_id is not None:
+        return RawReport(timestamp, source, None, None, data_id, payload)
+    header = peek_report_header(payload)
+    if header is None:
+        return RawReport(timestamp, source, None, None, None, payload)
+    return RawReport(timestamp, source, header.eui, header.subset_id, None, payload)
+
+
+def _rotated(path: Path, index: int) -> Path:
+    return path.with_name(f"{path.stem}.{index:05d}{path.suffix}")
+
+
+def _rotation_index(path: Path) -> int:
+    return int(path.stem.rsplit(".", 1)[1])
+
+
+def _rotated_files(path: Path) -> List[Path]:
+    rotated = path.parent.glob(f"{path.stem}.[0-9][0-9][0-9][0-9][0-9]{path.suffix}")
+    return sorted(rotated, key=_rotation_index)
+
+
+def capture_files(path: Union[str, "os.PathLike[str]"]) -> List[Path]:
+    """The files a :class:`CaptureWriter` for ``path`` wrote, oldest
+    first: ``path`` itself, or its rotated files."""
+    path = Path(path)
+    if path.exists():
+        return [path]
+    return _rotated_files(path)
@@ -7,14 +7,22 @@
 
 import argparse
 import json
-from time import sleep
+from time import sleep, time
 from typing import Any, Union
 
 from ._protocol import WireFormat
 from .client import ThingSetClient
+from .schema import SchemaTree
+from .response import ThingSetStatus
+from .schema_cache import DEFAULT_FINGERPRINT_ID, SchemaCache, schema_fingerprint
 from .transport import ThingSetCAN, ThingSetSerial, ThingSetTCP
 
 
+# How long, in seconds, a cached schema labels values before its
+# fingerprint is checked against the device again
+_FINGERPRINT_TTL = 300.0
+
+
 def process_args(args: list) -> list:
     processed_args = list()
 
@@ -61,10 +69,16 @@ def get_schema(
     ts: ThingSetClient,
     object_id: Union[int, str],
     node_id: Union[int, None] = None,
+    cache: Union[SchemaCache, None] = None,
+    device_key: Union[int, str, None] = None,
 ):
-    """Recursively print every child identifier under ``object_id``."""
+    """Recursively print every child identifier under ``object_id``.
+
+    On binary transports, a ``cache`` and ``device_key`` reuse a
+    previously discovered tree while the firmware is unchanged.
+    """
     if ts.wire_format is WireFormat.BINARY:
-        _schema_binary(ts, object_id, node_id)
+        _schema_binary(ts, object_id, node_id, cache, device_key)
     else:
         _schema_text(ts, object_id, node_id)
 
@@ -73,8 +87,15 @@ def _schema_binary(
     ts: ThingSetClient,
     object_id: int,
     node_id: Union[int, None],
+    cache: Union[SchemaCache, None] = None,
+    device_key: Union[int, str, None] = None,
 ) -> None:
-    tree = ts.discover_schema(root_id=object_id, node_id=node_id)
+    if cache is not None and device_key is not None:
+        tree = ts.discover_schema_cached(
+            cache, device_key, root_id=object_id, node_id=node_id
+        )
+    else:
+        tree = ts.discover_schema(root_id=object_id, node_id=node_id)
     for node in tree:
         print(node)
 
@@ -150,6 +171,18 @@ def setup_args() -> argparse.Namespace:
         ),
     )
 
+    parent_parser.add_argument(
+        "--schema-cache",
+        metavar="DIR",
+        help=(
+            "Binary transports only: keep discovered schemas in DIR. "
+            "`schema` re-walks the device only when its firmware "
+            "fingerprint changes, and other commands label IDs from "
+            "the cached schema instead of asking the device, checking "
+            "the fingerprint at most every five minutes."
+        ),
+    )
+
     subparsers = arg_parser.add_subparsers(
         dest="method",
         required=True,
@@ -280,9 +313,27 @@ def _make_client(args: argparse.Namespace) -> ThingSetClient:
     return ThingSetTCP(args.ip, target_eui=target_eui)
 
 
+def _device_key(args: argparse.Namespace) -> Union[int, str, None]:
+    """Schema-cache key for the device the CLI is talking to: the
+    target EUI when forwarding, else the IP or CAN bus and node.
+    Serial (text) devices have no cacheable schema."""
+    if args.ip:
+        return int(args.target_eui, 16) if args.target_eui else args.ip
+    if args.can_bus and args.target_address:
+        return f"{args.can_bus}:{int(args.target_address, 16):02x}"
+    return None
+
+
+def _schema_cache_for(args: argparse.Namespace) -> Union[SchemaCache, None]:
+    directory = getattr(args, "schema_cache", None)
+    return SchemaCache(directory) if directory else None
+
+
 def _dispatch(ts: ThingSetClient, args: argparse.Namespace):
     is_serial = bool(args.port)
     is_tcp = bool(args.ip)
+    cache = _schema_cache_for(args)
+    device_key = _device_key(args)
 
     match args.method:
         case "get":
@@ -339,9 +390,15 @@ def _dispatch(ts: ThingSetClient, args: argparse.Namespace):
                 root = "" if args.root_id == "00" else args.root_id
                 get_schema(ts, root)
             elif is_tcp:
-                get_schema(ts, int(args.root_id, 16))
+                get_schema(ts, int(args.root_id, 16), None, cache, device_key)
             else:
-                get_schema(ts, int(args.root_id, 16), int(args.target_address, 16))
+                get_schema(
+                    ts,
+                    int(args.root_id, 16),
+                    int(args.target_address, 16),
+                    cache,
+                    device_key,
+                )
             return None
 
     return None
@@ -392,23 +449,36 @@ def _fmt(v, names: dict = None) -> str:
 
 
 def _resolve_names(
-    ts: ThingSetClient, ids: list, node_id: Union[int, None] = None
+    ts: ThingSetClient,
+    ids: list,
+    node_id: Union[int, None] = None,
+    tree: Union[SchemaTree, None] = None,
 ) -> dict:
     """Best-effort ``fetch(0x19, [ids])`` → ``{id: (name, type)}``.
 
     Only runs for binary wire formats. ``node_id`` is required for CAN
-    (to build the ISO-TP request address) and ignored by TCP. Silently
-    returns {} on any failure so the caller falls back to raw IDs.
+    (to build the ISO-TP request address) and ignored by TCP. IDs
+    already described by ``tree`` (a cached schema) are answered from
+    it, and the device is only asked about the rest. Silently drops
+    IDs it can't resolve so the caller falls back to raw IDs.
     """
     if ts.wire_format is not WireFormat.BINARY or not ids:
         return {}
+    out = {}
+    if tree is not None:
+        for obj_id in ids:
+            node = tree.by_id.get(obj_id)
+            if node is not None:
+                out[obj_id] = (node.name, node.type)
+        ids = [i for i in ids if i not in out]
+        if not ids:
+            return out
     try:
         resp = ts.fetch(_METADATA_OVERLAY_ID, ids, node_id)
     except Exception:
-        return {}
+        return out
     if resp is None or resp.status_code is None or not resp.values:
-        return {}
-    out = {}
+        return out
     for idx, obj_id in enumerate(ids):
         if idx >= len(resp.values):
             break
@@ -439,6 +509,7 @@ def _print_response(
     response,
     op_hint: str = None,
     node_id: Union[int, None] = None,
+    tree: Union[SchemaTree, None] = None,
 ) -> None:
     if response is None:
         return
@@ -471,7 +542,7 @@ def _print_response(
         ):
             all_ids.update(v.value)
     names = (
-        _resolve_names(ts, sorted(all_ids), node_id) if all_ids else {}
+        _resolve_names(ts, sorted(all_ids), node_id, tree) if all_ids else {}
     )
 
     print(status_line)
@@ -510,6 +581,32 @@ def _node_id_for(args: argparse.Namespace) -> Union[int, None]:
     return None
 
 
+def _cached_tree(
+    ts: ThingSetClient, args: argparse.Namespace
+) -> Union[SchemaTree, None]:
+    """The cached schema for this device, if any. Its fingerprint is
+    checked with one ``get`` once the entry is ``_FINGERPRINT_TTL``
+    seconds old, and the entry dated afresh when the firmware is
+    unchanged."""
+    cache = _schema_cache_for(args)
+    device_key = _device_key(args)
+    if cache is None or device_key is None or ts.wire_format is not WireFormat.BINARY:
+        return None
+    cached = cache.load(device_key)
+    if cached is None:
+        return None
+    if time() - cached.checked_at < _FINGERPRINT_TTL:
+        return cached.tree
+    resp = ts.get(DEFAULT_FINGERPRINT_ID, _node_id_for(args))
+    if (
+        resp.status_code != ThingSetStatus.CONTENT
+        or schema_fingerprint(resp.data) != cached.fingerprint
+    ):
+        return None
+    cache.store(device_key, cached.fingerprint, cached.tree, cached.root_id)
+    return cached.tree
+
+
 def run_cli():
     args = setup_args()
     with _make_client(args) as ts:
@@ -520,6 +617,7 @@ def run_cli():
                 response,
                 op_hint=_op_hint(args),
                 node_id=_node_id_for(args),
+                tree=_cached_tree(ts, args) if response.values else None,
             )
 
 
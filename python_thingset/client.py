@@ -3,47 +3,123 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Union
+from typing import Any, Callable, Dict, List, Tuple, Union
 
+from . import _discovery
 from ._protocol import ParsedResponse, ThingSetProtocol, WireFormat
+from .codec import FunctionCodec, ValueCodec
+from .lazy_schema import LazySchemaTree
+from .path_index import Address, PathIndex, child_path
 from .response import ThingSetResponse, ThingSetStatus, ThingSetValue
-from .schema import SchemaNode, SchemaTree
+from .schema import SchemaDiff, SchemaNode, SchemaTree
+from .schema_cache import DEFAULT_FINGERPRINT_ID, SchemaCache, schema_fingerprint
 
 
-# Binary ThingSet metadata overlay (used by discover_schema)
-_METADATA_OVERLAY = 0x19
-_METADATA_KEY_NAME = 26  # 0x1A
-_METADATA_KEY_TYPE = 27  # 0x1B
-_METADATA_KEY_ACCESS = 28  # 0x1C
-# Types whose metadata advertises a parent node we can descend into.
-# "group" is the conventional namespace; "record"/"record[]" appear when
-# a property exposes a struct or array-of-struct (see TS++ ThingSetType.hpp:
-# the ThingSetType default is "record" and array suffixes append "[]"),
-# and the inner record members are registered as parent-scoped children.
-_RECURSIVE_TYPES = {"group", "record", "record[]"}
+# Called as rpc_sink(request, response, latency, node_id) after each
+# RPC, with the request and response bytes (response None on timeout)
+# and the round trip in seconds
+RpcSink = Callable[[bytes, Union[bytes, None], float, Union[int, None]], None]
+
+
+def _raw_response(parsed: Union[ParsedResponse, None]) -> Union[bytes, None]:
+    if parsed is None:
+        return None
+    raw = parsed.raw
+    return raw.encode() if isinstance(raw, str) else raw
 
 
 class ThingSetClient(ABC):
     """Abstract client: templates the fetch/get/exec/update flow over
     an encoded request followed by a parsed response. Subclasses provide
     the transport by implementing _send and _recv, and set self._protocol.
+
+    Set ``rpc_sink`` to see every request and response on the wire,
+    for instance :meth:`CaptureWriter.rpc`.
     """
 
     _protocol: ThingSetProtocol
+    _path_indexes: Union[Dict[Union[int, None], PathIndex], None] = None
+    # Attached by a first path lookup: addresses only, no codecs
+    _lazy_indexes: Union[Dict[Union[int, None], PathIndex], None] = None
+    rpc_sink: Union[RpcSink, None] = None
 
     @property
     def wire_format(self) -> WireFormat:
         return self._protocol.wire_format
 
+    @property
+    def typed_arrays(self) -> bool:
+        """Send float buffers as RFC 8746 typed arrays (binary only)."""
+        return self._protocol.typed_arrays
+
+    @typed_arrays.setter
+    def typed_arrays(self, enabled: bool) -> None:
+        self._protocol.typed_arrays = enabled
+
+    @property
+    def array_decode(self) -> Union[str, None]:
+        """Return numeric arrays in responses packed: ``"array"`` or
+        ``"numpy"`` (binary only; see :class:`ThingSetProtocol`)."""
+        return self._protocol.array_decode
+
+    @array_decode.setter
+    def array_decode(self, mode: Union[str, None]) -> None:
+        self._protocol.array_decode = mode
+
+    def attach_schema(
+        self,
+        tree: SchemaTree,
+        node_id: Union[int, None] = None,
+        root_id: int = 0,
+        *,
+        decode: Union[str, None] = None,
+    ) -> None:
+        """Address ``node_id``'s values by path using ``tree``.
+
+        On binary transports, ``fetch``, ``get``, ``update`` and
+        ``exec`` then accept paths such as ``"Module/rVoltage"`` in
+        place of numeric IDs (``fetch`` children may also be names
+        relative to a parent path, as on the text transport), and
+        ``update`` fills in ``parent_id`` itself. Each path is looked
+        up once and remembered. Without an attached tree, paths are
+        looked up in a :meth:`lazy_schema`, created by the first path
+        used for a node, which discovers just the branches that are
+        asked for; it serves for addressing only, not for the checks
+        and conversions below.
+
+        Values of known type are also checked and encoded by their
+        schema codec (:func:`python_thingset.codec.codec_for`) before
+        ``update`` or ``exec`` sends them: a value the device would
+        reject raises ``ValueError`` instead, and ``f32`` values go out
+        as 32-bit floats while ``f64`` keep full precision. ``decode``
+        converts received values to their schema type: ``"list"`` for
+        typed scalars and lists, ``"array"`` to return numeric arrays as
+        ``array.array``, ``"numpy"`` for NumPy arrays (needs numpy).
+        """
+        if self._path_indexes is None:
+            self._path_indexes = {}
+        self._path_indexes[node_id] = PathIndex(tree, root_id, decode)
+        if self._lazy_indexes is not None:
+            self._lazy_indexes.pop(node_id, None)
+
     def fetch(
         self,
         parent_id: Union[int, str],
         ids: List[Union[int, str]],
         node_id: Union[int, None] = None,
     ) -> ThingSetResponse:
-        self._send(self._protocol.encode_fetch(parent_id, ids), node_id)
-        parsed = self._recv()
+        wire_parent: Union[int, str] = parent_id
+        wire_ids: List[Union[int, str]] = ids
+        if self.wire_format is WireFormat.BINARY:
+            wire_parent = self._wire_id(parent_id, node_id)
+            wire_ids = [
+                self._wire_id(child_path(parent_id, i), node_id) for i in ids
+            ]
+        parsed = self._exchange(
+            self._protocol.encode_fetch(wire_parent, wire_ids), node_id
+        )
 
         values: List[ThingSetValue] = []
         if (
@@ -52,10 +128,16 @@ class ThingSetClient(ABC):
             and parsed.status_code <= ThingSetStatus.CONTENT
         ):
             if len(ids) == 0:
-                values.append(self._build_value(parent_id, parsed.data))
+                values.append(
+                    self._build_value(parent_id, parsed.data, wire_parent, node_id)
+                )
             else:
                 for idx, vid in enumerate(ids):
-                    values.append(self._build_value(vid, parsed.data[idx]))
+                    values.append(
+                        self._build_value(
+                            vid, parsed.data[idx], wire_ids[idx], node_id
+                        )
+                    )
 
         return self._to_response(parsed, values)
 
@@ -64,8 +146,10 @@ class ThingSetClient(ABC):
         value_id: Union[int, str],
         node_id: Union[int, None] = None,
     ) -> ThingSetResponse:
-        self._send(self._protocol.encode_get(value_id), node_id)
-        parsed = self._recv()
+        wire_id = value_id
+        if self.wire_format is WireFormat.BINARY:
+            wire_id = self._wire_id(value_id, node_id)
+        parsed = self._exchange(self._protocol.encode_get(wire_id), node_id)
 
         values: List[ThingSetValue] = []
         if (
@@ -73,7 +157,7 @@ class ThingSetClient(ABC):
             and parsed.status_code is not None
             and parsed.status_code <= ThingSetStatus.CONTENT
         ):
-            values.append(self._build_value(value_id, parsed.data))
+            values.append(self._build_value(value_id, parsed.data, wire_id, node_id))
 
         return self._to_response(parsed, values)
 
@@ -82,10 +166,22 @@ class ThingSetClient(ABC):
         value_id: Union[int, str],
         value: Any,
         node_id: Union[int, None] = None,
-        parent_id: Union[int, None] = None,
+        parent_id: Union[int, str, None] = None,
     ) -> ThingSetResponse:
-        self._send(self._protocol.encode_update(parent_id, value_id, value), node_id)
-        return self._to_response(self._recv())
+        coerce = True
+        if self.wire_format is WireFormat.BINARY:
+            if isinstance(value_id, str):
+                parent, value_id = self._address(value_id, node_id)
+                if parent_id is None:
+                    parent_id = parent
+            parent_id = self._wire_id(parent_id, node_id)
+            codec = self._codec(value_id, node_id)
+            if codec is not None:
+                value, coerce = codec.encode(value), False
+        parsed = self._exchange(
+            self._protocol.encode_update(parent_id, value_id, value, coerce), node_id
+        )
+        return self._to_response(parsed)
 
     def exec(
         self,
@@ -93,21 +189,32 @@ class ThingSetClient(ABC):
         args: Union[List[Any], None],
         node_id: Union[int, None] = None,
     ) -> ThingSetResponse:
-        self._send(self._protocol.encode_exec(value_id, args), node_id)
-        return self._to_response(self._recv())
+        coerce = True
+        if self.wire_format is WireFormat.BINARY:
+            value_id = self._wire_id(value_id, node_id)
+            codec = self._codec(value_id, node_id)
+            if isinstance(codec, FunctionCodec):
+                args, coerce = codec.encode(args), False
+        parsed = self._exchange(
+            self._protocol.encode_exec(value_id, args, coerce), node_id
+        )
+        return self._to_response(parsed)
 
     def discover_schema(
         self,
         root_id: int = 0,
         node_id: Union[int, None] = None,
+        *,
+        metadata_batch_size: int = _discovery.DEFAULT_METADATA_BATCH,
     ) -> SchemaTree:
         """Walk the device's object tree and build a structured schema.
 
-        Issues two fetches per group: one for child IDs, one for the
-        metadata overlay (which carries name, type and access for every
-        child in a single round-trip). Recursion is bounded by type:
-        only children whose type is ``"group"`` are walked further;
-        records, functions and primitives are terminal.
+        The walk is breadth-first: for each depth, one fetch per group
+        collects the child IDs, then the metadata overlay (name, type
+        and access) is requested for every child at that depth in as
+        few ``fetch(0x19, ids)`` calls as ``metadata_batch_size``
+        allows. Only children whose type is a group or record are
+        walked further; functions and primitives are terminal.
 
         Binary wire format only — raises ``ValueError`` on text
         transports, which lack the metadata overlay.
@@ -118,68 +225,221 @@ class ThingSetClient(ABC):
             )
         by_id: Dict[int, SchemaNode] = {}
         by_path: Dict[str, SchemaNode] = {}
-        root = self._walk_schema(root_id, "", node_id, by_id, by_path)
+        root = self._expand_groups(
+            [(root_id, "")], node_id, by_id, by_path, metadata_batch_size
+        )[0]
+        frontier = [n for n in root if _discovery.is_recursive(n)]
+        while frontier:
+            levels = self._expand_groups(
+                [(n.id, n.path) for n in frontier],
+                node_id,
+                by_id,
+                by_path,
+                metadata_batch_size,
+            )
+            for node, children in zip(frontier, levels):
+                node.children = children
+            frontier = [
+                c for children in levels for c in children
+                if _discovery.is_recursive(c)
+            ]
         return SchemaTree(root=root, by_id=by_id, by_path=by_path)
 
-    def _walk_schema(
+    def lazy_schema(
+        self,
+        root_id: int = 0,
+        node_id: Union[int, None] = None,
+        *,
+        metadata_batch_size: int = _discovery.DEFAULT_METADATA_BATCH,
+    ) -> LazySchemaTree:
+        """Fetch the top level of the object tree and return a
+        :class:`LazySchemaTree` that discovers the rest on demand.
+
+        Use this instead of :meth:`discover_schema` when only part of
+        the tree is needed: looking up one path costs two round-trips
+        per path segment rather than a walk of every group.
+        """
+        return LazySchemaTree(
+            self, root_id, node_id, metadata_batch_size=metadata_batch_size
+        )
+
+    def discover_schema_cached(
         self,
-        group_id: int,
-        path_prefix: str,
+        cache: SchemaCache,
+        device_key: Union[int, str],
+        root_id: int = 0,
+        node_id: Union[int, None] = None,
+        *,
+        fingerprint_id: int = DEFAULT_FINGERPRINT_ID,
+        metadata_batch_size: int = _discovery.DEFAULT_METADATA_BATCH,
+        revalidate: bool = False,
+    ) -> SchemaTree:
+        """Like :meth:`discover_schema`, but reuse the tree stored in
+        ``cache`` for ``device_key`` while the device's firmware is
+        unchanged.
+
+        The firmware is identified by the value of ``fingerprint_id``,
+        so a warm cache costs a single ``get``. When that value
+        differs from the one recorded with the cached tree, the tree
+        is walked again and the cache entry replaced. With
+        ``revalidate``, the cached tree is revalidated instead (see
+        :meth:`revalidate_schema`), which is cheaper but misses nodes
+        renamed or retyped in place. If the fingerprint can't be read,
+        the tree is walked and not cached.
+        """
+        if self.wire_format is not WireFormat.BINARY:
+            raise ValueError(
+                "discover_schema requires a binary wire format (TCP or CAN)"
+            )
+        resp = self.get(fingerprint_id, node_id)
+        if resp.status_code != ThingSetStatus.CONTENT:
+            return self.discover_schema(
+                root_id, node_id, metadata_batch_size=metadata_batch_size
+            )
+        fingerprint = schema_fingerprint(resp.data)
+        cached = cache.load(device_key)
+        if (
+            cached is not None
+            and cached.fingerprint == fingerprint
+            and cached.root_id == root_id
+        ):
+            return cached.tree
+        if revalidate and cached is not None and cached.root_id == root_id:
+            tree = cached.tree
+            self.revalidate_schema(
+                tree, root_id, node_id, metadata_batch_size=metadata_batch_size
+            )
+        else:
+            tree = self.discover_schema(
+                root_id, node_id, metadata_batch_size=metadata_batch_size
+            )
+        cache.store(device_key, fingerprint, tree, root_id)
+        return tree
+
+    def revalidate_schema(
+        self,
+        tree: SchemaTree,
+        root_id: int = 0,
+        node_id: Union[int, None] = None,
+        *,
+        metadata_batch_size: int = _discovery.DEFAULT_METADATA_BATCH,
+    ) -> SchemaDiff:
+        """Bring ``tree`` up to date with the device, in place, and
+        return what changed.
+
+        Every group's child list is fetched again, but the metadata
+        overlay is only asked about IDs that are new or now sit under
+        a different parent; nodes that stayed put are reused as they
+        are. This costs far less than :meth:`discover_schema` after a
+        firmware update that only touched part of the tree. A node
+        that kept its ID and parent but was renamed or retyped isn't
+        noticed.
+        """
+        if self.wire_format is not WireFormat.BINARY:
+            raise ValueError(
+                "revalidate_schema requires a binary wire format (TCP or CAN)"
+            )
+        revalidation = _discovery.Revalidation(tree, root_id)
+        groups = revalidation.start()
+        while groups:
+            child_lists = [
+                _discovery.child_ids_from(self.fetch(group_id, [], node_id))
+                for group_id, _ in groups
+            ]
+            metadata: Dict[int, Dict[int, Any]] = {}
+            for batch in _discovery.metadata_batches(
+                revalidation.unknown(groups, child_lists), metadata_batch_size
+            ):
+                metadata.update(self._fetch_metadata(batch, node_id))
+            groups = revalidation.apply(groups, child_lists, metadata)
+        return revalidation.finish()
+
+    def _expand_groups(
+        self,
+        groups: List[Tuple[int, str]],
         node_id: Union[int, None],
         by_id: Dict[int, SchemaNode],
         by_path: Dict[str, SchemaNode],
-    ) -> List[SchemaNode]:
-        fresp = self.fetch(group_id, [], node_id)
-        if not fresp.values:
-            return []
-        child_ids = fresp.values[0].value
-        if not isinstance(child_ids, list) or not child_ids:
-            return []
-
-        mresp = self.fetch(_METADATA_OVERLAY, child_ids, node_id)
-        if mresp.status_code != ThingSetStatus.CONTENT or not mresp.values:
-            return []
-
-        nodes: List[SchemaNode] = []
-        for idx, cid in enumerate(child_ids):
-            md = mresp.values[idx].value if idx < len(mresp.values) else None
-            if not isinstance(md, dict):
-                continue
-            name = md.get(_METADATA_KEY_NAME, "")
-            type_str = md.get(_METADATA_KEY_TYPE, "")
-            access = md.get(_METADATA_KEY_ACCESS, 0)
-            full_path = f"{path_prefix}/{name}" if path_prefix else name
-
-            children: List[SchemaNode] = []
-            if type_str in _RECURSIVE_TYPES:
-                children = self._walk_schema(
-                    cid, full_path, node_id, by_id, by_path
-                )
+        metadata_batch_size: int,
+        node_factory: _discovery.NodeFactory = SchemaNode,
+    ) -> List[List[SchemaNode]]:
+        """Discover the children of every ``(group_id, path)`` in
+        ``groups`` with one child-list fetch per group plus batched
+        metadata fetches shared across all of them."""
+        child_lists = [
+            _discovery.child_ids_from(self.fetch(group_id, [], node_id))
+            for group_id, _ in groups
+        ]
+        metadata: Dict[int, Dict[int, Any]] = {}
+        for batch in _discovery.metadata_batches(
+            [cid for ids in child_lists for cid in ids], metadata_batch_size
+        ):
+            metadata.update(self._fetch_metadata(batch, node_id))
+        return _discovery.build_children(
+            groups, child_lists, metadata, by_id, by_path, node_factory
+        )
+
+    def _fetch_metadata(
+        self, batch: List[int], node_id: Union[int, None]
+    ) -> Dict[int, Dict[int, Any]]:
+        resp = self.fetch(_discovery.METADATA_OVERLAY, batch, node_id)
+        if _discovery.should_split(resp, batch):
+            first, second = _discovery.split(batch)
+            return {
+                **self._fetch_metadata(first, node_id),
+                **self._fetch_metadata(second, node_id),
+            }
+        return _discovery.metadata_from(batch, resp)
 
-            node = SchemaNode(
-                id=cid,
-                name=name,
-                type=type_str,
-                access=access,
-                path=full_path,
-                children=children,
+    def _path_index(self, node_id: Union[int, None]) -> PathIndex:
+        if self._path_indexes is not None and node_id in self._path_indexes:
+            return self._path_indexes[node_id]
+        if self._lazy_indexes is None:
+            self._lazy_indexes = {}
+        index = self._lazy_indexes.get(node_id)
+        if index is None:
+            index = self._lazy_indexes[node_id] = PathIndex(
+                self.lazy_schema(node_id=node_id)
             )
-            nodes.append(node)
-            by_id[cid] = node
-            by_path[full_path] = node
+        return index
 
-        return nodes
+    def _address(self, path: str, node_id: Union[int, None]) -> Address:
+        return self._path_index(node_id)[path]
+
+    def _wire_id(self, value_id: Any, node_id: Union[int, None]) -> Any:
+        """Numeric ID for ``value_id`` on a binary transport: paths are
+        looked up, anything else is sent as is."""
+        if isinstance(value_id, str):
+            return self._path_index(node_id).id_of(value_id)
+        return value_id
 
     def _build_value(
         self,
         value_id: Union[int, str],
         value: Any,
+        wire_id: Union[int, str, None] = None,
+        node_id: Union[int, None] = None,
     ) -> ThingSetValue:
         if self.wire_format is WireFormat.TEXT:
             # Text (serial) addresses values by path; the "id" IS the path
             return ThingSetValue(None, value, value_id)
+        if self._path_indexes and node_id in self._path_indexes:
+            value = self._path_indexes[node_id].decode_value(
+                value_id if wire_id is None else wire_id, value
+            )
+        if isinstance(value_id, str):
+            # Addressed by path: report the ID it resolved to as well
+            return ThingSetValue(wire_id, value, value_id)
         return ThingSetValue(value_id, value, None)
 
+    def _codec(
+        self, value_id: Any, node_id: Union[int, None]
+    ) -> Union[ValueCodec, None]:
+        """Codec for ``value_id`` if an attached schema knows its type."""
+        if not self._path_indexes or node_id not in self._path_indexes:
+            return None
+        return self._path_indexes[node_id].codec(value_id)
+
     @staticmethod
     def _to_response(
         parsed: Union[ParsedResponse, None],
@@ -195,6 +455,19 @@ class ThingSetClient(ABC):
             raw=parsed.raw,
         )
 
+    def _exchange(
+        self, request: bytes, node_id: Union[int, None]
+    ) -> Union[ParsedResponse, None]:
+        sink = self.rpc_sink
+        if sink is None:
+            self._send(request, node_id)
+            return self._recv()
+        started = time.perf_counter()
+        self._send(request, node_id)
+        parsed = self._recv()
+        sink(request, _raw_response(parsed), time.perf_counter() - started, node_id)
+        return parsed
+
     @abstractmethod
     def disconnect(self) -> None:
         pass
@@ -0,0 +1,393 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Value codecs compiled from ThingSet type strings.
+
+The metadata overlay describes each value with a type string —
+``u8``, ``i16``, ``f32``, ``bool``, ``string``, arrays such as
+``f32[]`` or ``u16[8]``, and function signatures like
+``(u8,f32)->(i32)``. :func:`codec_for` turns one into a codec that
+
+- checks a value before it is sent, raising ``ValueError`` for one
+  the device would reject (an out-of-range integer, a string where a
+  number is expected, the wrong number of function arguments);
+- converts it to exactly what goes on the wire (``f32`` values are
+  encoded as 32-bit floats, never widened or narrowed);
+- decodes a received value to a typed scalar, or numeric arrays to
+  an ``array.array`` (or a NumPy array, when installed and asked for).
+
+Clients apply these automatically to ``update`` and ``exec`` on values
+they have a schema for; see :meth:`ThingSetClient.attach_schema`.
+"""
+
+import array
+import math
+import re
+import struct
+import sys
+from functools import lru_cache
+from typing import Any, List, Sequence, Tuple, Union
+
+
+class Float32:
+    """A value to be encoded as a CBOR single-precision float."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: float) -> None:
+        self.value = value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Float32) and other.value == self.value
+
+    def __repr__(self) -> str:
+        return f"Float32({self.value!r})"
+
+    def encode(self) -> bytes:
+        return b"\xfa" + struct.pack(">f", self.value)
+
+
+class Float32Array:
+    """A buffer of floats — ``array.array('f')`` or ``('d')``, a float
+    NumPy array or a ``memoryview`` of one — to be encoded as a CBOR
+    array of single-precision floats in one pass."""
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: Any) -> None:
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, typed: bool = False) -> bytes:
+        """The CBOR encoding: an array of ``0xFA`` floats, or with
+        ``typed`` an RFC 8746 little-endian float32 typed array (tag
+        85) wrapping the raw bytes."""
+        if typed:
+            raw = _f32_bytes(self.values, "little")
+            return _RFC8746_FLOAT32_LE + _cbor_head(2, len(raw)) + raw
+        raw = _f32_bytes(self.values, "big")
+        count = len(raw) // 4
+        out = bytearray(5 * count)
+        # Interleave a float32 marker before each big-endian value with
+        # slice assignments, rather than a Python loop over elements
+        out[0::5] = b"\xfa" * count
+        for byte in range(4):
+            out[byte + 1 :: 5] = raw[byte::4]
+        return _cbor_head(4, count) + bytes(out)
+
+
+# CBOR tag 85 (RFC 8746): float32, little endian, typed array
+_RFC8746_FLOAT32_LE = b"\xd8\x55"
+
+
+def _cbor_head(major: int, length: int) -> bytes:
+    if length < 24:
+        return bytes([major << 5 | length])
+    if length < 0x100:
+        return bytes([major << 5 | 24, length])
+    if length < 0x10000:
+        return bytes([major << 5 | 25]) + length.to_bytes(2, "big")
+    if length < 0x100000000:
+        return bytes([major << 5 | 26]) + length.to_bytes(4, "big")
+    return bytes([major << 5 | 27]) + length.to_bytes(8, "big")
+
+
+def _f32_bytes(values: Any, byteorder: str) -> bytes:
+    """``values`` as packed float32 in ``byteorder``. float32 input is
+    copied as a block; float64 input is narrowed by ``array`` or NumPy
+    in C."""
+    if _is_ndarray(values):
+        return values.astype("<f4" if byteorder == "little" else ">f4").tobytes()
+    if isinstance(values, memoryview):
+        values = _array_from_memoryview(values)
+    if values.typecode == "f":
+        packed = array.array("f")
+        packed.frombytes(values.tobytes())
+    else:
+        packed = array.array("f", values)
+    if byteorder != sys.byteorder:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _array_from_memoryview(view: memoryview) -> array.array:
+    typecode = view.format.lstrip("@=")
+    if typecode not in ("f", "d"):
+        raise TypeError(f"not a float buffer (format {view.format!r})")
+    out = array.array(typecode)
+    out.frombytes(view.tobytes())
+    return out
+
+
+def _is_ndarray(value: Any) -> bool:
+    return hasattr(value, "dtype") and hasattr(value, "astype")
+
+
+def is_float_buffer(value: Any) -> bool:
+    """Whether ``value`` can go through :class:`Float32Array`."""
+    if isinstance(value, array.array):
+        return value.typecode in ("f", "d")
+    if isinstance(value, memoryview):
+        return value.ndim == 1 and value.format.lstrip("@=") in ("f", "d")
+    return _is_ndarray(value) and value.dtype.kind == "f" and value.ndim == 1
+
+
+def cbor_default(encoder, value: Any, typed_arrays: bool = False) -> None:
+    """``default`` hook for ``cbor2.dumps`` that knows :class:`Float32`
+    and :class:`Float32Array` (bind ``typed_arrays`` with
+    ``functools.partial`` to emit RFC 8746 typed arrays)."""
+    if isinstance(value, Float32):
+        encoder.write(value.encode())
+        return
+    if isinstance(value, Float32Array):
+        encoder.write(value.encode(typed_arrays))
+        return
+    raise TypeError(f"cannot serialise {type(value).__name__} to CBOR")
+
+
+# type -> (minimum, maximum, array.array typecode, numpy dtype)
+_INTEGER_TYPES = {
+    "u8": (0, 0xFF, "B", "uint8"),
+    "u16": (0, 0xFFFF, "H", "uint16"),
+    "u32": (0, 0xFFFFFFFF, "I", "uint32"),
+    "u64": (0, 0xFFFFFFFFFFFFFFFF, "Q", "uint64"),
+    "i8": (-0x80, 0x7F, "b", "int8"),
+    "i16": (-0x8000, 0x7FFF, "h", "int16"),
+    "i32": (-0x80000000, 0x7FFFFFFF, "i", "int32"),
+    "i64": (-0x8000000000000000, 0x7FFFFFFFFFFFFFFF, "q", "int64"),
+}
+
+_FLOAT_TYPES = {"f32": ("f", "float32"), "f64": ("d", "float64")}
+
+_F32_MAX = 3.4028234663852886e38
+
+_ARRAY_TYPE = re.compile(r"^(?P<elem>[^\[\]]+)\[(?P<length>\d*)\]$")
+_FUNCTION_TYPE = re.compile(r"^\((?P<args>[^)]*)\)\s*->\s*\((?P<ret>[^)]*)\)$")
+
+# How decoded numeric arrays are returned: as lists of typed values,
+# as array.array, or as NumPy arrays.
+DECODE_MODES = ("list", "array", "numpy")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(
+            "NumPy decoding needs numpy: pip install 'python-thingset[numpy]'"
+        ) from e
+    return numpy
+
+
+class ValueCodec:
+    """Encodes and decodes values of one ThingSet type. This base
+    class passes values through unchecked; it stands in for types
+    (groups, records, ...) without a more specific codec."""
+
+    def __init__(self, type_str: str) -> None:
+        self.type = type_str
+
+    def encode(self, value: Any) -> Any:
+        return value
+
+    def decode(self, value: Any, array_decode: Union[str, None] = None) -> Any:
+        return value
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.type!r})"
+
+    def _reject(self, value: Any, why: str = "") -> ValueError:
+        suffix = f" ({why})" if why else ""
+        return ValueError(f"{value!r} is not a valid {self.type}{suffix}")
+
+
+class IntegerCodec(ValueCodec):
+    def __init__(self, type_str: str) -> None:
+        super().__init__(type_str)
+        self.minimum, self.maximum, self.typecode, self.dtype = _INTEGER_TYPES[
+            type_str
+        ]
+
+    def encode(self, value: Any) -> int:
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise self._reject(value)
+        if not self.minimum <= value <= self.maximum:
+            raise self._reject(
+                value, f"range {self.minimum}..{self.maximum}"
+            )
+        return value
+
+    def decode(self, value: Any, array_decode: Union[str, None] = None) -> Any:
+        if _is_number(value) and not isinstance(value, float):
+            return int(value)
+        return value
+
+
+class FloatCodec(ValueCodec):
+    def __init__(self, type_str: str) -> None:
+        super().__init__(type_str)
+        self.typecode, self.dtype = _FLOAT_TYPES[type_str]
+
+    def encode(self, value: Any) -> Union[float, Float32]:
+        if not _is_number(value):
+            raise self._reject(value)
+        value = float(value)
+        if self.type == "f64":
+            return value
+        if math.isfinite(value) and abs(value) > _F32_MAX:
+            raise self._reject(value, "out of range for a 32-bit float")
+        return Float32(value)
+
+    def decode(self, value: Any, array_decode: Union[str, None] = None) -> Any:
+        return float(value) if _is_number(value) else value
+
+
+class BoolCodec(ValueCodec):
+    def encode(self, value: Any) -> bool:
+        if isinstance(value, bool):
+            return value
+        # The CLI and text transport spell booleans as strings
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+        raise self._reject(value)
+
+
+class StringCodec(ValueCodec):
+    def encode(self, value: Any) -> str:
+        if not isinstance(value, str):
+            raise self._reject(value)
+        return value
+
+
+class BytesCodec(ValueCodec):
+    def encode(self, value: Any) -> bytes:
+        if not isinstance(value, (bytes, bytearray, memoryview)):
+            raise self._reject(value)
+        return bytes(value)
+
+
+class ArrayCodec(ValueCodec):
+    def __init__(
+        self, type_str: str, element: ValueCodec, length: Union[int, None]
+    ) -> None:
+        super().__init__(type_str)
+        self.element = element
+        self.length = length
+
+    def encode(self, value: Any) -> Union[List[Any], Float32Array]:
+        if (
+            isinstance(self.element, FloatCodec)
+            and self.element.type == "f32"
+            and is_float_buffer(value)
+        ):
+            # Bulk path: no per-element Python objects
+            if self.length is not None and len(value) > self.length:
+                raise self._reject(value, f"at most {self.length} elements")
+            return Float32Array(value)
+        if isinstance(value, (str, bytes, bytearray, dict)) or not hasattr(
+            value, "__iter__"
+        ):
+            raise self._reject(value)
+        items = list(value)
+        if self.length is not None and len(items) > self.length:
+            raise self._reject(value, f"at most {self.length} elements")
+        out = []
+        for item in items:
+            # NumPy scalars aren't int/float subclasses
+            if hasattr(item, "item") and not isinstance(item, (int, float)):
+                item = item.item()
+            try:
+                out.append(self.element.encode(item))
+            except ValueError as e:
+                raise self._reject(value, str(e)) from None
+        return out
+
+    def decode(self, value: Any, array_decode: Union[str, None] = None) -> Any:
+        if not isinstance(value, list):
+            # Already packed by the protocol (ThingSetProtocol.array_decode)
+            if array_decode == "list" and hasattr(value, "tolist"):
+                return value.tolist()
+            return value
+        typecode = getattr(self.element, "typecode", None)
+        if array_decode in (None, "list") or typecode is None:
+            return [self.element.decode(v) for v in value]
+        if not all(_is_number(v) for v in value):
+            return value
+        if array_decode == "numpy":
+            return _numpy().asarray(value, dtype=self.element.dtype)
+        return array.array(typecode, value)
+
+
+class FunctionCodec(ValueCodec):
+    """Codec for a function's ``exec`` arguments; decodes its result."""
+
+    def __init__(
+        self,
+        type_str: str,
+        arguments: Sequence[ValueCodec],
+        results: Sequence[ValueCodec],
+    ) -> None:
+        super().__init__(type_str)
+        self.arguments: Tuple[ValueCodec, ...] = tuple(arguments)
+        self.results: Tuple[ValueCodec, ...] = tuple(results)
+
+    def encode(self, value: Any) -> List[Any]:
+        args = [] if value is None else list(value)
+        if len(args) != len(self.arguments):
+            raise ValueError(
+                f"{self.type} takes {len(self.arguments)} argument(s), "
+                f"got {len(args)}"
+            )
+        return [codec.encode(arg) for codec, arg in zip(self.arguments, args)]
+
+    def decode(self, value: Any, array_decode: Union[str, None] = None) -> Any:
+        if len(self.results) == 1:
+            return self.results[0].decode(value, array_decode)
+        return value
+
+
+@lru_cache(maxsize=256)
+def codec_for(type_str: str) -> ValueCodec:
+    """The codec for a ThingSet type string. Types it doesn't know get
+    a pass-through :class:`ValueCodec`."""
+    type_str = type_str.strip()
+    if type_str in _INTEGER_TYPES:
+        return IntegerCodec(type_str)
+    if type_str in _FLOAT_TYPES:
+        return FloatCodec(type_str)
+    if type_str == "bool":
+        return BoolCodec(type_str)
+    if type_str == "string":
+        return StringCodec(type_str)
+    if type_str == "bytes":
+        return BytesCodec(type_str)
+    match = _ARRAY_TYPE.match(type_str)
+    if match is not None:
+        element = codec_for(match["elem"])
+        if type(element) is ValueCodec:
+            # Record arrays and the like: nothing to check
+            return ValueCodec(type_str)
+        length = int(match["length"]) if match["length"] else None
+        return ArrayCodec(type_str, element, length)
+    match = _FUNCTION_TYPE.match(type_str)
+    if match is not None:
+        return FunctionCodec(
+            type_str,
+            [codec_for(t) for t in _split_types(match["args"])],
+            [codec_for(t) for t in _split_types(match["ret"])],
+        )
+    return ValueCodec(type_str)
+
+
+def _split_types(types: str) -> List[str]:
+    return [t.strip() for t in types.split(",") if t.strip()]
@@ -0,0 +1,155 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Decoding large reports off the event loop.
+
+A receiver decodes each report inline, on the event loop; a report of
+several kilobytes (a gateway's ``record[]`` of every module, say)
+holds up everything else on the loop while it decodes. Given an
+executor, a receiver hands payloads of ``decode_threshold`` bytes or
+more to it instead::
+
+    pool = concurrent.futures.ProcessPoolExecutor(2)
+    AsyncThingSetUDPReceiver(decode_executor=pool, decode_threshold=4096)
+
+Reports are still delivered in arrival order per source: a report
+that arrives while an earlier one from the same source is being
+decoded waits for it. The header is checked against the receiver's
+filters on the loop, so only wanted reports are sent off. At most
+``max_pending`` decodes are in flight; beyond that, payloads are
+decoded inline again, so a slow executor costs latency, not memory.
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, Callable, Deque, Dict, List, Union
+
+from ._protocol import ThingSetProtocol, WireFormat, peek_report_header
+from .log import get_logger
+from .report import ThingSetReport
+
+
+logger = get_logger()
+
+
+# Payload size from which reports are decoded in the executor, in bytes
+DEFAULT_DECODE_THRESHOLD = 4096
+
+DEFAULT_MAX_PENDING = 64
+
+# Protocols for _parse, per array_decode mode, in each worker process
+_protocols: Dict[Union[str, None], ThingSetProtocol] = {}
+
+
+def _parse(payload: bytes, array_decode: Union[str, None]) -> Union[ThingSetReport, None]:
+    """Runs in the executor; module level so process pools can call it."""
+    protocol = _protocols.get(array_decode)
+    if protocol is None:
+        protocol = _protocols[array_decode] = ThingSetProtocol(
+            WireFormat.BINARY, array_decode=array_decode
+        )
+    return protocol.parse_report(payload)
+
+
+class _Slot:
+    __slots__ = ("done", "report")
+
+    def __init__(self) -> None:
+        self.done = False
+        self.report: Union[ThingSetReport, None] = None
+
+
+class DecodeOffload:
+    """Decodes report payloads for one receiver, in ``executor`` from
+    ``threshold`` bytes, and calls ``deliver(key, report)`` in arrival
+    order per ``key`` — the source, as the receiver identifies it."""
+
+    def __init__(
+        self,
+        protocol: ThingSetProtocol,
+        executor: Executor,
+        deliver: Callable[[Any, ThingSetReport], None],
+        threshold: int = DEFAULT_DECODE_THRESHOLD,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ) -> None:
+        self._protocol = protocol
+        self._executor = executor
+        self._deliver = deliver
+        self.threshold = threshold
+        self.max_pending = max_pending
+        self._waiting: Dict[Any, Deque[_Slot]] = {}
+        self._in_flight = 0
+        self.offloaded = 0
+
+    @property
+    def pending(self) -> int:
+        """Decodes in flight."""
+        return self._in_flight
+
+    def decode(
+        self,
+        key: Any,
+        payload: bytes,
+        accept: Union[Callable[[Union[int, None], int], bool], None] = None,
+    ) -> None:
+        """Decode ``payload`` as :meth:`ThingSetProtocol.parse_report`
+        would, and deliver the report when its turn comes."""
+        if len(payload) < self.threshold or self._in_flight >= self.max_pending:
+            report = self._protocol.parse_report(payload, accept)
+            if report is not None:
+                self.ready(key, report)
+            return
+        if accept is not None:
+            header = peek_report_header(payload)
+            if header is None or not accept(header.eui, header.subset_id):
+                return
+        slot = _Slot()
+        self._waiting.setdefault(key, deque()).append(slot)
+        self._in_flight += 1
+        self.offloaded += 1
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, _parse, payload, self._protocol.array_decode
+        )
+        future.add_done_callback(lambda f: self._decoded(key, slot, f))
+
+    def ready(self, key: Any, report: ThingSetReport) -> None:
+        """Deliver a report decoded elsewhere, after any from ``key``
+        still being decoded."""
+        waiting = self._waiting.get(key)
+        if not waiting:
+            self._deliver(key, report)
+            return
+        slot = _Slot()
+        slot.done = True
+        slot.report = report
+        waiting.append(slot)
+
+    def close(self) -> None:
+        """Forget the decodes in flight; their reports are dropped."""
+        self._waiting.clear()
+
+    def _decoded(self, key: Any, slot: _Slot, future: "asyncio.Future[Any]") -> None:
+        self._in_flight -= 1
+        if not future.cancelled():
+            try:
+                slot.report = future.result()
+            except Exception:
+                logger.exception("ThingSet report decode failed in executor")
+        # Done either way, so later reports from key aren't held up
+        slot.done = True
+        waiting = self._waiting.get(key)
+        if not waiting or slot not in waiting:
+            # Forgotten by close()
+            return
+        ready: List[ThingSetReport] = []
+        while waiting and waiting[0].done:
+            report = waiting.popleft().report
+            if report is not None:
+                ready.append(report)
+        if not waiting:
+            del self._waiting[key]
+        for report in ready:
+            self._deliver(key, report)
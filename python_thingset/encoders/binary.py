@@ -5,18 +5,31 @@
 #
 import json
 import struct
+from functools import partial
 from typing import Any, List, Union
 
 import cbor2
 
+from ..codec import Float32Array, cbor_default, is_float_buffer
 from ..response import ThingSetRequest
 
 
 class ThingSetBinaryEncoder(object):
     NULL_BYTE = 0xF6
 
-    def __init__(self):
-        pass
+    def __init__(self, typed_arrays: bool = False):
+        """``typed_arrays`` sends float buffers (``array.array``, NumPy
+        arrays, ``memoryview``) as RFC 8746 float32 typed arrays rather
+        than CBOR arrays of float32. Only enable it for firmware that
+        decodes tag 85."""
+        self.typed_arrays = typed_arrays
+
+    def _dumps(self, value: Any) -> bytes:
+        return cbor2.dumps(
+            value,
+            canonical=True,
+            default=partial(cbor_default, typed_arrays=self.typed_arrays),
+        )
 
     """ Fetch request:
     05                 # FETCH
@@ -40,14 +53,23 @@ class ThingSetBinaryEncoder(object):
         return bytes(req)
 
     def encode_get(self, value_id: int) -> bytes:
-        return bytes([ThingSetRequest.GET] + list(cbor2.dumps(value_id)))
+        return bytes([ThingSetRequest.GET]) + cbor2.dumps(value_id)
 
-    def encode_exec(self, value_id: int, args: List[Union[Any, None]]) -> bytes:
+    def encode_exec(
+        self, value_id: int, args: List[Union[Any, None]], coerce: bool = True
+    ) -> bytes:
         p_args = list()
 
+        if not coerce:
+            # Already typed by a schema codec
+            p_args = list(args)
+            args = []
+
         for a in args:
             if isinstance(a, float):
                 p_args.append(self.to_f32(a))
+            elif is_float_buffer(a):
+                p_args.append(Float32Array(a))
             elif isinstance(a, str):
                 if a.lower() == "true" or a.lower() == "false":
                     p_args.append(json.loads(a.lower()))
@@ -56,25 +78,31 @@ class ThingSetBinaryEncoder(object):
             else:
                 p_args.append(a)
 
-        return bytes(
-            [ThingSetRequest.EXEC]
-            + list(cbor2.dumps(value_id))
-            + list(cbor2.dumps(p_args, canonical=True))
+        return (
+            bytes([ThingSetRequest.EXEC]) + cbor2.dumps(value_id) + self._dumps(p_args)
         )
 
-    def encode_update(self, parent_id: int, value_id: int, value: Any) -> bytes:
-        value = self._coerce_value(value)
+    def encode_update(
+        self, parent_id: int, value_id: int, value: Any, coerce: bool = True
+    ) -> bytes:
+        if coerce:
+            value = self._coerce_value(value)
 
-        return bytes(
-            [ThingSetRequest.UPDATE]
-            + list(cbor2.dumps(parent_id))
-            + list(cbor2.dumps({value_id: value}, canonical=True))
+        return (
+            bytes([ThingSetRequest.UPDATE])
+            + cbor2.dumps(parent_id)
+            + self._dumps({value_id: value})
         )
 
     def _coerce_value(self, value: Any) -> Any:
         """Recursively coerce a value for embedded targets: doubles → float32,
         and ``"true"``/``"false"`` strings → bool. Lists are walked element-wise
-        so an array of floats round-trips as a CBOR array of float32s."""
+        so an array of floats round-trips as a CBOR array of float32s.
+        Float buffers (``array.array('f')``/``('d')``, float NumPy arrays
+        and ``memoryview``s of them) are converted in one pass instead,
+        without a Python object per element."""
+        if is_float_buffer(value):
+            return Float32Array(value)
         if isinstance(value, list):
             return [self._coerce_value(v) for v in value]
         # bool is a subclass of int — keep as-is, don't coerce
@@ -0,0 +1,181 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Fan one report stream out to many consumers.
+
+A receiver's reports go to whichever consumer awaits first; two loops
+over one receiver split the stream between them. A :class:`ReportHub`
+reads a receiver once and hands every report, decoded once, to each
+of its subscriptions. Each subscription has its own bounded queue and
+overflow policy, so a slow consumer only loses its own reports, and
+an optional filter checked before anything is queued::
+
+    async with AsyncThingSetUDPReceiver() as receiver, ReportHub(receiver) as hub:
+        archive = hub.subscribe(maxsize=10000)
+        alarms = hub.subscribe(euis={0xBADB1B0000000001}, overflow="conflate")
+        async for addr, report in alarms:
+            ...
+"""
+
+import asyncio
+from typing import Any, AsyncIterable, Collection, List, Union
+
+from .log import get_logger
+from .receive_filter import _as_set, _source_in
+from .report import ThingSetReport
+from .report_queue import Item, OverflowPolicy, ReportQueue
+
+
+logger = get_logger()
+
+
+class ReportFilter:
+    """Which reports a subscription takes. Each set given must match:
+    ``sources`` holds receiver addresses (or, for UDP, bare IPs),
+    ``euis`` and ``subsets`` the report's EUI and subset ID, and
+    ``ids`` data IDs of which the report must carry at least one."""
+
+    __slots__ = ("sources", "euis", "subsets", "ids")
+
+    def __init__(
+        self,
+        sources: Union[Collection[Any], None] = None,
+        euis: Union[Collection[int], None] = None,
+        subsets: Union[Collection[int], None] = None,
+        ids: Union[Collection[int], None] = None,
+    ) -> None:
+        self.sources = _as_set(sources)
+        self.euis = _as_set(euis)
+        self.subsets = _as_set(subsets)
+        self.ids = _as_set(ids)
+
+    def __bool__(self) -> bool:
+        return any(
+            s is not None for s in (self.sources, self.euis, self.subsets, self.ids)
+        )
+
+    def matches(self, addr: Any, report: ThingSetReport) -> bool:
+        if self.sources is not None and not _source_in(addr, self.sources):
+            return False
+        if self.euis is not None and report.eui not in self.euis:
+            return False
+        if self.subsets is not None and report.subset_id not in self.subsets:
+            return False
+        if self.ids is not None and self.ids.isdisjoint(report.values):
+            return False
+        return True
+
+
+class HubSubscription(ReportQueue):
+    """One consumer's view of a :class:`ReportHub`: a
+    :class:`ReportQueue` of at most ``maxsize`` reports that pass its
+    filter, overflowing as ``overflow`` says. Iteration ends once the
+    hub's source ends and the queue is drained."""
+
+    def __init__(
+        self,
+        hub: "ReportHub",
+        maxsize: int,
+        overflow: Union[OverflowPolicy, str],
+        report_filter: ReportFilter,
+    ) -> None:
+        super().__init__(maxsize, overflow)
+        self._hub = hub
+        self.filter = report_filter
+
+    def close(self) -> None:
+        """Unsubscribe. Reports already queued can still be read."""
+        self._hub._remove(self)
+        self.end()
+
+    def __enter__(self) -> "HubSubscription":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class ReportHub:
+    """Reads ``source`` — a report receiver, or any async iterable of
+    ``(addr, report)`` — and delivers each report to every matching
+    subscription.
+
+    Use as an async context manager, or call :meth:`start` /
+    :meth:`close`. Closing the hub leaves the source open.
+    """
+
+    DEFAULT_QUEUE_SIZE = 1024
+
+    def __init__(self, source: AsyncIterable[Item]) -> None:
+        self._source = source
+        self._subscriptions: List[HubSubscription] = []
+        self._task: Union["asyncio.Task[None]", None] = None
+
+    def subscribe(
+        self,
+        *,
+        maxsize: int = DEFAULT_QUEUE_SIZE,
+        overflow: Union[OverflowPolicy, str] = OverflowPolicy.DROP_NEWEST,
+        sources: Union[Collection[Any], None] = None,
+        euis: Union[Collection[int], None] = None,
+        subsets: Union[Collection[int], None] = None,
+        ids: Union[Collection[int], None] = None,
+    ) -> HubSubscription:
+        """A new subscription; it sees reports published from now on.
+        See :class:`OverflowPolicy` for ``overflow`` and
+        :class:`ReportFilter` for the filter arguments."""
+        subscription = HubSubscription(
+            self, maxsize, overflow, ReportFilter(sources, euis, subsets, ids)
+        )
+        self._subscriptions.append(subscription)
+        return subscription
+
+    @property
+    def subscriptions(self) -> List[HubSubscription]:
+        return list(self._subscriptions)
+
+    def publish(self, addr: Any, report: ThingSetReport) -> None:
+        """Deliver one report to every matching subscription."""
+        item = (addr, report)
+        for subscription in self._subscriptions:
+            if not subscription.filter or subscription.filter.matches(addr, report):
+                subscription.put(item)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._pump(), name="thingset-report-hub")
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _pump(self) -> None:
+        try:
+            async for addr, report in self._source:
+                self.publish(addr, report)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("ThingSet report hub source failed")
+        finally:
+            for subscription in self._subscriptions:
+                subscription.end()
+
+    def _remove(self, subscription: HubSubscription) -> None:
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    async def __aenter__(self) -> "ReportHub":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
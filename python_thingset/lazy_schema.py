@@ -0,0 +1,394 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Schema trees that discover their nodes on demand.
+
+:meth:`ThingSetClient.discover_schema` walks every group before
+returning, which is wasted effort for a tool that only needs one
+branch. The trees here start with just the top level and expand a
+group the first time something looks inside it, so resolving
+``"Metadata/rBoard"`` costs one child-list fetch and one metadata
+fetch per path segment, whatever the size of the rest of the tree.
+
+:class:`LazySchemaTree` (sync) expands transparently: reading a
+node's ``children``, or looking up a path in ``by_path``, fetches
+whatever is missing. :class:`AsyncLazySchemaTree` can't block inside
+an attribute access, so it exposes the same operations as coroutines
+(:meth:`~AsyncLazySchemaTree.resolve`,
+:meth:`~AsyncLazySchemaTree.children` and so on) and its ``by_id`` /
+``by_path`` dicts hold only what has been discovered so far.
+
+Either tree expands several groups together with ``expand(nodes)``,
+sharing the metadata requests between them.
+"""
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Set,
+    Tuple,
+    Union,
+)
+
+from . import _discovery
+from ._protocol import WireFormat
+from .schema import SchemaNode, SchemaTree
+
+
+if TYPE_CHECKING:
+    from .async_client import AsyncThingSetClient
+    from .client import ThingSetClient
+
+
+_MISSING = object()
+
+
+class LazySchemaNode(SchemaNode):
+    """A :class:`SchemaNode` whose ``children`` are fetched on first
+    access. Nodes that can't have children (functions, primitives)
+    start out loaded."""
+
+    _tree: Union["LazySchemaTree", None] = None
+    _loaded: bool = True
+
+    @property  # type: ignore[override]
+    def children(self) -> List[SchemaNode]:
+        if not self._loaded and self._tree is not None:
+            self._tree.expand([self])
+        return self._children
+
+    @children.setter
+    def children(self, value: List[SchemaNode]) -> None:
+        self._children = value
+        self._loaded = True
+
+    @property
+    def loaded(self) -> bool:
+        """Whether ``children`` can be read without a round-trip."""
+        return self._loaded
+
+    def __repr__(self) -> str:
+        children = (
+            repr(self._children) if self._loaded else "<not loaded>"
+        )
+        return (
+            f"LazySchemaNode(id={self.id!r}, name={self.name!r}, "
+            f"type={self.type!r}, access={self.access!r}, "
+            f"path={self.path!r}, children={children})"
+        )
+
+
+def _segments(path: str) -> List[str]:
+    return [s for s in path.strip("/").split("/") if s]
+
+
+def _needing_expansion(
+    nodes: Iterable[SchemaNode], loaded: Set[int]
+) -> List[SchemaNode]:
+    out: Dict[int, SchemaNode] = {}
+    for node in nodes:
+        if _discovery.is_recursive(node) and node.id not in loaded:
+            out.setdefault(node.id, node)
+    return list(out.values())
+
+
+def _unexpanded(
+    root: List[SchemaNode], loaded: Set[int]
+) -> List[SchemaNode]:
+    """Known groups not yet expanded, shallowest first."""
+    out: List[SchemaNode] = []
+    level = root
+    while level:
+        out.extend(_needing_expansion(level, loaded))
+        level = [
+            c for n in level if n.id in loaded for c in _raw_children(n)
+        ]
+    return out
+
+
+def _raw_children(node: SchemaNode) -> List[SchemaNode]:
+    # Read a lazy node's children without triggering expansion.
+    if isinstance(node, LazySchemaNode):
+        return node._children
+    return node.children
+
+
+def _require_binary(wire_format: WireFormat) -> None:
+    if wire_format is not WireFormat.BINARY:
+        raise ValueError(
+            "lazy_schema requires a binary wire format (TCP or CAN)"
+        )
+
+
+class _LazyIndex(dict):
+    """``by_id`` / ``by_path`` for :class:`LazySchemaTree`: a miss
+    asks the tree to resolve the key before giving up."""
+
+    def __init__(self, resolve) -> None:
+        super().__init__()
+        self._resolve = resolve
+
+    def __missing__(self, key):
+        return self._resolve(key)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class LazySchemaTree(SchemaTree):
+    """Sync schema tree that discovers nodes as they are looked at.
+
+    Build one with :meth:`ThingSetClient.lazy_schema`. The top level
+    is fetched up front; everything below it on demand:
+
+    - reading ``node.children`` expands that node;
+    - ``by_path[path]`` expands each group along ``path``;
+    - ``by_id[id]`` first checks that the ID exists, then expands
+      unexplored groups breadth-first until it turns up — IDs carry
+      no parent information, so this can cost a partial walk;
+    - iterating the tree expands everything that's left, a depth at
+      a time.
+
+    ``len(tree)`` counts the nodes discovered so far. Lookups that
+    miss raise ``KeyError`` (``get`` and ``in`` return ``None`` /
+    ``False``), as for a plain :class:`SchemaTree`.
+    """
+
+    def __init__(
+        self,
+        client: "ThingSetClient",
+        root_id: int = 0,
+        node_id: Union[int, None] = None,
+        *,
+        metadata_batch_size: int = _discovery.DEFAULT_METADATA_BATCH,
+    ) -> None:
+        _require_binary(client.wire_format)
+        self._client = client
+        self._root_id = root_id
+        self._node_id = node_id
+        self._metadata_batch_size = metadata_batch_size
+        self._loaded: Set[int] = set()
+        self.by_id = _LazyIndex(self.resolve_id)
+        self.by_path = _LazyIndex(self.resolve)
+        self.root = self._fetch_children([(root_id, "")])[0]
+
+    def expand(self, nodes: Iterable[SchemaNode]) -> None:
+        """Fetch the children of every node in ``nodes`` that doesn't
+        have them yet, sharing the metadata requests between them."""
+        pending = _needing_expansion(nodes, self._loaded)
+        if not pending:
+            return
+        levels = self._fetch_children([(n.id, n.path) for n in pending])
+        for node, children in zip(pending, levels):
+            node.children = children
+
+    def expand_all(self) -> None:
+        """Discover the rest of the tree, one depth per round."""
+        frontier = _unexpanded(self.root, self._loaded)
+        while frontier:
+            self.expand(frontier)
+            frontier = _needing_expansion(
+                (c for n in frontier for c in _raw_children(n)), self._loaded
+            )
+
+    def resolve(self, path: str) -> SchemaNode:
+        """Return the node at ``path``, expanding only the groups on
+        the way to it. Raises ``KeyError`` if there is no such node."""
+        if not isinstance(path, str):
+            raise KeyError(path)
+        node = dict.get(self.by_path, path)
+        if node is not None:
+            return node
+        prefix = ""
+        for depth, segment in enumerate(_segments(path)):
+            if depth:
+                self.expand([node])
+            prefix = f"{prefix}/{segment}" if prefix else segment
+            node = dict.get(self.by_path, prefix)
+            if node is None:
+                raise KeyError(path)
+        if node is None:
+            raise KeyError(path)
+        return node
+
+    def resolve_id(self, value_id: int) -> SchemaNode:
+        """Return the node with ``value_id``, expanding unexplored
+        groups breadth-first until it is found. Raises ``KeyError``
+        if the device has no such node."""
+        node = dict.get(self.by_id, value_id)
+        if node is not None:
+            return node
+        if not isinstance(value_id, int) or not self._client._fetch_metadata(
+            [value_id], self._node_id
+        ):
+            raise KeyError(value_id)
+        frontier = _unexpanded(self.root, self._loaded)
+        while frontier:
+            self.expand(frontier)
+            node = dict.get(self.by_id, value_id)
+            if node is not None:
+                return node
+            frontier = _needing_expansion(
+                (c for n in frontier for c in _raw_children(n)), self._loaded
+            )
+        raise KeyError(value_id)
+
+    def __iter__(self) -> Iterator[SchemaNode]:
+        self.expand_all()
+        return super().__iter__()
+
+    def _fetch_children(
+        self, groups: List[Tuple[int, str]]
+    ) -> List[List[SchemaNode]]:
+        levels = self._client._expand_groups(
+            groups,
+            self._node_id,
+            self.by_id,
+            self.by_path,
+            self._metadata_batch_size,
+            self._new_node,
+        )
+        self._loaded.update(group_id for group_id, _ in groups)
+        return levels
+
+    def _new_node(self, **kwargs: Any) -> LazySchemaNode:
+        node = LazySchemaNode(**kwargs)
+        node._tree = self
+        node._loaded = not _discovery.is_recursive(node)
+        return node
+
+
+class AsyncLazySchemaTree(SchemaTree):
+    """Async schema tree that discovers nodes as they are asked for.
+
+    Build one with :meth:`AsyncThingSetClient.lazy_schema`. Nodes are
+    plain :class:`SchemaNode` objects whose ``children`` stay empty
+    until expanded through the tree, and ``by_id`` / ``by_path`` hold
+    only discovered nodes — use the coroutines to look further::
+
+        tree = await client.lazy_schema()
+        board = await tree.resolve("Metadata/rBoard")
+        for child in await tree.children(tree.by_path["Metadata"]):
+            ...
+    """
+
+    def __init__(
+        self,
+        client: "AsyncThingSetClient",
+        root_id: int = 0,
+        node_id: Union[int, None] = None,
+        *,
+        metadata_batch_size: int = _discovery.DEFAULT_METADATA_BATCH,
+    ) -> None:
+        _require_binary(client.wire_format)
+        self._client = client
+        self._root_id = root_id
+        self._node_id = node_id
+        self._metadata_batch_size = metadata_batch_size
+        self._loaded: Set[int] = set()
+        self.root: List[SchemaNode] = []
+        self.by_id: Dict[int, SchemaNode] = {}
+        self.by_path: Dict[str, SchemaNode] = {}
+
+    def is_expanded(self, node: SchemaNode) -> bool:
+        """Whether ``node.children`` is complete."""
+        return not _discovery.is_recursive(node) or node.id in self._loaded
+
+    async def load_root(self) -> List[SchemaNode]:
+        """Fetch the top level, if not already done."""
+        if self._root_id not in self._loaded:
+            self.root = (await self._fetch_children([(self._root_id, "")]))[0]
+        return self.root
+
+    async def expand(self, nodes: Iterable[SchemaNode]) -> None:
+        """Fetch the children of every node in ``nodes`` that doesn't
+        have them yet, sharing the metadata requests between them."""
+        pending = _needing_expansion(nodes, self._loaded)
+        if not pending:
+            return
+        levels = await self._fetch_children([(n.id, n.path) for n in pending])
+        for node, children in zip(pending, levels):
+            node.children = children
+
+    async def expand_all(self) -> None:
+        """Discover the rest of the tree, one depth per round."""
+        await self.load_root()
+        frontier = _unexpanded(self.root, self._loaded)
+        while frontier:
+            await self.expand(frontier)
+            frontier = _needing_expansion(
+                (c for n in frontier for c in n.children), self._loaded
+            )
+
+    async def children(self, node: SchemaNode) -> List[SchemaNode]:
+        await self.expand([node])
+        return node.children
+
+    async def resolve(self, path: str) -> SchemaNode:
+        """Return the node at ``path``, expanding only the groups on
+        the way to it. Raises ``KeyError`` if there is no such node."""
+        if not isinstance(path, str):
+            raise KeyError(path)
+        node = self.by_path.get(path)
+        if node is not None:
+            return node
+        await self.load_root()
+        prefix = ""
+        for depth, segment in enumerate(_segments(path)):
+            if depth:
+                await self.expand([node])
+            prefix = f"{prefix}/{segment}" if prefix else segment
+            node = self.by_path.get(prefix)
+            if node is None:
+                raise KeyError(path)
+        if node is None:
+            raise KeyError(path)
+        return node
+
+    async def resolve_id(self, value_id: int) -> SchemaNode:
+        """Return the node with ``value_id``, expanding unexplored
+        groups breadth-first until it is found. Raises ``KeyError``
+        if the device has no such node."""
+        node = self.by_id.get(value_id)
+        if node is not None:
+            return node
+        if not isinstance(value_id, int) or not (
+            await self._client._fetch_metadata([value_id], self._node_id)
+        ):
+            raise KeyError(value_id)
+        await self.load_root()
+        frontier = _unexpanded(self.root, self._loaded)
+        while frontier:
+            await self.expand(frontier)
+            node = self.by_id.get(value_id)
+            if node is not None:
+                return node
+            frontier = _needing_expansion(
+                (c for n in frontier for c in n.children), self._loaded
+            )
+        raise KeyError(value_id)
+
+    async def _fetch_children(
+        self, groups: List[Tuple[int, str]]
+    ) -> List[List[SchemaNode]]:
+        levels = await self._client._expand_groups(
+            groups,
+            self._node_id,
+            self.by_id,
+            self.by_path,
+            self._metadata_batch_size,
+        )
+        self._loaded.update(group_id for group_id, _ in groups)
+        return levels
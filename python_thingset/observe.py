@@ -0,0 +1,289 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Change notifications on reported values.
+
+Devices re-send every value of a subset in every report, whether it
+changed or not. :class:`LiveValues` keeps the latest value per
+``(source, id)`` from a report stream and tells subscribers only about
+values that changed — by more than a :class:`Deadband`, if one is set
+for the ID, and no more often than its ``min_interval``::
+
+    live = LiveValues()
+    live.set_deadband(0x401, Deadband(absolute=0.01, min_interval=1.0))
+    live.subscribe(print, ids=[0x401])        # callback per Change
+
+    async with AsyncThingSetUDPReceiver() as receiver:
+        asyncio.create_task(live.follow(receiver))
+        async for change in live.changes(ids=[0x402]):
+            ...
+
+A report's source is its EUI when it carries one, otherwise the
+address the receiver yielded it with. Only IDs somebody subscribed to
+are compared, so the cost of a report grows with what is watched, not
+with the report's size.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Collection,
+    Dict,
+    List,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .log import get_logger
+from .receive_filter import _as_set
+from .report import ThingSetReport
+
+
+logger = get_logger()
+
+
+@dataclass(frozen=True)
+class Deadband:
+    """How much a numeric value must move, and how long after the last
+    notification, before a change is delivered.
+
+    A change is delivered when it exceeds both ``absolute`` and
+    ``relative`` times the last delivered value's magnitude. Other
+    values are delivered on any change. A change within
+    ``min_interval`` seconds of the last one is dropped; a later
+    report still differing from the last delivered value delivers it.
+    """
+
+    absolute: float = 0.0
+    relative: float = 0.0
+    min_interval: float = 0.0
+
+    def exceeded(self, old: Any, new: Any) -> bool:
+        if _is_number(old) and _is_number(new):
+            delta = abs(new - old)
+            if math.isnan(delta):
+                return not (math.isnan(old) and math.isnan(new))
+            return delta > self.absolute and delta > self.relative * abs(old)
+        differs = old != new
+        # NumPy arrays (ThingSetProtocol.array_decode) compare per element
+        return differs if isinstance(differs, bool) else bool(differs.any())
+
+
+NO_DEADBAND = Deadband()
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+@dataclass
+class Change:
+    source: Any
+    value_id: int
+    value: Any
+    # Last value delivered for this (source, id); None the first time
+    previous: Any
+    timestamp: float
+
+
+class _Subscription:
+    def __init__(
+        self,
+        owner: "LiveValues",
+        deliver: Callable[[Change], None],
+        ids: Union[Set[int], None],
+        sources: Union[Set[Any], None],
+    ) -> None:
+        self._owner = owner
+        self.deliver = deliver
+        self.ids = ids
+        self.sources = sources
+
+    def close(self) -> None:
+        """Stop delivering changes."""
+        self._owner._remove(self)
+
+
+class ChangeStream(_Subscription):
+    """Async iterator over :class:`Change` objects. Holds at most
+    ``maxsize`` undelivered changes; when full, the oldest is dropped."""
+
+    def __init__(
+        self,
+        owner: "LiveValues",
+        ids: Union[Set[int], None],
+        sources: Union[Set[Any], None],
+        maxsize: int,
+    ) -> None:
+        super().__init__(owner, self._put, ids, sources)
+        self._queue: "asyncio.Queue[Change]" = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def _put(self, change: Change) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(change)
+
+    def __aiter__(self) -> AsyncIterator[Change]:
+        return self
+
+    async def __anext__(self) -> Change:
+        return await self._queue.get()
+
+    def __enter__(self) -> "ChangeStream":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class LiveValues:
+    """Latest reported value per ``(source, id)``, with change
+    subscriptions."""
+
+    DEFAULT_STREAM_SIZE = 1024
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._latest: Dict[Any, Dict[int, Any]] = {}
+        # (source, id) -> (value, time) last delivered
+        self._delivered: Dict[Tuple[Any, int], Tuple[Any, float]] = {}
+        self._deadbands: Dict[int, Deadband] = {}
+        self._by_id: Dict[int, List[_Subscription]] = {}
+        self._any_id: List[_Subscription] = []
+
+    def set_deadband(self, value_id: int, deadband: Union[Deadband, None]) -> None:
+        """Set (or with ``None``, clear) the deadband for ``value_id``."""
+        if deadband is None:
+            self._deadbands.pop(value_id, None)
+        else:
+            self._deadbands[value_id] = deadband
+
+    def get(self, source: Any, value_id: int, default: Any = None) -> Any:
+        return self._latest.get(source, {}).get(value_id, default)
+
+    def values(self, source: Any) -> Dict[int, Any]:
+        """A copy of the latest values from ``source``."""
+        return dict(self._latest.get(source, {}))
+
+    def sources(self) -> List[Any]:
+        return list(self._latest)
+
+    def subscribe(
+        self,
+        callback: Callable[[Change], None],
+        *,
+        ids: Union[Collection[int], None] = None,
+        sources: Union[Collection[Any], None] = None,
+    ) -> _Subscription:
+        """Call ``callback`` with each :class:`Change` of ``ids`` (all
+        IDs by default) from ``sources`` (all by default). Returns a
+        subscription; ``close()`` it to stop."""
+        return self._add(
+            _Subscription(self, callback, _as_set(ids), _as_set(sources))
+        )
+
+    def changes(
+        self,
+        *,
+        ids: Union[Collection[int], None] = None,
+        sources: Union[Collection[Any], None] = None,
+        maxsize: int = DEFAULT_STREAM_SIZE,
+    ) -> ChangeStream:
+        """Like :meth:`subscribe`, as an async iterator."""
+        stream = ChangeStream(self, _as_set(ids), _as_set(sources), maxsize)
+        self._add(stream)
+        return stream
+
+    def apply(self, source: Any, report: ThingSetReport) -> int:
+        """Store a report's values; returns how many changes passed
+        their deadbands."""
+        values = report.values
+        latest = self._latest.get(source)
+        if latest is None:
+            latest = self._latest[source] = {}
+        latest.update(values)
+
+        # Only compare what is watched, walking the smaller side
+        by_id = self._by_id
+        watched: Collection[int]
+        if self._any_id:
+            watched = values
+        elif len(by_id) < len(values):
+            watched = [i for i in by_id if i in values]
+        else:
+            watched = [i for i in values if i in by_id]
+        if not watched:
+            return 0
+
+        now = self._clock()
+        delivered = 0
+        for value_id in watched:
+            value = values[value_id]
+            key = (source, value_id)
+            last = self._delivered.get(key)
+            deadband = self._deadbands.get(value_id, NO_DEADBAND)
+            if last is not None:
+                previous, when = last
+                if not deadband.exceeded(previous, value):
+                    continue
+                if now - when < deadband.min_interval:
+                    continue
+            else:
+                previous = None
+            self._delivered[key] = (value, now)
+            self._dispatch(Change(source, value_id, value, previous, now))
+            delivered += 1
+        return delivered
+
+    async def follow(self, reports: AsyncIterable[Tuple[Any, ThingSetReport]]) -> None:
+        """Apply reports from a receiver (or any async iterable of
+        ``(addr, report)``) until it ends."""
+        async for addr, report in reports:
+            self.apply(report.eui if report.eui is not None else addr, report)
+
+    def _dispatch(self, change: Change) -> None:
+        for subscription in self._by_id.get(change.value_id, ()):
+            self._deliver(subscription, change)
+        for subscription in self._any_id:
+            self._deliver(subscription, change)
+
+    @staticmethod
+    def _deliver(subscription: _Subscription, change: Change) -> None:
+        sources = subscription.sources
+        if sources is not None and change.source not in sources:
+            return
+        try:
+            subscription.deliver(change)
+        except Exception:
+            logger.exception("ThingSet change subscriber raised")
+
+    def _add(self, subscription: _Subscription) -> _Subscription:
+        if subscription.ids is None:
+            self._any_id.append(subscription)
+        else:
+            for value_id in subscription.ids:
+                self._by_id.setdefault(value_id, []).append(subscription)
+        return subscription
+
+    def _remove(self, subscription: _Subscription) -> None:
+        if subscription.ids is None:
+            if subscription in self._any_id:
+                self._any_id.remove(subscription)
+            return
+        for value_id in subscription.ids:
+            subscribers = self._by_id.get(value_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._by_id.pop(value_id, None)
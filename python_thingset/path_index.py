@@ -0,0 +1,123 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Path addressing for binary transports.
+
+Binary ThingSet requests carry numeric IDs, but a value's path is what
+the text transport, the schema and most application code use. A
+:class:`PathIndex` turns a path such as ``"Module/rVoltage"`` into the
+``(parent_id, id)`` pair a binary request needs, from the ``by_path``
+lookup of a :class:`SchemaTree`. Each path is compiled once and then
+answered from a plain dict.
+
+Clients keep one index per target node; see
+:meth:`ThingSetClient.attach_schema`.
+"""
+
+from typing import Any, Dict, Tuple, Union
+
+from .codec import DECODE_MODES, ValueCodec, codec_for
+from .schema import SchemaNode, SchemaTree
+
+
+Address = Tuple[int, int]
+
+
+def child_path(parent: Union[int, str], child: Union[int, str]) -> Union[int, str]:
+    """Path of a ``fetch`` child given by name under a parent given by
+    path, as the text transport addresses it; anything else as is."""
+    if isinstance(child, str) and isinstance(parent, str) and parent:
+        return f"{parent}/{child}"
+    return child
+
+
+class PathIndex:
+    """``path -> (parent_id, id)`` compiled from a schema tree.
+
+    A path the index hasn't seen is looked up in ``tree.by_path``,
+    which for a :class:`LazySchemaTree` discovers it on demand.
+    Unknown paths raise ``KeyError``. A leading ``/`` is ignored, as
+    on the command line, and the empty path names the root,
+    ``root_id``.
+
+    ``decode`` records how the owning client decodes values it has a
+    schema for: ``None`` (as received), ``"list"``, ``"array"`` or
+    ``"numpy"`` (see :mod:`python_thingset.codec`).
+    """
+
+    def __init__(
+        self,
+        tree: SchemaTree,
+        root_id: int = 0,
+        decode: Union[str, None] = None,
+    ) -> None:
+        if decode is not None and decode not in DECODE_MODES:
+            raise ValueError(
+                f"decode must be None or one of {', '.join(DECODE_MODES)}"
+            )
+        self._tree = tree
+        self._root_id = root_id
+        self.decode = decode
+        self._addresses: Dict[str, Address] = {}
+
+    @property
+    def tree(self) -> SchemaTree:
+        return self._tree
+
+    def get(self, path: str) -> Union[Address, None]:
+        """The compiled address of ``path``, without consulting the
+        tree."""
+        address = self._addresses.get(path)
+        if address is None and path.startswith("/"):
+            address = self._addresses.get(path.lstrip("/"))
+        return address
+
+    def node(self, value_id: Union[int, str]) -> Union[SchemaNode, None]:
+        """The already-discovered node for an ID or path, if any. Never
+        triggers discovery on a lazy tree."""
+        if isinstance(value_id, str):
+            return dict.get(self._tree.by_path, value_id.lstrip("/"))
+        return dict.get(self._tree.by_id, value_id)
+
+    def codec(self, value_id: Union[int, str]) -> Union[ValueCodec, None]:
+        """The codec for ``value_id``'s type, or ``None`` if the node
+        isn't known or its type has nothing to check."""
+        node = self.node(value_id)
+        if node is None:
+            return None
+        codec = codec_for(node.type)
+        return None if type(codec) is ValueCodec else codec
+
+    def decode_value(self, value_id: Union[int, str], value: Any) -> Any:
+        """``value`` as received for ``value_id``, decoded as ``decode``
+        asks."""
+        if self.decode is None:
+            return value
+        codec = self.codec(value_id)
+        return value if codec is None else codec.decode(value, self.decode)
+
+    def id_of(self, path: str) -> int:
+        if not path.lstrip("/"):
+            return self._root_id
+        return self[path][1]
+
+    def __getitem__(self, path: str) -> Address:
+        try:
+            return self._addresses[path]
+        except KeyError:
+            pass
+        if path.startswith("/"):
+            path = path.lstrip("/")
+            address = self._addresses.get(path)
+            if address is not None:
+                return address
+        node = self._tree.by_path[path]
+        parent, _, _ = path.rpartition("/")
+        parent_id = self._tree.by_path[parent].id if parent else self._root_id
+        address = self._addresses[path] = (parent_id, node.id)
+        return address
+
+    def __len__(self) -> int:
+        return len(self._addresses)
@@ -0,0 +1,199 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Read many values in as few requests as possible.
+
+:meth:`SchemaTree.select` finds the nodes matching a path pattern;
+:class:`FetchPlan` turns a set of nodes into ``fetch(parent, ids)``
+requests, one per parent, split wherever a request or its response
+might not fit in a ThingSet frame. A plan is built once and can be
+executed repeatedly, from the sync or the async client::
+
+    plan = FetchPlan.build(tree, "Modules/*/rVoltage")
+    values = plan.execute(client)             # {path: value}
+    values = await plan.execute_async(client)
+"""
+
+import asyncio
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Union
+
+from .path_index import PathIndex
+from .response import ThingSetResponse, ThingSetStatus
+from .schema import SchemaNode, SchemaTree
+
+
+if TYPE_CHECKING:
+    from .async_client import AsyncThingSetClient
+    from .client import ThingSetClient
+
+
+# Largest request or response a ThingSet device will handle.
+DEFAULT_FRAME_LIMIT = 4095
+
+# Request: code, parent ID (up to a 32-bit uint) and array header.
+_REQUEST_OVERHEAD = 1 + 5 + 3
+# Response: status code, CBOR null and array header.
+_RESPONSE_OVERHEAD = 1 + 1 + 3
+
+_SCALAR_SIZES = {
+    "bool": 1,
+    "u8": 2,
+    "i8": 2,
+    "u16": 3,
+    "i16": 3,
+    "u32": 5,
+    "i32": 5,
+    "f32": 5,
+    "u64": 9,
+    "i64": 9,
+    "f64": 9,
+    "decfrac": 12,
+}
+
+# Guesses for values whose encoded size the type doesn't pin down.
+STRING_SIZE_ESTIMATE = 32
+ARRAY_LENGTH_ESTIMATE = 16
+GROUP_SIZE_ESTIMATE = 256
+
+_ARRAY_TYPE = re.compile(r"^(?P<elem>[^\[]+)\[(?P<length>\d*)\]$")
+
+
+def estimate_value_size(node: SchemaNode) -> int:
+    """Rough upper bound on the CBOR size of ``node``'s value."""
+    match = _ARRAY_TYPE.match(node.type)
+    if match is not None:
+        elem = match["elem"]
+        length = int(match["length"]) if match["length"] else ARRAY_LENGTH_ESTIMATE
+        if elem in _SCALAR_SIZES:
+            return 3 + length * _SCALAR_SIZES[elem]
+        return 3 + length * (
+            STRING_SIZE_ESTIMATE if elem == "string" else GROUP_SIZE_ESTIMATE
+        )
+    if node.type in _SCALAR_SIZES:
+        return _SCALAR_SIZES[node.type]
+    if node.type == "string":
+        return STRING_SIZE_ESTIMATE
+    return GROUP_SIZE_ESTIMATE
+
+
+def _cbor_uint_size(value: int) -> int:
+    if value < 24:
+        return 1
+    if value < 0x100:
+        return 2
+    if value < 0x10000:
+        return 3
+    if value < 0x100000000:
+        return 5
+    return 9
+
+
+def _is_readable(node: SchemaNode) -> bool:
+    # Functions are executed, not read
+    return not node.type.startswith("(")
+
+
+@dataclass
+class FetchRequest:
+    parent_id: int
+    ids: List[int] = field(default_factory=list)
+    paths: List[str] = field(default_factory=list)
+
+
+@dataclass
+class FetchPlan:
+    requests: List[FetchRequest] = field(default_factory=list)
+
+    @classmethod
+    def build(
+        cls,
+        tree: SchemaTree,
+        nodes: Union[str, Iterable[SchemaNode]],
+        *,
+        root_id: int = 0,
+        frame_limit: int = DEFAULT_FRAME_LIMIT,
+        size_of: Callable[[SchemaNode], int] = estimate_value_size,
+    ) -> "FetchPlan":
+        """Plan the reads of ``nodes`` (or of ``tree.select(nodes)``,
+        given a pattern).
+
+        Nodes are grouped by parent, in the order first seen, and each
+        group is cut into requests whose ID list and estimated response
+        both stay within ``frame_limit`` bytes. ``size_of`` estimates a
+        value's encoded size; pass a tighter one if you know better
+        than the type does. Functions are left out.
+        """
+        if isinstance(nodes, str):
+            nodes = tree.select(nodes)
+        index = PathIndex(tree, root_id)
+        by_parent: Dict[int, List[SchemaNode]] = {}
+        for node in nodes:
+            if _is_readable(node):
+                by_parent.setdefault(index[node.path][0], []).append(node)
+
+        requests: List[FetchRequest] = []
+        for parent_id, children in by_parent.items():
+            request = FetchRequest(parent_id)
+            request_size = _REQUEST_OVERHEAD
+            response_size = _RESPONSE_OVERHEAD
+            for node in children:
+                id_size = _cbor_uint_size(node.id)
+                value_size = size_of(node)
+                if request.ids and (
+                    request_size + id_size > frame_limit
+                    or response_size + value_size > frame_limit
+                ):
+                    requests.append(request)
+                    request = FetchRequest(parent_id)
+                    request_size = _REQUEST_OVERHEAD
+                    response_size = _RESPONSE_OVERHEAD
+                request.ids.append(node.id)
+                request.paths.append(node.path)
+                request_size += id_size
+                response_size += value_size
+            requests.append(request)
+        return cls(requests)
+
+    def __len__(self) -> int:
+        return len(self.requests)
+
+    def execute(
+        self, client: "ThingSetClient", node_id: Union[int, None] = None
+    ) -> Dict[str, Any]:
+        """Run the plan; returns ``{path: value}`` for every value read.
+        Values from a request the device refused are left out."""
+        out: Dict[str, Any] = {}
+        for request in self.requests:
+            self._collect(
+                request, client.fetch(request.parent_id, request.ids, node_id), out
+            )
+        return out
+
+    async def execute_async(
+        self, client: "AsyncThingSetClient", node_id: Union[int, None] = None
+    ) -> Dict[str, Any]:
+        """Async :meth:`execute`. All requests are issued at once; the
+        client serialises them on the wire."""
+        responses = await asyncio.gather(
+            *(
+                client.fetch(request.parent_id, request.ids, node_id)
+                for request in self.requests
+            )
+        )
+        out: Dict[str, Any] = {}
+        for request, resp in zip(self.requests, responses):
+            self._collect(request, resp, out)
+        return out
+
+    @staticmethod
+    def _collect(
+        request: FetchRequest, resp: ThingSetResponse, out: Dict[str, Any]
+    ) -> None:
+        if resp.status_code != ThingSetStatus.CONTENT or not resp.values:
+            return
+        for path, value in zip(request.paths, resp.values):
+            out[path] = value.value
@@ -0,0 +1,89 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Receiver-level report filters.
+
+On a shared network most reports a receiver hears are of no interest
+to it. Filtering the decoded reports (as :class:`ReportHub`
+subscriptions do) still pays for decoding every value map. A
+:class:`ReceiveFilter` is checked by the receivers before that: the
+source as each datagram or frame arrives, and the EUI and subset ID
+by peeking at the report header (:func:`peek_report_header`) — for
+UDP, on the first fragment, so the rest of a rejected report is not
+even reassembled::
+
+    AsyncThingSetUDPReceiver(sources={"192.0.2.10"}, euis={0xBADB1B0000000001})
+
+The CAN receiver also hands the source and report type to the
+kernel's ``can_filters``, so unwanted frames never reach Python.
+"""
+
+from typing import Any, Collection, Set, Union
+
+from ._protocol import peek_report_header
+
+
+class ReceiveFilter:
+    """``sources`` holds receiver addresses (for UDP, ``(ip, port)``
+    or a bare IP; for CAN, node addresses), ``euis`` and ``subsets``
+    the EUIs and subset IDs to keep. Each set given must match; a
+    report without an EUI or subset ID — a standard report, or a CAN
+    single-frame one — never matches a set of them.
+
+    :attr:`rejected` counts the reports turned away.
+    """
+
+    __slots__ = ("sources", "euis", "subsets", "rejected")
+
+    def __init__(
+        self,
+        sources: Union[Collection[Any], None] = None,
+        euis: Union[Collection[int], None] = None,
+        subsets: Union[Collection[int], None] = None,
+    ) -> None:
+        self.sources = _as_set(sources)
+        self.euis = _as_set(euis)
+        self.subsets = _as_set(subsets)
+        self.rejected = 0
+
+    @property
+    def headers(self) -> bool:
+        """Whether reports must be checked by header."""
+        return self.euis is not None or self.subsets is not None
+
+    def accepts_source(self, addr: Any) -> bool:
+        return self.sources is None or _source_in(addr, self.sources)
+
+    def accepts_header(self, eui: Union[int, None], subset_id: Union[int, None]) -> bool:
+        """The ``accept`` callback of :meth:`ThingSetProtocol.parse_report`;
+        counts rejections."""
+        if (self.euis is not None and eui not in self.euis) or (
+            self.subsets is not None and subset_id not in self.subsets
+        ):
+            self.rejected += 1
+            return False
+        return True
+
+    def rejects_start(self, fragment: bytes) -> bool:
+        """Whether the first fragment of a report already shows it
+        unwanted. ``False`` when the fragment ends inside the header."""
+        if not self.headers:
+            return False
+        header = peek_report_header(fragment)
+        return header is not None and not self.accepts_header(
+            header.eui, header.subset_id
+        )
+
+
+def _as_set(items: Union[Collection[Any], None]) -> Union[Set[Any], None]:
+    return None if items is None else set(items)
+
+
+def _source_in(addr: Any, sources: Collection[Any]) -> bool:
+    """Whether ``addr`` is one of ``sources``, or its first part is:
+    a bare IP for a UDP ``(ip, port)``, a node for a CAN ``(node, bus)``."""
+    if addr in sources:
+        return True
+    return isinstance(addr, tuple) and bool(addr) and addr[0] in sources
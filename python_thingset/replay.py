@@ -0,0 +1,628 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Replaying recorded traffic through the report receivers.
+
+Benchmarking or regression-testing ingest needs realistic load, and
+the hardware that produced it is rarely at hand. :func:`replay` pushes
+recorded reports through a receiver at their original pace, ``speed``
+times faster, or as fast as possible (``speed=None``), and says what
+came out::
+
+    receiver = AsyncThingSetUDPReceiver(queue_reports=False)
+    stats = await replay(read_capture("site.tscap"), receiver, speed=10)
+    print(stats)
+
+Recordings come from :func:`read_capture` (a :class:`CaptureWriter`
+file), :func:`read_candump` (``candump -l`` logs, or any other log
+python-can reads) or :func:`read_pcap` (UDP report datagrams from a
+``tcpdump -w`` file). Captured payloads are split into datagrams or
+frames again on the way out.
+
+The target decides how items are delivered:
+
+* an :class:`AsyncThingSetUDPReceiver` — datagrams go straight into
+  its datagram handler, with no socket, so the figures are those of
+  reassembly and decoding alone;
+* an :class:`AsyncThingSetCANReportReceiver` — frames go straight
+  into its frame handler, with no bus;
+* an ``(address, port)`` pair — datagrams are sent from a UDP socket
+  per recorded source, so that each source keeps a port, and a
+  reassembly buffer, of its own at the receiver. Sources that differ
+  only by IP address can't be told apart by the receiver's
+  ``sources`` filter, as every datagram comes from this host;
+* a ``can.BusABC`` (``vcan0``, say) — frames are sent onto the bus.
+
+Reports are counted as they reach the receiver's callbacks; for the
+last two, pass the receiver listening at the other end as
+``receiver``. Latency is the time from when a report's last datagram
+or frame was due to when the receiver delivered it, matching reports
+to deliveries in order; once reports are lost or filtered out, only
+the counts are meaningful.
+"""
+
+import asyncio
+import socket
+import struct
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Tuple,
+    Union,
+)
+
+import can
+
+from .capture import CaptureReader, capture_files
+from .report import ThingSetReport
+from .report_callbacks import ReportCallback
+from .shm_ring import RawReport
+from .transport.async_can import (
+    _MFT_CONSECUTIVE,
+    _MFT_FIRST,
+    _MFT_LAST,
+    _MFT_SINGLE,
+    _MSG_NUM_POS,
+    _MULTIFRAME_TYPE_MASK,
+    _SEQ_POS,
+    _TYPE_MASK,
+    _TYPE_MULTI_FRAME_REPORT,
+    _TYPE_SINGLE_FRAME_REPORT,
+    AsyncThingSetCANReportReceiver,
+)
+from .transport.async_udp import (
+    _MSG_TYPE_CONSECUTIVE,
+    _MSG_TYPE_FIRST,
+    _MSG_TYPE_LAST,
+    _MSG_TYPE_MASK,
+    _MSG_TYPE_SINGLE,
+    AsyncThingSetUDPReceiver,
+)
+
+
+# Fragment size when splitting a captured payload into datagrams
+# (Ethernet MTU less IPv4, UDP and framing headers)
+_UDP_FRAGMENT = 1500 - 20 - 8 - 2
+
+# Priority bits of generated report frames: lowest
+_REPORT_PRIORITY = 0x7 << 26
+
+# Delays shorter than this are caught up rather than slept
+_MIN_SLEEP = 0.001
+
+# At full speed, let the event loop run other tasks this often
+_YIELD_EVERY = 256
+
+# Sockets kept open at once for an (address, port) target, one per
+# recorded source; the least recently used is closed beyond this
+_MAX_SOCKETS = 256
+
+DEFAULT_SETTLE = 0.5
+
+REPORT_PORT = 9002
+
+
+class Datagram(NamedTuple):
+    """A framed ThingSet UDP datagram, as recorded."""
+
+    timestamp: float
+    source: Tuple[str, int]
+    data: bytes
+
+
+ReplayItem = Union[Datagram, can.Message, RawReport]
+
+
+# -- Recordings ---------------------------------------------------------
+
+
+def read_capture(path: Any) -> Iterator[RawReport]:
+    """The reports in a capture, across its rotated files."""
+    files = capture_files(path)
+    if not files:
+        raise FileNotFoundError(f"no capture files for {path}")
+    for file in files:
+        with CaptureReader(file) as reader:
+            yield from reader.records(kinds=["report"])  # type: ignore[misc]
+
+
+def read_candump(path: Any) -> Iterator[can.Message]:
+    """The frames in a ``candump -l`` log, or any log format python-can
+    reads (chosen by file suffix)."""
+    yield from can.LogReader(path)
+
+
+# pcap link types
+_LINKTYPE_NULL = 0
+_LINKTYPE_ETHERNET = 1
+_LINKTYPE_RAW = 101
+_LINKTYPE_LINUX_SLL = 113
+_LINKTYPE_IPV4 = 228
+_LINKTYPE_LINUX_SLL2 = 276
+
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_VLAN = (0x8100, 0x88A8)
+
+_PCAPNG_MAGIC = 0x0A0D0D0A
+
+
+def read_pcap(path: Any, port: int = REPORT_PORT) -> Iterator[Datagram]:
+    """The UDP datagrams to ``port`` in a pcap file (``tcpdump -w``).
+
+    Reads Ethernet, Linux cooked and raw IP captures of IPv4. Raises
+    ``ValueError`` for pcapng (convert it with ``editcap -F pcap``) or
+    another link type. IP fragments are skipped.
+    """
+    with open(path, "rb") as f:
+        header = f.read(24)
+        if len(header) < 24:
+            raise ValueError(f"{path} is not a pcap file")
+        magic = struct.unpack("<I", header[:4])[0]
+        if magic == _PCAPNG_MAGIC:
+            raise ValueError(f"{path} is pcapng; convert it with editcap -F pcap")
+        for endian in "<>":
+            magic = struct.unpack(endian + "I", header[:4])[0]
+            if magic in (0xA1B2C3D4, 0xA1B23C4D):
+                break
+        else:
+            raise ValueError(f"{path} is not a pcap file")
+        fraction = 1e-6 if magic == 0xA1B2C3D4 else 1e-9
+        link_type = struct.unpack(endian + "I", header[20:24])[0] & 0x0FFFFFFF
+        record = struct.Struct(endian + "IIII")
+        while True:
+            raw = f.read(record.size)
+            if len(raw) < record.size:
+                return
+            seconds, frac, length, _ = record.unpack(raw)
+            packet = f.read(length)
+            if len(packet) < length:
+                return
+            ip = _ipv4_packet(packet, link_type, endian)
+            datagram = _udp_datagram(ip, port) if ip else None
+            if datagram is not None:
+                source, data = datagram
+                yield Datagram(seconds + frac * fraction, source, data)
+
+
+def _ipv4_packet(packet: bytes, link_type: int, endian: str) -> Union[bytes, None]:
+    if link_type == _LINKTYPE_ETHERNET:
+        offset = 12
+        ethertype = struct.unpack_from("!H", packet, offset)[0]
+        while ethertype in _ETHERTYPE_VLAN:
+            offset += 4
+            ethertype = struct.unpack_from("!H", packet, offset)[0]
+        return packet[offset + 2 :] if ethertype == _ETHERTYPE_IPV4 else None
+    if link_type == _LINKTYPE_LINUX_SLL:
+        protocol = struct.unpack_from("!H", packet, 14)[0]
+        return packet[16:] if protocol == _ETHERTYPE_IPV4 else None
+    if link_type == _LINKTYPE_LINUX_SLL2:
+        protocol = struct.unpack_from("!H", packet, 0)[0]
+        return packet[20:] if protocol == _ETHERTYPE_IPV4 else None
+    if link_type == _LINKTYPE_NULL:
+        # Address family, in the byte order of the capturing host
+        family = struct.unpack_from(endian + "I", packet, 0)[0]
+        return packet[4:] if family == socket.AF_INET else None
+    if link_type in (_LINKTYPE_RAW, _LINKTYPE_IPV4):
+        return packet if packet and packet[0] >> 4 == 4 else None
+    raise ValueError(f"unsupported pcap link type {link_type}")
+
+
+def _udp_datagram(ip: bytes, port: int) -> Union[Tuple[Tuple[str, int], bytes], None]:
+    if len(ip) < 20 or ip[0] >> 4 != 4 or ip[9] != socket.IPPROTO_UDP:
+        return None
+    flags_offset = struct.unpack_from("!H", ip, 6)[0]
+    if flags_offset & 0x3FFF:
+        # A fragment (more to come, or not the first)
+        return None
+    udp = ip[(ip[0] & 0x0F) * 4 :]
+    if len(udp) < 8:
+        return None
+    source_port, destination_port, length = struct.unpack_from("!HHH", udp, 0)
+    if destination_port != port:
+        return None
+    return (socket.inet_ntoa(ip[12:16]), source_port), udp[8:length]
+
+
+# -- Targets ------------------------------------------------------------
+
+
+class _Target(ABC):
+    """Turns items into what the target carries, and delivers it."""
+
+    receiver: Union[AsyncThingSetUDPReceiver, AsyncThingSetCANReportReceiver, None]
+
+    @abstractmethod
+    def units(self, item: ReplayItem) -> Union[List[Any], None]:
+        """The datagrams or frames for ``item``; ``None`` if the target
+        can't carry it."""
+
+    @abstractmethod
+    def completes(self, unit: Any) -> bool:
+        """Whether ``unit`` is the last of a report."""
+
+    @abstractmethod
+    def deliver(self, unit: Any) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class _UdpTarget(_Target):
+    def __init__(self) -> None:
+        self._message_numbers: Dict[Any, int] = {}
+
+    def units(self, item: ReplayItem) -> Union[List[Any], None]:
+        if isinstance(item, Datagram):
+            return [(item.data, item.source)]
+        if (
+            isinstance(item, RawReport)
+            and item.data_id is None
+            and isinstance(item.source, tuple)
+            and isinstance(item.source[0], str)
+        ):
+            number = self._message_numbers.get(item.source, -1) + 1 & 0xFF
+            self._message_numbers[item.source] = number
+            return [(data, item.source) for data in _udp_frames(item.payload, number)]
+        return None
+
+    def completes(self, unit: Any) -> bool:
+        data = unit[0]
+        return bool(data) and data[0] & _MSG_TYPE_MASK in (
+            _MSG_TYPE_LAST,
+            _MSG_TYPE_SINGLE,
+        )
+
+
+class _UdpReceiverTarget(_UdpTarget):
+    def __init__(self, receiver: AsyncThingSetUDPReceiver) -> None:
+        super().__init__()
+        self.receiver = receiver
+        # A handler of our own: the receiver may be running already
+        self._protocol = receiver._make_protocol()
+
+    def deliver(self, unit: Any) -> None:
+        self._protocol.datagram_received(*unit)
+
+    def close(self) -> None:
+        if self._protocol._offload is not None:
+            self._protocol._offload.close()
+
+
+class _UdpSocketTarget(_UdpTarget):
+    def __init__(self, address: Tuple[str, int], receiver: Any) -> None:
+        super().__init__()
+        self.receiver = receiver
+        self._address = address
+        self._socks: Dict[Any, socket.socket] = {}
+
+    def deliver(self, unit: Any) -> None:
+        data, source = unit
+        socks = self._socks
+        sock = socks.pop(source, None)
+        if sock is None:
+            if len(socks) >= _MAX_SOCKETS:
+                socks.pop(next(iter(socks))).close()
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.connect(self._address)
+        # Most recently used last
+        socks[source] = sock
+        try:
+            sock.send(data)
+        except (BlockingIOError, ConnectionRefusedError):
+            # Lost, as on a real network; shows up in the drop count
+            pass
+
+    def close(self) -> None:
+        for sock in self._socks.values():
+            sock.close()
+        self._socks.clear()
+
+
+class _CanTarget(_Target):
+    def __init__(self, fd: bool) -> None:
+        self._fd = fd
+        self._message_numbers: Dict[Any, int] = {}
+
+    def units(self, item: ReplayItem) -> Union[List[Any], None]:
+        if isinstance(item, can.Message):
+            return [item]
+        if (
+            isinstance(item, RawReport)
+            and isinstance(item.source, tuple)
+            and isinstance(item.source[0], int)
+        ):
+            node, bus = item.source
+            if item.data_id is not None:
+                can_id = (
+                    _REPORT_PRIORITY
+                    | _TYPE_SINGLE_FRAME_REPORT
+                    | item.data_id << 8
+                    | node
+                )
+                return [self._message(can_id, item.payload, item.timestamp, bus)]
+            number = self._message_numbers.get(item.source, -1) + 1 & 0x3
+            self._message_numbers[item.source] = number
+            return [
+                self._message(can_id, chunk, item.timestamp, bus)
+                for can_id, chunk in _can_frames(
+                    item.payload, node, number, 64 if self._fd else 8
+                )
+            ]
+        return None
+
+    def _message(self, can_id: int, data: bytes, timestamp: float, bus: str) -> can.Message:
+        return can.Message(
+            timestamp=timestamp,
+            arbitration_id=can_id,
+            is_extended_id=True,
+            data=data,
+            is_fd=self._fd,
+            channel=bus,
+        )
+
+    def completes(self, unit: can.Message) -> bool:
+        if not unit.is_extended_id:
+            return False
+        can_id = unit.arbitration_id
+        if can_id & _TYPE_MASK == _TYPE_SINGLE_FRAME_REPORT:
+            return True
+        return can_id & _TYPE_MASK == _TYPE_MULTI_FRAME_REPORT and (
+            can_id & _MULTIFRAME_TYPE_MASK in (_MFT_LAST, _MFT_SINGLE)
+        )
+
+
+class _CanReceiverTarget(_CanTarget):
+    def __init__(self, receiver: AsyncThingSetCANReportReceiver, fd: bool) -> None:
+        super().__init__(fd)
+        self.receiver = receiver
+
+    def deliver(self, unit: can.Message) -> None:
+        self.receiver._handle_message(unit)
+
+
+class _CanBusTarget(_CanTarget):
+    def __init__(self, bus: can.BusABC, receiver: Any, fd: bool) -> None:
+        super().__init__(fd)
+        self.receiver = receiver
+        self._bus = bus
+
+    def deliver(self, unit: can.Message) -> None:
+        try:
+            self._bus.send(unit)
+        except can.CanError:
+            # Bus or transmit queue full; shows up in the drop count
+            pass
+
+
+def _udp_frames(payload: bytes, number: int) -> List[bytes]:
+    if len(payload) <= _UDP_FRAGMENT:
+        return [bytes([_MSG_TYPE_SINGLE, number]) + payload]
+    chunks = [
+        payload[i : i + _UDP_FRAGMENT] for i in range(0, len(payload), _UDP_FRAGMENT)
+    ]
+    out = []
+    for seq, chunk in enumerate(chunks):
+        if seq == 0:
+            msg_type = _MSG_TYPE_FIRST
+        elif seq == len(chunks) - 1:
+            msg_type = _MSG_TYPE_LAST
+        else:
+            msg_type = _MSG_TYPE_CONSECUTIVE
+        out.append(bytes([msg_type | seq & 0x0F, number]) + chunk)
+    return out
+
+
+def _can_frames(
+    payload: bytes, node: int, number: int, size: int
+) -> List[Tuple[int, bytes]]:
+    chunks = [payload[i : i + size] for i in range(0, len(payload), size)] or [b""]
+    out = []
+    for seq, chunk in enumerate(chunks):
+        if len(chunks) == 1:
+            mft = _MFT_SINGLE
+        elif seq == 0:
+            mft = _MFT_FIRST
+        elif seq == len(chunks) - 1:
+            mft = _MFT_LAST
+        else:
+            mft = _MFT_CONSECUTIVE
+        can_id = (
+            _REPORT_PRIORITY
+            | _TYPE_MULTI_FRAME_REPORT
+            | number << _MSG_NUM_POS
+            | mft
+            | (seq & 0xF) << _SEQ_POS
+            | node
+        )
+        out.append((can_id, chunk))
+    return out
+
+
+def _target(
+    into: Any, receiver: Any, fd: bool
+) -> _Target:
+    if isinstance(into, AsyncThingSetUDPReceiver):
+        return _UdpReceiverTarget(into)
+    if isinstance(into, AsyncThingSetCANReportReceiver):
+        return _CanReceiverTarget(into, fd)
+    if isinstance(into, can.BusABC):
+        return _CanBusTarget(into, receiver, fd)
+    if isinstance(into, tuple):
+        return _UdpSocketTarget(into, receiver)
+    raise TypeError(f"cannot replay into {into!r}")
+
+
+# -- Replay -------------------------------------------------------------
+
+
+@dataclass
+class ReplayStats:
+    # Items read from the recording
+    items: int = 0
+    # Items the target can't carry (CAN frames for a UDP target, say)
+    skipped: int = 0
+    # Datagrams or frames delivered
+    sent: int = 0
+    # Reports whose last datagram or frame was delivered
+    reports_sent: int = 0
+    # Reports the receiver delivered; None without a receiver to watch
+    reports_received: Union[int, None] = None
+    # Reports the receiver's queue dropped
+    queue_dropped: int = 0
+    # From the first item sent to the last sent or report received,
+    # in seconds
+    elapsed: float = 0.0
+    # How far delivery fell behind the recording's pace, in seconds
+    max_lag: float = 0.0
+    latencies: "array[float]" = field(default_factory=lambda: array("d"), repr=False)
+
+    @property
+    def dropped(self) -> Union[int, None]:
+        """Reports sent but never delivered."""
+        if self.reports_received is None:
+            return None
+        return max(self.reports_sent - self.reports_received, 0)
+
+    @property
+    def rate(self) -> float:
+        """Reports delivered (or, without a receiver, sent) per second."""
+        count = self.reports_sent if self.reports_received is None else self.reports_received
+        return count / self.elapsed if self.elapsed > 0 else 0.0
+
+    def latency(self, percentile: float) -> Union[float, None]:
+        """The ``percentile`` (0-100) report latency in seconds."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(int(len(ordered) * percentile / 100), len(ordered) - 1)
+        return ordered[index]
+
+    def __str__(self) -> str:
+        lines = [
+            f"{self.items} items, {self.sent} sent, {self.skipped} skipped "
+            f"in {self.elapsed:.3f} s",
+            f"{self.reports_sent} reports sent, "
+            + (
+                "none watched"
+                if self.reports_received is None
+                else f"{self.reports_received} received, {self.dropped} dropped "
+                f"({self.queue_dropped} by the queue)"
+            ),
+            f"{self.rate:,.0f} reports/s, max lag {self.max_lag * 1e3:.1f} ms",
+        ]
+        if self.latencies:
+            lines.append(
+                "latency p50 {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms".format(
+                    *(self.latency(p) * 1e3 for p in (50, 99, 100))  # type: ignore[operator]
+                )
+            )
+        return "\n".join(lines)
+
+
+async def replay(
+    items: Iterable[ReplayItem],
+    into: Any,
+    speed: Union[float, None] = 1.0,
+    *,
+    receiver: Union[AsyncThingSetUDPReceiver, AsyncThingSetCANReportReceiver, None] = None,
+    fd: bool = True,
+    settle: float = DEFAULT_SETTLE,
+) -> ReplayStats:
+    """Deliver ``items`` to ``into`` and return what happened.
+
+    ``speed`` scales the recording's pace: ``1.0`` is real time,
+    ``10`` ten times faster, ``None`` as fast as possible. ``receiver``
+    is the receiver to watch when ``into`` is a socket address or CAN
+    bus. ``fd`` selects CAN FD frames (64 bytes) rather than classic
+    ones when captured payloads are split into frames. After the last
+    item, waits until no report has arrived for ``settle`` seconds.
+    """
+    if speed is not None and speed <= 0:
+        raise ValueError("speed must be positive, or None for full speed")
+    target = _target(into, receiver, fd)
+    watched = target.receiver
+    stats = ReplayStats()
+    clock = time.perf_counter
+    # When each report sent but not yet received was due
+    due_times: Deque[float] = deque()
+    entry: Union[ReportCallback, None] = None
+    last_delivery = 0.0
+    queue_dropped = 0
+    if watched is not None:
+        stats.reports_received = 0
+        queue_dropped = watched.counters["dropped"]
+
+        def on_report(addr: Any, report: ThingSetReport) -> None:
+            nonlocal last_delivery
+            last_delivery = clock()
+            stats.reports_received += 1  # type: ignore[operator]
+            if due_times:
+                stats.latencies.append(last_delivery - due_times.popleft())
+
+        entry = watched.add_callback(on_report)
+
+    started = first = None
+    try:
+        for item in items:
+            stats.items += 1
+            units = target.units(item)
+            if units is None:
+                stats.skipped += 1
+                continue
+            now = clock()
+            if started is None:
+                started, first = now, item.timestamp
+            if speed is None:
+                due = now
+                if stats.items % _YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+            else:
+                due = started + (item.timestamp - first) / speed
+                if due - now >= _MIN_SLEEP:
+                    await asyncio.sleep(due - now)
+                else:
+                    stats.max_lag = max(stats.max_lag, now - due)
+            for unit in units:
+                if target.completes(unit):
+                    stats.reports_sent += 1
+                    due_times.append(due)
+                target.deliver(unit)
+                stats.sent += 1
+        finished = clock()
+        if watched is not None:
+            await _settle(stats, settle)
+        if started is not None:
+            stats.elapsed = max(finished, last_delivery) - started
+    finally:
+        target.close()
+        if watched is not None and entry is not None:
+            watched.remove_callback(entry)
+            stats.queue_dropped = watched.counters["dropped"] - queue_dropped
+    return stats
+
+
+async def _settle(stats: ReplayStats, settle: float) -> None:
+    """Wait for reports still on their way, until none has arrived
+    for ``settle`` seconds."""
+    last = stats.reports_received
+    quiet_since = time.monotonic()
+    while stats.reports_received < stats.reports_sent:  # type: ignore[operator]
+        await asyncio.sleep(min(settle, 0.01))
+        if stats.reports_received != last:
+            last = stats.reports_received
+            quiet_since = time.monotonic()
+        elif time.monotonic() - quiet_since >= settle:
+            return
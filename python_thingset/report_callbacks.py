@@ -0,0 +1,122 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Inline report callbacks.
+
+Reading reports through a receiver's queue costs a task switch per
+report, and however long the event loop takes to get round to the
+consumer. Callbacks added with the receivers' ``add_callback`` run
+instead straight from the code that completes a report, before it is
+queued — for protection logic that must act on a value as soon as it
+arrives::
+
+    def on_report(addr, report):
+        if report.values.get(0x401, 0) > 4.2:
+            trip()
+
+    receiver.add_callback(on_report, budget=0.0005)
+
+A callback runs on the event loop, so it must be quick and must not
+block. Each call is timed; one that takes longer than its ``budget``
+is counted and logged (at most once a second per callback), and
+:attr:`ReportCallback.stats` keeps the figures.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List
+
+from .log import get_logger
+from .report import ThingSetReport
+
+
+logger = get_logger()
+
+
+# Default time a callback may take, in seconds
+DEFAULT_BUDGET = 0.001
+
+_WARNING_INTERVAL = 1.0
+
+Callback = Callable[[Any, ThingSetReport], None]
+
+# A receiver's payload_sink: called as sink(addr, payload, timestamp)
+# with each complete report payload before it is decoded, and for CAN
+# single-frame reports as sink(addr, value, timestamp, data_id)
+PayloadSink = Callable[..., None]
+
+
+@dataclass
+class CallbackStats:
+    calls: int = 0
+    overruns: int = 0
+    errors: int = 0
+    total_time: float = 0.0
+    worst_time: float = 0.0
+
+
+class ReportCallback:
+    """A registered callback; pass it to ``remove_callback`` to
+    unregister."""
+
+    __slots__ = ("callback", "budget", "stats", "_last_warning")
+
+    def __init__(self, callback: Callback, budget: float) -> None:
+        self.callback = callback
+        self.budget = budget
+        self.stats = CallbackStats()
+        self._last_warning = float("-inf")
+
+
+class ReportCallbacks:
+    """The callbacks of one receiver, called in the order added."""
+
+    def __init__(self) -> None:
+        self._callbacks: List[ReportCallback] = []
+
+    def __bool__(self) -> bool:
+        return bool(self._callbacks)
+
+    def __len__(self) -> int:
+        return len(self._callbacks)
+
+    def add(self, callback: Callback, budget: float = DEFAULT_BUDGET) -> ReportCallback:
+        entry = ReportCallback(callback, budget)
+        # Copy on write: a callback may add or remove callbacks
+        self._callbacks = self._callbacks + [entry]
+        return entry
+
+    def remove(self, entry: ReportCallback) -> None:
+        self._callbacks = [c for c in self._callbacks if c is not entry]
+
+    def dispatch(self, addr: Any, report: ThingSetReport) -> None:
+        clock = time.perf_counter
+        for entry in self._callbacks:
+            stats = entry.stats
+            start = clock()
+            try:
+                entry.callback(addr, report)
+            except Exception:
+                stats.errors += 1
+                logger.exception("ThingSet report callback %r raised", entry.callback)
+            elapsed = clock() - start
+            stats.calls += 1
+            stats.total_time += elapsed
+            if elapsed > stats.worst_time:
+                stats.worst_time = elapsed
+            if elapsed > entry.budget:
+                stats.overruns += 1
+                now = start + elapsed
+                if now - entry._last_warning >= _WARNING_INTERVAL:
+                    entry._last_warning = now
+                    logger.warning(
+                        "ThingSet report callback %r took %.3f ms (budget "
+                        "%.3f ms; %d overruns in %d calls)",
+                        entry.callback,
+                        elapsed * 1e3,
+                        entry.budget * 1e3,
+                        stats.overruns,
+                        stats.calls,
+                    )
@@ -0,0 +1,244 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Bounded report queues with a choice of what to lose.
+
+When a consumer falls behind, a report queue fills up and something
+has to give. :class:`OverflowPolicy` picks what:
+
+- ``DROP_NEWEST`` discards the arriving report (the receivers' old
+  behaviour);
+- ``DROP_OLDEST`` discards the longest-queued report, so the consumer
+  sees the most recent ones;
+- ``CONFLATE`` keeps at most one report per :func:`report_key` —
+  source, EUI and subset, or data ID for single-value CAN reports. A
+  newer report replaces a queued one with the same key in place, at
+  any fill level, so a slow consumer reads the freshest state of each
+  stream in arrival order. Only a queue full of distinct keys drops
+  its oldest.
+
+Every :class:`ReportQueue` counts what it lost in :attr:`dropped`
+and, when conflating, what it replaced in :attr:`conflated`.
+
+:meth:`ReportQueue.batches` reads reports a list at a time, for
+consumers that process or store them in bulk anyway::
+
+    async for batch in receiver.batches(max_items=500, max_latency=0.2):
+        database.insert_many(batch)
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from enum import Enum
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    Tuple,
+    Union,
+)
+
+from .log import get_logger
+from .report import ThingSetReport
+
+
+logger = get_logger()
+
+
+Item = Tuple[Any, ThingSetReport]
+
+_WARNING_INTERVAL = 1.0
+
+
+class OverflowPolicy(Enum):
+    DROP_NEWEST = "drop_newest"
+    DROP_OLDEST = "drop_oldest"
+    CONFLATE = "conflate"
+
+
+def report_key(addr: Any, report: ThingSetReport) -> Hashable:
+    """The stream a report belongs to, for conflation."""
+    if report.subset_id is None:
+        # CAN single-frame reports: one value, keyed by its data ID
+        return (addr, report.eui, None, tuple(report.values))
+    return (addr, report.eui, report.subset_id)
+
+
+class ReportQueue:
+    """An asyncio queue of ``(addr, report)`` holding at most
+    ``maxsize`` items, overflowing as ``policy`` says.
+
+    ``put`` never blocks. Iterate with ``async for``, or ``await
+    get()``; both finish with ``StopAsyncIteration`` after :meth:`end`
+    once the queue is drained.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        policy: Union[OverflowPolicy, str] = OverflowPolicy.DROP_NEWEST,
+        key: Callable[[Any, ThingSetReport], Hashable] = report_key,
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.policy = OverflowPolicy(policy)
+        self._key = key
+        self._items: Deque[Item] = deque()
+        self._latest: "OrderedDict[Hashable, Item]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._ended = False
+        self.dropped = 0
+        self.conflated = 0
+
+    def __len__(self) -> int:
+        if self.policy is OverflowPolicy.CONFLATE:
+            return len(self._latest)
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def full(self) -> bool:
+        return len(self) >= self.maxsize
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        """``{"dropped": ..., "conflated": ...}``"""
+        return {"dropped": self.dropped, "conflated": self.conflated}
+
+    def put(self, item: Item) -> bool:
+        """Queue ``item``; returns ``False`` if a report was dropped
+        to make room (or, for ``DROP_NEWEST``, ``item`` itself was)."""
+        lost = False
+        if self.policy is OverflowPolicy.CONFLATE:
+            key = self._key(*item)
+            if key in self._latest:
+                # Replaced in place: keeps its position in the queue
+                self._latest[key] = item
+                self.conflated += 1
+            else:
+                if len(self._latest) >= self.maxsize:
+                    self._latest.popitem(last=False)
+                    self.dropped += 1
+                    lost = True
+                self._latest[key] = item
+        else:
+            if len(self._items) >= self.maxsize:
+                self.dropped += 1
+                if self.policy is OverflowPolicy.DROP_NEWEST:
+                    return False
+                self._items.popleft()
+                lost = True
+            self._items.append(item)
+        self._ready.set()
+        return not lost
+
+    def get_nowait(self) -> Item:
+        """The next item; raises ``asyncio.QueueEmpty`` if there is
+        none."""
+        if self.policy is OverflowPolicy.CONFLATE:
+            if not self._latest:
+                raise asyncio.QueueEmpty
+            return self._latest.popitem(last=False)[1]
+        if not self._items:
+            raise asyncio.QueueEmpty
+        return self._items.popleft()
+
+    async def get(self) -> Item:
+        while self.empty():
+            if self._ended:
+                raise StopAsyncIteration
+            self._ready.clear()
+            await self._ready.wait()
+        return self.get_nowait()
+
+    def get_all_nowait(self, max_items: int) -> List[Item]:
+        """Up to ``max_items`` queued items, without waiting."""
+        count = min(max_items, len(self))
+        if self.policy is OverflowPolicy.CONFLATE:
+            popitem = self._latest.popitem
+            return [popitem(last=False)[1] for _ in range(count)]
+        popleft = self._items.popleft
+        return [popleft() for _ in range(count)]
+
+    async def get_batch(self, max_items: int, max_latency: float) -> List[Item]:
+        """Wait for an item, then return it with whatever else arrives
+        within ``max_latency`` seconds, up to ``max_items`` in all.
+        Everything already queued is taken at once, without a wait."""
+        if max_items < 1:
+            raise ValueError("max_items must be at least 1")
+        batch = [await self.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_latency
+        while True:
+            batch += self.get_all_nowait(max_items - len(batch))
+            remaining = deadline - loop.time()
+            if len(batch) >= max_items or self._ended or remaining <= 0:
+                return batch
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                batch += self.get_all_nowait(max_items - len(batch))
+                return batch
+
+    async def batches(
+        self, max_items: int = 256, max_latency: float = 0.1
+    ) -> AsyncIterator[List[Item]]:
+        """Yield lists of items as :meth:`get_batch` collects them,
+        until the queue ends."""
+        while True:
+            try:
+                batch = await self.get_batch(max_items, max_latency)
+            except StopAsyncIteration:
+                return
+            yield batch
+
+    def end(self) -> None:
+        """No more items will be put; wakes any waiting consumer."""
+        self._ended = True
+        self._ready.set()
+
+    def __aiter__(self) -> "ReportQueue":
+        return self
+
+    async def __anext__(self) -> Item:
+        return await self.get()
+
+
+class DropWarning:
+    """Logs reports a full queue dropped, at most once a second and
+    with the count since the last message, so that a steady overload
+    doesn't flood the log. The queue's counters keep the exact figures.
+
+    ``receiver`` names the receiver in the message, e.g. ``"UDP"``.
+    """
+
+    __slots__ = ("receiver", "_last_warning", "_dropped_since_warning")
+
+    def __init__(self, receiver: str) -> None:
+        self.receiver = receiver
+        self._last_warning = float("-inf")
+        self._dropped_since_warning = 0
+
+    def __call__(self, queue: ReportQueue, count: int = 1) -> None:
+        self._dropped_since_warning += count
+        now = time.monotonic()
+        if now - self._last_warning >= _WARNING_INTERVAL:
+            logger.warning(
+                "ThingSet %s queue full; dropped %d reports (%s policy)",
+                self.receiver,
+                self._dropped_since_warning,
+                queue.policy.value,
+            )
+            self._last_warning = now
+            self._dropped_since_warning = 0
+
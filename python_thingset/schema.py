@@ -7,11 +7,17 @@
 
 A :class:`SchemaTree` holds the discovered hierarchy plus flat
 ``by_id`` and ``by_path`` lookups. Build one with
-:meth:`python_thingset.ThingSetClient.discover_schema`.
+:meth:`python_thingset.ThingSetClient.discover_schema`, or restore a
+previously serialised one with :meth:`SchemaTree.loads`.
 """
 
+import fnmatch
+import re
 from dataclasses import dataclass, field
-from typing import Dict, Iterator, List
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Pattern, Tuple, Union
+
+import cbor2
 
 
 @dataclass
@@ -27,6 +33,21 @@ class SchemaNode:
         return f"0x{self.id:04X}  {self.path}  ({self.type})"
 
 
+@dataclass
+class SchemaDiff:
+    """What changed between a schema tree and the device it describes,
+    as reported by ``revalidate_schema``. ``changed`` holds nodes that
+    moved to a different parent or path; each list holds the nodes as
+    they are now (``removed``: as they were)."""
+
+    added: List[SchemaNode] = field(default_factory=list)
+    removed: List[SchemaNode] = field(default_factory=list)
+    changed: List[SchemaNode] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
 @dataclass
 class SchemaTree:
     root: List[SchemaNode]
@@ -43,3 +64,118 @@ class SchemaTree:
 
     def __len__(self) -> int:
         return len(self.by_id)
+
+    def select(self, pattern: str) -> List[SchemaNode]:
+        """Nodes whose path matches ``pattern``.
+
+        Segments are shell-style globs (``*``, ``?``, ``[...]``)
+        matched against one path segment each; a ``**`` segment
+        matches any number of segments, including none::
+
+            tree.select("Modules/*/rVoltage")
+            tree.select("**/r*")
+
+        Plain segments are looked up in ``by_path`` rather than
+        scanned for, so only the branches the pattern can match are
+        visited (on a :class:`LazySchemaTree`, only those are
+        discovered).
+        """
+        matched: Dict[int, SchemaNode] = {}
+        seen = set()
+
+        def visit(
+            prefix: str,
+            node: Union[SchemaNode, None],
+            segments: Tuple[Union[str, Pattern[str]], ...],
+        ) -> None:
+            key = (None if node is None else node.id, len(segments))
+            if key in seen:
+                return
+            seen.add(key)
+            if not segments:
+                if node is not None:
+                    matched.setdefault(node.id, node)
+                return
+            head, rest = segments[0], segments[1:]
+            if head == "**":
+                visit(prefix, node, rest)
+                for child in self._children_of(node):
+                    visit(child.path, child, segments)
+            elif isinstance(head, str):
+                child = self.by_path.get(f"{prefix}/{head}" if prefix else head)
+                if child is not None:
+                    visit(child.path, child, rest)
+            else:
+                for child in self._children_of(node):
+                    if head.match(child.name):
+                        visit(child.path, child, rest)
+
+        visit("", None, _compile_pattern(pattern))
+        return list(matched.values())
+
+    def _children_of(self, node: Union[SchemaNode, None]) -> List[SchemaNode]:
+        return self.root if node is None else node.children
+
+    def dumps(self) -> bytes:
+        """Serialise the hierarchy to compact CBOR.
+
+        Each node becomes ``[id, name, type, access, [children...]]``;
+        paths and the flat lookups are rebuilt by :meth:`loads`.
+        Entries in ``by_id`` that aren't reachable from ``root`` are
+        not included.
+        """
+        def encode(nodes: List[SchemaNode]) -> List[Any]:
+            return [
+                [n.id, n.name, n.type, n.access, encode(n.children)]
+                for n in nodes
+            ]
+        return cbor2.dumps(encode(self.root))
+
+    @classmethod
+    def loads(cls, data: bytes) -> "SchemaTree":
+        """Rebuild a tree serialised by :meth:`dumps`.
+
+        Raises ``ValueError`` if ``data`` isn't a serialised tree.
+        """
+        by_id: Dict[int, SchemaNode] = {}
+        by_path: Dict[str, SchemaNode] = {}
+
+        def decode(items: Any, prefix: str) -> List[SchemaNode]:
+            if not isinstance(items, list):
+                raise ValueError("malformed serialised schema")
+            nodes: List[SchemaNode] = []
+            for item in items:
+                if not isinstance(item, list) or len(item) != 5:
+                    raise ValueError("malformed serialised schema node")
+                node_id, name, type_str, access, children = item
+                path = f"{prefix}/{name}" if prefix else name
+                node = SchemaNode(
+                    id=node_id, name=name, type=type_str, access=access, path=path
+                )
+                node.children = decode(children, path)
+                nodes.append(node)
+                by_id[node_id] = node
+                by_path[path] = node
+            return nodes
+
+        try:
+            items = cbor2.loads(data)
+        except (cbor2.CBORDecodeError, cbor2.CBORDecodeEOF) as e:
+            raise ValueError(f"malformed serialised schema: {e}") from e
+        root = decode(items, "")
+        return cls(root=root, by_id=by_id, by_path=by_path)
+
+
+@lru_cache(maxsize=128)
+def _compile_pattern(pattern: str) -> Tuple[Union[str, Pattern[str]], ...]:
+    """Split a :meth:`SchemaTree.select` pattern into segments: plain
+    names stay strings, ``**`` stays as is, globs become regexes."""
+    out: List[Union[str, Pattern[str]]] = []
+    for segment in pattern.strip("/").split("/"):
+        if not segment or (segment == "**" and out and out[-1] == "**"):
+            continue
+        if segment == "**" or not any(c in segment for c in "*?["):
+            out.append(segment)
+        else:
+            out.append(re.compile(fnmatch.translate(segment)))
+    return tuple(out)
@@ -0,0 +1,167 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""On-disk cache of discovered schemas.
+
+Walking a device's schema costs one round-trip per group plus the
+metadata requests — seconds over TCP, far longer through a CAN
+gateway — yet the result only changes when the firmware does. A
+:class:`SchemaCache` stores each device's :class:`SchemaTree` in a
+directory, one small CBOR file per device, together with a
+fingerprint of the firmware build it was discovered from.
+
+The clients' ``discover_schema_cached`` methods tie this together:
+one ``get`` of the build-info node yields the fingerprint, and the
+tree is only re-walked when that fingerprint no longer matches::
+
+    cache = SchemaCache("~/.cache/thingset")
+    tree = client.discover_schema_cached(cache, 0xBADB1B0000000001)
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Union
+
+import cbor2
+
+from .log import get_logger
+from .schema import SchemaTree
+
+
+logger = get_logger()
+
+
+# Node whose value identifies the firmware build. On ThingSet firmware
+# this is the Metadata group (build hash, user, board and version).
+DEFAULT_FINGERPRINT_ID = 0x0F
+
+_FORMAT_VERSION = 1
+
+
+def schema_fingerprint(value: Any) -> bytes:
+    """Digest of a build-info value, as compared by the cache."""
+    return hashlib.blake2b(
+        cbor2.dumps(value, canonical=True), digest_size=16
+    ).digest()
+
+
+@dataclass
+class CachedSchema:
+    fingerprint: bytes
+    root_id: int
+    tree: SchemaTree
+    # Wall-clock time the fingerprint was last seen to match the device
+    checked_at: float = 0.0
+
+
+class SchemaCache:
+    """A directory of serialised schemas keyed by device identity.
+
+    ``device_key`` is the module's EUI-64 (an ``int``) or, for
+    devices addressed some other way, any string that identifies
+    them — an IP address, ``"can0:10"`` and so on.
+    """
+
+    FILE_SUFFIX = ".tsschema"
+
+    def __init__(self, directory: Union[str, "os.PathLike[str]"]) -> None:
+        self._directory = Path(directory).expanduser()
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def load(self, device_key: Union[int, str]) -> Union[CachedSchema, None]:
+        """Return the cached entry for ``device_key``, or ``None`` if
+        there isn't one or it can't be read."""
+        path = self._path_for(device_key)
+        try:
+            raw = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("could not read schema cache %s: %s", path, e)
+            return None
+        try:
+            entry = cbor2.loads(raw)
+            if entry.get("version") != _FORMAT_VERSION:
+                return None
+            return CachedSchema(
+                fingerprint=entry["fingerprint"],
+                root_id=entry["root_id"],
+                tree=SchemaTree.loads(entry["tree"]),
+                checked_at=entry.get("checked_at", 0.0),
+            )
+        except (
+            AttributeError,
+            KeyError,
+            ValueError,
+            cbor2.CBORDecodeError,
+            cbor2.CBORDecodeEOF,
+        ) as e:
+            logger.warning("ignoring corrupt schema cache %s: %s", path, e)
+            return None
+
+    def store(
+        self,
+        device_key: Union[int, str],
+        fingerprint: bytes,
+        tree: SchemaTree,
+        root_id: int = 0,
+        checked_at: Union[float, None] = None,
+    ) -> None:
+        """Write (or replace) the entry for ``device_key``, as checked
+        against the device at ``checked_at`` (now by default).
+
+        The file is written to a temporary name and renamed into
+        place, so a concurrent reader never sees a partial entry. A
+        cache that can't be written is logged and otherwise ignored.
+        """
+        payload = cbor2.dumps(
+            {
+                "version": _FORMAT_VERSION,
+                "fingerprint": fingerprint,
+                "root_id": root_id,
+                "tree": tree.dumps(),
+                "checked_at": time.time() if checked_at is None else checked_at,
+            }
+        )
+        path = self._path_for(device_key)
+        try:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        except OSError as e:
+            logger.warning("could not write schema cache %s: %s", path, e)
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except BaseException as e:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            if not isinstance(e, OSError):
+                raise
+            logger.warning("could not write schema cache %s: %s", path, e)
+
+    def invalidate(self, device_key: Union[int, str]) -> None:
+        try:
+            self._path_for(device_key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _path_for(self, device_key: Union[int, str]) -> Path:
+        if isinstance(device_key, int):
+            name = f"{device_key:016x}"
+        else:
+            name = re.sub(r"[^A-Za-z0-9._-]", "_", device_key)
+        return self._directory / f"{name}{self.FILE_SUFFIX}"
@@ -0,0 +1,393 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Raw report payloads in shared memory, for other processes.
+
+Passing decoded reports between processes pickles every value map. A
+:class:`ReportRing` instead carries the reassembled payloads
+themselves, each behind a fixed header — timestamp, source, EUI,
+subset ID — in a ring buffer in ``multiprocessing.shared_memory``.
+One process writes; any number read, each at its own pace, and decode
+only the reports they want::
+
+    # Ingest process: reassemble, filter, publish; no decoding
+    ring = ReportRing.create("thingset-reports", capacity=64 << 20)
+    receiver = AsyncThingSetUDPReceiver(queue_reports=False, payload_sink=ring.publish)
+
+    # Any other process
+    ring = ReportRing.attach("thingset-reports")
+    async for raw in ring.records():
+        if raw.eui in watched:
+            report = raw.decode()
+
+The writer never waits for readers. A reader that falls more than the
+ring's capacity behind skips to the newest record and counts what it
+missed in :attr:`ReportRing.lost`. Each record carries a CRC-32, which
+is how a reader tells a complete record from one being overwritten
+(or, on weakly ordered CPUs, not yet fully visible) without locks.
+"""
+
+import asyncio
+import socket
+import struct
+import time
+import zlib
+from multiprocessing import shared_memory
+from typing import Any, AsyncIterator, Iterator, List, Set, Tuple, Union
+
+from ._protocol import ThingSetProtocol, WireFormat, peek_report_header
+from .report import ThingSetReport
+
+
+_MAGIC = 0x54535242  # "TSRB"
+_VERSION = 1
+
+# Control block: magic, version, capacity, write position, records
+# written. Positions count bytes written since creation; the 8-byte
+# fields are 8-aligned so each is stored in one go.
+_CONTROL = struct.Struct("<IHxxQQQ")
+_CONTROL_SIZE = 64
+_WRITE_POS = 16
+_RECORDS = 24
+
+# Record: size, CRC-32 of the rest, timestamp, EUI, subset or data ID,
+# payload length, flags, source kind, source
+_RECORD = struct.Struct("<IIdQIIBB16s6x")
+_CRC_START = 8
+
+_HAS_EUI = 0x01
+_HAS_SUBSET = 0x02
+_HAS_DATA_ID = 0x04
+
+_SOURCE_NONE = 0
+_SOURCE_UDP = 1
+_SOURCE_CAN = 2
+
+DEFAULT_CAPACITY = 16 << 20
+
+_protocol = ThingSetProtocol(WireFormat.BINARY)
+
+# Rings created by this process, which its resource tracker must keep
+_created: Set[str] = set()
+
+
+class RawReport:
+    """A report as written to the ring; :meth:`decode` on demand."""
+
+    __slots__ = ("timestamp", "source", "eui", "subset_id", "data_id", "payload")
+
+    def __init__(
+        self,
+        timestamp: float,
+        source: Any,
+        eui: Union[int, None],
+        subset_id: Union[int, None],
+        data_id: Union[int, None],
+        payload: bytes,
+    ) -> None:
+        self.timestamp = timestamp
+        self.source = source
+        self.eui = eui
+        self.subset_id = subset_id
+        # Set for CAN single-frame reports, whose payload is a bare value
+        self.data_id = data_id
+        self.payload = payload
+
+    def decode(
+        self, protocol: Union[ThingSetProtocol, None] = None
+    ) -> Union[ThingSetReport, None]:
+        """The decoded report, or ``None`` if the payload is malformed.
+        Pass a ``protocol`` for its :attr:`~ThingSetProtocol.array_decode`."""
+        protocol = protocol or _protocol
+        if self.data_id is not None:
+            return protocol.build_single_frame_report(self.data_id, self.payload)
+        return protocol.parse_report(self.payload)
+
+    def __repr__(self) -> str:
+        return (
+            f"RawReport(source={self.source!r}, eui={self.eui!r}, "
+            f"subset_id={self.subset_id!r}, {len(self.payload)} bytes)"
+        )
+
+
+class ReportRing:
+    """A single-producer, multi-consumer ring of raw report payloads.
+
+    Make one with :meth:`create` in the writing process and
+    :meth:`attach` to it by name in each reading one.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self._shm = shm
+        self._owner = owner
+        self._buf = shm.buf
+        magic, version, capacity, write_pos, _ = _CONTROL.unpack_from(self._buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{shm.name} is not a ThingSet report ring")
+        self.capacity = capacity
+        self._data = self._buf[_CONTROL_SIZE : _CONTROL_SIZE + capacity]
+        # Readers start at the newest record
+        self._pos = write_pos
+        self._seen = self._records()
+        self.lost = 0
+        # Records publish() dropped for being too large for the ring
+        self.too_large = 0
+
+    @classmethod
+    def create(
+        cls, name: Union[str, None] = None, capacity: int = DEFAULT_CAPACITY
+    ) -> "ReportRing":
+        """A new ring of ``capacity`` bytes (rounded up to a multiple
+        of 8), to write to."""
+        capacity = -(-capacity // 8) * 8
+        if capacity < 1024:
+            raise ValueError("capacity must be at least 1024 bytes")
+        shm = shared_memory.SharedMemory(
+            name=name, create=True, size=_CONTROL_SIZE + capacity
+        )
+        _CONTROL.pack_into(shm.buf, 0, _MAGIC, _VERSION, capacity, 0, 0)
+        _created.add(shm.name)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ReportRing":
+        """The existing ring ``name``, to read from."""
+        shm = shared_memory.SharedMemory(name=name)
+        if shm.name not in _created:
+            _untrack(shm)
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def close(self) -> None:
+        """Detach; the creator also removes the ring."""
+        self._data.release()
+        self._buf = None  # type: ignore[assignment]
+        self._shm.close()
+        if self._owner:
+            _created.discard(self._shm.name)
+            self._shm.unlink()
+
+    def __enter__(self) -> "ReportRing":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    # -- Writing --------------------------------------------------------
+
+    def write(
+        self,
+        payload: bytes,
+        source: Any = None,
+        eui: Union[int, None] = None,
+        subset_id: Union[int, None] = None,
+        data_id: Union[int, None] = None,
+        timestamp: Union[float, None] = None,
+    ) -> None:
+        """Append a record. ``source`` is a UDP ``(ip, port)``, a CAN
+        ``(node, bus)`` or ``None``. Raises ``ValueError`` for a record
+        larger than a quarter of the ring."""
+        flags = 0
+        if eui is not None:
+            flags |= _HAS_EUI
+        if subset_id is not None:
+            flags |= _HAS_SUBSET
+        if data_id is not None:
+            flags |= _HAS_DATA_ID
+            subset_id = data_id
+        kind, packed_source = _pack_source(source)
+        size = _record_size(payload)
+        if size > self.capacity // 4:
+            raise ValueError(f"record of {size} bytes is too large for the ring")
+        body = (
+            _RECORD.pack(
+                size,
+                0,
+                time.time() if timestamp is None else timestamp,
+                eui or 0,
+                subset_id or 0,
+                len(payload),
+                flags,
+                kind,
+                packed_source,
+            )[_CRC_START:]
+            + payload
+            + bytes(size - _RECORD.size - len(payload))
+        )
+        record = struct.pack("<II", size, zlib.crc32(body)) + body
+
+        buf = self._buf
+        pos = struct.unpack_from("<Q", buf, _WRITE_POS)[0]
+        self._put(pos % self.capacity, record)
+        # Publish: readers only look up to the write position
+        struct.pack_into("<Q", buf, _WRITE_POS, pos + size)
+        struct.pack_into("<Q", buf, _RECORDS, self._records() + 1)
+
+    def publish(
+        self,
+        addr: Any,
+        payload: bytes,
+        timestamp: Union[float, None] = None,
+        data_id: Union[int, None] = None,
+    ) -> None:
+        """Write a reassembled report payload from ``addr``, taking its
+        EUI and subset from the header. Usable as a receiver's
+        ``payload_sink``: a record too large for the ring is dropped and
+        counted in :attr:`too_large` rather than raising."""
+        if _record_size(payload) > self.capacity // 4:
+            self.too_large += 1
+            return
+        if data_id is not None:
+            self.write(payload, addr, data_id=data_id, timestamp=timestamp)
+            return
+        header = peek_report_header(payload)
+        if header is None:
+            self.write(payload, addr, timestamp=timestamp)
+        else:
+            self.write(payload, addr, header.eui, header.subset_id, timestamp=timestamp)
+
+    # -- Reading --------------------------------------------------------
+
+    def read(self) -> Union[RawReport, None]:
+        """The next record, or ``None`` if there is none yet."""
+        capacity = self.capacity
+        write_pos = self._write_pos()
+        pos = self._pos
+        if write_pos == pos:
+            return None
+        if write_pos - pos > capacity:
+            self._resync()
+            return None
+        start = pos % capacity
+        size = struct.unpack("<I", self._get(start, 4))[0]
+        if size < _RECORD.size or size > write_pos - pos:
+            # Not a record boundary any more: overwritten under us
+            if self._write_pos() - pos > capacity:
+                self._resync()
+            return None
+        record = self._get(start, size)
+        if self._write_pos() - pos > capacity:
+            # Overwritten while copying
+            self._resync()
+            return None
+        (
+            _,
+            crc,
+            timestamp,
+            eui,
+            subset_id,
+            length,
+            flags,
+            kind,
+            source,
+        ) = _RECORD.unpack_from(record)
+        if zlib.crc32(record[_CRC_START:]) != crc:
+            # Published but not all visible yet; try again later
+            return None
+        self._pos = pos + size
+        self._seen += 1
+        return RawReport(
+            timestamp,
+            _unpack_source(kind, source),
+            eui if flags & _HAS_EUI else None,
+            subset_id if flags & _HAS_SUBSET else None,
+            subset_id if flags & _HAS_DATA_ID else None,
+            record[_RECORD.size : _RECORD.size + length],
+        )
+
+    def read_available(self, max_items: int = 1024) -> List[RawReport]:
+        """Up to ``max_items`` records, without waiting."""
+        out = []
+        while len(out) < max_items:
+            raw = self.read()
+            if raw is None:
+                break
+            out.append(raw)
+        return out
+
+    def __iter__(self) -> Iterator[RawReport]:
+        """The records available now."""
+        while True:
+            raw = self.read()
+            if raw is None:
+                return
+            yield raw
+
+    async def records(self, poll_interval: float = 0.001) -> AsyncIterator[RawReport]:
+        """Yield records as they are written, checking every
+        ``poll_interval`` seconds while there are none."""
+        while True:
+            raw = self.read()
+            if raw is None:
+                await asyncio.sleep(poll_interval)
+                continue
+            yield raw
+
+    # -- Internals ------------------------------------------------------
+
+    def _write_pos(self) -> int:
+        return struct.unpack_from("<Q", self._buf, _WRITE_POS)[0]
+
+    def _records(self) -> int:
+        return struct.unpack_from("<Q", self._buf, _RECORDS)[0]
+
+    def _resync(self) -> None:
+        """Skip to the newest record after falling a lap behind."""
+        self._pos = self._write_pos()
+        records = self._records()
+        self.lost += max(records - self._seen, 0)
+        self._seen = records
+
+    def _put(self, start: int, data: bytes) -> None:
+        first = min(len(data), self.capacity - start)
+        self._data[start : start + first] = data[:first]
+        if first < len(data):
+            self._data[: len(data) - first] = data[first:]
+
+    def _get(self, start: int, size: int) -> bytes:
+        end = start + size
+        if end <= self.capacity:
+            return bytes(self._data[start:end])
+        return bytes(self._data[start:]) + bytes(self._data[: end - self.capacity])
+
+
+def _record_size(payload: bytes) -> int:
+    """Bytes a record of ``payload`` takes in the ring, 8-aligned."""
+    return -(-(_RECORD.size + len(payload)) // 8) * 8
+
+
+def _pack_source(source: Any) -> Tuple[int, bytes]:
+    if source is None:
+        return _SOURCE_NONE, b""
+    first, second = source
+    if isinstance(first, str):
+        return _SOURCE_UDP, socket.inet_aton(first) + struct.pack("<H", second)
+    bus = second.encode()
+    if len(bus) > 15:
+        raise ValueError(f"CAN bus name too long for the ring: {second!r}")
+    return _SOURCE_CAN, bytes([first]) + bus
+
+
+def _unpack_source(kind: int, packed: bytes) -> Any:
+    if kind == _SOURCE_UDP:
+        return socket.inet_ntoa(packed[:4]), struct.unpack_from("<H", packed, 4)[0]
+    if kind == _SOURCE_CAN:
+        return packed[0], packed[1:].rstrip(b"\0").decode()
+    return None
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    """Stop this process's resource tracker from removing a segment it
+    only attached to when it exits (it tracks attached segments as
+    well as created ones)."""
+    try:
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    except Exception:
+        pass
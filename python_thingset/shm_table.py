@@ -0,0 +1,368 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Latest reported values in shared memory, for other processes.
+
+Processes that only need the current value of a few IDs shouldn't each
+run a receiver and decode every report. A :class:`ValueTable` keeps
+one row per module and one column per numeric ID of a
+:class:`~python_thingset.SchemaTree`, in ``multiprocessing.shared_memory``.
+One process feeds it from a receiver; any number read single values
+or whole rows, without decoding or locks::
+
+    # Writer
+    table = ValueTable.create(schema, "thingset-values", max_modules=64)
+    receiver.add_callback(table.apply)
+
+    # Any other process
+    table = ValueTable.attach("thingset-values")
+    voltage = table.get(eui, 0x401)
+
+Rows are keyed like :class:`~python_thingset.LiveValues`: by a report's
+EUI when it carries one, otherwise by the address the receiver yielded
+it with. A row is given to a module the first time it reports, and
+kept; reports from modules beyond ``max_modules`` are counted in
+:attr:`ValueTable.unplaced` and dropped.
+
+Each row has a sequence counter (a seqlock): the writer makes it odd
+while it updates the row and even again after, and a reader retries
+until it sees the same even count before and after its copy. Values
+are stored, and read back, as 64-bit floats — integers beyond 2**53
+lose precision — with the time each was last reported. The counter
+relies on stores becoming visible in order, as they do on x86; on
+weakly ordered CPUs a read racing a write may rarely mix old and new
+values.
+"""
+
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import (
+    Any,
+    AsyncIterable,
+    Callable,
+    Collection,
+    Dict,
+    List,
+    Mapping,
+    Tuple,
+    Union,
+)
+
+from .codec import _FLOAT_TYPES, _INTEGER_TYPES
+from .report import ThingSetReport
+from .schema import SchemaTree
+from .shm_ring import _created, _pack_source, _unpack_source, _untrack
+
+
+_MAGIC = 0x54535654  # "TSVT"
+_VERSION = 1
+
+# Control block: magic, version, rows, columns, rows in use. Rows in
+# use is 8-aligned so it is stored in one go.
+_CONTROL = struct.Struct("<IHxxIIQ")
+_CONTROL_SIZE = 64
+_ROWS_USED = 16
+
+# Directory entry per row: source kind, source
+_ENTRY = struct.Struct("<B7x16s")
+
+_SOURCE_EUI = 3
+
+# Row, in 8-byte words: sequence, last update, values, timestamps
+_ROW_HEADER = 2
+
+NUMERIC_TYPES = frozenset(["bool", *_INTEGER_TYPES, *_FLOAT_TYPES])
+
+DEFAULT_MAX_MODULES = 64
+
+# Reads retried this often before yielding the CPU to the writer
+_SPINS = 100
+DEFAULT_READ_TIMEOUT = 0.1
+
+
+class ValueTable:
+    """Latest numeric values per ``(module, ID)`` in shared memory.
+
+    Make one with :meth:`create` in the writing process and
+    :meth:`attach` to it by name in each reading one.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self._shm = shm
+        self._owner = owner
+        self._buf = shm.buf
+        magic, version, rows, columns, _ = _CONTROL.unpack_from(self._buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{shm.name} is not a ThingSet value table")
+        self.max_modules = rows
+        self.ids: Tuple[int, ...] = struct.unpack_from(
+            f"<{columns}I", self._buf, _CONTROL_SIZE
+        )
+        self._columns = {value_id: i for i, value_id in enumerate(self.ids)}
+        self._directory = _CONTROL_SIZE + _ids_size(columns)
+        rows_start = self._directory + rows * _ENTRY.size
+        self._row_words = _ROW_HEADER + 2 * columns
+        data = self._buf[rows_start : rows_start + rows * self._row_words * 8]
+        self._data = data
+        self._q = data.cast("Q")
+        self._f = data.cast("d")
+        self._slots: Dict[Any, int] = {}
+        self._scanned = 0
+        self.unplaced = 0
+
+    @classmethod
+    def create(
+        cls,
+        schema: SchemaTree,
+        name: Union[str, None] = None,
+        max_modules: int = DEFAULT_MAX_MODULES,
+        ids: Union[Collection[int], None] = None,
+    ) -> "ValueTable":
+        """A new table with a column per numeric ID in ``schema`` (only
+        those in ``ids``, if given) and room for ``max_modules`` rows.
+
+        Raises ``ValueError`` if that leaves no columns.
+        """
+        wanted = None if ids is None else set(ids)
+        columns = [
+            node.id
+            for node in schema
+            if node.type in NUMERIC_TYPES and (wanted is None or node.id in wanted)
+        ]
+        if not columns:
+            raise ValueError("no numeric IDs to make columns of")
+        if max_modules < 1:
+            raise ValueError("max_modules must be at least 1")
+        size = (
+            _CONTROL_SIZE
+            + _ids_size(len(columns))
+            + max_modules * (_ENTRY.size + (_ROW_HEADER + 2 * len(columns)) * 8)
+        )
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _CONTROL.pack_into(shm.buf, 0, _MAGIC, _VERSION, max_modules, len(columns), 0)
+        struct.pack_into(f"<{len(columns)}I", shm.buf, _CONTROL_SIZE, *columns)
+        _created.add(shm.name)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ValueTable":
+        """The existing table ``name``, to read from."""
+        shm = shared_memory.SharedMemory(name=name)
+        if shm.name not in _created:
+            _untrack(shm)
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def close(self) -> None:
+        """Detach; the creator also removes the table."""
+        self._q.release()
+        self._f.release()
+        self._data.release()
+        self._buf = None  # type: ignore[assignment]
+        self._shm.close()
+        if self._owner:
+            _created.discard(self._shm.name)
+            self._shm.unlink()
+
+    def __enter__(self) -> "ValueTable":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    # -- Writing --------------------------------------------------------
+
+    def update(
+        self,
+        source: Any,
+        values: Mapping[int, Any],
+        timestamp: Union[float, None] = None,
+    ) -> int:
+        """Store the numeric ``values`` that have a column in
+        ``source``'s row; returns how many were stored. ``source`` is
+        an EUI, a UDP ``(ip, port)`` or a CAN ``(node, bus)``."""
+        slot = self._slots.get(source)
+        if slot is None:
+            slot = self._add_row(source)
+            if slot is None:
+                self.unplaced += 1
+                return 0
+        if timestamp is None:
+            timestamp = time.time()
+        columns = self._columns
+        q = self._q
+        f = self._f
+        base = slot * self._row_words
+        first = base + _ROW_HEADER
+        stamps = first + len(columns)
+        seq = q[base]
+        stored = 0
+        q[base] = seq + 1
+        try:
+            for value_id, value in values.items():
+                column = columns.get(value_id)
+                if column is None or type(value) not in (float, int, bool):
+                    continue
+                f[first + column] = value
+                f[stamps + column] = timestamp
+                stored += 1
+            f[base + 1] = timestamp
+        finally:
+            q[base] = seq + 2
+        return stored
+
+    def apply(self, addr: Any, report: ThingSetReport) -> None:
+        """Store a report from ``addr``. Usable as a receiver callback."""
+        self.update(report.eui if report.eui is not None else addr, report.values)
+
+    async def follow(self, reports: AsyncIterable[Tuple[Any, ThingSetReport]]) -> None:
+        """Apply reports from a receiver (or any async iterable of
+        ``(addr, report)``) until it ends."""
+        async for addr, report in reports:
+            self.apply(addr, report)
+
+    # -- Reading --------------------------------------------------------
+
+    def get(self, source: Any, value_id: int, default: Any = None) -> Any:
+        """The latest value of ``value_id`` from ``source``, or
+        ``default`` if it has never been reported."""
+        found = self.read(source, value_id)
+        return default if found is None else found[0]
+
+    def read(self, source: Any, value_id: int) -> Union[Tuple[float, float], None]:
+        """``(value, timestamp)`` of ``value_id`` from ``source``, or
+        ``None`` if it has never been reported.
+
+        Raises ``KeyError`` if the table has no column for ``value_id``.
+        """
+        column = self._columns[value_id]
+        slot = self._slot(source)
+        if slot is None:
+            return None
+        base = slot * self._row_words
+        value_at = base + _ROW_HEADER + column
+        stamp_at = value_at + len(self.ids)
+        q = self._q
+        f = self._f
+        seq = q[base]
+        value = f[value_at]
+        stamp = f[stamp_at]
+        if seq & 1 or q[base] != seq:
+            # Raced a write; retry properly
+            value, stamp = self._consistent(base, lambda f: (f[value_at], f[stamp_at]))
+        return None if stamp == 0.0 else (value, stamp)
+
+    def snapshot(self, source: Any) -> Dict[int, Tuple[float, float]]:
+        """``{id: (value, timestamp)}`` for every value ``source`` has
+        reported, all as of one moment."""
+        slot = self._slot(source)
+        if slot is None:
+            return {}
+        base = slot * self._row_words
+        start = base + _ROW_HEADER
+        stop = base + self._row_words
+        words = self._consistent(base, lambda f: f[start:stop].tolist())
+        count = len(self.ids)
+        return {
+            value_id: (words[i], words[count + i])
+            for i, value_id in enumerate(self.ids)
+            if words[count + i] != 0.0
+        }
+
+    def updated(self, source: Any) -> Union[float, None]:
+        """When ``source``'s row was last written, or ``None``."""
+        slot = self._slot(source)
+        if slot is None:
+            return None
+        stamp = self._f[slot * self._row_words + 1]
+        return None if stamp == 0.0 else stamp
+
+    def sources(self) -> List[Any]:
+        """The sources with a row, in the order they first reported."""
+        self._scan()
+        by_slot = sorted((slot, source) for source, slot in self._slots.items())
+        return [source for _, source in by_slot]
+
+    # -- Internals ------------------------------------------------------
+
+    def _consistent(
+        self,
+        base: int,
+        copy: Callable[[memoryview], Any],
+        timeout: float = DEFAULT_READ_TIMEOUT,
+    ) -> Any:
+        """``copy(values)`` made while the writer left the row alone."""
+        q = self._q
+        f = self._f
+        deadline = None
+        while True:
+            for _ in range(_SPINS):
+                seq = q[base]
+                if not seq & 1:
+                    out = copy(f)
+                    if q[base] == seq:
+                        return out
+            # The writer may be descheduled mid-update; let it finish
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + timeout
+            elif now > deadline:
+                raise TimeoutError("ThingSet value table row stuck mid-update")
+            time.sleep(0)
+
+    def _rows_used(self) -> int:
+        return struct.unpack_from("<Q", self._buf, _ROWS_USED)[0]
+
+    def _slot(self, source: Any) -> Union[int, None]:
+        slot = self._slots.get(source)
+        if slot is None:
+            self._scan()
+            slot = self._slots.get(source)
+        return slot
+
+    def _scan(self) -> None:
+        """Learn the rows the writer has added since the last scan."""
+        used = self._rows_used()
+        for slot in range(self._scanned, used):
+            offset = self._directory + slot * _ENTRY.size
+            kind, packed = _ENTRY.unpack_from(self._buf, offset)
+            self._slots[_unpack_key(kind, packed)] = slot
+        self._scanned = used
+
+    def _add_row(self, source: Any) -> Union[int, None]:
+        self._scan()
+        slot = self._slots.get(source)
+        if slot is not None:
+            return slot
+        slot = self._scanned
+        if slot >= self.max_modules:
+            return None
+        kind, packed = _pack_key(source)
+        _ENTRY.pack_into(self._buf, self._directory + slot * _ENTRY.size, kind, packed)
+        # Publish: readers only look up to the rows in use
+        struct.pack_into("<Q", self._buf, _ROWS_USED, slot + 1)
+        self._slots[source] = slot
+        self._scanned = slot + 1
+        return slot
+
+
+def _ids_size(columns: int) -> int:
+    return -(-columns * 4 // 8) * 8
+
+
+def _pack_key(source: Any) -> Tuple[int, bytes]:
+    if isinstance(source, int):
+        return _SOURCE_EUI, struct.pack("<Q", source)
+    return _pack_source(source)
+
+
+def _unpack_key(kind: int, packed: bytes) -> Any:
+    if kind == _SOURCE_EUI:
+        return struct.unpack_from("<Q", packed)[0]
+    return _unpack_source(kind, packed)
@@ -0,0 +1,146 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Classic BPF socket filters for the UDP report receiver (Linux).
+
+A filter attached with ``SO_ATTACH_FILTER`` runs in the kernel on
+every datagram before it is queued on the socket; datagrams it refuses
+never wake the event loop. For a UDP socket the program sees the
+packet from the UDP header on — the framing byte is at offset 8 — and
+reaches the IPv4 header through the ``SKF_NET_OFF`` window.
+"""
+
+import ctypes
+import socket
+import struct
+import sys
+from typing import Any, Collection, List, Tuple, Union
+
+
+# From <linux/filter.h>
+_BPF_LD_W_ABS = 0x20
+_BPF_LD_H_ABS = 0x28
+_BPF_LD_B_ABS = 0x30
+_BPF_ALU_AND_K = 0x54
+_BPF_JMP_JEQ_K = 0x15
+_BPF_RET_K = 0x06
+_SKF_NET_OFF = -0x100000
+_SO_ATTACH_FILTER = getattr(socket, "SO_ATTACH_FILTER", 26)
+
+_IP_SOURCE = _SKF_NET_OFF + 12
+_UDP_SOURCE_PORT = 0
+_FRAMING_BYTE = 8
+
+_ACCEPT = 0xFFFFFFFF
+_REJECT = 0
+
+# Jump offsets are 8 bits wide
+_MAX_JUMP = 255
+
+Instruction = Tuple[int, int, int, int]
+
+# UDP framing message types, by name (see async_udp.py)
+MESSAGE_TYPES = {"first": 0x00, "consecutive": 0x10, "last": 0x20, "single": 0x30}
+
+
+def supported() -> bool:
+    return sys.platform.startswith("linux")
+
+
+def build_program(
+    sources: Union[Collection[Any], None] = None,
+    message_types: Union[Collection[str], None] = None,
+) -> List[Instruction]:
+    """A program that accepts datagrams from ``sources`` — IPv4
+    addresses, or ``(ip, port)`` pairs — whose framing byte is one of
+    ``message_types``. Either left as ``None`` accepts everything.
+
+    Raises ``ValueError`` for an address that isn't dotted-quad IPv4,
+    an unknown message type, or too many sources to jump across.
+    """
+    ips, pairs = _split_sources(sources)
+    types = message_type_values(message_types)
+
+    program: List[Instruction] = []
+    if sources is not None:
+        # Each test jumps to the end of the block on a match and falls
+        # through otherwise; the block ends by rejecting.
+        block: List[Instruction] = []
+        for ip in ips:
+            block.append((_BPF_LD_W_ABS, 0, 0, _IP_SOURCE & 0xFFFFFFFF))
+            block.append((_BPF_JMP_JEQ_K, 0, 0, ip))
+        for ip, port in pairs:
+            block.append((_BPF_LD_W_ABS, 0, 0, _IP_SOURCE & 0xFFFFFFFF))
+            block.append((_BPF_JMP_JEQ_K, 0, 2, ip))
+            block.append((_BPF_LD_H_ABS, 0, 0, _UDP_SOURCE_PORT))
+            block.append((_BPF_JMP_JEQ_K, 0, 0, port))
+        program += _jump_past_reject(block)
+    if message_types is not None:
+        block = [
+            (_BPF_LD_B_ABS, 0, 0, _FRAMING_BYTE),
+            (_BPF_ALU_AND_K, 0, 0, 0xF0),
+        ]
+        block += [(_BPF_JMP_JEQ_K, 0, 0, value) for value in types]
+        program += _jump_past_reject(block)
+    program.append((_BPF_RET_K, 0, 0, _ACCEPT))
+    return program
+
+
+def attach(sock: socket.socket, program: List[Instruction]) -> None:
+    """Attach ``program`` to ``sock``; raises ``OSError`` if the kernel
+    refuses it."""
+    code = b"".join(struct.pack("HBBI", *instruction) for instruction in program)
+    buffer = ctypes.create_string_buffer(code)
+    fprog = struct.pack("HL", len(program), ctypes.addressof(buffer))
+    sock.setsockopt(socket.SOL_SOCKET, _SO_ATTACH_FILTER, fprog)
+
+
+def _jump_past_reject(block: List[Instruction]) -> List[Instruction]:
+    """Point each match in ``block`` past a reject appended to it."""
+    end = len(block)
+    out = []
+    for index, (code, jt, jf, k) in enumerate(block):
+        if code == _BPF_JMP_JEQ_K and jf == 0:
+            # A final match: skip what is left of the block and the reject
+            jt = end - index
+            if jt > _MAX_JUMP:
+                raise ValueError("too many sources for a socket filter")
+        out.append((code, jt, jf, k))
+    out.append((_BPF_RET_K, 0, 0, _REJECT))
+    return out
+
+
+def _split_sources(
+    sources: Union[Collection[Any], None],
+) -> Tuple[List[int], List[Tuple[int, int]]]:
+    ips: List[int] = []
+    pairs: List[Tuple[int, int]] = []
+    for source in sources or ():
+        if isinstance(source, tuple):
+            ip, port = source
+            pairs.append((_ipv4(ip), int(port)))
+        else:
+            ips.append(_ipv4(source))
+    return ips, pairs
+
+
+def _ipv4(address: str) -> int:
+    try:
+        return struct.unpack("!I", socket.inet_pton(socket.AF_INET, address))[0]
+    except (OSError, TypeError):
+        raise ValueError(f"not an IPv4 address: {address!r}") from None
+
+
+def message_type_values(message_types: Union[Collection[str], None]) -> List[int]:
+    """The framing type nibbles of ``message_types``, by name."""
+    if message_types is None:
+        return []
+    try:
+        return sorted({MESSAGE_TYPES[name] for name in message_types})
+    except KeyError as e:
+        raise ValueError(
+            f"unknown message type {e.args[0]!r}; expected one of "
+            + ", ".join(MESSAGE_TYPES)
+        ) from None
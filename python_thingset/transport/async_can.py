@@ -27,12 +27,23 @@ yielding ``((source_addr, bus_name), ThingSetReport)``.
 
 import asyncio
 import logging
-from typing import Dict, Tuple, Union
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Collection, Dict, List, Tuple, Union
 
 import can
 
-from .._protocol import ThingSetProtocol, WireFormat
+from .._protocol import ThingSetProtocol, WireFormat, peek_report_header
+from ..decode_offload import DEFAULT_DECODE_THRESHOLD, DecodeOffload
+from ..receive_filter import ReceiveFilter
 from ..report import ThingSetReport
+from ..report_callbacks import (
+    DEFAULT_BUDGET,
+    Callback,
+    PayloadSink,
+    ReportCallback,
+    ReportCallbacks,
+)
+from ..report_queue import DropWarning, OverflowPolicy, ReportQueue
 
 
 logger = logging.getLogger(__name__)
@@ -54,6 +65,8 @@ _TYPE_NETWORK = 0x3 << _TYPE_POS
 # Source addr is bits 0-7
 _SOURCE_MASK = 0xFF
 
+_CAN_EFF_MASK = 0x1FFFFFFF
+
 # Single-frame report layout: data ID at bits 8-23
 _DATA_ID_POS = 8
 _DATA_ID_MASK = 0xFFFF << _DATA_ID_POS
@@ -105,6 +118,27 @@ class AsyncThingSetCANReportReceiver:
 
     Use as an async context manager. Iterate with
     ``async for ((source_addr, bus_name), report) in receiver``.
+    ``array_decode``, ``queue_size``, ``overflow``, ``queue_reports``
+    and callbacks are as for :class:`AsyncThingSetUDPReceiver`.
+
+    ``sources`` (node addresses), ``euis`` and ``subsets`` filter
+    reports as for :class:`AsyncThingSetUDPReceiver`;
+    ``single_frame=False`` or ``multi_frame=False`` leaves out that
+    kind of report. As single-frame reports carry neither EUI nor
+    subset, ``euis`` or ``subsets`` leave them out too. An empty
+    ``sources`` accepts nothing. Sources and kinds are matched by the
+    kernel's ``can_filters``, and reports stopped there do not count
+    towards :attr:`filtered`; both are checked again as frames arrive,
+    for interfaces that ignore the filters and for replayed frames.
+
+    ``decode_executor`` and ``decode_threshold`` move the decoding of
+    large multi-frame reports off the event loop, as for
+    :class:`AsyncThingSetUDPReceiver`.
+
+    ``payload_sink`` is as for :class:`AsyncThingSetUDPReceiver`, with
+    the timestamp of the report's last frame (the kernel's receive
+    time on SocketCAN). Single-frame reports are passed as
+    ``payload_sink(addr, value, timestamp, data_id)``.
     """
 
     DEFAULT_QUEUE_SIZE = 1024
@@ -115,15 +149,40 @@ class AsyncThingSetCANReportReceiver:
         interface: str = "socketcan",
         fd: bool = True,
         queue_size: int = DEFAULT_QUEUE_SIZE,
+        array_decode: Union[str, None] = None,
+        overflow: Union[OverflowPolicy, str] = OverflowPolicy.DROP_NEWEST,
+        queue_reports: bool = True,
+        sources: Union[Collection[int], None] = None,
+        euis: Union[Collection[int], None] = None,
+        subsets: Union[Collection[int], None] = None,
+        single_frame: bool = True,
+        multi_frame: bool = True,
+        decode_executor: Union[Executor, None] = None,
+        decode_threshold: int = DEFAULT_DECODE_THRESHOLD,
+        payload_sink: Union[PayloadSink, None] = None,
     ) -> None:
         self._bus_name = bus
         self._interface = interface
         self._fd = fd
         self._queue_size = queue_size
-        self._protocol = ThingSetProtocol(WireFormat.BINARY)
-        self._queue: "asyncio.Queue[Tuple[Tuple[int, str], ThingSetReport]]" = (
-            asyncio.Queue(maxsize=queue_size)
+        self._protocol = ThingSetProtocol(
+            WireFormat.BINARY, array_decode=array_decode
         )
+        self._queue = ReportQueue(queue_size, overflow)
+        self._drop_warning = DropWarning("CAN report")
+        self._queue_reports = queue_reports
+        self._callbacks = ReportCallbacks()
+        self._payload_sink = payload_sink
+        self._filter = ReceiveFilter(sources, euis, subsets)
+        # A single-frame report has no EUI or subset to match
+        self._single_frame = single_frame and not self._filter.headers
+        self._multi_frame = multi_frame
+        self._can_filters = self._build_can_filters()
+        self._offload: Union[DecodeOffload, None] = None
+        if decode_executor is not None:
+            self._offload = DecodeOffload(
+                self._protocol, decode_executor, self._enqueue, decode_threshold
+            )
         self._buffers: Dict[int, _ReassemblyBuffer] = {}
         self._can_bus: Union[can.BusABC, None] = None
         self._reader: Union[can.AsyncBufferedReader, None] = None
@@ -134,28 +193,11 @@ class AsyncThingSetCANReportReceiver:
         if self._can_bus is not None:
             return
         loop = asyncio.get_running_loop()
-        # Hardware-level filter: only receive frames whose type field
-        # is single-frame (0x2) or multi-frame (0x1) report. Two
-        # filters because the bitmask doesn't allow OR'ing of two
-        # disjoint values — but the kernel accepts a list and ORs
-        # the matches.
-        filters = [
-            {
-                "can_id": _TYPE_SINGLE_FRAME_REPORT,
-                "can_mask": _TYPE_MASK,
-                "extended": True,
-            },
-            {
-                "can_id": _TYPE_MULTI_FRAME_REPORT,
-                "can_mask": _TYPE_MASK,
-                "extended": True,
-            },
-        ]
         self._can_bus = can.Bus(
             channel=self._bus_name,
             interface=self._interface,
             fd=self._fd,
-            can_filters=filters,
+            can_filters=self._can_filters,
         )
         self._reader = can.AsyncBufferedReader()
         self._notifier = can.Notifier(self._can_bus, [self._reader], loop=loop)
@@ -164,6 +206,39 @@ class AsyncThingSetCANReportReceiver:
             name=f"thingset-can-rx-{self._bus_name}",
         )
 
+    def _build_can_filters(self) -> List[Dict[str, Any]]:
+        """Hardware-level filters: only report frames, of the kinds and
+        from the sources wanted. One filter per kind and source,
+        because a bitmask can't OR disjoint values — but the kernel
+        accepts a list and ORs the matches."""
+        types = []
+        if self._single_frame:
+            types.append(_TYPE_SINGLE_FRAME_REPORT)
+        if self._multi_frame:
+            types.append(_TYPE_MULTI_FRAME_REPORT)
+        if not types:
+            raise ValueError("the filters leave no kind of report to receive")
+        sources = self._filter.sources
+        if sources is None:
+            return [
+                {"can_id": t, "can_mask": _TYPE_MASK, "extended": True}
+                for t in types
+            ]
+        if not sources:
+            # Accept nothing. An empty filter list would let every frame
+            # through; this one only matches extended ID 0, a request
+            # frame, which isn't a report.
+            return [{"can_id": 0, "can_mask": _CAN_EFF_MASK, "extended": True}]
+        return [
+            {
+                "can_id": t | source,
+                "can_mask": _TYPE_MASK | _SOURCE_MASK,
+                "extended": True,
+            }
+            for t in types
+            for source in sorted(sources)
+        ]
+
     async def close(self) -> None:
         if self._task is not None:
             self._task.cancel()
@@ -185,6 +260,8 @@ class AsyncThingSetCANReportReceiver:
                 pass
             self._can_bus = None
         self._reader = None
+        if self._offload is not None:
+            self._offload.close()
 
     async def _consume_frames(self) -> None:
         assert self._reader is not None
@@ -205,20 +282,55 @@ class AsyncThingSetCANReportReceiver:
         msg_type = can_id & _TYPE_MASK
         source = can_id & _SOURCE_MASK
 
+        if msg_type == _TYPE_SINGLE_FRAME_REPORT:
+            wanted = self._single_frame
+            starts = True
+        elif msg_type == _TYPE_MULTI_FRAME_REPORT:
+            wanted = self._multi_frame
+            starts = can_id & _MULTIFRAME_TYPE_MASK in (_MFT_FIRST, _MFT_SINGLE)
+        else:
+            return
+
+        # Also enforced by the bus's can_filters, but not every interface
+        # honours them, and replayed frames don't pass through them
+        report_filter = self._filter
+        if not wanted or (
+            report_filter.sources is not None
+            and not report_filter.accepts_source(source)
+        ):
+            if starts:
+                report_filter.rejected += 1
+            return
+
         if msg_type == _TYPE_SINGLE_FRAME_REPORT:
             data_id = (can_id & _DATA_ID_MASK) >> _DATA_ID_POS
             payload = bytes(msg.data[: msg.dlc])
+            if self._payload_sink is not None:
+                self._payload_sink(
+                    (source, self._bus_name), payload, msg.timestamp, data_id
+                )
+                if not self._wants_reports():
+                    return
             report = self._protocol.build_single_frame_report(data_id, payload)
-            if report is not None:
+            if report is None:
+                return
+            if self._offload is not None:
+                # Behind any multi-frame report from source still decoding
+                self._offload.ready(source, report)
+            else:
                 self._enqueue(source, report)
             return
 
-        if msg_type == _TYPE_MULTI_FRAME_REPORT:
-            self._handle_multi_frame(source, can_id, bytes(msg.data[: msg.dlc]))
-            return
+        self._handle_multi_frame(
+            source, can_id, bytes(msg.data[: msg.dlc]), msg.timestamp
+        )
+
+    def _wants_reports(self) -> bool:
+        """Whether anything consumes decoded reports."""
+        return self._queue_reports or bool(self._callbacks)
 
     def _handle_multi_frame(
-        self, source: int, can_id: int, data: bytes
+        self, source: int, can_id: int, data: bytes, timestamp: float = 0.0
     ) -> None:
         mft = can_id & _MULTIFRAME_TYPE_MASK
         seq = (can_id & _SEQ_MASK) >> _SEQ_POS
@@ -240,6 +352,9 @@ class AsyncThingSetCANReportReceiver:
 
         if _is_first(mft):
             buf.reset()
+            if self._filter.rejects_start(data):
+                # Not started: the rest of its frames are dropped
+                return
             buf.started = True
             buf.message_number = msg_num
         elif not buf.started or buf.message_number != msg_num:
@@ -276,18 +391,61 @@ class AsyncThingSetCANReportReceiver:
         if _is_last(mft):
             payload = bytes(buf.data)
             buf.reset()
-            report = self._protocol.parse_report(payload)
+            report_filter = self._filter
+            accept = report_filter.accepts_header if report_filter.headers else None
+            if self._payload_sink is not None:
+                if accept is not None:
+                    header = peek_report_header(payload)
+                    if header is None or not accept(header.eui, header.subset_id):
+                        return
+                    accept = None
+                self._payload_sink((source, self._bus_name), payload, timestamp)
+                if not self._wants_reports():
+                    return
+            if self._offload is not None:
+                self._offload.decode(source, payload, accept)
+                return
+            report = self._protocol.parse_report(payload, accept)
             if report is not None:
                 self._enqueue(source, report)
 
     def _enqueue(self, source: int, report: ThingSetReport) -> None:
-        try:
-            self._queue.put_nowait(((source, self._bus_name), report))
-        except asyncio.QueueFull:
-            logger.warning(
-                "ThingSet CAN report queue full; dropping report from 0x%02X",
-                source,
-            )
+        addr = (source, self._bus_name)
+        if self._callbacks:
+            self._callbacks.dispatch(addr, report)
+        if not self._queue_reports:
+            return
+        if not self._queue.put((addr, report)):
+            self._drop_warning(self._queue)
+
+    def add_callback(
+        self, callback: Callback, budget: float = DEFAULT_BUDGET
+    ) -> ReportCallback:
+        """As :meth:`AsyncThingSetUDPReceiver.add_callback`."""
+        return self._callbacks.add(callback, budget)
+
+    def remove_callback(self, entry: ReportCallback) -> None:
+        self._callbacks.remove(entry)
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        """As :attr:`AsyncThingSetUDPReceiver.counters`."""
+        return self._queue.counters
+
+    @property
+    def filtered(self) -> int:
+        """Reports turned away so far, once they got past the kernel's
+        ``can_filters``: by their source, their kind, or (multi-frame
+        reports) their EUI or subset."""
+        return self._filter.rejected
+
+    def batches(
+        self, max_items: int = 256, max_latency: float = 0.1
+    ) -> AsyncIterator[List[Tuple[Any, ThingSetReport]]]:
+        """Iterate over lists of up to ``max_items`` reports, waiting at
+        most ``max_latency`` seconds after the first for a list to fill.
+        See :meth:`ReportQueue.batches`."""
+        return self._queue.batches(max_items, max_latency)
 
     def __aiter__(self) -> "AsyncThingSetCANReportReceiver":
         return self
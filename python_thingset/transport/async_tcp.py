@@ -16,19 +16,53 @@ response with :func:`asyncio.wait_for`.
 ThingSet has no wire-level correlation ID, so the lock keeps one
 request in flight at a time. That still releases the event loop
 during I/O — the whole point of running async.
+
+If the peer drops the connection, the reader task notices (EOF or a
+socket error) and RPCs fail fast with :class:`ConnectionError` instead
+of each waiting out the full timeout. With ``reconnect=True`` the
+client re-dials in the background with exponential backoff. Reads
+(GET and FETCH) are idempotent, so any that were in flight or issued
+during the outage are held and replayed once the link is back. Writes
+(UPDATE, EXEC, ...) still fail fast, because the client can't tell
+whether the device applied them before the link went down.
 """
 
 import asyncio
-from typing import Union
+import logging
+from enum import Enum
+from typing import Callable, Union
 
 from .._protocol import ParsedResponse, ThingSetProtocol, WireFormat
 from ..async_client import AsyncThingSetClient
+from ..response import ThingSetRequest
+
+
+logger = logging.getLogger(__name__)
+
+
+# Request types that are safe to send twice.
+_IDEMPOTENT_REQUESTS = frozenset({ThingSetRequest.GET, ThingSetRequest.FETCH})
+
+# Pushed onto the response queue by the reader task so that an RPC
+# blocked on the queue wakes up immediately when the link drops.
+_CONNECTION_LOST = object()
+
+
+class ConnectionState(Enum):
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    RECONNECTING = "reconnecting"
+    CLOSED = "closed"
 
 
 class AsyncThingSetTCP(AsyncThingSetClient):
     DEFAULT_PORT = 9001
     RECV_BUFSIZE = 4096
     DEFAULT_TIMEOUT_S = 0.5
+    DEFAULT_RECONNECT_INITIAL_DELAY_S = 0.1
+    DEFAULT_RECONNECT_MAX_DELAY_S = 10.0
+    DEFAULT_REPLAY_TIMEOUT_S = 5.0
 
     def __init__(
         self,
@@ -37,6 +71,11 @@ class AsyncThingSetTCP(AsyncThingSetClient):
         timeout: float = DEFAULT_TIMEOUT_S,
         *,
         target_eui: Union[int, None] = None,
+        reconnect: bool = False,
+        reconnect_initial_delay: float = DEFAULT_RECONNECT_INITIAL_DELAY_S,
+        reconnect_max_delay: float = DEFAULT_RECONNECT_MAX_DELAY_S,
+        replay_timeout: float = DEFAULT_REPLAY_TIMEOUT_S,
+        on_state_change: Union[Callable[[ConnectionState], None], None] = None,
     ):
         """Connect to a ThingSet device over TCP with asyncio.
 
@@ -45,41 +84,70 @@ class AsyncThingSetTCP(AsyncThingSetClient):
         IP↔CAN gateway such as an HMCU) routes it to the CAN-side
         module with that EUI-64. Responses come back unwrapped; the
         caller API is unchanged.
+
+        With ``reconnect=True`` a dropped connection is re-dialled in
+        the background, waiting ``reconnect_initial_delay`` seconds
+        after the first failed attempt and doubling up to
+        ``reconnect_max_delay``. Reads issued while the link is down
+        wait up to ``replay_timeout`` seconds for it to come back
+        (then return a status-less response, like a timeout); writes
+        raise :class:`ConnectionError` straight away.
+
+        ``on_state_change`` is called with the new
+        :class:`ConnectionState` on every transition.
         """
         self._protocol = ThingSetProtocol(WireFormat.BINARY)
         self._address = address
         self._port = port
         self._timeout = timeout
         self._target_eui = target_eui
+        self._reconnect = reconnect
+        self._reconnect_initial_delay = reconnect_initial_delay
+        self._reconnect_max_delay = reconnect_max_delay
+        self._replay_timeout = replay_timeout
+        self._on_state_change = on_state_change
+        self._state = ConnectionState.DISCONNECTED
         self._reader: Union[asyncio.StreamReader, None] = None
         self._writer: Union[asyncio.StreamWriter, None] = None
-        self._rx_queue: "asyncio.Queue[ParsedResponse]" = asyncio.Queue()
+        self._rx_queue: "asyncio.Queue[Union[ParsedResponse, object]]" = (
+            asyncio.Queue()
+        )
         self._reader_task: Union[asyncio.Task, None] = None
+        self._reconnect_task: Union[asyncio.Task, None] = None
+        self._connected = asyncio.Event()
         self._lock = asyncio.Lock()
+        self._started = False
         self._closed = False
 
+    @property
+    def state(self) -> ConnectionState:
+        return self._state
+
     async def connect(self) -> None:
         if self._writer is not None:
             return
-        self._reader, self._writer = await asyncio.open_connection(
-            self._address, self._port
-        )
-        self._reader_task = asyncio.create_task(
-            self._reader_loop(), name=f"thingset-rx-{self._address}"
-        )
+        self._set_state(ConnectionState.CONNECTING)
+        try:
+            await self._open()
+        except OSError:
+            self._set_state(ConnectionState.DISCONNECTED)
+            raise
+        self._started = True
 
     async def close(self) -> None:
         if self._closed:
             return
         self._closed = True
 
-        task, self._reader_task = self._reader_task, None
-        if task is not None:
-            task.cancel()
-            try:
-                await task
-            except (asyncio.CancelledError, Exception):
-                pass
+        for task in (self._reconnect_task, self._reader_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._reconnect_task = None
+        self._reader_task = None
 
         writer, self._writer = self._writer, None
         if writer is not None:
@@ -89,14 +157,28 @@ class AsyncThingSetTCP(AsyncThingSetClient):
             except Exception:
                 pass
 
-    async def _reader_loop(self) -> None:
+        # Wake any RPC parked on the link or the response queue; both
+        # paths re-check _closed.
+        self._connected.set()
+        self._rx_queue.put_nowait(_CONNECTION_LOST)
+        self._set_state(ConnectionState.CLOSED)
+
+    async def _open(self) -> None:
+        reader, writer = await asyncio.open_connection(self._address, self._port)
+        self._reader, self._writer = reader, writer
+        self._reader_task = asyncio.create_task(
+            self._reader_loop(reader), name=f"thingset-rx-{self._address}"
+        )
+        self._connected.set()
+        self._set_state(ConnectionState.CONNECTED)
+
+    async def _reader_loop(self, reader: asyncio.StreamReader) -> None:
         buffer = bytearray()
-        assert self._reader is not None
         try:
             while True:
-                chunk = await self._reader.read(self.RECV_BUFSIZE)
+                chunk = await reader.read(self.RECV_BUFSIZE)
                 if not chunk:
-                    return  # peer closed the connection
+                    break  # peer closed the connection
                 buffer.extend(chunk)
                 while True:
                     resp, consumed = self._protocol.try_consume(bytes(buffer))
@@ -106,39 +188,133 @@ class AsyncThingSetTCP(AsyncThingSetClient):
                     await self._rx_queue.put(resp)
         except asyncio.CancelledError:
             raise
-        except Exception:
-            # Connection broken; subsequent _rpc calls will time out.
+        except Exception as e:
+            logger.debug(
+                "ThingSet TCP reader for %s failed: %s", self._address, e
+            )
+        self._connection_lost(reader)
+
+    def _connection_lost(self, reader: Union[asyncio.StreamReader, None]) -> None:
+        """Tear down the current link and, if enabled, start re-dialling.
+
+        ``reader`` identifies the connection the caller saw fail, so a
+        late EOF from a previous connection can't take down its
+        replacement.
+        """
+        if self._closed or reader is not self._reader:
+            return
+        logger.warning("ThingSet TCP connection to %s lost", self._address)
+        self._connected.clear()
+        self._reader = None
+        self._reader_task = None
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+        self._rx_queue.put_nowait(_CONNECTION_LOST)
+        if self._reconnect:
+            self._set_state(ConnectionState.RECONNECTING)
+            self._reconnect_task = asyncio.create_task(
+                self._reconnect_loop(), name=f"thingset-reconnect-{self._address}"
+            )
+        else:
+            self._set_state(ConnectionState.DISCONNECTED)
+
+    async def _reconnect_loop(self) -> None:
+        delay = self._reconnect_initial_delay
+        try:
+            while not self._closed:
+                try:
+                    await self._open()
+                    logger.info("ThingSet TCP reconnected to %s", self._address)
+                    return
+                except OSError as e:
+                    logger.debug(
+                        "ThingSet TCP reconnect to %s failed (%s); retrying in %.2f s",
+                        self._address, e, delay,
+                    )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self._reconnect_max_delay)
+        finally:
+            if self._reconnect_task is asyncio.current_task():
+                self._reconnect_task = None
+
+    def _set_state(self, state: ConnectionState) -> None:
+        if state is self._state:
+            return
+        self._state = state
+        if self._on_state_change is None:
             return
+        try:
+            self._on_state_change(state)
+        except Exception:
+            logger.exception("ThingSet TCP state-change callback raised")
 
     async def _rpc(
         self, request: bytes, node_id: Union[int, None]
     ) -> Union[ParsedResponse, None]:
-        if self._closed or self._writer is None:
+        if self._closed or not self._started:
             raise RuntimeError(
                 "AsyncThingSetTCP is not connected; use `async with` "
                 "or call connect() first"
             )
+        replayable = (
+            self._reconnect
+            and len(request) > 0
+            and request[0] in _IDEMPOTENT_REQUESTS
+        )
         if self._target_eui is not None:
             request = self._protocol.wrap_forward(request, self._target_eui)
         async with self._lock:
-            # Drain responses left over from a prior call that timed
-            # out and whose reply arrived late — without correlation
-            # IDs we can't tell them from fresh ones.
-            while not self._rx_queue.empty():
-                try:
-                    self._rx_queue.get_nowait()
-                except asyncio.QueueEmpty:
-                    break
+            while True:
+                if self._closed:
+                    raise ConnectionError("AsyncThingSetTCP was closed")
+                if not self._connected.is_set():
+                    if not replayable:
+                        raise ConnectionError(
+                            f"ThingSet TCP connection to {self._address} is down"
+                        )
+                    try:
+                        await asyncio.wait_for(
+                            self._connected.wait(), timeout=self._replay_timeout
+                        )
+                    except asyncio.TimeoutError:
+                        return None
+                    continue
 
-            self._writer.write(request)
-            await self._writer.drain()
+                # Drain responses left over from a prior call that timed
+                # out and whose reply arrived late — without correlation
+                # IDs we can't tell them from fresh ones.
+                while not self._rx_queue.empty():
+                    try:
+                        self._rx_queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
 
-            try:
-                return await asyncio.wait_for(
-                    self._rx_queue.get(), timeout=self._timeout
+                reader, writer = self._reader, self._writer
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                except (ConnectionError, OSError):
+                    self._connection_lost(reader)
+                    continue
+
+                try:
+                    resp = await asyncio.wait_for(
+                        self._rx_queue.get(), timeout=self._timeout
+                    )
+                except asyncio.TimeoutError:
+                    return None
+                if resp is not _CONNECTION_LOST:
+                    return resp
+                if not replayable or self._closed:
+                    raise ConnectionError(
+                        f"ThingSet TCP connection to {self._address} lost "
+                        "while a request was in flight"
+                    )
+                logger.info(
+                    "ThingSet TCP replaying read to %s after reconnect",
+                    self._address,
                 )
-            except asyncio.TimeoutError:
-                return None
 
     async def __aenter__(self) -> "AsyncThingSetTCP":
         await self.connect()
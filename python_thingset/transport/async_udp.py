@@ -29,11 +29,35 @@ not wake up a pending ``__anext__``.
 
 import asyncio
 import socket
-from typing import Dict, Tuple, Union
-
-from .._protocol import ThingSetProtocol, WireFormat
+import struct
+import sys
+import time
+from concurrent.futures import Executor
+from typing import (
+    Any,
+    AsyncIterator,
+    Collection,
+    Dict,
+    FrozenSet,
+    List,
+    Tuple,
+    Union,
+)
+
+from .._protocol import ThingSetProtocol, WireFormat, peek_report_header
+from ..decode_offload import DEFAULT_DECODE_THRESHOLD, DecodeOffload
 from ..log import get_logger
+from ..receive_filter import ReceiveFilter
 from ..report import ThingSetReport
+from ..report_callbacks import (
+    DEFAULT_BUDGET,
+    Callback,
+    PayloadSink,
+    ReportCallback,
+    ReportCallbacks,
+)
+from ..report_queue import DropWarning, OverflowPolicy, ReportQueue
+from . import _socket_filter
 
 
 logger = get_logger()
@@ -51,6 +75,16 @@ _MSG_TYPE_MASK = 0xF0
 _SEQ_MASK = 0x0F
 _HEADER_SIZE = 2
 
+# Largest UDP payload over IPv4
+_MAX_DATAGRAM = 65507
+
+# Kernel receive timestamps as a struct timespec in the ancillary data
+# (Linux; the socket module doesn't name the option)
+_SO_TIMESTAMPNS = getattr(
+    socket, "SO_TIMESTAMPNS", 35 if sys.platform.startswith("linux") else None
+)
+_TIMESPEC = struct.Struct("@ll")
+
 
 class _ReassemblyBuffer:
     __slots__ = ("data", "expected_seq", "message_number", "started")
@@ -70,28 +104,66 @@ class _ReassemblyBuffer:
 class _UdpReceiverProtocol(asyncio.DatagramProtocol):
     def __init__(
         self,
-        queue: "asyncio.Queue[Tuple[Tuple[str, int], ThingSetReport]]",
+        queue: Union[ReportQueue, None],
         protocol: ThingSetProtocol,
+        callbacks: ReportCallbacks,
+        report_filter: ReceiveFilter,
+        message_types: Union[FrozenSet[int], None] = None,
+        decode_executor: Union[Executor, None] = None,
+        decode_threshold: int = DEFAULT_DECODE_THRESHOLD,
+        payload_sink: Union[PayloadSink, None] = None,
     ) -> None:
         self._queue = queue
+        self._payload_sink = payload_sink
         self._protocol = protocol
+        self._callbacks = callbacks
+        self._filter = report_filter
+        self._message_types = message_types
+        self._drop_warning = DropWarning("UDP")
+        self._offload: Union[DecodeOffload, None] = None
+        if decode_executor is not None:
+            self._offload = DecodeOffload(
+                protocol, decode_executor, self._deliver, decode_threshold
+            )
         self._buffers: Dict[Tuple[str, int], _ReassemblyBuffer] = {}
 
+    def datagrams_received(self, datagrams: List[Tuple[Any, ...]]) -> None:
+        """``(data, addr)`` pairs, or ``(data, addr, timestamp)``."""
+        for datagram in datagrams:
+            self.datagram_received(*datagram)
+
     def datagram_received(
-        self, data: bytes, addr: Tuple[str, int]
+        self,
+        data: bytes,
+        addr: Tuple[str, int],
+        timestamp: Union[float, None] = None,
     ) -> None:
         if len(data) < _HEADER_SIZE + 1:
             return
 
         msg_type = data[0] & _MSG_TYPE_MASK
+        if self._message_types is not None and msg_type not in self._message_types:
+            return
         seq = data[0] & _SEQ_MASK
         msg_num = data[1]
         fragment = data[_HEADER_SIZE:]
+        report_filter = self._filter
+        starts = msg_type in (_MSG_TYPE_FIRST, _MSG_TYPE_SINGLE)
+
+        if report_filter.sources is not None and not report_filter.accepts_source(
+            addr
+        ):
+            if starts:
+                report_filter.rejected += 1
+            return
 
         buf = self._buffers.setdefault(addr, _ReassemblyBuffer())
 
-        if msg_type in (_MSG_TYPE_FIRST, _MSG_TYPE_SINGLE):
+        if starts:
             buf.reset()
+            if report_filter.rejects_start(fragment):
+                # Not started: the rest of its fragments are dropped
+                return
             buf.started = True
             buf.message_number = msg_num
         elif not buf.started or buf.message_number != msg_num:
@@ -114,15 +186,132 @@ class _UdpReceiverProtocol(asyncio.DatagramProtocol):
         if msg_type in (_MSG_TYPE_LAST, _MSG_TYPE_SINGLE):
             payload = bytes(buf.data)
             buf.reset()
-            report = self._protocol.parse_report(payload)
-            if report is None:
+            accept = report_filter.accepts_header if report_filter.headers else None
+            if self._payload_sink is not None:
+                if accept is not None:
+                    header = peek_report_header(payload)
+                    if header is None or not accept(header.eui, header.subset_id):
+                        return
+                    accept = None
+                self._payload_sink(
+                    addr, payload, time.time() if timestamp is None else timestamp
+                )
+                if self._queue is None and not self._callbacks:
+                    # Nothing wants it decoded
+                    return
+            if self._offload is not None:
+                self._offload.decode(addr, payload, accept)
                 return
+            report = self._protocol.parse_report(payload, accept)
+            if report is not None:
+                self._deliver(addr, report)
+
+    def _deliver(self, addr: Tuple[str, int], report: ThingSetReport) -> None:
+        if self._callbacks:
+            self._callbacks.dispatch(addr, report)
+        if self._queue is not None and not self._queue.put((addr, report)):
+            self._drop_warning(self._queue)
+
+
+class _BatchedDatagramReader:
+    """Reads a non-blocking UDP socket from a loop reader callback,
+    draining up to ``batch_size`` datagrams per wakeup and handing them
+    to the protocol together.
+
+    The selector transport reads one datagram per loop iteration and
+    returns to the selector in between. Under a flood of fragments,
+    staying in one callback until the socket is empty saves that round
+    trip per datagram; Python has no ``recvmmsg``, so each datagram is
+    still one ``recvfrom_into``. With a ``payload_sink`` to feed, it
+    asks for kernel receive timestamps (``SO_TIMESTAMPNS``) and reads
+    with ``recvmsg_into`` instead.
+
+    Offers the parts of the ``DatagramTransport`` interface the
+    receiver uses.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        sock: socket.socket,
+        protocol: _UdpReceiverProtocol,
+        batch_size: int,
+    ) -> None:
+        self._loop = loop
+        self._sock = sock
+        self._protocol = protocol
+        self._batch_size = batch_size
+        self._buffer = bytearray(_MAX_DATAGRAM)
+        self._view = memoryview(self._buffer)
+        read_ready = self._read_ready
+        if protocol._payload_sink is not None and self._enable_timestamps():
+            read_ready = self._read_ready_timestamped
+        loop.add_reader(sock.fileno(), read_ready)
+
+    def _enable_timestamps(self) -> bool:
+        if _SO_TIMESTAMPNS is None:
+            return False
+        try:
+            self._sock.setsockopt(socket.SOL_SOCKET, _SO_TIMESTAMPNS, 1)
+        except OSError as exc:
+            logger.warning("could not enable UDP receive timestamps: %s", exc)
+            return False
+        return True
+
+    def _read_ready_timestamped(self) -> None:
+        recvmsg_into = self._sock.recvmsg_into
+        buffers = [self._buffer]
+        ancbufsize = socket.CMSG_SPACE(_TIMESPEC.size)
+        view = self._view
+        batch = []
+        for _ in range(self._batch_size):
             try:
-                self._queue.put_nowait((addr, report))
-            except asyncio.QueueFull:
-                logger.warning(
-                    "ThingSet UDP queue full; dropping report from %s", addr
-                )
+                size, ancdata, _, addr = recvmsg_into(buffers, ancbufsize)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as exc:
+                self._protocol.error_received(exc)
+                break
+            timestamp = None
+            for level, kind, data in ancdata:
+                if level == socket.SOL_SOCKET and kind == _SO_TIMESTAMPNS:
+                    seconds, nanoseconds = _TIMESPEC.unpack_from(data)
+                    timestamp = seconds + nanoseconds * 1e-9
+            batch.append((bytes(view[:size]), addr, timestamp))
+        if batch:
+            self._protocol.datagrams_received(batch)
+
+    def _read_ready(self) -> None:
+        recvfrom_into = self._sock.recvfrom_into
+        buffer = self._buffer
+        view = self._view
+        batch = []
+        for _ in range(self._batch_size):
+            try:
+                size, addr = recvfrom_into(buffer)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as exc:
+                self._protocol.error_received(exc)
+                break
+            batch.append((bytes(view[:size]), addr))
+        if batch:
+            self._protocol.datagrams_received(batch)
+
+    def get_extra_info(self, name: str, default: Any = None) -> Any:
+        if name == "sockname":
+            return self._sock.getsockname()
+        if name == "socket":
+            return self._sock
+        return default
+
+    def get_protocol(self) -> _UdpReceiverProtocol:
+        return self._protocol
+
+    def close(self) -> None:
+        if self._sock.fileno() != -1:
+            self._loop.remove_reader(self._sock.fileno())
+            self._sock.close()
 
 
 class AsyncThingSetUDPReceiver:
@@ -131,7 +320,20 @@ class AsyncThingSetUDPReceiver:
     Use as an async context manager or call :meth:`start` / :meth:`close`
     directly. Iterate with ``async for (addr, report) in receiver`` —
     ``addr`` is the source ``(ip, port)``, ``report`` is a
-    :class:`ThingSetReport`.
+    :class:`ThingSetReport`. ``array_decode`` is as for
+    :class:`ThingSetProtocol`.
+
+    ``queue_size`` and ``overflow`` bound the queue (see
+    :class:`OverflowPolicy`); callbacks from :meth:`add_callback` see
+    each report before it is queued, and with ``queue_reports=False``
+    instead of it. ``sources``, ``euis``, ``subsets`` and
+    ``message_types`` filter before decoding (see
+    :mod:`~python_thingset.receive_filter`), in the kernel as well with
+    ``kernel_filter=True``. ``batch_size``, ``decode_executor`` and
+    ``payload_sink`` are described in the README; the last gets each
+    complete payload as ``payload_sink(addr, payload, timestamp)``,
+    the kernel's receive time of its last datagram with ``batch_size``
+    set, the wall-clock time otherwise.
     """
 
     DEFAULT_PORT = 9002
@@ -143,21 +345,67 @@ class AsyncThingSetUDPReceiver:
         port: int = DEFAULT_PORT,
         queue_size: int = DEFAULT_QUEUE_SIZE,
         rcvbuf_bytes: int = DEFAULT_RCVBUF_BYTES,
+        array_decode: Union[str, None] = None,
+        overflow: Union[OverflowPolicy, str] = OverflowPolicy.DROP_NEWEST,
+        queue_reports: bool = True,
+        sources: Union[Collection[Any], None] = None,
+        euis: Union[Collection[int], None] = None,
+        subsets: Union[Collection[int], None] = None,
+        message_types: Union[Collection[str], None] = None,
+        kernel_filter: bool = False,
+        batch_size: Union[int, None] = None,
+        decode_executor: Union[Executor, None] = None,
+        decode_threshold: int = DEFAULT_DECODE_THRESHOLD,
+        payload_sink: Union[PayloadSink, None] = None,
     ) -> None:
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
         self._bind = bind
         self._port = port
         self._queue_size = queue_size
         self._rcvbuf_bytes = rcvbuf_bytes
-        self._protocol = ThingSetProtocol(WireFormat.BINARY)
-        self._queue: "asyncio.Queue[Tuple[Tuple[str, int], ThingSetReport]]" = (
-            asyncio.Queue(maxsize=queue_size)
+        self._protocol = ThingSetProtocol(
+            WireFormat.BINARY, array_decode=array_decode
         )
-        self._transport: Union[asyncio.DatagramTransport, None] = None
+        self._queue = ReportQueue(queue_size, overflow)
+        self._queue_reports = queue_reports
+        self._callbacks = ReportCallbacks()
+        self._filter = ReceiveFilter(sources, euis, subsets)
+        self._message_types = (
+            None
+            if message_types is None
+            else frozenset(_socket_filter.message_type_values(message_types))
+        )
+        self._filter_program: Union[List[_socket_filter.Instruction], None] = None
+        if kernel_filter and (sources is not None or message_types is not None):
+            self._filter_program = _socket_filter.build_program(sources, message_types)
+        self._batch_size = batch_size
+        self._decode_executor = decode_executor
+        self._decode_threshold = decode_threshold
+        self._payload_sink = payload_sink
+        self._offload: Union[DecodeOffload, None] = None
+        self._transport: Union[
+            asyncio.DatagramTransport, _BatchedDatagramReader, None
+        ] = None
 
     async def start(self) -> None:
         if self._transport is not None:
             return
         loop = asyncio.get_running_loop()
+        sock = self._open_socket()
+        protocol = self._make_protocol()
+        self._offload = protocol._offload
+        if self._batch_size is not None:
+            self._transport = _BatchedDatagramReader(
+                loop, sock, protocol, self._batch_size
+            )
+        else:
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: protocol, sock=sock
+            )
+
+    def _open_socket(self) -> socket.socket:
+        """A bound, non-blocking socket set up as configured."""
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         # Allow multiple processes on one host to listen together; not
@@ -169,11 +417,23 @@ class AsyncThingSetUDPReceiver:
             except OSError:
                 pass
         self._enlarge_rcvbuf(sock)
+        self._attach_filter(sock)
         sock.bind((self._bind, self._port))
         sock.setblocking(False)
-        self._transport, _ = await loop.create_datagram_endpoint(
-            lambda: _UdpReceiverProtocol(self._queue, self._protocol),
-            sock=sock,
+        return sock
+
+    def _make_protocol(self) -> _UdpReceiverProtocol:
+        """A datagram handler feeding this receiver, without touching
+        its state."""
+        return _UdpReceiverProtocol(
+            self._queue if self._queue_reports else None,
+            self._protocol,
+            self._callbacks,
+            self._filter,
+            self._message_types,
+            self._decode_executor,
+            self._decode_threshold,
+            self._payload_sink,
         )
 
     def _enlarge_rcvbuf(self, sock: socket.socket) -> None:
@@ -211,11 +471,62 @@ class AsyncThingSetUDPReceiver:
         else:
             logger.info("UDP SO_RCVBUF set to %d B", actual)
 
+    def _attach_filter(self, sock: socket.socket) -> None:
+        """Attach the ``kernel_filter`` BPF program, if there is one.
+        Where that isn't possible the same filters still run in
+        Python, so failing is only a warning."""
+        if self._filter_program is None:
+            return
+        if not _socket_filter.supported():
+            logger.warning("UDP socket filters need Linux; filtering in Python")
+            return
+        try:
+            _socket_filter.attach(sock, self._filter_program)
+        except OSError as exc:
+            logger.warning("could not attach UDP socket filter: %s", exc)
+            return
+        logger.info(
+            "UDP socket filter attached (%d instructions)", len(self._filter_program)
+        )
+
     async def close(self) -> None:
         if self._transport is None:
             return
         self._transport.close()
         self._transport = None
+        if self._offload is not None:
+            self._offload.close()
+
+    def add_callback(
+        self, callback: Callback, budget: float = DEFAULT_BUDGET
+    ) -> ReportCallback:
+        """Call ``callback(addr, report)`` inline as each report
+        completes, before it is queued. See
+        :mod:`python_thingset.report_callbacks`."""
+        return self._callbacks.add(callback, budget)
+
+    def remove_callback(self, entry: ReportCallback) -> None:
+        self._callbacks.remove(entry)
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        """Reports lost to overflow so far: ``dropped`` and, with
+        ``OverflowPolicy.CONFLATE``, ``conflated``."""
+        return self._queue.counters
+
+    @property
+    def filtered(self) -> int:
+        """Reports turned away by the ``sources``, ``euis`` and
+        ``subsets`` filters so far."""
+        return self._filter.rejected
+
+    def batches(
+        self, max_items: int = 256, max_latency: float = 0.1
+    ) -> AsyncIterator[List[Tuple[Any, ThingSetReport]]]:
+        """Iterate over lists of up to ``max_items`` reports, waiting at
+        most ``max_latency`` seconds after the first for a list to fill.
+        See :meth:`ReportQueue.batches`."""
+        return self._queue.batches(max_items, max_latency)
 
     def __aiter__(self) -> "AsyncThingSetUDPReceiver":
         return self
@@ -0,0 +1,421 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Multi-process UDP report ingestion.
+
+One :class:`AsyncThingSetUDPReceiver` reassembles and decodes every
+report on one event loop, so ingest tops out at one core.
+:class:`ShardedThingSetUDPReceiver` spreads that work over worker
+processes, each reassembling and decoding the datagrams of a share of
+the sources:
+
+- ``mode="dispatch"`` (the default): one dispatcher process owns the
+  socket and routes raw datagrams to workers by source address. This
+  is the mode for broadcast reports — the kernel delivers a broadcast
+  datagram to *every* ``SO_REUSEPORT`` socket on the port, so sharing
+  the port would decode each report once per worker.
+- ``mode="reuseport"``: every worker binds the port itself and the
+  kernel hashes unicast datagrams between them by source, with no
+  process in between.
+
+Workers send decoded reports back in pickled batches over a pipe per
+worker, and the receiver yields them like any other::
+
+    async with ShardedThingSetUDPReceiver(workers=8) as receiver:
+        async for addr, report in receiver:
+            ...
+
+Reports from one source always go through the same worker, so their
+order is kept; between sources there is no ordering. Where the parent
+would itself become the bottleneck, pass a ``handler`` — a picklable
+``handler(addr, report)``, e.g. a module-level function — to consume
+reports inside the workers, and ``forward=False``.
+
+Workers are started with the ``spawn`` method by default, so a
+script using this needs the usual ``if __name__ == "__main__":``
+guard.
+"""
+
+import asyncio
+import math
+import multiprocessing
+import pickle
+import select
+import socket
+import threading
+from multiprocessing.connection import Connection
+from typing import Any, AsyncIterator, Collection, Dict, List, Tuple, Union
+
+from ..log import get_logger
+from ..report import ThingSetReport
+from ..report_callbacks import Callback
+from ..report_queue import DropWarning, OverflowPolicy, ReportQueue
+from .async_udp import _MAX_DATAGRAM, DEFAULT_RCVBUF_BYTES, AsyncThingSetUDPReceiver
+
+
+logger = get_logger()
+
+
+MODES = ("dispatch", "reuseport")
+
+# How often blocked workers look at the stop flag, in seconds
+_POLL_INTERVAL = 0.2
+
+# How long start() waits for the processes to come up, in seconds
+_START_TIMEOUT = 30.0
+
+Datagram = Tuple[bytes, Tuple[str, int]]
+
+
+class ShardedThingSetUDPReceiver:
+    """Receives reports on :attr:`port` with ``workers`` processes.
+
+    The receiver arguments — ``bind``, ``port``, ``rcvbuf_bytes``,
+    ``array_decode``, the filters and ``kernel_filter`` — are as for
+    :class:`AsyncThingSetUDPReceiver` and apply in every process that
+    reads the socket. ``batch_size`` caps how many datagrams are read
+    from the socket, and handed to a worker, at a time. ``queue_size``
+    and ``overflow`` bound the queue of reports in this process.
+    """
+
+    DEFAULT_PORT = AsyncThingSetUDPReceiver.DEFAULT_PORT
+    DEFAULT_QUEUE_SIZE = AsyncThingSetUDPReceiver.DEFAULT_QUEUE_SIZE
+
+    def __init__(
+        self,
+        workers: int = 0,
+        mode: str = "dispatch",
+        bind: str = "0.0.0.0",
+        port: int = DEFAULT_PORT,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        overflow: Union[OverflowPolicy, str] = OverflowPolicy.DROP_NEWEST,
+        rcvbuf_bytes: int = DEFAULT_RCVBUF_BYTES,
+        array_decode: Union[str, None] = None,
+        sources: Union[Collection[Any], None] = None,
+        euis: Union[Collection[int], None] = None,
+        subsets: Union[Collection[int], None] = None,
+        message_types: Union[Collection[str], None] = None,
+        kernel_filter: bool = False,
+        batch_size: int = 256,
+        handler: Union[Callback, None] = None,
+        forward: bool = True,
+        start_method: str = "spawn",
+    ) -> None:
+        """``workers`` defaults to one per CPU."""
+        if mode not in MODES:
+            raise ValueError("mode must be one of " + ", ".join(MODES))
+        if mode == "reuseport" and port == 0:
+            raise ValueError("reuseport workers need a fixed port")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.workers = workers or multiprocessing.cpu_count()
+        self.mode = mode
+        self._bind = bind
+        self._port = port
+        self._receiver_args: Dict[str, Any] = dict(
+            bind=bind,
+            port=port,
+            rcvbuf_bytes=rcvbuf_bytes,
+            array_decode=array_decode,
+            sources=sources,
+            euis=euis,
+            subsets=subsets,
+            message_types=message_types,
+            kernel_filter=kernel_filter,
+        )
+        # Fail here, not in a child process, on bad receiver arguments
+        AsyncThingSetUDPReceiver(**self._receiver_args)
+        self._batch_size = batch_size
+        self._handler = handler
+        self._forward = forward
+        self._context = multiprocessing.get_context(start_method)
+        self._queue = ReportQueue(queue_size, overflow)
+        self._drop_warning = DropWarning("UDP")
+        self._processes: List[multiprocessing.process.BaseProcess] = []
+        self._threads: List[threading.Thread] = []
+        self._stop: Any = None
+        self._address: Union[Tuple[str, int], None] = None
+
+    @property
+    def address(self) -> Union[Tuple[str, int], None]:
+        """The ``(ip, port)`` bound, once started."""
+        return self._address
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        """As :attr:`AsyncThingSetUDPReceiver.counters`, for the queue
+        in this process."""
+        return self._queue.counters
+
+    async def start(self) -> None:
+        if self._processes:
+            return
+        loop = asyncio.get_running_loop()
+        context = self._context
+        self._stop = context.Event()
+        ready = context.Queue()
+        worker_args = (
+            self._receiver_args,
+            self.mode,
+            self._batch_size,
+            self._handler,
+            self._forward,
+        )
+        child_ends: List[Connection] = []
+        results: List[Connection] = []
+        inboxes: List[Connection] = []
+        for index in range(self.workers):
+            result_r, result_w = context.Pipe(duplex=False)
+            results.append(result_r)
+            child_ends.append(result_w)
+            inbox_r: Union[Connection, None] = None
+            if self.mode == "dispatch":
+                inbox_r, inbox_w = context.Pipe(duplex=False)
+                inboxes.append(inbox_w)
+                child_ends.append(inbox_r)
+            self._processes.append(
+                context.Process(
+                    target=_worker_main,
+                    args=(index, worker_args, inbox_r, result_w, ready, self._stop),
+                    name=f"thingset-udp-worker-{index}",
+                    daemon=True,
+                )
+            )
+        if self.mode == "dispatch":
+            self._processes.append(
+                context.Process(
+                    target=_dispatcher_main,
+                    args=(
+                        self._receiver_args,
+                        self._batch_size,
+                        inboxes,
+                        ready,
+                        self._stop,
+                    ),
+                    name="thingset-udp-dispatcher",
+                    daemon=True,
+                )
+            )
+        for process in self._processes:
+            process.start()
+        # The children hold these now; closing ours lets a reader see
+        # end-of-file once its worker exits
+        for connection in child_ends + inboxes:
+            connection.close()
+
+        try:
+            self._address = await loop.run_in_executor(
+                None, self._wait_ready, ready, len(self._processes)
+            )
+        except BaseException:
+            await self.close()
+            raise
+        for index, connection in enumerate(results):
+            thread = threading.Thread(
+                target=self._read_results,
+                args=(loop, connection),
+                name=f"thingset-udp-results-{index}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _wait_ready(self, ready: Any, expected: int) -> Tuple[str, int]:
+        address = (self._bind, self._port)
+        for _ in range(expected):
+            try:
+                kind, detail = ready.get(timeout=_START_TIMEOUT)
+            except Exception:
+                raise TimeoutError("ThingSet UDP workers did not start") from None
+            if kind == "error":
+                raise OSError(f"ThingSet UDP worker failed to start: {detail}")
+            if kind == "bound":
+                address = detail
+        return address
+
+    def _read_results(
+        self, loop: asyncio.AbstractEventLoop, connection: Connection
+    ) -> None:
+        """Unpickle a worker's batches on this thread and queue them on
+        the loop, until the worker goes away."""
+        try:
+            while True:
+                try:
+                    data = connection.recv_bytes()
+                except (EOFError, OSError):
+                    return
+                items = [
+                    ((ip, port), ThingSetReport(subset_id, values, eui))
+                    for ip, port, subset_id, eui, values in pickle.loads(data)
+                ]
+                try:
+                    loop.call_soon_threadsafe(self._deliver, items)
+                except RuntimeError:
+                    # The loop has closed
+                    return
+        finally:
+            connection.close()
+
+    def _deliver(self, items: List[Tuple[Tuple[str, int], ThingSetReport]]) -> None:
+        dropped = 0
+        for item in items:
+            if not self._queue.put(item):
+                dropped += 1
+        if dropped:
+            self._drop_warning(self._queue, dropped)
+
+    async def close(self) -> None:
+        if not self._processes:
+            return
+        self._stop.set()
+        processes, self._processes = self._processes, []
+        threads, self._threads = self._threads, []
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _join, processes, threads)
+        self._queue.end()
+
+    def batches(
+        self, max_items: int = 256, max_latency: float = 0.1
+    ) -> AsyncIterator[List[Tuple[Any, ThingSetReport]]]:
+        """As :meth:`AsyncThingSetUDPReceiver.batches`."""
+        return self._queue.batches(max_items, max_latency)
+
+    def __aiter__(self) -> "ShardedThingSetUDPReceiver":
+        return self
+
+    async def __anext__(self) -> Tuple[Tuple[str, int], ThingSetReport]:
+        return await self._queue.get()
+
+    async def __aenter__(self) -> "ShardedThingSetUDPReceiver":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+
+def _join(
+    processes: List[multiprocessing.process.BaseProcess],
+    threads: List[threading.Thread],
+) -> None:
+    for process in processes:
+        process.join(_POLL_INTERVAL * 5)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    for thread in threads:
+        thread.join(_POLL_INTERVAL * 5)
+
+
+def _read_batches(sock: socket.socket, stop: Any, batch_size: int):
+    """Yield lists of up to ``batch_size`` datagrams from ``sock``
+    (non-blocking) until ``stop`` is set."""
+    buffer = bytearray(_MAX_DATAGRAM)
+    view = memoryview(buffer)
+    recvfrom_into = sock.recvfrom_into
+    while not stop.is_set():
+        readable, _, _ = select.select([sock], [], [], _POLL_INTERVAL)
+        if not readable:
+            continue
+        batch = []
+        for _ in range(batch_size):
+            try:
+                size, addr = recvfrom_into(buffer)
+            except (BlockingIOError, InterruptedError):
+                break
+            batch.append((bytes(view[:size]), addr))
+        if batch:
+            yield batch
+
+
+def _dispatcher_main(
+    receiver_args: Dict[str, Any],
+    batch_size: int,
+    inboxes: List[Connection],
+    ready: Any,
+    stop: Any,
+) -> None:
+    try:
+        sock = AsyncThingSetUDPReceiver(**receiver_args)._open_socket()
+    except Exception as e:
+        ready.put(("error", repr(e)))
+        return
+    ready.put(("bound", sock.getsockname()))
+    shards: List[List[Datagram]] = [[] for _ in inboxes]
+    count = len(inboxes)
+    try:
+        for batch in _read_batches(sock, stop, batch_size):
+            for datagram in batch:
+                # A source always maps to the same worker, which
+                # reassembly needs
+                shards[hash(datagram[1]) % count].append(datagram)
+            for inbox, shard in zip(inboxes, shards):
+                if shard:
+                    inbox.send(shard)
+                    shard.clear()
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    finally:
+        sock.close()
+        for inbox in inboxes:
+            inbox.close()
+
+
+def _worker_main(
+    index: int,
+    worker_args: Tuple[Any, ...],
+    inbox: Union[Connection, None],
+    results: Connection,
+    ready: Any,
+    stop: Any,
+) -> None:
+    receiver_args, mode, batch_size, handler, forward = worker_args
+    try:
+        receiver = AsyncThingSetUDPReceiver(queue_reports=False, **receiver_args)
+        out: List[Tuple[Any, ...]] = []
+        if handler is not None:
+            receiver.add_callback(handler, budget=math.inf)
+        if forward:
+            append = out.append
+            receiver.add_callback(
+                lambda addr, report: append(
+                    (addr[0], addr[1], report.subset_id, report.eui, report.values)
+                ),
+                budget=math.inf,
+            )
+        protocol = receiver._make_protocol()
+        sock = receiver._open_socket() if mode == "reuseport" else None
+    except Exception as e:
+        ready.put(("error", repr(e)))
+        return
+    ready.put(("worker", index))
+
+    def flush() -> None:
+        if out:
+            results.send_bytes(pickle.dumps(out, protocol=pickle.HIGHEST_PROTOCOL))
+            out.clear()
+
+    try:
+        if sock is not None:
+            for batch in _read_batches(sock, stop, batch_size):
+                protocol.datagrams_received(batch)
+                flush()
+        else:
+            assert inbox is not None
+            while not stop.is_set():
+                if not inbox.poll(_POLL_INTERVAL):
+                    continue
+                try:
+                    batch = inbox.recv()
+                except EOFError:
+                    break
+                protocol.datagrams_received(batch)
+                flush()
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    finally:
+        if sock is not None:
+            sock.close()
+        results.close()
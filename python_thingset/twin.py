@@ -0,0 +1,291 @@
+#
+# Copyright (c) 2024-2025 Brill Power.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""A local mirror of one device's values.
+
+A :class:`DeviceTwin` pairs a device's :class:`SchemaTree` with the
+last value seen for each of its nodes. Reports keep it current at no
+cost to the device; :meth:`DeviceTwin.reconcile` reads, with as few
+``fetch`` requests as the schema allows, only the values no report has
+covered recently::
+
+    twin = DeviceTwin(tree, eui=0xBADB1B0000000001, max_age=30.0)
+    async with AsyncThingSetUDPReceiver() as receiver:
+        await twin.run(client, receiver, interval=10.0)
+
+    twin["Module/rVoltage"]   # by path
+    twin[0x401]               # or by ID
+    twin.snapshot()           # {path: value}
+"""
+
+import asyncio
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Tuple,
+    Union,
+)
+
+from .log import get_logger
+from .query import FetchPlan, _is_readable
+from .receive_filter import _source_in
+from .report import ThingSetReport
+from .schema import SchemaDiff, SchemaNode, SchemaTree
+
+
+if TYPE_CHECKING:
+    from .async_client import AsyncThingSetClient
+    from .client import ThingSetClient
+
+
+logger = get_logger()
+
+
+class DeviceTwin:
+    """Last known value of every value node in ``tree``.
+
+    ``max_age`` is how long, in seconds, a value counts as fresh after
+    it was last reported or read; older values, and values never seen,
+    are what :meth:`reconcile` reads. Values keep being returned once
+    stale; :meth:`age` tells how old they are.
+
+    A receiver yields reports from every device on the network. When
+    following one, a report is taken as this device's if its EUI is
+    ``eui`` or, for reports without an EUI, if it came from
+    ``source`` — an address as the receiver yields it, or for UDP just
+    the IP. With neither set, every report is taken.
+
+    IDs that ``tree`` doesn't describe are stored too, and can be
+    looked up by ID, but are never reconciled.
+
+    After a firmware update, assign the new tree to ``tree`` or bring
+    the current one up to date with :meth:`revalidate`; a tree changed
+    in place by other means should be assigned again so the twin
+    notices.
+    """
+
+    def __init__(
+        self,
+        tree: SchemaTree,
+        *,
+        eui: Union[int, None] = None,
+        source: Any = None,
+        root_id: int = 0,
+        max_age: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.tree = tree
+        self.eui = eui
+        self.source = source
+        self.root_id = root_id
+        self.max_age = max_age
+        self._clock = clock
+        self._values: Dict[int, Any] = {}
+        self._updated: Dict[int, float] = {}
+        # When a read of a value that came back empty was last tried
+        self._attempted: Dict[int, float] = {}
+
+    @property
+    def tree(self) -> SchemaTree:
+        return self._tree
+
+    @tree.setter
+    def tree(self, tree: SchemaTree) -> None:
+        self._tree = tree
+        self._value_nodes: Union[List[SchemaNode], None] = None
+
+    def __getitem__(self, key: Union[int, str]) -> Any:
+        return self._values[self._id(key)]
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            return self._id(key) in self._values  # type: ignore[arg-type]
+        except KeyError:
+            return False
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._values)
+
+    def get(self, key: Union[int, str], default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def age(self, key: Union[int, str]) -> Union[float, None]:
+        """Seconds since ``key`` was last updated, or ``None`` if it
+        never was."""
+        updated = self._updated.get(self._id(key))
+        return None if updated is None else self._clock() - updated
+
+    def update(self, values: Dict[int, Any], at: Union[float, None] = None) -> int:
+        """Store ``{id: value}`` as seen at ``at`` (now by default).
+        A group's value given as a map of its children's IDs is
+        stored child by child. Returns the number of values stored."""
+        now = self._clock() if at is None else at
+        stored = 0
+        pending: List[Tuple[int, Any]] = list(values.items())
+        while pending:
+            value_id, value = pending.pop()
+            # dict.get: a report must never trigger lazy discovery
+            node = dict.get(self.tree.by_id, value_id)
+            if isinstance(value, dict) and node is not None and node.children:
+                pending.extend(value.items())
+                continue
+            self._values[value_id] = value
+            self._updated[value_id] = now
+            stored += 1
+        return stored
+
+    def apply_report(self, report: ThingSetReport) -> int:
+        return self.update(report.values)
+
+    def accepts(self, addr: Any, report: ThingSetReport) -> bool:
+        """Whether a report a receiver yielded is this device's."""
+        if report.eui is not None and self.eui is not None:
+            return report.eui == self.eui
+        if self.source is None:
+            return self.eui is None
+        return _source_in(addr, (self.source,))
+
+    async def follow(self, reports: AsyncIterable[Tuple[Any, ThingSetReport]]) -> None:
+        """Apply this device's reports from a receiver (or any async
+        iterable of ``(addr, report)``) until it ends."""
+        async for addr, report in reports:
+            if self.accepts(addr, report):
+                self.apply_report(report)
+
+    def value_nodes(self) -> List[SchemaNode]:
+        """The nodes that hold a value: leaves other than groups and
+        functions."""
+        if self._value_nodes is None:
+            self._value_nodes = [
+                node
+                for node in self.tree
+                if not node.children and node.type != "group" and _is_readable(node)
+            ]
+        return self._value_nodes
+
+    def revalidate(
+        self, client: "ThingSetClient", node_id: Union[int, None] = None
+    ) -> SchemaDiff:
+        """Bring ``tree`` up to date with the device, in place (see
+        ``revalidate_schema``), and return what changed."""
+        try:
+            return client.revalidate_schema(self.tree, self.root_id, node_id)
+        finally:
+            self._value_nodes = None
+
+    async def revalidate_async(
+        self, client: "AsyncThingSetClient", node_id: Union[int, None] = None
+    ) -> SchemaDiff:
+        """Async :meth:`revalidate`."""
+        try:
+            return await client.revalidate_schema(self.tree, self.root_id, node_id)
+        finally:
+            self._value_nodes = None
+
+    def stale(self) -> List[SchemaNode]:
+        """Value nodes never seen or last updated more than
+        ``max_age`` seconds ago. A value the device refused to return
+        is left out until ``max_age`` after that attempt."""
+        cutoff = self._clock() - self.max_age
+        updated = self._updated
+        attempted = self._attempted
+        return [
+            node
+            for node in self.value_nodes()
+            if updated.get(node.id, cutoff) <= cutoff
+            and attempted.get(node.id, cutoff) <= cutoff
+        ]
+
+    def reconcile_plan(self) -> FetchPlan:
+        """The fetches that would bring every stale value up to date."""
+        return FetchPlan.build(self.tree, self.stale(), root_id=self.root_id)
+
+    def reconcile(
+        self, client: "ThingSetClient", node_id: Union[int, None] = None
+    ) -> int:
+        """Read the stale values; returns how many were updated."""
+        plan = self.reconcile_plan()
+        if not plan.requests:
+            return 0
+        return self._apply_read(plan, plan.execute(client, node_id))
+
+    async def reconcile_async(
+        self, client: "AsyncThingSetClient", node_id: Union[int, None] = None
+    ) -> int:
+        """Async :meth:`reconcile`."""
+        plan = self.reconcile_plan()
+        if not plan.requests:
+            return 0
+        return self._apply_read(plan, await plan.execute_async(client, node_id))
+
+    async def run(
+        self,
+        client: "AsyncThingSetClient",
+        reports: AsyncIterable[Tuple[Any, ThingSetReport]],
+        *,
+        interval: float = 10.0,
+        node_id: Union[int, None] = None,
+    ) -> None:
+        """Follow ``reports`` and reconcile every ``interval`` seconds,
+        until cancelled or the reports end.
+
+        The first reconciliation waits an interval too, so that values
+        the device reports anyway are never read. A failed
+        reconciliation is logged and retried at the next interval.
+        """
+        follower = asyncio.ensure_future(self.follow(reports))
+        try:
+            while True:
+                await asyncio.wait({follower}, timeout=interval)
+                if follower.done():
+                    follower.result()
+                    return
+                try:
+                    await self.reconcile_async(client, node_id)
+                except (OSError, asyncio.TimeoutError) as e:
+                    logger.warning("Device twin reconciliation failed: %s", e)
+        finally:
+            follower.cancel()
+
+    def snapshot(self, by_id: bool = False) -> Dict[Union[int, str], Any]:
+        """A copy of the stored values, by path (values ``tree`` doesn't
+        describe are left out) or, with ``by_id``, by ID."""
+        if by_id:
+            return dict(self._values)
+        by_id_nodes = self.tree.by_id
+        out: Dict[Union[int, str], Any] = {}
+        for value_id, value in self._values.items():
+            node = dict.get(by_id_nodes, value_id)
+            if node is not None:
+                out[node.path] = value
+        return out
+
+    def _apply_read(self, plan: FetchPlan, values: Dict[str, Any]) -> int:
+        now = self._clock()
+        for request in plan.requests:
+            for value_id, path in zip(request.ids, request.paths):
+                if path not in values:
+                    self._attempted[value_id] = now
+        by_path = self.tree.by_path
+        return self.update(
+            {by_path[path].id: value for path, value in values.items()}, now
+        )
+
+    def _id(self, key: Union[int, str]) -> int:
+        if isinstance(key, str):
+            return self.tree.by_path[key].id
+        return key
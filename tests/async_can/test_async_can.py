@@ -398,3 +398,184 @@ async def test_malformed_single_frame_payload_silently_dropped(virtual_channel):
     finally:
         sender.shutdown()
         await receiver.close()
+
+
+async def test_inline_callback_runs_before_queue(virtual_channel):
+    receiver, sender = await _open_pair(virtual_channel)
+    seen = []
+
+    def on_report(addr, report):
+        # Called before the report is queued
+        seen.append((addr, report.values, len(receiver._queue)))
+
+    entry = receiver.add_callback(on_report)
+    try:
+        _send_can(
+            sender,
+            _single_frame_id(source=0x10, data_id=0x602),
+            cbor2.dumps(42, canonical=True),
+        )
+        _, report = await _next(receiver)
+        assert seen == [((0x10, virtual_channel), {0x602: 42}, 0)]
+        assert entry.stats.calls == 1
+    finally:
+        sender.shutdown()
+        await receiver.close()
+
+
+async def test_sources_and_types_go_to_kernel_filters(virtual_channel):
+    receiver = AsyncThingSetCANReportReceiver(
+        bus=virtual_channel, interface="virtual", sources={0x20, 0x10}, single_frame=False
+    )
+    assert receiver._can_filters == [
+        {"can_id": _TYPE_MULTI_FRAME | source, "can_mask": (0x3 << 24) | 0xFF, "extended": True}
+        for source in (0x10, 0x20)
+    ]
+    nothing = AsyncThingSetCANReportReceiver(
+        bus=virtual_channel, interface="virtual", sources=()
+    )
+    assert len(nothing._can_filters) == 1
+    with pytest.raises(ValueError):
+        AsyncThingSetCANReportReceiver(
+            bus=virtual_channel, interface="virtual", euis={1}, multi_frame=False
+        )
+
+
+async def test_filter_by_source_and_subset(virtual_channel):
+    receiver = AsyncThingSetCANReportReceiver(
+        bus=virtual_channel, interface="virtual", sources={0x10}, subsets={0x400}
+    )
+    await receiver.start()
+    sender = can.Bus(channel=virtual_channel, interface="virtual", fd=True)
+    try:
+        def body(subset_id, value):
+            return (
+                bytes([0x1F])
+                + cbor2.dumps(subset_id, canonical=True)
+                + cbor2.dumps({0x1: value}, canonical=True)
+            )
+
+        frames = [
+            (_multi_frame_id(0x11, 0, _MFT_SINGLE, 0), body(0x400, 1)),
+            (_single_frame_id(0x10, 0x602), cbor2.dumps(2)),
+            (_multi_frame_id(0x10, 0, _MFT_SINGLE, 0), body(0x800, 3)),
+            (_multi_frame_id(0x10, 1, _MFT_SINGLE, 0), body(0x400, 4)),
+        ]
+        for can_id, data in frames:
+            _send_can(sender, can_id, data)
+        (src, _), report = await _next(receiver)
+        assert src == 0x10
+        assert report.values == {0x1: 4}
+        # The other source and the single frame stop at the bus filters
+        assert receiver.filtered == 1
+    finally:
+        sender.shutdown()
+        await receiver.close()
+
+
+async def test_sources_checked_without_kernel_filters(virtual_channel):
+    got = []
+    receiver = AsyncThingSetCANReportReceiver(
+        bus=virtual_channel, interface="virtual", sources={0x10}
+    )
+    receiver.add_callback(lambda addr, report: got.append(addr[0]))
+    nothing = AsyncThingSetCANReportReceiver(
+        bus=virtual_channel, interface="virtual", sources=()
+    )
+    nothing.add_callback(lambda addr, report: got.append(None))
+    for source in (0x10, 0x11):
+        msg = can.Message(
+            arbitration_id=_single_frame_id(source, 0x602),
+            is_extended_id=True,
+            data=cbor2.dumps(source),
+        )
+        # As if the interface ignored can_filters
+        receiver._handle_message(msg)
+        nothing._handle_message(msg)
+    assert got == [0x10]
+    assert receiver.filtered == 1
+    assert nothing.filtered == 2
+
+
+async def test_single_frames_checked_without_kernel_filters(virtual_channel):
+    msg = can.Message(
+        arbitration_id=_single_frame_id(0x10, 0x602),
+        is_extended_id=True,
+        data=cbor2.dumps(1),
+    )
+    for kwargs in ({"euis": {0xBADB1B0000000001}}, {"subsets": {0x400}}, {"single_frame": False}):
+        got = []
+        receiver = AsyncThingSetCANReportReceiver(
+            bus=virtual_channel, interface="virtual", **kwargs
+        )
+        receiver.add_callback(lambda addr, report: got.append(report))
+        # As if the interface ignored can_filters
+        receiver._handle_message(msg)
+        assert got == []
+        assert receiver.filtered == 1
+
+
+async def test_offloaded_decode_keeps_source_order(virtual_channel):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(1) as executor:
+        receiver = AsyncThingSetCANReportReceiver(
+            bus=virtual_channel,
+            interface="virtual",
+            decode_executor=executor,
+            decode_threshold=100,
+        )
+        await receiver.start()
+        sender = can.Bus(channel=virtual_channel, interface="virtual", fd=True)
+        try:
+            values = {k: k * 1000 for k in range(60)}
+            body = (
+                bytes([0x1F])
+                + cbor2.dumps(0x400, canonical=True)
+                + cbor2.dumps(values, canonical=True)
+            )
+            chunks = [body[i : i + 64] for i in range(0, len(body), 64)]
+            for seq, chunk in enumerate(chunks):
+                mft = (
+                    _MFT_FIRST
+                    if seq == 0
+                    else _MFT_LAST if seq == len(chunks) - 1 else _MFT_CONSECUTIVE
+                )
+                _send_can(sender, _multi_frame_id(0x10, 1, mft, seq), chunk)
+            _send_can(sender, _single_frame_id(0x10, 0x602), cbor2.dumps(7))
+            _, first = await _next(receiver)
+            _, second = await _next(receiver)
+            assert first.values == values
+            assert second.values == {0x602: 7}
+            assert receiver._offload.offloaded == 1
+        finally:
+            sender.shutdown()
+            await receiver.close()
+
+
+async def test_payload_sink_sees_payloads_with_frame_times(virtual_channel):
+    seen = []
+    receiver = AsyncThingSetCANReportReceiver(
+        bus=virtual_channel,
+        interface="virtual",
+        queue_reports=False,
+        payload_sink=lambda *args: seen.append(args),
+    )
+    await receiver.start()
+    sender = can.Bus(channel=virtual_channel, interface="virtual", fd=True)
+    try:
+        body = bytes([0x1F]) + cbor2.dumps(0x400) + cbor2.dumps({0x1: 2})
+        _send_can(sender, _multi_frame_id(0x10, 0, _MFT_SINGLE, 0), body)
+        _send_can(sender, _single_frame_id(0x11, 0x602), cbor2.dumps(7))
+        for _ in range(100):
+            if len(seen) == 2:
+                break
+            await asyncio.sleep(0.01)
+        (addr, payload, timestamp), single = seen
+        assert (addr, payload) == ((0x10, virtual_channel), body)
+        assert timestamp > 0
+        assert single[0] == (0x11, virtual_channel)
+        assert (single[1], single[3]) == (cbor2.dumps(7), 0x602)
+    finally:
+        sender.shutdown()
+        await receiver.close()
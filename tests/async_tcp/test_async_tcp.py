@@ -14,6 +14,7 @@ import pytest
 
 from python_thingset import (
     AsyncThingSetTCP,
+    ConnectionState,
     ThingSetProtocol,
     ThingSetStatus,
     WireFormat,
@@ -45,8 +46,10 @@ class _CannedServer:
         response_delay: float = 0.0,
         chunked_response: bool = False,
         expect_forward_eui: Optional[int] = None,
+        drop_on_request: int = 0,
     ):
         self._responses = responses
+        self._drop_on_request = drop_on_request
         self._response_delay = response_delay
         self._chunked = chunked_response
         self._expect_forward_eui = expect_forward_eui
@@ -87,6 +90,13 @@ class _CannedServer:
             await asyncio.gather(*self._handlers, return_exceptions=True)
         await self._server.wait_closed()
 
+    async def drop_connections(self) -> None:
+        """Close every accepted connection, as a rebooting gateway would."""
+        for handler in list(self._handlers):
+            handler.cancel()
+        if self._handlers:
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+
     async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
         task = asyncio.current_task()
         if task is not None:
@@ -96,6 +106,10 @@ class _CannedServer:
                 data = await reader.read(4096)
                 if not data:
                     return
+                if self._drop_on_request > 0:
+                    # Hang up mid-request without answering
+                    self._drop_on_request -= 1
+                    return
                 response = self._lookup(data)
                 if response is None:
                     continue
@@ -222,14 +236,12 @@ async def test_discover_schema_end_to_end():
             ]),
         _protocol.encode_fetch(0x0E, []):
             _bin_response(ThingSetStatus.CONTENT, [0xE04]),
-        _protocol.encode_fetch(0x19, [0xE04]):
-            _bin_response(ThingSetStatus.CONTENT, [
-                {26: "rDFUState", 27: "u8", 28: 7},
-            ]),
         _protocol.encode_fetch(0x0F, []):
             _bin_response(ThingSetStatus.CONTENT, [0xF03]),
-        _protocol.encode_fetch(0x19, [0xF03]):
+        # Breadth-first: both groups' children in one overlay request
+        _protocol.encode_fetch(0x19, [0xE04, 0xF03]):
             _bin_response(ThingSetStatus.CONTENT, [
+                {26: "rDFUState", 27: "u8", 28: 7},
                 {26: "rBoard", 27: "string", 28: 7},
             ]),
     }
@@ -340,3 +352,109 @@ async def test_forwarding_discover_schema_is_transparent():
             tree = await client.discover_schema()
     assert set(tree.by_id.keys()) == {0x0E, 0xE04}
     assert tree.by_path["OnlyGroup/Leaf"].type == "u8"
+
+
+async def _wait_for_state(client, state, timeout: float = 1.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while client.state is not state:
+        assert asyncio.get_running_loop().time() < deadline, client.state
+        await asyncio.sleep(0.005)
+
+
+async def test_lost_connection_fails_fast_without_reconnect():
+    """A dropped link surfaces as ConnectionError immediately rather
+    than every later RPC waiting out its timeout."""
+    async with _CannedServer({}) as server:
+        async with AsyncThingSetTCP(
+            "127.0.0.1", port=server.port, timeout=5.0
+        ) as client:
+            await server.drop_connections()
+            await _wait_for_state(client, ConnectionState.DISCONNECTED)
+            with pytest.raises(ConnectionError):
+                await asyncio.wait_for(client.get(0xF03), timeout=0.5)
+
+
+async def test_reconnects_after_peer_drop():
+    request = _protocol.encode_get(0xF03)
+    response = _bin_response(ThingSetStatus.CONTENT, "native_sim")
+    states = []
+    async with _CannedServer({request: response}) as server:
+        async with AsyncThingSetTCP(
+            "127.0.0.1",
+            port=server.port,
+            reconnect=True,
+            reconnect_initial_delay=0.01,
+            on_state_change=states.append,
+        ) as client:
+            await server.drop_connections()
+            await _wait_for_state(client, ConnectionState.RECONNECTING)
+            r = await client.get(0xF03)
+            assert client.state is ConnectionState.CONNECTED
+    assert r.status_code == ThingSetStatus.CONTENT
+    assert states == [
+        ConnectionState.CONNECTING,
+        ConnectionState.CONNECTED,
+        ConnectionState.RECONNECTING,
+        ConnectionState.CONNECTED,
+        ConnectionState.CLOSED,
+    ]
+
+
+async def test_in_flight_read_replayed_after_drop():
+    """The server hangs up on the first request; the read is re-sent on
+    the fresh connection and the caller just sees the answer."""
+    request = _protocol.encode_get(0xF03)
+    response = _bin_response(ThingSetStatus.CONTENT, "native_sim")
+    async with _CannedServer({request: response}, drop_on_request=1) as server:
+        async with AsyncThingSetTCP(
+            "127.0.0.1",
+            port=server.port,
+            timeout=2.0,
+            reconnect=True,
+            reconnect_initial_delay=0.01,
+        ) as client:
+            r = await client.get(0xF03)
+    assert r.status_code == ThingSetStatus.CONTENT
+    assert r.data == "native_sim"
+
+
+async def test_in_flight_write_not_replayed():
+    update_req = _protocol.encode_update(0x03, 0x300, 42)
+    async with _CannedServer(
+        {update_req: _bin_response(ThingSetStatus.CHANGED)}, drop_on_request=1
+    ) as server:
+        async with AsyncThingSetTCP(
+            "127.0.0.1",
+            port=server.port,
+            timeout=2.0,
+            reconnect=True,
+            reconnect_initial_delay=0.01,
+        ) as client:
+            with pytest.raises(ConnectionError):
+                await client.update(0x300, 42, parent_id=0x03)
+            # The link itself recovers for subsequent calls
+            await _wait_for_state(client, ConnectionState.CONNECTED)
+            u = await client.update(0x300, 42, parent_id=0x03)
+    assert u.status_code == ThingSetStatus.CHANGED
+
+
+async def test_read_during_outage_times_out_when_peer_stays_down():
+    async with _CannedServer({}) as server:
+        client = AsyncThingSetTCP(
+            "127.0.0.1",
+            port=server.port,
+            reconnect=True,
+            reconnect_initial_delay=0.01,
+            replay_timeout=0.1,
+        )
+        await client.connect()
+    # Server (and listener) gone — reconnect attempts keep failing
+    try:
+        await _wait_for_state(client, ConnectionState.RECONNECTING)
+        r = await client.get(0xF03)
+        assert r.status_code is None
+        with pytest.raises(ConnectionError):
+            await client.exec(0x67, [])
+    finally:
+        await client.close()
+    assert client.state is ConnectionState.CLOSED
@@ -286,6 +286,147 @@ async def test_queue_full_drops_overflow():
         await receiver.close()
 
 
+async def _send_burst(receiver: AsyncThingSetUDPReceiver, bodies) -> None:
+    port = receiver._transport.get_extra_info("sockname")[1]
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        for i, body in enumerate(bodies):
+            _send(s, port, _frame(body, _MSG_TYPE_SINGLE, 0, i))
+    await asyncio.sleep(0.05)
+
+
+async def test_queue_drop_oldest_keeps_newest():
+    receiver = AsyncThingSetUDPReceiver(
+        bind="127.0.0.1", port=0, queue_size=2, overflow="drop_oldest"
+    )
+    await receiver.start()
+    try:
+        await _send_burst(receiver, [_standard_report_body(i, {}) for i in range(5)])
+        got = [await _next_with_timeout(receiver, 0.5) for _ in range(2)]
+        assert [r.subset_id for _, r in got] == [3, 4]
+        assert receiver.counters == {"dropped": 3, "conflated": 0}
+    finally:
+        await receiver.close()
+
+
+async def test_queue_conflate_keeps_latest_per_subset():
+    receiver = AsyncThingSetUDPReceiver(
+        bind="127.0.0.1", port=0, queue_size=8, overflow="conflate"
+    )
+    await receiver.start()
+    try:
+        await _send_burst(
+            receiver,
+            [_standard_report_body(i % 2, {0x1001: i}) for i in range(6)],
+        )
+        got = [await _next_with_timeout(receiver, 0.5) for _ in range(2)]
+        assert [(r.subset_id, r.values[0x1001]) for _, r in got] == [(0, 4), (1, 5)]
+        assert receiver.counters == {"dropped": 0, "conflated": 4}
+    finally:
+        await receiver.close()
+
+
+async def test_batches():
+    receiver = AsyncThingSetUDPReceiver(bind="127.0.0.1", port=0)
+    await receiver.start()
+    try:
+        await _send_burst(receiver, [_standard_report_body(i, {}) for i in range(5)])
+        batches = receiver.batches(max_items=3, max_latency=0.05)
+        first = await asyncio.wait_for(batches.__anext__(), 1)
+        second = await asyncio.wait_for(batches.__anext__(), 1)
+        assert [r.subset_id for _, r in first + second] == [0, 1, 2, 3, 4]
+        assert len(first) == 3
+    finally:
+        await receiver.close()
+
+
+async def test_callbacks_without_queue():
+    receiver = AsyncThingSetUDPReceiver(bind="127.0.0.1", port=0, queue_reports=False)
+    seen = []
+    receiver.add_callback(lambda addr, report: seen.append(report.subset_id))
+    await receiver.start()
+    try:
+        await _send_burst(receiver, [_standard_report_body(i, {}) for i in range(3)])
+        assert seen == [0, 1, 2]
+        assert len(receiver._queue) == 0
+    finally:
+        await receiver.close()
+
+
+async def test_filter_by_eui_and_subset():
+    receiver = AsyncThingSetUDPReceiver(
+        bind="127.0.0.1", port=0, euis={0xBADB1B0000000001}, subsets={0x400}
+    )
+    await receiver.start()
+    try:
+        await _send_burst(
+            receiver,
+            [
+                _enhanced_report_body(0xBADB1B0000000002, 0x400, {0x1: 1}),
+                _enhanced_report_body(0xBADB1B0000000001, 0x800, {0x1: 2}),
+                _standard_report_body(0x400, {0x1: 3}),
+                _enhanced_report_body(0xBADB1B0000000001, 0x400, {0x1: 4}),
+            ],
+        )
+        _, report = await _next_with_timeout(receiver)
+        assert report.values == {0x1: 4}
+        assert receiver.filtered == 3
+        assert len(receiver._queue) == 0
+    finally:
+        await receiver.close()
+
+
+async def test_filter_rejects_on_first_fragment():
+    receiver = AsyncThingSetUDPReceiver(bind="127.0.0.1", port=0, subsets={0x400})
+    await receiver.start()
+    port = receiver._transport.get_extra_info("sockname")[1]
+    try:
+        unwanted = _standard_report_body(0x800, {k: k for k in range(40)})
+        wanted = _standard_report_body(0x400, {0x1: 1})
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            _send(s, port, _frame(unwanted[:10], _MSG_TYPE_FIRST, 0, 1))
+            await asyncio.sleep(0.02)
+            # Nothing of the rejected report is buffered
+            assert not any(b.data for b in receiver._transport.get_protocol()._buffers.values())
+            _send(s, port, _frame(unwanted[10:], _MSG_TYPE_LAST, 1, 1))
+            _send(s, port, _frame(wanted, _MSG_TYPE_SINGLE, 0, 2))
+        _, report = await _next_with_timeout(receiver)
+        assert report.subset_id == 0x400
+        assert receiver.filtered == 1
+    finally:
+        await receiver.close()
+
+
+async def test_filter_by_source():
+    receiver = AsyncThingSetUDPReceiver(bind="127.0.0.1", port=0, sources={"192.0.2.1"})
+    await receiver.start()
+    try:
+        await _send_burst(receiver, [_standard_report_body(0x400, {})])
+        assert len(receiver._queue) == 0
+        assert receiver.filtered == 1
+    finally:
+        await receiver.close()
+
+
+async def test_batched_reader():
+    receiver = AsyncThingSetUDPReceiver(bind="127.0.0.1", port=0, batch_size=4)
+    await receiver.start()
+    port = receiver._transport.get_extra_info("sockname")[1]
+    try:
+        values = {k: f"value_{k}" * 10 for k in range(30)}
+        body = _standard_report_body(0x400, values)
+        half = len(body) // 2
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            for i in range(10):
+                _send(s, port, _frame(body[:half], _MSG_TYPE_FIRST, 0, i))
+                _send(s, port, _frame(body[half:], _MSG_TYPE_LAST, 1, i))
+        got = [await _next_with_timeout(receiver) for _ in range(10)]
+        assert all(report.values == values for _, report in got)
+    finally:
+        await receiver.close()
+    # Closing removes the reader and closes the socket
+    assert receiver._transport is None
+
+
 async def test_receiver_enlarges_rcvbuf():
     """The receiver requests a large SO_RCVBUF so bursts of big reports from a
     fleet of gateways aren't dropped before they're drained. We can't guarantee
@@ -0,0 +1,100 @@
+"""ShardedThingSetUDPReceiver: worker processes decode, the parent
+yields. Workers are spawned, so these take a second or so each."""
+
+import asyncio
+import functools
+import socket
+
+import cbor2
+import pytest
+
+from python_thingset.transport.sharded_udp import ShardedThingSetUDPReceiver
+
+
+def _datagram(subset_id: int, value: int, msg_num: int = 0) -> bytes:
+    body = bytes([0x1F]) + cbor2.dumps(subset_id) + cbor2.dumps({0x1: value})
+    return bytes([0x30, msg_num]) + body
+
+
+def _append(path, addr, report) -> None:
+    # Runs in a worker process
+    with open(path, "a") as f:
+        f.write(f"{report.subset_id} {report.values[0x1]}\n")
+
+
+async def _collect(receiver, count: int):
+    return [await asyncio.wait_for(receiver.__anext__(), 5) for _ in range(count)]
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def test_dispatch_keeps_order_per_source():
+    async with ShardedThingSetUDPReceiver(workers=2, bind="127.0.0.1", port=0) as receiver:
+        senders = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(4)]
+        try:
+            for i in range(10):
+                for n, sender in enumerate(senders):
+                    sender.sendto(_datagram(n, i, i), receiver.address)
+            got = await _collect(receiver, 40)
+        finally:
+            for sender in senders:
+                sender.close()
+    by_source = {}
+    for addr, report in got:
+        by_source.setdefault(addr, []).append((report.subset_id, report.values[0x1]))
+    assert len(by_source) == 4
+    for values in by_source.values():
+        assert [v for _, v in values] == list(range(10))
+        assert len({s for s, _ in values}) == 1
+
+
+async def test_reuseport_mode():
+    port = _free_port()
+    async with ShardedThingSetUDPReceiver(
+        workers=2, mode="reuseport", bind="127.0.0.1", port=port, subsets={0x400}
+    ) as receiver:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(_datagram(0x800, 1), ("127.0.0.1", port))
+            s.sendto(_datagram(0x400, 2), ("127.0.0.1", port))
+        [(_, report)] = await _collect(receiver, 1)
+        assert report.values == {0x1: 2}
+
+
+async def test_handler_runs_in_workers(tmp_path):
+    path = tmp_path / "reports.txt"
+    async with ShardedThingSetUDPReceiver(
+        workers=2,
+        bind="127.0.0.1",
+        port=0,
+        handler=functools.partial(_append, str(path)),
+        forward=False,
+    ) as receiver:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            for i in range(3):
+                s.sendto(_datagram(0x400, i, i), receiver.address)
+        for _ in range(50):
+            if path.exists() and len(path.read_text().splitlines()) == 3:
+                break
+            await asyncio.sleep(0.05)
+        assert len(receiver._queue) == 0
+    assert path.read_text().splitlines() == ["1024 0", "1024 1", "1024 2"]
+
+
+async def test_iteration_ends_on_close():
+    receiver = ShardedThingSetUDPReceiver(workers=1, bind="127.0.0.1", port=0)
+    await receiver.start()
+    await receiver.close()
+    assert [item async for item in receiver] == []
+
+
+def test_arguments_checked_up_front():
+    with pytest.raises(ValueError, match="mode"):
+        ShardedThingSetUDPReceiver(mode="hash")
+    with pytest.raises(ValueError, match="fixed port"):
+        ShardedThingSetUDPReceiver(mode="reuseport", port=0)
+    with pytest.raises(ValueError, match="IPv4"):
+        ShardedThingSetUDPReceiver(sources=["gateway"], kernel_filter=True)
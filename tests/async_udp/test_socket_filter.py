@@ -0,0 +1,120 @@
+"""BPF socket filters for AsyncThingSetUDPReceiver (Linux only for the
+kernel side; the programs themselves are built anywhere)."""
+
+import asyncio
+import socket
+import sys
+
+import cbor2
+import pytest
+
+from python_thingset import AsyncThingSetUDPReceiver
+from python_thingset.transport import _socket_filter
+
+
+linux_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="SO_ATTACH_FILTER is Linux only"
+)
+
+_BODY = bytes([0x1F]) + cbor2.dumps(0x400) + cbor2.dumps({0x1: 1})
+
+
+def _single(body: bytes = _BODY) -> bytes:
+    return bytes([0x30, 0]) + body
+
+
+def test_program_accepts_everything_without_filters():
+    assert _socket_filter.build_program() == [(0x06, 0, 0, 0xFFFFFFFF)]
+
+
+def test_program_rejects_bad_arguments():
+    with pytest.raises(ValueError, match="IPv4"):
+        _socket_filter.build_program(sources=["gateway.local"])
+    with pytest.raises(ValueError, match="unknown message type"):
+        _socket_filter.build_program(message_types=["middle"])
+    with pytest.raises(ValueError, match="too many"):
+        _socket_filter.build_program(
+            sources=[f"10.0.{i // 256}.{i % 256}" for i in range(200)]
+        )
+
+
+def _received(program, sender_ip: str, data: bytes, sender_port: int = 0) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver, socket.socket(
+        socket.AF_INET, socket.SOCK_DGRAM
+    ) as sender:
+        _socket_filter.attach(receiver, program)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(0.1)
+        sender.bind((sender_ip, sender_port))
+        sender.sendto(data, receiver.getsockname())
+        try:
+            return receiver.recv(64) == data
+        except socket.timeout:
+            return False
+
+
+@linux_only
+def test_kernel_filters_sources():
+    program = _socket_filter.build_program(sources=["127.0.0.1"])
+    assert _received(program, "127.0.0.1", _single())
+    assert not _received(program, "127.0.0.2", _single())
+
+
+@linux_only
+def test_kernel_filters_source_ports():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.2", 0))
+        port = s.getsockname()[1]
+    program = _socket_filter.build_program(sources=[("127.0.0.3", 1), ("127.0.0.2", port)])
+    assert _received(program, "127.0.0.2", _single(), port)
+    assert not _received(program, "127.0.0.3", _single(), port)
+
+
+@linux_only
+def test_kernel_filters_message_types():
+    program = _socket_filter.build_program(
+        sources=["127.0.0.1"], message_types=["single"]
+    )
+    assert _received(program, "127.0.0.1", _single())
+    assert not _received(program, "127.0.0.1", bytes([0x00, 0]) + _BODY)
+
+
+@linux_only
+async def test_receiver_kernel_filter():
+    receivers = [
+        AsyncThingSetUDPReceiver(
+            bind="127.0.0.1", port=0, sources={"127.0.0.2"}, kernel_filter=kernel
+        )
+        for kernel in (False, True)
+    ]
+    for receiver in receivers:
+        await receiver.start()
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.bind(("127.0.0.1", 0))
+            for receiver in receivers:
+                s.sendto(_single(), receiver._transport.get_extra_info("sockname"))
+        await asyncio.sleep(0.05)
+        # In Python, the datagram is seen and turned away; in the
+        # kernel, it never arrives
+        assert [r.filtered for r in receivers] == [1, 0]
+        assert all(len(r._queue) == 0 for r in receivers)
+    finally:
+        for receiver in receivers:
+            await receiver.close()
+
+
+async def test_message_types_filter_in_python():
+    receiver = AsyncThingSetUDPReceiver(bind="127.0.0.1", port=0, message_types={"single"})
+    await receiver.start()
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            address = receiver._transport.get_extra_info("sockname")
+            s.sendto(bytes([0x00, 1]) + _BODY, address)
+            s.sendto(bytes([0x21, 1]), address)
+            s.sendto(_single(), address)
+        _, report = await asyncio.wait_for(receiver.__anext__(), 1)
+        assert report.values == {0x1: 1}
+        assert len(receiver._queue) == 0
+    finally:
+        await receiver.close()
@@ -0,0 +1,229 @@
+"""CaptureWriter and CaptureReader: block-compressed capture files."""
+
+import asyncio
+import socket
+import sys
+import threading
+import time
+from typing import Union
+
+import cbor2
+import pytest
+
+from python_thingset import (
+    AsyncThingSetUDPReceiver,
+    CapturedRpc,
+    CaptureReader,
+    CaptureWriter,
+    ThingSetProtocol,
+    WireFormat,
+    capture_files,
+)
+from python_thingset._protocol import ParsedResponse
+from python_thingset.client import ThingSetClient
+from reports import report_body
+
+
+EUI = 0xBADB1B0000000001
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib", "lzma"])
+def test_round_trip(tmp_path, compression):
+    path = tmp_path / "site.tscap"
+    with CaptureWriter(path, compression=compression) as capture:
+        capture.report(("192.0.2.1", 9002), report_body(0x400, {0x1: 1.5}, eui=EUI), 10.0)
+        capture.report((0x10, "can0"), cbor2.dumps(7), 11.0, data_id=0x602)
+        capture.rpc(b"\x01\x02", b"\x85\xf6\x07", 0.004, timestamp=12.0)
+        capture.rpc(b"\x01\x03", None, 0.5, node_id=0x20, timestamp=13.0)
+
+    with CaptureReader(path) as reader:
+        assert reader.complete
+        assert reader.compression == compression
+        assert (len(reader), reader.start, reader.end) == (4, 10.0, 13.0)
+        report, single, rpc, timeout = reader
+        assert (report.source, report.eui, report.subset_id, report.timestamp) == (
+            ("192.0.2.1", 9002),
+            EUI,
+            0x400,
+            10.0,
+        )
+        assert report.decode().values == {0x1: 1.5}
+        assert single.decode().values == {0x602: 7}
+        assert rpc == CapturedRpc(12.0, None, b"\x01\x02", b"\x85\xf6\x07", 0.004)
+        assert timeout == CapturedRpc(13.0, 0x20, b"\x01\x03", None, 0.5)
+        assert [r.timestamp for r in reader.records(start=10.5, kinds=["rpc"])] == [
+            12.0,
+            13.0,
+        ]
+        with pytest.raises(ValueError):
+            list(reader.records(kinds=["frames"]))
+
+
+def test_blocks_are_skipped_by_time(tmp_path):
+    path = tmp_path / "site.tscap"
+    with CaptureWriter(path, block_size=1) as capture:
+        for i in range(10):
+            capture.report(("192.0.2.1", 9002), report_body(0x400, {0x1: i}), float(i))
+    with CaptureReader(path) as reader:
+        assert len(reader.blocks) == 10
+        got = [r.decode().values[0x1] for r in reader.records(start=3.0, end=5.0)]
+        assert got == [3, 4, 5]
+
+
+def test_rotation_keeps_the_newest_files(tmp_path):
+    path = tmp_path / "site.tscap"
+    payload = report_body(0x400, {0x1: "x" * 200})
+    with CaptureWriter(
+        path,
+        compression="none",
+        block_size=1,
+        max_bytes=1024,
+        max_files=3,
+        max_pending=64,
+    ) as capture:
+        for i in range(40):
+            capture.report(("192.0.2.1", 9002), payload, float(i))
+    assert capture.dropped == 0
+    files = capture_files(path)
+    assert len(files) == 3
+    assert files == capture.files
+    timestamps = []
+    for file in files:
+        with CaptureReader(file) as reader:
+            assert reader.complete
+            timestamps += [r.timestamp for r in reader]
+    # The oldest records went with the oldest files
+    assert timestamps == [float(i) for i in range(40 - len(timestamps), 40)]
+
+
+def test_restarted_writer_keeps_earlier_files(tmp_path):
+    path = tmp_path / "site.tscap"
+    for run in range(2):
+        with CaptureWriter(path, max_bytes=1 << 20, max_files=3) as capture:
+            capture.report(("192.0.2.1", 9002), report_body(0x400, {0x1: run}), float(run))
+    files = capture_files(path)
+    assert [f.name for f in files] == ["site.00000.tscap", "site.00001.tscap"]
+    values = []
+    for file in files:
+        with CaptureReader(file) as reader:
+            values += [r.decode().values[0x1] for r in reader]
+    assert values == [0, 1]
+
+    # Files left from earlier runs count towards max_files
+    with CaptureWriter(path, max_bytes=1 << 20, max_files=2) as capture:
+        assert capture.path.name == "site.00002.tscap"
+    assert [f.name for f in capture_files(path)] == [
+        "site.00001.tscap",
+        "site.00002.tscap",
+    ]
+
+    single = tmp_path / "single.tscap"
+    CaptureWriter(single).close()
+    with pytest.raises(FileExistsError):
+        CaptureWriter(single)
+
+
+def test_unfinished_file_is_walked(tmp_path):
+    path = tmp_path / "site.tscap"
+    capture = CaptureWriter(path)
+    try:
+        capture.report(("192.0.2.1", 9002), report_body(0x400, {0x1: 1}), 1.0)
+        capture.flush()
+        deadline = time.monotonic() + 5
+        while capture.blocks < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with CaptureReader(path) as reader:
+            assert not reader.complete
+            assert [r.timestamp for r in reader] == [1.0]
+    finally:
+        capture.close()
+
+
+def test_blocks_are_dropped_when_the_disk_falls_behind(tmp_path, monkeypatch):
+    release = threading.Event()
+    capture = CaptureWriter(tmp_path / "site.tscap", block_size=1, max_pending=1)
+    compress = capture._compress
+    monkeypatch.setattr(
+        capture, "_compress", lambda data: release.wait(5) and compress(data)
+    )
+    try:
+        for i in range(5):
+            capture.report(("192.0.2.1", 9002), b"\x1f\x00\xa0", float(i))
+        # One block being compressed, one waiting; the rest dropped
+        assert capture.dropped >= 3
+    finally:
+        release.set()
+        capture.close()
+    with CaptureReader(capture.path) as reader:
+        assert len(reader) == 5 - capture.dropped
+
+
+class _Client(ThingSetClient):
+    def __init__(self) -> None:
+        self._protocol = ThingSetProtocol(WireFormat.BINARY)
+        self._response: Union[ParsedResponse, None] = None
+
+    def _send(self, data: bytes, node_id) -> None:
+        self._response = self._protocol.parse_response(b"\x85\xf6\x18\x2a")
+
+    def _recv(self):
+        return self._response
+
+    def disconnect(self) -> None:
+        pass
+
+
+async def test_receiver_and_client_feed_a_capture(tmp_path):
+    path = tmp_path / "site.tscap"
+    capture = CaptureWriter(path)
+    client = _Client()
+    client.rpc_sink = capture.rpc
+    receiver = AsyncThingSetUDPReceiver(
+        bind="127.0.0.1", port=0, payload_sink=capture.report
+    )
+    await receiver.start()
+    try:
+        address = receiver._transport.get_extra_info("sockname")
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(bytes([0x30, 0]) + report_body(0x400, {0x1: 3}), address)
+            sender = s.getsockname()
+        addr, report = await asyncio.wait_for(receiver.__anext__(), 1)
+        assert client.get(0x401).values[0].value == 42
+    finally:
+        await receiver.close()
+        capture.close()
+    with CaptureReader(path) as reader:
+        captured, rpc = reader
+    assert captured.source == addr == ("127.0.0.1", sender[1])
+    assert captured.decode() == report
+    assert rpc.request == client._protocol.encode_get(0x401)
+    assert rpc.response == b"\x85\xf6\x18\x2a"
+    assert rpc.latency >= 0
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="SO_TIMESTAMPNS")
+async def test_batched_receiver_passes_kernel_receive_time():
+    got = []
+    receiver = AsyncThingSetUDPReceiver(
+        bind="127.0.0.1",
+        port=0,
+        queue_reports=False,
+        batch_size=16,
+        payload_sink=lambda addr, payload, timestamp: got.append(timestamp),
+    )
+    await receiver.start()
+    try:
+        address = receiver._transport.get_extra_info("sockname")
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            sent_at = time.time()
+            s.sendto(bytes([0x30, 0]) + report_body(0x400, {0x1: 3}), address)
+        # Held up before the loop gets to read it
+        time.sleep(0.2)
+        for _ in range(100):
+            if got:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await receiver.close()
+    assert len(got) == 1
+    assert sent_at - 0.01 <= got[0] < sent_at + 0.1
@@ -0,0 +1,267 @@
+"""replay(): captured traffic pushed back through the receivers."""
+
+import asyncio
+import socket
+import struct
+
+import cbor2
+import pytest
+
+from python_thingset import (
+    AsyncThingSetCANReportReceiver,
+    AsyncThingSetUDPReceiver,
+    CaptureWriter,
+    Datagram,
+    read_candump,
+    read_capture,
+    read_pcap,
+    replay,
+)
+from reports import report_body
+
+
+def _capture(path, count: int, step: float = 0.001, size: int = 0) -> None:
+    with CaptureWriter(path) as capture:
+        for i in range(count):
+            values = {0x1: i, 0x2: "x" * size} if size else {0x1: i}
+            capture.report(("192.0.2.1", 9002), report_body(0x400, values), 100.0 + i * step)
+
+
+def _reports(receiver):
+    got = []
+    receiver.add_callback(lambda addr, report: got.append((addr, report)))
+    return got
+
+
+async def test_capture_into_udp_receiver(tmp_path):
+    path = tmp_path / "site.tscap"
+    _capture(path, 500)
+    receiver = AsyncThingSetUDPReceiver(queue_reports=False)
+    got = _reports(receiver)
+    stats = await replay(read_capture(path), receiver, speed=None)
+    assert (stats.items, stats.sent, stats.skipped) == (500, 500, 0)
+    assert (stats.reports_sent, stats.reports_received, stats.dropped) == (500, 500, 0)
+    assert len(stats.latencies) == 500
+    assert 0 <= stats.latency(50) <= stats.latency(100)
+    assert [report.values[0x1] for _, report in got] == list(range(500))
+    assert got[0][0] == ("192.0.2.1", 9002)
+    assert "500 received, 0 dropped" in str(stats)
+
+
+async def test_running_receiver_is_left_as_it_was(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    path = tmp_path / "site.tscap"
+    _capture(path, 10)
+    with ThreadPoolExecutor(1) as executor:
+        receiver = AsyncThingSetUDPReceiver(
+            bind="127.0.0.1", port=0, queue_reports=False, decode_executor=executor
+        )
+        await receiver.start()
+        offload = receiver._offload
+        try:
+            stats = await replay(read_capture(path), receiver, speed=None)
+            assert receiver._offload is offload
+        finally:
+            await receiver.close()
+    assert stats.reports_received == 10
+
+
+async def test_large_reports_are_split_into_datagrams(tmp_path):
+    path = tmp_path / "site.tscap"
+    _capture(path, 3, size=4000)
+    receiver = AsyncThingSetUDPReceiver(queue_reports=False)
+    got = _reports(receiver)
+    stats = await replay(read_capture(path), receiver, speed=None)
+    assert stats.sent == 9
+    assert stats.reports_received == 3
+    assert [report.values[0x2] for _, report in got] == ["x" * 4000] * 3
+
+
+async def test_speed_scales_the_recording(tmp_path):
+    path = tmp_path / "site.tscap"
+    # 0.5 s of traffic
+    _capture(path, 51, step=0.01)
+    receiver = AsyncThingSetUDPReceiver(queue_reports=False)
+    stats = await replay(read_capture(path), receiver, speed=10)
+    assert 0.045 <= stats.elapsed < 0.5
+    assert stats.reports_received == 51
+    with pytest.raises(ValueError):
+        await replay([], receiver, speed=0)
+
+
+async def test_udp_socket_target(tmp_path):
+    path = tmp_path / "site.tscap"
+    _capture(path, 50)
+    receiver = AsyncThingSetUDPReceiver(bind="127.0.0.1", port=0, queue_reports=False)
+    await receiver.start()
+    try:
+        address = receiver._transport.get_extra_info("sockname")
+        stats = await replay(
+            read_capture(path), address, speed=None, receiver=receiver, settle=0.2
+        )
+    finally:
+        await receiver.close()
+    assert stats.reports_sent == 50
+    assert stats.reports_received + stats.dropped == 50
+    # Nothing to watch: counts of what was sent only
+    stats = await replay(read_capture(path), ("127.0.0.1", 9), speed=None)
+    assert (stats.reports_sent, stats.reports_received, stats.dropped) == (50, None, None)
+
+
+async def test_udp_socket_target_keeps_sources_apart():
+    body = report_body(0x400, {0x1: "x" * 2000})
+    first, last = body[:1000], body[1000:]
+    items = [
+        Datagram(1.0, ("192.0.2.1", 5000), bytes([0x00, 7]) + first),
+        Datagram(1.0, ("192.0.2.2", 5000), bytes([0x00, 3]) + first),
+        Datagram(1.0, ("192.0.2.1", 5000), bytes([0x21, 7]) + last),
+        Datagram(1.0, ("192.0.2.2", 5000), bytes([0x21, 3]) + last),
+    ]
+    receiver = AsyncThingSetUDPReceiver(bind="127.0.0.1", port=0, queue_reports=False)
+    got = _reports(receiver)
+    await receiver.start()
+    try:
+        address = receiver._transport.get_extra_info("sockname")
+        stats = await replay(items, address, speed=None, receiver=receiver, settle=0.2)
+    finally:
+        await receiver.close()
+    assert (stats.reports_sent, stats.reports_received) == (2, 2)
+    assert len({addr for addr, _ in got}) == 2
+
+
+async def test_candump_into_can_receiver(tmp_path):
+    value = cbor2.dumps(42).hex().upper()
+    body = report_body(0x400, {0x1: "y" * 100})
+    single = 0x7 << 26 | 0x2 << 24 | 0x602 << 8 | 0x10
+    lines = [f"(1700000000.000000) can0 {single:08X}#{value}"]
+    chunks = [body[i : i + 64] for i in range(0, len(body), 64)]
+    for seq, chunk in enumerate(chunks):
+        mft = 0x0 if seq == 0 else 0x2
+        can_id = 0x7 << 26 | 0x1 << 24 | mft << 12 | seq << 8 | 0x20
+        lines.append(f"(1700000000.{seq + 1:06d}) can0 {can_id:08X}##0{chunk.hex().upper()}")
+    # A classic 11-bit frame, not a report
+    lines.append("(1700000000.100000) can0 123#DEADBEEF")
+    path = tmp_path / "candump.log"
+    path.write_text("\n".join(lines) + "\n")
+
+    receiver = AsyncThingSetCANReportReceiver(bus="replay", interface="virtual", fd=True)
+    got = _reports(receiver)
+    try:
+        stats = await replay(read_candump(path), receiver, speed=None)
+    finally:
+        await receiver.close()
+    assert (stats.items, stats.sent, stats.reports_sent) == (4, 4, 2)
+    assert stats.reports_received == 2
+    assert [(addr[0], report.values) for addr, report in got] == [
+        (0x10, {0x602: 42}),
+        (0x20, {0x1: "y" * 100}),
+    ]
+
+
+async def test_captured_can_reports_are_framed_again(tmp_path):
+    path = tmp_path / "site.tscap"
+    with CaptureWriter(path) as capture:
+        capture.report((0x10, "can0"), cbor2.dumps(7), 1.0, data_id=0x602)
+        capture.report((0x20, "can0"), report_body(0x400, {0x1: "z" * 300}), 2.0)
+        capture.report(("192.0.2.1", 9002), report_body(0x400, {0x1: 1}), 3.0)
+    receiver = AsyncThingSetCANReportReceiver(bus="replay", interface="virtual", fd=True)
+    got = _reports(receiver)
+    try:
+        stats = await replay(read_capture(path), receiver, speed=None)
+    finally:
+        await receiver.close()
+    # The UDP report has no place on a CAN bus
+    assert (stats.items, stats.skipped, stats.reports_received) == (3, 1, 2)
+    assert [report.values for _, report in got] == [{0x602: 7}, {0x1: "z" * 300}]
+
+
+def _pcap(packets, link_type: int = 1) -> bytes:
+    out = struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, link_type)
+    for ts, packet in packets:
+        out += struct.pack("<IIII", int(ts), round(ts % 1 * 1e6), len(packet), len(packet))
+        out += packet
+    return out
+
+
+def _ipv4_udp(src: str, sport: int, dport: int, payload: bytes, frag: int = 0) -> bytes:
+    udp = struct.pack("!HHHH", sport, dport, 8 + len(payload), 0) + payload
+    ip = struct.pack(
+        "!BBHHHBBH4s4s",
+        0x45,
+        0,
+        20 + len(udp),
+        0,
+        frag,
+        64,
+        socket.IPPROTO_UDP,
+        0,
+        socket.inet_aton(src),
+        socket.inet_aton("192.0.2.255"),
+    )
+    return ip + udp
+
+
+def _ethernet(ip: bytes, vlan: bool = False) -> bytes:
+    header = b"\xff" * 6 + b"\x02" * 6
+    if vlan:
+        header += b"\x81\x00\x00\x05"
+    return header + b"\x08\x00" + ip
+
+
+def test_pcap_yields_report_datagrams(tmp_path):
+    report = bytes([0x30, 0]) + report_body(0x400, {0x1: 1})
+    path = tmp_path / "site.pcap"
+    path.write_bytes(
+        _pcap(
+            [
+                (10.25, _ethernet(_ipv4_udp("192.0.2.1", 5000, 9002, report))),
+                (10.5, _ethernet(_ipv4_udp("192.0.2.1", 5000, 53, b"dns"))),
+                (10.75, _ethernet(_ipv4_udp("192.0.2.2", 5001, 9002, report), vlan=True)),
+                # A fragment
+                (11.0, _ethernet(_ipv4_udp("192.0.2.3", 5002, 9002, report, frag=0x2000))),
+                # ARP
+                (11.25, b"\xff" * 12 + b"\x08\x06" + bytes(28)),
+            ]
+        )
+    )
+    assert list(read_pcap(path)) == [
+        Datagram(10.25, ("192.0.2.1", 5000), report),
+        Datagram(10.75, ("192.0.2.2", 5001), report),
+    ]
+
+    cooked = tmp_path / "any.pcap"
+    sll = b"\x00\x00\x00\x01\x00\x06" + bytes(8) + b"\x08\x00"
+    cooked.write_bytes(
+        _pcap([(1.0, sll + _ipv4_udp("192.0.2.1", 5000, 9002, report))], link_type=113)
+    )
+    assert [d.source for d in read_pcap(cooked)] == [("192.0.2.1", 5000)]
+
+    pcapng = tmp_path / "site.pcapng"
+    pcapng.write_bytes(struct.pack("<II", 0x0A0D0D0A, 28) + bytes(20))
+    with pytest.raises(ValueError):
+        list(read_pcap(pcapng))
+
+
+async def test_pcap_into_udp_receiver(tmp_path):
+    path = tmp_path / "site.pcap"
+    path.write_bytes(
+        _pcap(
+            [
+                (
+                    1.0 + i * 0.001,
+                    _ethernet(
+                        _ipv4_udp(
+                            "192.0.2.1", 5000, 9002, bytes([0x30, i]) + report_body(0x400, {0x1: i})
+                        )
+                    ),
+                )
+                for i in range(20)
+            ]
+        )
+    )
+    receiver = AsyncThingSetUDPReceiver(queue_reports=False)
+    got = _reports(receiver)
+    stats = await asyncio.wait_for(replay(read_pcap(path), receiver, speed=None), 5)
+    assert stats.reports_received == 20
+    assert [addr for addr, _ in got] == [("192.0.2.1", 5000)] * 20
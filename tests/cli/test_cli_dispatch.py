@@ -4,11 +4,12 @@
   responses based on what the user typed.
 - ``_node_id_for`` extracts the CAN target address and returns None
   for TCP / serial invocations.
+- ``_device_key`` names the device in the schema cache.
 """
 
 import argparse
 
-from python_thingset.cli import _node_id_for, _op_hint
+from python_thingset.cli import _device_key, _node_id_for, _op_hint
 
 
 def _ns(**overrides) -> argparse.Namespace:
@@ -28,6 +29,7 @@ def _ns(**overrides) -> argparse.Namespace:
         baud_rate=115200,
         ip=None,
         target_eui=None,
+        schema_cache=None,
     )
     defaults.update(overrides)
     return argparse.Namespace(**defaults)
@@ -102,3 +104,22 @@ def test_node_id_for_tcp_with_target_eui_is_still_none():
 def test_node_id_for_can_without_target_address_is_none():
     # Argparse would normally reject this, but defensive code should cope
     assert _node_id_for(_ns(can_bus="vcan0", target_address=None)) is None
+
+
+# ---------- _device_key ----------
+
+def test_device_key_tcp_is_ip():
+    assert _device_key(_ns(ip="192.0.2.1")) == "192.0.2.1"
+
+
+def test_device_key_forwarded_is_target_eui():
+    key = _device_key(_ns(ip="192.0.2.1", target_eui="badb1b0000000001"))
+    assert key == 0xBADB1B0000000001
+
+
+def test_device_key_can_is_bus_and_node():
+    assert _device_key(_ns(can_bus="vcan0", target_address="A")) == "vcan0:0a"
+
+
+def test_device_key_serial_is_none():
+    assert _device_key(_ns(port="/dev/ttyACM0")) is None
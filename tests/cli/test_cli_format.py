@@ -107,3 +107,70 @@ def test_names_map_propagates_through_nested_containers():
     # Inner dicts inside list values should also pick up the names map
     names = {0x6E: ("cEUI", "u64")}
     assert _fmt({0x9: [{0x6E: 1}]}, names) == "{0x9: [{0x6E cEUI: 1}]}"
+
+
+def test_resolve_names_prefers_cached_tree():
+    """IDs the cached schema knows are labelled without a round-trip;
+    only unknown ones reach the device."""
+    from python_thingset import SchemaNode, SchemaTree, WireFormat
+    from python_thingset.cli import _resolve_names
+
+    node = SchemaNode(id=0xF03, name="rBoard", type="string", access=7, path="Metadata/rBoard")
+    tree = SchemaTree(root=[node], by_id={0xF03: node}, by_path={node.path: node})
+
+    class _NoDevice:
+        wire_format = WireFormat.BINARY
+
+        def __init__(self):
+            self.asked = []
+
+        def fetch(self, parent_id, ids, node_id=None):
+            self.asked.append(list(ids))
+            return None
+
+    ts = _NoDevice()
+    assert _resolve_names(ts, [0xF03], tree=tree) == {0xF03: ("rBoard", "string")}
+    assert ts.asked == []
+    assert _resolve_names(ts, [0xF03, 0xF05], tree=tree) == {0xF03: ("rBoard", "string")}
+    assert ts.asked == [[0xF05]]
+
+
+def test_cached_tree_checks_the_fingerprint(tmp_path):
+    """Output is only labelled from the cache while the firmware is
+    the one the cached schema came from, checked once the entry is
+    older than the TTL."""
+    import argparse
+
+    from python_thingset import SchemaCache, SchemaNode, SchemaTree, ThingSetStatus, WireFormat
+    from python_thingset.cli import _cached_tree
+    from python_thingset.response import ThingSetResponse
+    from python_thingset.schema_cache import schema_fingerprint
+
+    node = SchemaNode(id=0xF03, name="rBoard", type="string", access=7, path="Metadata/rBoard")
+    tree = SchemaTree(root=[node], by_id={0xF03: node}, by_path={node.path: node})
+    cache = SchemaCache(tmp_path)
+    fingerprint = schema_fingerprint({0xF01: "v1"})
+    cache.store("192.0.2.1", fingerprint, tree, 0, checked_at=0.0)
+
+    class _Device:
+        wire_format = WireFormat.BINARY
+
+        def __init__(self, build):
+            self.build = build
+            self.gets = []
+
+        def get(self, value_id, node_id=None):
+            self.gets.append(value_id)
+            return ThingSetResponse(ThingSetStatus.CONTENT, "CONTENT", data=self.build)
+
+    args = argparse.Namespace(
+        schema_cache=str(tmp_path), ip="192.0.2.1", target_eui=None, can_bus=None
+    )
+    assert _cached_tree(_Device({0xF01: "v2"}), args) is None
+    same = _Device({0xF01: "v1"})
+    assert _cached_tree(same, args).by_id[0xF03].name == "rBoard"
+    assert same.gets == [0x0F]
+    # Checked just now: no round trip until the TTL runs out
+    assert _cached_tree(same, args) is not None
+    assert same.gets == [0x0F]
+
@@ -0,0 +1,103 @@
+import array
+import struct
+
+import cbor2
+import pytest
+
+from python_thingset import ThingSetProtocol, WireFormat
+from python_thingset.encoders import ThingSetBinaryEncoder
+
+
+encoder = ThingSetBinaryEncoder()
+
+VALUES = [1.5, -2.25, 3.14, 0.0, 1e30]
+
+
+def _f32(values):
+    return [struct.unpack(">f", struct.pack(">f", v))[0] for v in values]
+
+
+def _payload(encoded: bytes):
+    return cbor2.loads(encoded[2:])[0x4F]
+
+
+def _assert_f32_array(encoded: bytes, values):
+    assert _payload(encoded) == _f32(values)
+    # every element is a 0xFA single-precision float
+    assert encoded.count(b"\xfa") >= len(values)
+    assert b"\xfb" not in encoded and b"\xf9" not in encoded
+
+
+def test_array_f():
+    _assert_f32_array(encoder.encode_update(0x0, 0x4F, array.array("f", VALUES)), VALUES)
+
+
+def test_array_d_narrowed_to_f32():
+    _assert_f32_array(encoder.encode_update(0x0, 0x4F, array.array("d", VALUES)), VALUES)
+
+
+def test_memoryview():
+    view = memoryview(array.array("d", VALUES))
+    _assert_f32_array(encoder.encode_update(0x0, 0x4F, view), VALUES)
+
+
+def test_exact_bytes():
+    encoded = encoder.encode_update(0x0, 0x4F, array.array("f", [1.0, -2.0]))
+    assert encoded == (
+        b"\x07\x00\xa1\x18O\x82" + b"\xfa\x3f\x80\x00\x00" + b"\xfa\xc0\x00\x00\x00"
+    )
+
+
+def test_long_array_header():
+    values = array.array("f", range(300))
+    encoded = encoder.encode_update(0x0, 0x4F, values)
+    assert encoded[5:8] == b"\x99\x01\x2c"
+    assert _payload(encoded) == [float(v) for v in range(300)]
+
+
+def test_empty():
+    assert _payload(encoder.encode_update(0x0, 0x4F, array.array("f"))) == []
+
+
+def test_exec_args():
+    encoded = encoder.encode_exec(0x60, [array.array("f", VALUES), 1])
+    assert cbor2.loads(encoded[3:]) == [_f32(VALUES), 1]
+
+
+def test_typed_array():
+    typed = ThingSetBinaryEncoder(typed_arrays=True)
+    encoded = typed.encode_update(0x0, 0x4F, array.array("f", [1.0, -2.0]))
+    assert encoded == (
+        b"\x07\x00\xa1\x18O\xd8\x55\x48" + b"\x00\x00\x80\x3f" + b"\x00\x00\x00\xc0"
+    )
+    tag = _payload(encoded)
+    assert tag.tag == 85
+    assert array.array("f", tag.value).tolist() == [1.0, -2.0]
+
+
+def test_scalars_and_lists_unchanged():
+    typed = ThingSetBinaryEncoder(typed_arrays=True)
+    assert typed.encode_update(0x0, 0x4F, 3.14) == encoder.encode_update(0x0, 0x4F, 3.14)
+    assert typed.encode_update(0x0, 0x4F, VALUES) == encoder.encode_update(
+        0x0, 0x4F, VALUES
+    )
+    assert encoder.encode_update(0x0, 0x4F, [1, 2]) == b"\x07\x00\xa1\x18O\x82\x01\x02"
+
+
+def test_protocol_typed_arrays_flag():
+    protocol = ThingSetProtocol(WireFormat.BINARY, typed_arrays=True)
+    assert protocol.typed_arrays
+    protocol.typed_arrays = False
+    assert protocol.encode_update(0x0, 0x4F, array.array("f", [1.0]))[-5:] == (
+        b"\xfa\x3f\x80\x00\x00"
+    )
+    with pytest.raises(ValueError):
+        ThingSetProtocol(WireFormat.TEXT).typed_arrays = True
+
+
+def test_numpy():
+    np = pytest.importorskip("numpy")
+    values = np.array(VALUES, dtype=np.float64)
+    _assert_f32_array(encoder.encode_update(0x0, 0x4F, values), VALUES)
+    _assert_f32_array(encoder.encode_update(0x0, 0x4F, values.astype(np.float32)), VALUES)
+
@@ -0,0 +1,134 @@
+"""Tests for the schema-typed value codecs."""
+
+import array
+
+import cbor2
+import pytest
+
+from python_thingset.codec import (
+    ArrayCodec,
+    Float32,
+    FunctionCodec,
+    ValueCodec,
+    cbor_default,
+    codec_for,
+)
+from python_thingset.encoders import ThingSetBinaryEncoder
+
+
+def _dumps(value) -> bytes:
+    return cbor2.dumps(value, canonical=True, default=cbor_default)
+
+
+@pytest.mark.parametrize(
+    "type_str,good,bad",
+    [
+        ("u8", [0, 255], [-1, 256]),
+        ("i8", [-128, 127], [-129, 128]),
+        ("u16", [0, 0xFFFF], [0x10000]),
+        ("i32", [-(2**31), 2**31 - 1], [2**31]),
+        ("u64", [0, 2**64 - 1], [-1, 2**64]),
+    ],
+)
+def test_integer_ranges(type_str, good, bad):
+    codec = codec_for(type_str)
+    for value in good:
+        assert codec.encode(value) == value
+    for value in bad:
+        with pytest.raises(ValueError, match=type_str):
+            codec.encode(value)
+
+
+def test_integer_rejects_other_types():
+    codec = codec_for("u16")
+    assert codec.encode(3.0) == 3
+    for value in (True, 3.5, "3", None):
+        with pytest.raises(ValueError):
+            codec.encode(value)
+
+
+def test_f32_always_encodes_single_precision():
+    codec = codec_for("f32")
+    # 3.5 would shrink to a half-precision float under canonical CBOR
+    assert _dumps(codec.encode(3.5)) == b"\xfa\x40\x60\x00\x00"
+    assert _dumps(codec.encode(1)) == b"\xfa\x3f\x80\x00\x00"
+    with pytest.raises(ValueError):
+        codec.encode(1e39)
+    with pytest.raises(ValueError):
+        codec.encode("1.0")
+
+
+def test_f64_keeps_double_precision():
+    assert codec_for("f64").encode(0.1) == 0.1
+
+
+def test_bool_and_string():
+    assert codec_for("bool").encode("TRUE") is True
+    assert codec_for("bool").encode(False) is False
+    with pytest.raises(ValueError):
+        codec_for("bool").encode(1)
+    assert codec_for("string").encode("true") == "true"
+    with pytest.raises(ValueError):
+        codec_for("string").encode(5)
+
+
+def test_arrays():
+    codec = codec_for("f32[]")
+    assert isinstance(codec, ArrayCodec)
+    assert _dumps(codec.encode([1.0, 2.5])) == (
+        b"\x82\xfa\x3f\x80\x00\x00\xfa\x40\x20\x00\x00"
+    )
+    assert _dumps(codec.encode(array.array("d", [1.0]))) == b"\x81\xfa\x3f\x80\x00\x00"
+    with pytest.raises(ValueError, match="u8"):
+        codec_for("u8[]").encode([1, 300])
+    with pytest.raises(ValueError, match="at most 2"):
+        codec_for("u8[2]").encode([1, 2, 3])
+    with pytest.raises(ValueError):
+        codec_for("u8[]").encode("abc")
+
+
+def test_array_decoding():
+    codec = codec_for("u16[]")
+    assert codec.decode([1, 2]) == [1, 2]
+    decoded = codec.decode([1, 2], "array")
+    assert isinstance(decoded, array.array)
+    assert decoded.typecode == "H"
+    assert list(codec_for("f32[]").decode([1, 2.5], "array")) == [1.0, 2.5]
+    # string arrays stay lists
+    assert codec_for("string[]").decode(["a"], "array") == ["a"]
+
+
+def test_numpy_decoding():
+    np = pytest.importorskip("numpy")
+    decoded = codec_for("f32[]").decode([1.0, 2.5], "numpy")
+    assert decoded.dtype == np.float32
+
+
+def test_function_arguments():
+    codec = codec_for("(u8,f32)->(i32)")
+    assert isinstance(codec, FunctionCodec)
+    assert codec.encode([1, 2.0]) == [1, Float32(2.0)]
+    with pytest.raises(ValueError, match="2 argument"):
+        codec.encode([1])
+    with pytest.raises(ValueError):
+        codec.encode([256, 2.0])
+    assert codec_for("()->()").encode(None) == []
+    assert codec.decode(7) == 7
+
+
+def test_unknown_types_pass_through():
+    for type_str in ("group", "record[]", "decfrac"):
+        codec = codec_for(type_str)
+        assert type(codec) is ValueCodec
+        assert codec.encode({1: 2}) == {1: 2}
+
+
+def test_encoder_without_coercion():
+    encoder = ThingSetBinaryEncoder()
+    # A string value that happens to read "true" stays a string
+    assert encoder.encode_update(0x0F, 0xF03, "true", coerce=False) == (
+        b"\x07\x0f\xa1\x19\x0f\x03dtrue"
+    )
+    assert encoder.encode_exec(0xF09, [Float32(3.5)], coerce=False) == (
+        b"\x02\x19\x0f\t\x81\xfa\x40\x60\x00\x00"
+    )
@@ -0,0 +1,132 @@
+"""DecodeOffload: big reports decode in an executor, in order per
+source."""
+
+import asyncio
+import socket
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from python_thingset import AsyncThingSetUDPReceiver, ThingSetProtocol, WireFormat
+from python_thingset.decode_offload import DecodeOffload
+from reports import report_body
+
+
+_BIG = {k: f"module-{k}" * 8 for k in range(100)}
+
+
+class _GatedExecutor(Executor):
+    """Runs nothing until release() is called."""
+
+    def __init__(self):
+        self.held = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.held.append((future, fn, args))
+        return future
+
+    def release(self):
+        held, self.held = self.held, []
+        for future, fn, args in held:
+            future.set_result(fn(*args))
+
+
+async def _settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+async def test_order_kept_per_source():
+    executor = _GatedExecutor()
+    delivered = []
+    offload = DecodeOffload(
+        ThingSetProtocol(WireFormat.BINARY),
+        executor,
+        lambda key, report: delivered.append((key, report.subset_id)),
+        threshold=1000,
+    )
+    offload.decode("a", report_body(1, _BIG))
+    offload.decode("a", report_body(2, {}))
+    offload.decode("b", report_body(3, {}))
+    assert delivered == [("b", 3)]
+    assert offload.pending == 1
+    executor.release()
+    await _settle()
+    assert delivered == [("b", 3), ("a", 1), ("a", 2)]
+    assert offload.pending == 0
+
+
+async def test_rejected_header_never_leaves_the_loop():
+    executor = _GatedExecutor()
+    offload = DecodeOffload(
+        ThingSetProtocol(WireFormat.BINARY), executor, lambda *_: None, threshold=10
+    )
+    offload.decode("a", report_body(1, _BIG, eui=5), accept=lambda eui, subset_id: eui == 6)
+    assert executor.held == [] and offload.offloaded == 0
+
+
+async def test_decodes_inline_beyond_max_pending():
+    executor = _GatedExecutor()
+    delivered = []
+    offload = DecodeOffload(
+        ThingSetProtocol(WireFormat.BINARY),
+        executor,
+        lambda key, report: delivered.append(report.subset_id),
+        threshold=10,
+        max_pending=1,
+    )
+    offload.decode("a", report_body(1, _BIG))
+    offload.decode("a", report_body(2, _BIG))
+    # Decoded already, but still behind the first
+    assert len(executor.held) == 1 and delivered == []
+    executor.release()
+    await _settle()
+    assert delivered == [1, 2]
+
+
+async def test_failed_decode_does_not_block_source():
+    class Failing(_GatedExecutor):
+        def release(self):
+            for future, _, _ in self.held:
+                future.set_exception(RuntimeError("worker died"))
+
+    executor = Failing()
+    delivered = []
+    offload = DecodeOffload(
+        ThingSetProtocol(WireFormat.BINARY),
+        executor,
+        lambda key, report: delivered.append(report.subset_id),
+        threshold=10,
+    )
+    offload.decode("a", report_body(1, _BIG))
+    offload.decode("a", report_body(2, {}))
+    executor.release()
+    await _settle()
+    assert delivered == [2]
+
+
+async def _receive_with(executor):
+    receiver = AsyncThingSetUDPReceiver(
+        bind="127.0.0.1", port=0, decode_executor=executor, decode_threshold=1000
+    )
+    await receiver.start()
+    address = receiver._transport.get_extra_info("sockname")
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(bytes([0x30, 0]) + report_body(1, _BIG), address)
+            s.sendto(bytes([0x30, 1]) + report_body(2, {0x1: 1}), address)
+        got = [await asyncio.wait_for(receiver.__anext__(), 5) for _ in range(2)]
+        assert [r.subset_id for _, r in got] == [1, 2]
+        assert got[0][1].values == _BIG
+        assert receiver._offload.offloaded == 1
+    finally:
+        await receiver.close()
+
+
+async def test_udp_receiver_thread_pool():
+    with ThreadPoolExecutor(2) as executor:
+        await _receive_with(executor)
+
+
+async def test_udp_receiver_process_pool():
+    with ProcessPoolExecutor(1) as executor:
+        await _receive_with(executor)
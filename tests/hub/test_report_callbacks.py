@@ -0,0 +1,62 @@
+"""Tests for inline report callbacks and their time budgets."""
+
+import time
+
+from python_thingset import ThingSetReport
+from python_thingset.report_callbacks import ReportCallbacks
+
+
+A = ("192.0.2.1", 9002)
+REPORT = ThingSetReport(1, {0x401: 3.5})
+
+
+def test_dispatch_in_order_and_remove():
+    callbacks = ReportCallbacks()
+    calls = []
+    first = callbacks.add(lambda addr, r: calls.append(("first", addr)))
+    callbacks.add(lambda addr, r: calls.append(("second", addr)))
+    callbacks.dispatch(A, REPORT)
+    callbacks.remove(first)
+    callbacks.dispatch(A, REPORT)
+    assert calls == [("first", A), ("second", A), ("second", A)]
+    assert first.stats.calls == 1
+    assert len(callbacks) == 1
+
+
+def test_overrun_counted_and_logged_once_a_second(caplog):
+    callbacks = ReportCallbacks()
+    slow = callbacks.add(lambda addr, r: time.sleep(0.002), budget=0.0005)
+    for _ in range(3):
+        callbacks.dispatch(A, REPORT)
+    assert slow.stats.calls == slow.stats.overruns == 3
+    assert slow.stats.worst_time >= 0.002
+    assert caplog.text.count("budget") == 1
+
+
+def test_error_does_not_stop_others(caplog):
+    callbacks = ReportCallbacks()
+    calls = []
+
+    def boom(addr, report):
+        raise RuntimeError("boom")
+
+    failing = callbacks.add(boom)
+    callbacks.add(lambda addr, r: calls.append(r))
+    callbacks.dispatch(A, REPORT)
+    assert calls == [REPORT]
+    assert failing.stats.errors == 1
+    assert "raised" in caplog.text
+
+
+def test_callback_may_remove_itself():
+    callbacks = ReportCallbacks()
+    calls = []
+
+    def once(addr, report):
+        calls.append(report)
+        callbacks.remove(entry)
+
+    entry = callbacks.add(once)
+    callbacks.dispatch(A, REPORT)
+    callbacks.dispatch(A, REPORT)
+    assert len(calls) == 1
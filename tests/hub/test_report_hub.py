@@ -0,0 +1,106 @@
+"""Tests for ReportHub fan-out, per-subscription overflow and filters."""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from python_thingset import ReportHub, ThingSetReport
+
+
+EUI = 0xBADB1B0000000001
+A = ("192.0.2.1", 9002)
+B = ("192.0.2.2", 9002)
+
+
+class _Source:
+    """Async iterable fed by the test."""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self.queue.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+
+def _queued(subscription) -> List:
+    return [subscription.get_nowait() for _ in range(len(subscription))]
+
+
+async def _drain(subscription) -> List:
+    return [item async for item in subscription]
+
+
+async def test_every_subscription_gets_every_report():
+    source = _Source()
+    async with ReportHub(source) as hub:
+        first, second = hub.subscribe(), hub.subscribe()
+        reports = [ThingSetReport(1, {0x401: i}) for i in range(3)]
+        for report in reports:
+            source.queue.put_nowait((A, report))
+        source.queue.put_nowait(None)
+        got = await asyncio.wait_for(
+            asyncio.gather(_drain(first), _drain(second)), 1
+        )
+    assert [r for _, r in got[0]] == reports
+    assert [r for _, r in got[1]] == reports
+    # Delivered by reference: decoded once
+    assert got[0][0][1] is got[1][0][1]
+
+
+def test_overflow_policies():
+    hub = ReportHub(_Source())
+    newest = hub.subscribe(maxsize=2)
+    oldest = hub.subscribe(maxsize=2, overflow="drop_oldest")
+    for i in range(4):
+        hub.publish(A, ThingSetReport(1, {1: i}))
+    assert [newest.get_nowait()[1].values[1] for _ in range(2)] == [0, 1]
+    assert [oldest.get_nowait()[1].values[1] for _ in range(2)] == [2, 3]
+    assert newest.dropped == oldest.dropped == 2
+    with pytest.raises(ValueError):
+        hub.subscribe(overflow="block")
+
+
+def test_filters():
+    hub = ReportHub(_Source())
+    by_source = hub.subscribe(sources=["192.0.2.2"])
+    by_eui = hub.subscribe(euis={EUI})
+    by_subset = hub.subscribe(subsets={2})
+    by_id = hub.subscribe(ids={0x402})
+    hub.publish(A, ThingSetReport(1, {0x401: 1}, EUI))
+    hub.publish(B, ThingSetReport(2, {0x402: 1}))
+    assert [a for a, _ in _queued(by_source)] == [B]
+    assert [r.eui for _, r in _queued(by_eui)] == [EUI]
+    assert [r.subset_id for _, r in _queued(by_subset)] == [2]
+    assert [r.subset_id for _, r in _queued(by_id)] == [2]
+
+
+async def test_close_subscription():
+    source = _Source()
+    async with ReportHub(source) as hub:
+        subscription = hub.subscribe()
+        with subscription:
+            hub.publish(A, ThingSetReport(1, {}))
+        hub.publish(A, ThingSetReport(2, {}))
+        assert hub.subscriptions == []
+        assert [r.subset_id for _, r in await _drain(subscription)] == [1]
+
+
+async def test_source_failure_ends_subscriptions(caplog):
+    class _Broken:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            raise OSError("socket gone")
+
+    async with ReportHub(_Broken()) as hub:
+        subscription = hub.subscribe()
+        assert await asyncio.wait_for(_drain(subscription), 1) == []
+    assert "source failed" in caplog.text
@@ -0,0 +1,137 @@
+"""Tests for ReportQueue overflow policies."""
+
+import asyncio
+
+import pytest
+
+from python_thingset import OverflowPolicy, ReportQueue, ThingSetReport
+
+
+A = ("192.0.2.1", 9002)
+B = ("192.0.2.2", 9002)
+
+
+def _item(addr, subset, value, eui=None):
+    return addr, ThingSetReport(subset, {0x401: value}, eui)
+
+
+def _drain(queue: ReportQueue):
+    return [queue.get_nowait() for _ in range(len(queue))]
+
+
+def test_drop_newest():
+    queue = ReportQueue(2)
+    assert queue.put(_item(A, 1, 0)) and queue.put(_item(A, 1, 1))
+    assert not queue.put(_item(A, 1, 2))
+    assert [r.values[0x401] for _, r in _drain(queue)] == [0, 1]
+    assert queue.counters == {"dropped": 1, "conflated": 0}
+
+
+def test_drop_oldest():
+    queue = ReportQueue(2, OverflowPolicy.DROP_OLDEST)
+    for i in range(4):
+        queue.put(_item(A, 1, i))
+    assert [r.values[0x401] for _, r in _drain(queue)] == [2, 3]
+    assert queue.dropped == 2
+
+
+def test_conflate_replaces_in_place():
+    queue = ReportQueue(10, "conflate")
+    queue.put(_item(A, 1, 0))
+    queue.put(_item(B, 1, 0))
+    queue.put(_item(A, 2, 0))
+    assert queue.put(_item(A, 1, 1))
+    queue.put(_item(A, 1, 0, eui=0xAB))  # same address, other device
+    got = _drain(queue)
+    assert [(a, r.subset_id, r.values[0x401]) for a, r in got] == [
+        (A, 1, 1), (B, 1, 0), (A, 2, 0), (A, 1, 0),
+    ]
+    assert queue.counters == {"dropped": 0, "conflated": 1}
+
+
+def test_conflate_single_value_reports_by_data_id():
+    queue = ReportQueue(10, "conflate")
+    queue.put((A, ThingSetReport(None, {0x401: 1})))
+    queue.put((A, ThingSetReport(None, {0x402: 1})))
+    queue.put((A, ThingSetReport(None, {0x401: 2})))
+    assert [r.values for _, r in _drain(queue)] == [{0x401: 2}, {0x402: 1}]
+
+
+def test_conflate_full_of_distinct_keys_drops_oldest():
+    queue = ReportQueue(2, "conflate")
+    for subset in range(3):
+        queue.put(_item(A, subset, 0))
+    assert [r.subset_id for _, r in _drain(queue)] == [1, 2]
+    assert queue.dropped == 1
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        ReportQueue(0)
+    with pytest.raises(ValueError):
+        ReportQueue(1, "block")
+
+
+async def test_get_waits_and_end_stops_iteration():
+    queue = ReportQueue(4)
+    waiter = asyncio.ensure_future(queue.get())
+    await asyncio.sleep(0)
+    queue.put(_item(A, 1, 0))
+    assert (await asyncio.wait_for(waiter, 1))[1].subset_id == 1
+    queue.put(_item(A, 2, 0))
+    queue.end()
+    assert [r.subset_id async for _, r in queue] == [2]
+
+
+async def test_batch_takes_everything_queued_without_waiting():
+    queue = ReportQueue(100)
+    for i in range(10):
+        queue.put(_item(A, i, 0))
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    batch = await queue.get_batch(4, max_latency=10)
+    assert [r.subset_id for _, r in batch] == [0, 1, 2, 3]
+    assert len(await queue.get_batch(100, max_latency=0)) == 6
+    assert loop.time() - start < 1
+
+
+async def test_batch_waits_up_to_max_latency():
+    queue = ReportQueue(100, "conflate")
+    queue.put(_item(A, 1, 0))
+
+    async def later():
+        await asyncio.sleep(0.01)
+        queue.put(_item(A, 2, 0))
+        await asyncio.sleep(0.01)
+        queue.put(_item(A, 3, 0))
+
+    feeder = asyncio.ensure_future(later())
+    batch = await queue.get_batch(3, max_latency=1.0)
+    assert [r.subset_id for _, r in batch] == [1, 2, 3]
+    await feeder
+
+    queue.put(_item(A, 4, 0))
+    assert len(await queue.get_batch(3, max_latency=0.01)) == 1
+
+
+async def test_batches_end_with_queue():
+    queue = ReportQueue(100)
+    for i in range(5):
+        queue.put(_item(A, i, 0))
+    queue.end()
+    sizes = [len(batch) async for batch in queue.batches(max_items=2)]
+    assert sizes == [2, 2, 1]
+
+
+def test_overflow_logged_once_a_second(caplog):
+    from python_thingset import AsyncThingSetUDPReceiver
+
+    receiver = AsyncThingSetUDPReceiver(queue_size=1, overflow="drop_oldest")
+    protocol = receiver._make_protocol()
+    for i in range(100):
+        protocol.datagram_received(
+            bytes([0x30, i]) + b"\x1f\x01\xa1\x01" + bytes([i & 0x17]), A
+        )
+    assert receiver.counters["dropped"] == 99
+    assert caplog.text.count("queue full") == 1
+    assert "dropped 1 reports" in caplog.text
@@ -0,0 +1,130 @@
+"""ReportRing: raw payloads in shared memory, one writer, many
+readers."""
+
+import asyncio
+import multiprocessing
+import socket
+
+import cbor2
+import pytest
+
+from python_thingset import AsyncThingSetUDPReceiver, ReportRing
+from reports import report_body
+
+
+EUI = 0xBADB1B0000000001
+
+
+@pytest.fixture
+def ring():
+    ring = ReportRing.create(capacity=4096)
+    yield ring
+    ring.close()
+
+
+def test_header_fields_and_lazy_decode(ring):
+    reader = ReportRing.attach(ring.name)
+    try:
+        ring.publish(("192.0.2.1", 9002), report_body(0x400, {0x1: 1.5}, eui=EUI))
+        ring.write(cbor2.dumps(42), (0x10, "can0"), data_id=0x602, timestamp=12.5)
+        first, second = reader.read_available()
+        assert (first.source, first.eui, first.subset_id, first.data_id) == (
+            ("192.0.2.1", 9002),
+            EUI,
+            0x400,
+            None,
+        )
+        assert first.decode().values == {0x1: 1.5}
+        assert (second.source, second.eui, second.subset_id, second.timestamp) == (
+            (0x10, "can0"),
+            None,
+            None,
+            12.5,
+        )
+        assert second.decode().values == {0x602: 42}
+        assert reader.read() is None
+    finally:
+        reader.close()
+
+
+def test_readers_read_independently_across_wraps(ring):
+    readers = [ReportRing.attach(ring.name) for _ in range(2)]
+    try:
+        for i in range(200):
+            ring.write(bytes([i]) * (i % 50 + 1), ("192.0.2.1", i))
+            got = readers[0].read()
+            assert got.payload == bytes([i]) * (i % 50 + 1)
+            assert got.source == ("192.0.2.1", i)
+        # The second reader was lapped: it skips to the newest
+        assert readers[1].read() is None
+        assert readers[1].lost == 200
+        ring.write(b"x")
+        assert readers[1].read().payload == b"x"
+        assert readers[0].lost == 0
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+def test_torn_record_is_not_returned(ring):
+    reader = ReportRing.attach(ring.name)
+    try:
+        ring.write(b"payload")
+        # Corrupt the payload as a half-visible write would look
+        ring._data[56] ^= 0xFF
+        assert reader.read() is None
+        ring._data[56] ^= 0xFF
+        assert reader.read().payload == b"payload"
+    finally:
+        reader.close()
+
+
+def test_record_size_limit(ring):
+    with pytest.raises(ValueError, match="too large"):
+        ring.write(bytes(2000))
+    # As a payload sink, dropped and counted instead
+    ring.publish(("192.0.2.1", 9002), bytes(2000))
+    ring.publish(("192.0.2.1", 9002), b"\x1f\x01\xa0")
+    assert ring.too_large == 1
+    assert [raw.payload for raw in ring] == [b"\x1f\x01\xa0"]
+
+
+def _read_in_child(name, count, attached, results):
+    ring = ReportRing.attach(name)
+    attached.set()
+    got = []
+    while len(got) < count:
+        raw = ring.read()
+        if raw is not None and raw.subset_id == 0x400:
+            got.append(raw.decode().values[0x1])
+    results.put(got)
+    ring.close()
+
+
+async def test_udp_ingest_feeds_other_process():
+    ring = ReportRing.create(capacity=1 << 16)
+    context = multiprocessing.get_context("spawn")
+    attached = context.Event()
+    results = context.Queue()
+    child = context.Process(
+        target=_read_in_child, args=(ring.name, 3, attached, results)
+    )
+    child.start()
+    loop = asyncio.get_running_loop()
+    # Readers start at the newest record, so let it attach first
+    assert await loop.run_in_executor(None, attached.wait, 10)
+    receiver = AsyncThingSetUDPReceiver(
+        bind="127.0.0.1", port=0, queue_reports=False, payload_sink=ring.publish
+    )
+    await receiver.start()
+    try:
+        address = receiver._transport.get_extra_info("sockname")
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            for i in range(3):
+                s.sendto(bytes([0x30, i]) + report_body(0x800, {0x1: -i}), address)
+                s.sendto(bytes([0x30, i]) + report_body(0x400, {0x1: i}), address)
+        assert await loop.run_in_executor(None, results.get, True, 10) == [0, 1, 2]
+    finally:
+        await receiver.close()
+        child.join(5)
+        ring.close()
@@ -0,0 +1,126 @@
+"""ValueTable: latest values in shared memory, seqlocked rows."""
+
+import multiprocessing
+import threading
+import time
+
+import cbor2
+import pytest
+
+from python_thingset import SchemaTree, ThingSetReport, ValueTable
+
+
+EUI = 0xBADB1B0000000001
+
+# Measurements: three numeric values and a string
+SCHEMA = SchemaTree.loads(
+    cbor2.dumps(
+        [
+            [
+                0x400,
+                "Measurements",
+                "group",
+                5,
+                [
+                    [0x401, "rVoltage", "f32", 5, []],
+                    [0x402, "rCurrent", "f32", 5, []],
+                    [0x403, "rCycles", "u32", 5, []],
+                    [0x404, "rState", "string", 5, []],
+                ],
+            ]
+        ]
+    )
+)
+
+
+@pytest.fixture
+def table():
+    table = ValueTable.create(SCHEMA, max_modules=2)
+    yield table
+    table.close()
+
+
+def test_columns_are_the_numeric_ids():
+    with ValueTable.create(SCHEMA, ids=[0x401, 0x404]) as table:
+        assert table.ids == (0x401,)
+    with pytest.raises(ValueError):
+        ValueTable.create(SCHEMA, ids=[0x404])
+
+
+def test_reader_sees_writes_without_decoding(table):
+    reader = ValueTable.attach(table.name)
+    try:
+        assert reader.get(EUI, 0x401) is None
+        table.apply(("192.0.2.1", 9002), ThingSetReport(0x400, {0x401: 3.5}, eui=EUI))
+        stored = table.update(
+            (0x10, "can0"), {0x402: 1.25, 0x403: 7, 0x404: "ok", 0x999: 1}, timestamp=5.0
+        )
+        assert stored == 2
+        assert reader.get(EUI, 0x401) == 3.5
+        assert reader.get(EUI, 0x402, "unset") == "unset"
+        assert reader.read((0x10, "can0"), 0x403) == (7.0, 5.0)
+        assert reader.snapshot((0x10, "can0")) == {0x402: (1.25, 5.0), 0x403: (7.0, 5.0)}
+        assert reader.updated((0x10, "can0")) == 5.0
+        assert reader.sources() == [EUI, (0x10, "can0")]
+        with pytest.raises(KeyError):
+            reader.read(EUI, 0x404)
+    finally:
+        reader.close()
+
+
+def test_modules_beyond_the_table_are_counted(table):
+    for node in range(3):
+        table.update((node, "can0"), {0x401: 1.0})
+    assert table.unplaced == 1
+    assert table.get((2, "can0"), 0x401) is None
+
+
+def test_read_waits_out_a_write_in_progress(table):
+    table.update(EUI, {0x401: 1.0})
+    reader = ValueTable.attach(table.name)
+    try:
+        # Leave the row mid-update, as a descheduled writer would
+        table._q[0] += 1
+        table._f[2] = 2.0
+
+        def finish():
+            time.sleep(0.02)
+            table._q[0] += 1
+
+        threading.Thread(target=finish).start()
+        assert reader.get(EUI, 0x401) == 2.0
+    finally:
+        reader.close()
+
+
+def _check_rows(name: str, started, result) -> None:
+    table = ValueTable.attach(name)
+    started.set()
+    torn = reads = 0
+    deadline = time.monotonic() + 1.0
+    while time.monotonic() < deadline:
+        values = {value for value, _ in table.snapshot(EUI).values()}
+        reads += 1
+        torn += len(values) > 1
+    table.close()
+    result.put((reads, torn))
+
+
+def test_rows_read_consistently_from_another_process(table):
+    context = multiprocessing.get_context("spawn")
+    started = context.Event()
+    result = context.Queue()
+    table.update(EUI, {0x401: 0, 0x402: 0, 0x403: 0})
+    child = context.Process(target=_check_rows, args=(table.name, started, result))
+    child.start()
+    try:
+        assert started.wait(30)
+        i = 0
+        while child.is_alive():
+            i += 1
+            table.update(EUI, {0x401: i, 0x402: i, 0x403: i})
+        reads, torn = result.get(timeout=10)
+    finally:
+        child.join(10)
+    assert reads > 0
+    assert torn == 0
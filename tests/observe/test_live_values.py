@@ -0,0 +1,147 @@
+"""Tests for LiveValues change subscriptions and deadbands."""
+
+import array
+import asyncio
+from typing import List
+
+import pytest
+
+from python_thingset import Change, Deadband, LiveValues, ThingSetReport
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> _Clock:
+    return _Clock()
+
+
+@pytest.fixture
+def live(clock: _Clock) -> LiveValues:
+    return LiveValues(clock=clock)
+
+
+def _report(values, eui=None) -> ThingSetReport:
+    return ThingSetReport(1, values, eui)
+
+
+def _collect(live: LiveValues, **kwargs) -> List[Change]:
+    out: List[Change] = []
+    live.subscribe(out.append, **kwargs)
+    return out
+
+
+def test_only_changes_delivered(live: LiveValues):
+    changes = _collect(live)
+    live.apply("a", _report({1: 1.0, 2: "x"}))
+    live.apply("a", _report({1: 1.0, 2: "x"}))
+    live.apply("a", _report({1: 1.5, 2: "x"}))
+    assert [(c.value_id, c.value, c.previous) for c in changes] == [
+        (1, 1.0, None),
+        (2, "x", None),
+        (1, 1.5, 1.0),
+    ]
+    assert live.get("a", 1) == 1.5
+
+
+def test_sources_tracked_separately(live: LiveValues):
+    changes = _collect(live, sources=["b"])
+    live.apply("a", _report({1: 1.0}))
+    live.apply("b", _report({1: 1.0}))
+    live.apply("a", _report({1: 2.0}))
+    assert [(c.source, c.value) for c in changes] == [("b", 1.0)]
+    assert live.sources() == ["a", "b"]
+    assert live.values("a") == {1: 2.0}
+
+
+def test_unwatched_ids_stored_not_compared(live: LiveValues):
+    changes = _collect(live, ids=[2])
+    assert live.apply("a", _report({1: 1.0, 2: 5})) == 1
+    assert live.apply("a", _report({1: 3.0, 2: 5})) == 0
+    assert [c.value_id for c in changes] == [2]
+    assert live.get("a", 1) == 3.0
+
+
+def test_absolute_and_relative_deadbands(live: LiveValues):
+    changes = _collect(live)
+    live.set_deadband(1, Deadband(absolute=0.1))
+    live.set_deadband(2, Deadband(relative=0.05))
+    live.apply("a", _report({1: 3.0, 2: 100}))
+    live.apply("a", _report({1: 3.05, 2: 104}))
+    live.apply("a", _report({1: 3.15, 2: 106}))
+    # Drift accumulates against the last delivered value
+    assert [(c.value_id, c.value) for c in changes] == [
+        (1, 3.0), (2, 100), (1, 3.15), (2, 106),
+    ]
+    live.set_deadband(1, None)
+    live.apply("a", _report({1: 3.16}))
+    assert changes[-1].value == 3.16
+
+
+def test_min_interval(live: LiveValues, clock: _Clock):
+    changes = _collect(live)
+    live.set_deadband(1, Deadband(min_interval=1.0))
+    live.apply("a", _report({1: 1}))
+    clock.now += 0.5
+    live.apply("a", _report({1: 2}))
+    clock.now += 0.6
+    live.apply("a", _report({1: 2}))
+    assert [(c.value, c.previous) for c in changes] == [(1, None), (2, 1)]
+
+
+def test_non_numeric_and_arrays(live: LiveValues):
+    changes = _collect(live)
+    live.set_deadband(1, Deadband(absolute=10))
+    live.apply("a", _report({1: True, 2: array.array("f", [1.0])}))
+    live.apply("a", _report({1: False, 2: array.array("f", [1.0])}))
+    live.apply("a", _report({1: False, 2: array.array("f", [2.0])}))
+    assert [(c.value_id, c.value) for c in changes][2:] == [
+        (1, False), (2, array.array("f", [2.0])),
+    ]
+    assert Deadband().exceeded(float("nan"), 1.0)
+    assert not Deadband().exceeded(float("nan"), float("nan"))
+
+
+def test_close_and_failing_callback(live: LiveValues, caplog):
+    def boom(change):
+        raise RuntimeError("boom")
+
+    live.subscribe(boom, ids=[1])
+    changes: List[Change] = []
+    subscription = live.subscribe(changes.append, ids=[1])
+    live.apply("a", _report({1: 1}))
+    assert len(changes) == 1
+    assert "subscriber raised" in caplog.text
+    subscription.close()
+    live.apply("a", _report({1: 2}))
+    assert len(changes) == 1
+
+
+async def _reports(items):
+    for item in items:
+        yield item
+
+
+async def test_stream_and_follow(live: LiveValues):
+    with live.changes(ids=[1], maxsize=2) as stream:
+        await live.follow(
+            _reports(
+                [
+                    (("192.0.2.1", 9002), _report({1: 1.0})),
+                    (("192.0.2.2", 9002), _report({1: 1.0}, eui=0xAB)),
+                    (("192.0.2.1", 9002), _report({1: 2.0})),
+                ]
+            )
+        )
+        assert stream.dropped == 1
+        first = await asyncio.wait_for(stream.__anext__(), 1)
+        assert (first.source, first.value) == (0xAB, 1.0)
+        second = await asyncio.wait_for(stream.__anext__(), 1)
+        assert (second.source, second.value) == (("192.0.2.1", 9002), 2.0)
+    assert live.apply(("192.0.2.1", 9002), _report({1: 3.0})) == 0
@@ -0,0 +1,164 @@
+"""Tests for ThingSetProtocol.array_decode: float arrays and RFC 8746
+typed arrays in responses and reports come back packed, everything
+else exactly as cbor2 decodes it."""
+
+import array
+import struct
+
+import cbor2
+import pytest
+
+from python_thingset import ThingSetProtocol, WireFormat
+from python_thingset._cbor_arrays import load, loads
+
+
+CELLS = [3.5, 3.25, 3.75, 3.5, 3.0, 3.125, 3.625, 3.875, 4.0]
+
+
+def _f32_array(values) -> bytes:
+    out = bytearray(cbor2.dumps([None] * len(values))[:-len(values)])
+    for v in values:
+        out += b"\xfa" + struct.pack(">f", v)
+    return bytes(out)
+
+
+def _f64_array(values) -> bytes:
+    out = bytearray(cbor2.dumps([None] * len(values))[:-len(values)])
+    for v in values:
+        out += b"\xfb" + struct.pack(">d", v)
+    return bytes(out)
+
+
+def _response(payload: bytes) -> bytes:
+    return b"\x85\xf6" + payload
+
+
+@pytest.fixture
+def protocol() -> ThingSetProtocol:
+    return ThingSetProtocol(WireFormat.BINARY, array_decode="array")
+
+
+def test_default_unchanged():
+    data = _response(_f32_array(CELLS))
+    assert ThingSetProtocol(WireFormat.BINARY).parse_response(data).data == CELLS
+
+
+def test_float32_array(protocol: ThingSetProtocol):
+    parsed = protocol.parse_response(_response(_f32_array(CELLS))).data
+    assert isinstance(parsed, array.array)
+    assert parsed.typecode == "f"
+    assert parsed.tolist() == CELLS
+
+
+def test_float64_array(protocol: ThingSetProtocol):
+    parsed = protocol.parse_response(_response(_f64_array(CELLS))).data
+    assert parsed.typecode == "d"
+    assert parsed.tolist() == CELLS
+
+
+def test_nested_in_map(protocol: ThingSetProtocol):
+    payload = b"\xa2\x18\x40" + _f32_array(CELLS) + b"\x18\x41\x63abc"
+    parsed = protocol.parse_response(_response(payload)).data
+    assert parsed[0x40].tolist() == CELLS
+    assert parsed[0x41] == "abc"
+
+
+def test_short_and_mixed_arrays_stay_lists(protocol: ThingSetProtocol):
+    assert protocol.parse_response(_response(_f32_array(CELLS[:3]))).data == (
+        CELLS[:3]
+    )
+    mixed = cbor2.dumps([1.0] * 9, canonical=True)  # shrunk to float16
+    assert protocol.parse_response(_response(mixed)).data == [1.0] * 9
+    ints = cbor2.dumps(list(range(20)))
+    assert protocol.parse_response(_response(ints)).data == list(range(20))
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        {0x40: [1, -2, "x", b"\x00", None, True, False, 1.5], "k": {1: [2.5]}},
+        [2**64 - 1, -(2**64), 0.1, float("inf")],
+        cbor2.CBORTag(1, 1700000000),
+        [cbor2.undefined, cbor2.CBORSimpleValue(3)],
+        "ünïcødé",
+    ],
+)
+def test_parity_with_cbor2(document):
+    data = cbor2.dumps(document)
+    assert loads(data, "array") == cbor2.loads(data)
+
+
+def test_indefinite_length_falls_back():
+    data = b"\x9f\x01\x02\xff"
+    assert loads(data, "array") == [1, 2]
+    assert load(b"\x00" + data + b"\x03", 1, "array") == ([1, 2], 5)
+
+
+def test_truncated(protocol: ThingSetProtocol):
+    data = _response(_f32_array(CELLS))[:-3]
+    assert isinstance(protocol.parse_response(data).data, cbor2.CBORDecodeEOF)
+
+
+def test_typed_arrays(protocol: ThingSetProtocol):
+    little = struct.pack(f"<{len(CELLS)}f", *CELLS)
+    tagged = cbor2.dumps(cbor2.CBORTag(85, little))
+    assert protocol.parse_response(_response(tagged)).data.tolist() == CELLS
+
+    big = struct.pack(">3h", 1, -2, 300)
+    tagged = cbor2.dumps(cbor2.CBORTag(73, big))
+    parsed = protocol.parse_response(_response(tagged)).data
+    assert parsed.typecode == "h"
+    assert parsed.tolist() == [1, -2, 300]
+
+    half = struct.pack("<2e", 1.5, -0.25)
+    tagged = cbor2.dumps(cbor2.CBORTag(84, half))
+    assert protocol.parse_response(_response(tagged)).data.tolist() == [1.5, -0.25]
+
+
+def test_reports(protocol: ThingSetProtocol):
+    payload = (
+        b"\x1e"
+        + cbor2.dumps(0x1122334455667788)
+        + b"\x01"
+        + b"\xa1\x18\x40"
+        + _f32_array(CELLS)
+    )
+    report = protocol.parse_report(payload)
+    assert report.eui == 0x1122334455667788
+    assert report.subset_id == 1
+    assert report.values[0x40].tolist() == CELLS
+    assert protocol.parse_report(payload[:-2]) is None
+
+    single = protocol.build_single_frame_report(0x40, _f32_array(CELLS))
+    assert single.values[0x40].tolist() == CELLS
+
+
+def test_malformed_reports(protocol: ThingSetProtocol):
+    cells = b"\x18\x40" + _f32_array(CELLS)
+    bad_text = b"\x1f\x01\xa2" + cells + b"\x18\x41\x62\xff\xfe"
+    assert protocol.parse_report(bad_text) is None
+    # A float array as a map key: packed, so unhashable
+    array_key = b"\x1f\x01\xa1" + _f32_array(CELLS) + b"\x01"
+    assert protocol.parse_report(array_key) is None
+    map_key = b"\x1f\x01\xa2" + cells + b"\xa1\x01\x02\x03"
+    assert protocol.parse_report(map_key) is None
+
+
+def test_mode_validation():
+    with pytest.raises(ValueError):
+        ThingSetProtocol(WireFormat.BINARY, array_decode="lists")
+    with pytest.raises(ValueError, match="binary"):
+        ThingSetProtocol(WireFormat.TEXT, array_decode="array")
+
+
+def test_numpy_views():
+    np = pytest.importorskip("numpy")
+    protocol = ThingSetProtocol(WireFormat.BINARY, array_decode="numpy")
+    data = _response(_f32_array(CELLS))
+    parsed = protocol.parse_response(data).data
+    assert isinstance(parsed, np.ndarray)
+    assert parsed.tolist() == CELLS
+    assert not parsed.flags.owndata
+
+    tagged = cbor2.dumps(cbor2.CBORTag(82, struct.pack(">2d", 1.5, 2.5)))
+    assert protocol.parse_response(_response(tagged)).data.tolist() == [1.5, 2.5]
@@ -0,0 +1,80 @@
+"""peek_report_header and parse_report's header check."""
+
+import cbor2
+import pytest
+
+from python_thingset import ThingSetProtocol, WireFormat
+from python_thingset._protocol import ReportHeader, peek_report_header
+from python_thingset.receive_filter import ReceiveFilter
+
+
+EUI = 0xBADB1B0000000001
+
+
+def _enhanced(eui, subset_id, values) -> bytes:
+    return (
+        bytes([0x1E])
+        + cbor2.dumps(eui, canonical=True)
+        + cbor2.dumps(subset_id, canonical=True)
+        + cbor2.dumps(values, canonical=True)
+    )
+
+
+@pytest.mark.parametrize("subset_id", [0, 0x17, 0x18, 0x400, 0x10000, 2**40])
+def test_peek_standard(subset_id):
+    body = bytes([0x1F]) + cbor2.dumps(subset_id) + cbor2.dumps({1: 2})
+    header = peek_report_header(body)
+    assert header == ReportHeader(0x1F, None, subset_id, len(body) - 3)
+
+
+def test_peek_enhanced():
+    body = _enhanced(EUI, 0x400, {1: 2})
+    assert peek_report_header(body) == ReportHeader(0x1E, EUI, 0x400, 13)
+
+
+def test_peek_header_only():
+    # A first fragment may end right after the header
+    assert peek_report_header(_enhanced(EUI, 0x400, {})[:13]).subset_id == 0x400
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        b"",
+        b"\x42\x01",
+        b"\x1f",
+        b"\x1e\x1b\x00\x00",  # EUI cut short
+        b"\x1f\x61a\xa0",  # subset is a string
+        b"\x1f\x20\xa0",  # negative subset
+    ],
+)
+def test_peek_rejects(payload):
+    assert peek_report_header(payload) is None
+
+
+def test_parse_report_accept_skips_values():
+    protocol = ThingSetProtocol(WireFormat.BINARY)
+    seen = []
+
+    def accept(eui, subset_id):
+        seen.append((eui, subset_id))
+        return subset_id == 0x400
+
+    # Malformed value map: never decoded when the header is refused
+    assert protocol.parse_report(_enhanced(EUI, 0x800, {})[:-1] + b"\x1c", accept) is None
+    report = protocol.parse_report(_enhanced(EUI, 0x400, {1: 2}), accept)
+    assert report.values == {1: 2}
+    assert seen == [(EUI, 0x800), (EUI, 0x400)]
+
+
+def test_receive_filter():
+    report_filter = ReceiveFilter(sources={"192.0.2.1"}, euis={EUI})
+    assert report_filter.accepts_source(("192.0.2.1", 9002))
+    assert not report_filter.accepts_source(("192.0.2.2", 9002))
+    assert report_filter.accepts_header(EUI, 0x400)
+    assert not report_filter.accepts_header(None, 0x400)
+    assert report_filter.rejects_start(_enhanced(EUI + 1, 0x400, {}))
+    # Too short to tell
+    assert not report_filter.rejects_start(_enhanced(EUI + 1, 0x400, {})[:5])
+    assert report_filter.rejected == 2
+    assert not ReceiveFilter(sources={1}).rejects_start(_enhanced(EUI, 0x400, {}))
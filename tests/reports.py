@@ -0,0 +1,10 @@
+"""Report bodies for the receiver, ring and capture tests."""
+
+import cbor2
+
+
+def report_body(subset_id: int, values: dict, eui=None) -> bytes:
+    """A report without its UDP header: 0x1F, or 0x1E with the node's EUI."""
+    if eui is None:
+        return bytes([0x1F]) + cbor2.dumps(subset_id) + cbor2.dumps(values)
+    return bytes([0x1E]) + cbor2.dumps(eui) + cbor2.dumps(subset_id) + cbor2.dumps(values)
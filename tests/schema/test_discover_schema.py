@@ -6,7 +6,7 @@ without any real transport.
 """
 
 import io
-from typing import Any, Dict, Tuple, Union
+from typing import Any, Dict, List, Tuple, Union
 
 import cbor2
 import pytest
@@ -30,8 +30,14 @@ class _FakeBinaryClient(ThingSetClient):
         self._protocol = ThingSetProtocol(WireFormat.BINARY)
         self._canned = canned
         self._pending: Union[ParsedResponse, None] = None
+        self.requests: List[bytes] = []
+        # Requests with more IDs than this are refused as too large
+        self.max_ids: Union[int, None] = None
+        # Requests go unanswered, as over a link that has gone down
+        self.timeout = False
 
     def _send(self, data: bytes, node_id):
+        self.requests.append(data)
         # data is a binary ThingSet FETCH: [0x05][cbor parent_id][0xf6 | cbor list]
         stream = io.BytesIO(data[1:])
         parent = cbor2.load(stream)
@@ -42,6 +48,17 @@ class _FakeBinaryClient(ThingSetClient):
             ids = tuple(cbor2.loads(remaining))
         else:
             ids = ()
+        if self.timeout:
+            self._pending = None
+            return
+        if self.max_ids is not None and len(ids) > self.max_ids:
+            self._pending = ParsedResponse(
+                status_code=ThingSetStatus.REQUEST_TOO_LARGE,
+                status_string="REQUEST_TOO_LARGE",
+                data=None,
+                raw=b"",
+            )
+            return
         data_payload = self._canned.get((parent, ids))
         self._pending = ParsedResponse(
             status_code=ThingSetStatus.CONTENT,
@@ -73,7 +90,8 @@ class _FakeTextClient(ThingSetClient):
 
 
 # Minimal three-level tree exercising group/leaf/function/record terminations
-# and nested groups — mirrors native_sim's shape.
+# and nested groups — mirrors native_sim's shape. Discovery is breadth-first,
+# so the metadata overlay is asked about every child at one depth at once.
 CANNED: CannedMap = {
     # Root: DSM (group), Metadata (group), Modules (record[]), xRebootDFU (fn)
     (0, ()): [0x0E, 0x0F, 0x09, 0x67],
@@ -83,19 +101,18 @@ CANNED: CannedMap = {
         {26: "Modules", 27: "record[]", 28: 7},
         {26: "xRebootDFU", 27: "()->(i32)", 28: 112},
     ],
-    # DSM: one function + one primitive leaf
+    # Depth 1. DSM: one function + one primitive leaf. Metadata: one
+    # nested group + one primitive leaf. Modules has no child list.
     (0x0E, ()): [0xE00, 0xE04],
-    (0x19, (0xE00, 0xE04)): [
+    (0x0F, ()): [0xFFF, 0xF03],
+    (0x09, ()): [],
+    (0x19, (0xE00, 0xE04, 0xFFF, 0xF03)): [
         {26: "xOff", 27: "()->(i32)", 28: 112},
         {26: "rDFUState", 27: "u8", 28: 7},
-    ],
-    # Metadata: one nested group + one primitive leaf
-    (0x0F, ()): [0xFFF, 0xF03],
-    (0x19, (0xFFF, 0xF03)): [
         {26: "Nested", 27: "group", 28: 7},
         {26: "rBoard", 27: "string", 28: 7},
     ],
-    # Nested group (under Metadata) with a single leaf
+    # Depth 2. Nested group (under Metadata) with a single leaf
     (0xFFF, ()): [0xFF0],
     (0x19, (0xFF0,)): [
         {26: "rDeep", 27: "u32", 28: 7},
@@ -139,8 +156,9 @@ def test_group_has_children(tree: SchemaTree):
     assert [c.id for c in dsm.children] == [0xE00, 0xE04]
 
 
-def test_record_and_function_not_recursed(tree: SchemaTree):
-    """record[] and function types are terminal — no children walked even if the device would have returned some."""
+def test_record_and_function_have_no_children(tree: SchemaTree):
+    """Functions are terminal; a record[] is asked for its children but
+    this device lists none."""
     assert tree.by_id[0x09].type == "record[]"
     assert tree.by_id[0x09].children == []
     assert tree.by_id[0x67].type == "()->(i32)"
@@ -186,3 +204,59 @@ def test_empty_response_yields_empty_tree():
     assert tree.root == []
     assert tree.by_id == {}
     assert tree.by_path == {}
+
+
+def _is_overlay_fetch(request: bytes) -> bool:
+    return request[1:3] == cbor2.dumps(0x19)
+
+
+def test_one_metadata_fetch_per_depth():
+    """Breadth-first: three groups' worth of children share a single
+    metadata request, so the whole walk costs one child-list fetch per
+    group plus one overlay fetch per depth."""
+    client = _FakeBinaryClient(CANNED)
+    client.discover_schema()
+    overlay = [r for r in client.requests if _is_overlay_fetch(r)]
+    child_lists = [r for r in client.requests if not _is_overlay_fetch(r)]
+    assert len(overlay) == 3
+    assert len(child_lists) == 5  # root, DSM, Metadata, Modules, Nested
+
+
+def _wide_canned(count: int) -> CannedMap:
+    ids = list(range(0x100, 0x100 + count))
+    canned: CannedMap = {(0, ()): ids}
+    for size in (count, count // 2, count // 4, 8, 4):
+        for start in range(0, count, size):
+            chunk = tuple(ids[start : start + size])
+            canned[(0x19, chunk)] = [
+                {26: f"r{i:X}", 27: "u8", 28: 7} for i in chunk
+            ]
+    return canned
+
+
+def test_metadata_split_by_batch_size():
+    client = _FakeBinaryClient(_wide_canned(16))
+    tree = client.discover_schema(metadata_batch_size=4)
+    assert len(tree) == 16
+    overlay = [r for r in client.requests if _is_overlay_fetch(r)]
+    assert len(overlay) == 4
+
+
+def test_metadata_batch_halved_when_too_large():
+    client = _FakeBinaryClient(_wide_canned(16))
+    client.max_ids = 4
+    tree = client.discover_schema()
+    assert len(tree) == 16
+    assert [n.id for n in tree.root] == list(range(0x100, 0x110))
+
+
+def test_metadata_timeout_is_not_split():
+    client = _FakeBinaryClient(_wide_canned(16))
+    tree = client.discover_schema()
+    client.requests.clear()
+    client.timeout = True
+    ids = [n.id for n in tree.root]
+    assert client._fetch_metadata(ids, None) == {}
+    # One request for the whole batch, not one per bisection
+    assert len(client.requests) == 1
+
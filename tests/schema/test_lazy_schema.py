@@ -0,0 +1,227 @@
+"""Tests for on-demand schema discovery (LazySchemaTree and
+AsyncLazySchemaTree).
+
+The fake devices answer child-list fetches from CHILDREN and metadata
+overlay fetches for any subset of IDs from METADATA, and record every
+request so tests can count round-trips.
+"""
+
+import io
+from typing import Any, Dict, List, Union
+
+import cbor2
+import pytest
+
+from python_thingset import (
+    AsyncLazySchemaTree,
+    LazySchemaNode,
+    LazySchemaTree,
+    ParsedResponse,
+    ThingSetProtocol,
+    ThingSetStatus,
+    WireFormat,
+)
+from python_thingset.async_client import AsyncThingSetClient
+from python_thingset.client import ThingSetClient
+
+
+CHILDREN: Dict[int, List[int]] = {
+    0x00: [0x0E, 0x0F, 0x67],
+    0x0E: [0xE00, 0xE04],
+    0x0F: [0xFFF, 0xF03],
+    0xFFF: [0xFF0],
+}
+
+METADATA: Dict[int, Dict[int, Any]] = {
+    0x0E: {26: "DSM", 27: "group", 28: 7},
+    0x0F: {26: "Metadata", 27: "group", 28: 7},
+    0x67: {26: "xRebootDFU", 27: "()->(i32)", 28: 112},
+    0xE00: {26: "xOff", 27: "()->(i32)", 28: 112},
+    0xE04: {26: "rDFUState", 27: "u8", 28: 7},
+    0xFFF: {26: "Nested", 27: "group", 28: 7},
+    0xF03: {26: "rBoard", 27: "string", 28: 7},
+    0xFF0: {26: "rDeep", 27: "u32", 28: 7},
+}
+
+
+def _answer(data: bytes) -> ParsedResponse:
+    stream = io.BytesIO(data[1:])
+    parent = cbor2.load(stream)
+    remaining = stream.read()
+    ids = [] if remaining in (b"", b"\xf6") else cbor2.loads(remaining)
+    if parent == 0x19:
+        payload: Any = [METADATA.get(i) for i in ids]
+        if not any(payload):
+            return ParsedResponse(ThingSetStatus.NOT_FOUND, None, None, b"")
+    else:
+        payload = CHILDREN.get(parent, [])
+    return ParsedResponse(ThingSetStatus.CONTENT, "CONTENT", payload, b"")
+
+
+def _overlay_requests(requests: List[bytes]) -> List[bytes]:
+    return [r for r in requests if r[1:3] == cbor2.dumps(0x19)]
+
+
+class _FakeClient(ThingSetClient):
+    def __init__(self):
+        self._protocol = ThingSetProtocol(WireFormat.BINARY)
+        self._pending: Union[ParsedResponse, None] = None
+        self.requests: List[bytes] = []
+
+    def _send(self, data: bytes, node_id):
+        self.requests.append(data)
+        self._pending = _answer(data)
+
+    def _recv(self):
+        resp, self._pending = self._pending, None
+        return resp
+
+    def disconnect(self):
+        pass
+
+
+class _FakeAsyncClient(AsyncThingSetClient):
+    def __init__(self):
+        self._protocol = ThingSetProtocol(WireFormat.BINARY)
+        self.requests: List[bytes] = []
+
+    async def _rpc(self, request: bytes, node_id=None, timeout=None):
+        self.requests.append(request)
+        return _answer(request)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def client() -> _FakeClient:
+    return _FakeClient()
+
+
+def test_only_top_level_fetched_up_front(client: _FakeClient):
+    tree = client.lazy_schema()
+    assert isinstance(tree, LazySchemaTree)
+    assert [n.name for n in tree.root] == ["DSM", "Metadata", "xRebootDFU"]
+    assert len(client.requests) == 2  # root child list + one metadata fetch
+    assert len(tree) == 3
+
+
+def test_children_fetched_on_first_access(client: _FakeClient):
+    tree = client.lazy_schema()
+    dsm = tree.root[0]
+    assert isinstance(dsm, LazySchemaNode)
+    assert not dsm.loaded
+    assert [c.name for c in dsm.children] == ["xOff", "rDFUState"]
+    assert dsm.loaded
+    sent = len(client.requests)
+    dsm.children
+    assert len(client.requests) == sent
+
+
+def test_terminal_nodes_start_loaded(client: _FakeClient):
+    tree = client.lazy_schema()
+    fn = tree.root[2]
+    assert fn.loaded
+    assert fn.children == []
+
+
+def test_path_lookup_costs_round_trips_per_segment(client: _FakeClient):
+    tree = client.lazy_schema()
+    before = len(client.requests)
+    node = tree.by_path["Metadata/Nested/rDeep"]
+    assert node.id == 0xFF0
+    # Metadata and Nested expanded: child list + metadata each. DSM untouched.
+    assert len(client.requests) - before == 4
+    assert 0xE04 not in dict.keys(tree.by_id)
+
+
+def test_missing_path_raises_key_error(client: _FakeClient):
+    tree = client.lazy_schema()
+    with pytest.raises(KeyError):
+        tree.by_path["Metadata/nope"]
+    with pytest.raises(KeyError):
+        tree.by_path["xRebootDFU/child"]
+    assert tree.by_path.get("nope") is None
+    assert "Metadata/rBoard" in tree.by_path
+
+
+def test_id_lookup_expands_until_found(client: _FakeClient):
+    tree = client.lazy_schema()
+    assert tree.by_id[0xF03].path == "Metadata/rBoard"
+    # Nested wasn't needed to find a depth-1 node.
+    assert not tree.by_path["Metadata/Nested"].loaded
+
+
+def test_unknown_id_checked_without_walk(client: _FakeClient):
+    tree = client.lazy_schema()
+    before = len(client.requests)
+    assert tree.by_id.get(0x1234) is None
+    assert len(client.requests) - before == 1
+
+
+def test_expand_batches_metadata(client: _FakeClient):
+    tree = client.lazy_schema()
+    before = len(client.requests)
+    tree.expand(tree.root)
+    new = client.requests[before:]
+    assert len(_overlay_requests(new)) == 1
+    assert len(new) == 3  # DSM and Metadata child lists + one metadata fetch
+    assert all(n.loaded for n in tree.root)
+
+
+def test_iteration_expands_everything(client: _FakeClient):
+    tree = client.lazy_schema()
+    eager = client.discover_schema()
+    assert [n.id for n in tree] == [n.id for n in eager]
+    assert len(tree) == len(eager)
+
+
+def test_text_wire_format_raises():
+    client = _FakeClient()
+    client._protocol = ThingSetProtocol(WireFormat.TEXT)
+    with pytest.raises(ValueError, match="binary"):
+        client.lazy_schema()
+
+
+async def test_async_resolve_path():
+    client = _FakeAsyncClient()
+    tree = await client.lazy_schema()
+    assert isinstance(tree, AsyncLazySchemaTree)
+    assert [n.name for n in tree.root] == ["DSM", "Metadata", "xRebootDFU"]
+    before = len(client.requests)
+    node = await tree.resolve("Metadata/rBoard")
+    assert node.id == 0xF03
+    assert len(client.requests) - before == 2
+    assert "DSM/rDFUState" not in tree.by_path
+    with pytest.raises(KeyError):
+        await tree.resolve("Metadata/nope")
+
+
+async def test_async_children_and_expand():
+    client = _FakeAsyncClient()
+    tree = await client.lazy_schema()
+    metadata = tree.by_path["Metadata"]
+    assert metadata.children == []
+    assert not tree.is_expanded(metadata)
+    names = [c.name for c in await tree.children(metadata)]
+    assert names == ["Nested", "rBoard"]
+    assert tree.is_expanded(metadata)
+
+    await tree.expand_all()
+    assert tree.by_path["Metadata/Nested/rDeep"].id == 0xFF0
+    assert len(tree) == len(METADATA)
+
+
+async def test_async_resolve_id():
+    client = _FakeAsyncClient()
+    tree = await client.lazy_schema()
+    assert (await tree.resolve_id(0xFF0)).path == "Metadata/Nested/rDeep"
+    with pytest.raises(KeyError):
+        await tree.resolve_id(0x1234)
+
+
+def test_select_expands_only_matching_branches(client: _FakeClient):
+    tree = client.lazy_schema()
+    assert [n.path for n in tree.select("Metadata/r*")] == ["Metadata/rBoard"]
+    assert not tree.by_path["DSM"].loaded
+    assert not tree.by_path["Metadata/Nested"].loaded
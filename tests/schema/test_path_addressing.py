@@ -0,0 +1,238 @@
+"""Tests for path-addressed RPCs on binary clients: PathIndex, and
+get/fetch/update/exec taking paths once a schema is attached (or
+discovering just enough of one lazily when none is).
+"""
+
+import array
+import io
+from typing import Any, Dict, List, Union
+
+import cbor2
+import pytest
+
+from python_thingset import (
+    ParsedResponse,
+    ThingSetProtocol,
+    ThingSetStatus,
+    WireFormat,
+)
+from python_thingset.async_client import AsyncThingSetClient
+from python_thingset.client import ThingSetClient
+from python_thingset.path_index import PathIndex
+
+
+CHILDREN: Dict[int, List[int]] = {
+    0x00: [0x0E, 0x0F, 0x67],
+    0x0E: [0xE04],
+    0x0F: [0xF03, 0xF05],
+}
+
+METADATA: Dict[int, Dict[int, Any]] = {
+    0x0E: {26: "DSM", 27: "group", 28: 7},
+    0x0F: {26: "Metadata", 27: "group", 28: 7},
+    0x67: {26: "xRebootDFU", 27: "()->(i32)", 28: 112},
+    0xE04: {26: "sDFUOverride", 27: "bool", 28: 7},
+    0xF03: {26: "rBoard", 27: "string", 28: 7},
+    0xF05: {26: "rVersion", 27: "u8[]", 28: 7},
+}
+
+VALUES: Dict[int, Any] = {0xF03: "native_sim", 0xF05: [0, 48, 0, 1]}
+
+_GET, _EXEC, _FETCH, _UPDATE = 0x01, 0x02, 0x05, 0x07
+
+
+def _answer(data: bytes) -> ParsedResponse:
+    stream = io.BytesIO(data[1:])
+    target = cbor2.load(stream)
+    rest = stream.read()
+    payload: Any = None
+    if data[0] == _GET:
+        payload = VALUES.get(target)
+    elif data[0] == _FETCH:
+        ids = [] if rest in (b"", b"\xf6") else cbor2.loads(rest)
+        if target == 0x19:
+            payload = [METADATA.get(i) for i in ids]
+        elif ids:
+            payload = [VALUES.get(i) for i in ids]
+        else:
+            payload = CHILDREN.get(target, [])
+    return ParsedResponse(ThingSetStatus.CONTENT, "CONTENT", payload, b"")
+
+
+def _is_rpc(request: bytes) -> bool:
+    """Requests other than schema discovery traffic."""
+    if request[0] != _FETCH:
+        return True
+    stream = io.BytesIO(request[1:])
+    target = cbor2.load(stream)
+    return target != 0x19 and stream.read() != b"\xf6"
+
+
+class _FakeClient(ThingSetClient):
+    def __init__(self, wire_format: WireFormat = WireFormat.BINARY):
+        self._protocol = ThingSetProtocol(wire_format)
+        self._pending: Union[ParsedResponse, None] = None
+        self.requests: List[bytes] = []
+
+    def _send(self, data: bytes, node_id):
+        self.requests.append(data)
+        if self.wire_format is WireFormat.BINARY:
+            self._pending = _answer(data)
+
+    def _recv(self):
+        resp, self._pending = self._pending, None
+        return resp
+
+    def disconnect(self):
+        pass
+
+
+class _FakeAsyncClient(AsyncThingSetClient):
+    def __init__(self):
+        self._protocol = ThingSetProtocol(WireFormat.BINARY)
+        self.requests: List[bytes] = []
+
+    async def _rpc(self, request: bytes, node_id=None, timeout=None):
+        self.requests.append(request)
+        return _answer(request)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def client() -> _FakeClient:
+    c = _FakeClient()
+    c.attach_schema(_FakeClient().discover_schema())
+    return c
+
+
+def test_path_index_compiles_parent_and_id():
+    tree = _FakeClient().discover_schema()
+    index = PathIndex(tree)
+    assert index.get("Metadata/rBoard") is None
+    assert index["Metadata/rBoard"] == (0x0F, 0xF03)
+    assert index.get("Metadata/rBoard") == (0x0F, 0xF03)
+    assert index["DSM"] == (0x00, 0x0E)
+    assert index.id_of("") == 0
+    with pytest.raises(KeyError):
+        index["Metadata/nope"]
+
+
+def test_leading_slash_ignored(client: _FakeClient):
+    index = PathIndex(_FakeClient().discover_schema())
+    assert index["/Metadata/rBoard"] == (0x0F, 0xF03)
+    assert index.get("/Metadata/rBoard") == index.get("Metadata/rBoard")
+    assert len(index) == 1
+    assert index.node("/Metadata/rBoard").id == 0xF03
+    assert index.id_of("/") == 0
+    assert client.get("/Metadata/rBoard").data == "native_sim"
+    assert client.requests == [bytes([_GET]) + cbor2.dumps(0xF03)]
+
+
+def test_get_by_path(client: _FakeClient):
+    r = client.get("Metadata/rBoard")
+    assert client.requests == [bytes([_GET]) + cbor2.dumps(0xF03)]
+    assert r.data == "native_sim"
+    assert r.values[0].id == 0xF03
+    assert r.values[0].name == "Metadata/rBoard"
+
+
+def test_fetch_with_relative_child_names(client: _FakeClient):
+    r = client.fetch("Metadata", ["rBoard", "rVersion"])
+    assert client.requests == [client._protocol.encode_fetch(0x0F, [0xF03, 0xF05])]
+    assert [(v.id, v.name) for v in r.values] == [
+        (0xF03, "rBoard"),
+        (0xF05, "rVersion"),
+    ]
+
+
+def test_update_fills_in_parent(client: _FakeClient):
+    client.update("DSM/sDFUOverride", True)
+    assert client.requests == [
+        client._protocol.encode_update(0x0E, 0xE04, True)
+    ]
+
+
+def test_exec_by_path(client: _FakeClient):
+    client.exec("xRebootDFU", [])
+    assert client.requests == [client._protocol.encode_exec(0x67, [])]
+
+
+def test_numeric_ids_unchanged(client: _FakeClient):
+    client.update(0x509, True, parent_id=0x05)
+    assert client.requests == [client._protocol.encode_update(0x05, 0x509, True)]
+
+
+def test_unknown_path_raises(client: _FakeClient):
+    with pytest.raises(KeyError):
+        client.get("Metadata/nope")
+    assert client.requests == []
+
+
+def test_lazy_index_without_attached_schema():
+    client = _FakeClient()
+    client.get("Metadata/rBoard")
+    discovery = len(client.requests) - 1
+    assert discovery == 4  # root + Metadata: child list and metadata each
+    client.requests.clear()
+    client.get("Metadata/rVersion")
+    assert client.requests == [bytes([_GET]) + cbor2.dumps(0xF05)]
+
+
+def test_lazy_index_addresses_only():
+    client = _FakeClient()
+    client.get("Metadata/rBoard")
+    client.requests.clear()
+    # Not checked against the schema discovered along the way
+    client.update(0xF03, 5, parent_id=0x0F)
+    assert client.requests == [client._protocol.encode_update(0x0F, 0xF03, 5)]
+
+
+async def test_async_lazy_index_addresses_only():
+    client = _FakeAsyncClient()
+    await client.get("Metadata/rBoard")
+    client.requests.clear()
+    await client.update(0xF03, 5, parent_id=0x0F)
+    assert client.requests == [client._protocol.encode_update(0x0F, 0xF03, 5)]
+
+
+def test_text_transport_passes_paths_through():
+    client = _FakeClient(WireFormat.TEXT)
+    client.get("Metadata/rBoard")
+    assert client.requests == [b"thingset ?Metadata/rBoard\n"]
+
+
+async def test_async_path_addressing():
+    client = _FakeAsyncClient()
+    r = await client.get("Metadata/rBoard")
+    assert r.data == "native_sim"
+    assert r.values[0].id == 0xF03
+    client.requests.clear()
+    await client.update("DSM/sDFUOverride", True)
+    await client.fetch("Metadata", ["rVersion"])
+    assert [r for r in client.requests if _is_rpc(r)] == [
+        client._protocol.encode_update(0x0E, 0xE04, True),
+        client._protocol.encode_fetch(0x0F, [0xF05]),
+    ]
+
+
+def test_update_checked_against_schema(client: _FakeClient):
+    with pytest.raises(ValueError, match="bool"):
+        client.update("DSM/sDFUOverride", 3)
+    assert client.requests == []
+
+
+def test_exec_arguments_checked_against_schema(client: _FakeClient):
+    with pytest.raises(ValueError, match="argument"):
+        client.exec("xRebootDFU", [1])
+    assert client.requests == []
+
+
+def test_decode_arrays():
+    client = _FakeClient()
+    client.attach_schema(_FakeClient().discover_schema(), decode="array")
+    r = client.get("Metadata/rVersion")
+    assert r.values[0].value == array.array("B", [0, 48, 0, 1])
+    with pytest.raises(ValueError):
+        client.attach_schema(client._path_indexes[None].tree, decode="bogus")
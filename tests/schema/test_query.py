@@ -0,0 +1,159 @@
+"""Tests for SchemaTree.select and FetchPlan."""
+
+import io
+from typing import Any, Dict, List, Union
+
+import cbor2
+import pytest
+
+from python_thingset import (
+    FetchPlan,
+    ParsedResponse,
+    SchemaTree,
+    ThingSetProtocol,
+    ThingSetStatus,
+    WireFormat,
+)
+from python_thingset.async_client import AsyncThingSetClient
+from python_thingset.client import ThingSetClient
+
+
+def _module(base: int, name: str) -> list:
+    return [base, name, "group", 7, [
+        [base + 1, "rVoltage", "f32", 7, []],
+        [base + 2, "rCurrent", "f32", 7, []],
+        [base + 3, "sBalance", "bool", 7, []],
+        [base + 4, "xReset", "()->()", 112, []],
+    ]]
+
+
+TREE_DATA = [
+    [0x0F, "Metadata", "group", 7, [
+        [0xF03, "rBoard", "string", 7, []],
+    ]],
+    [0x40, "Modules", "group", 7, [
+        _module(0x400, "Module1"),
+        _module(0x410, "Module2"),
+    ]],
+]
+
+VALUES: Dict[int, Any] = {
+    0x401: 3.5, 0x402: 1.25, 0x411: 3.25, 0x412: -0.5, 0xF03: "native_sim",
+}
+
+
+@pytest.fixture
+def tree() -> SchemaTree:
+    return SchemaTree.loads(cbor2.dumps(TREE_DATA))
+
+
+def _paths(nodes) -> List[str]:
+    return [n.path for n in nodes]
+
+
+def test_select_plain_path(tree: SchemaTree):
+    assert _paths(tree.select("Metadata/rBoard")) == ["Metadata/rBoard"]
+    assert tree.select("Metadata/nope") == []
+
+
+def test_select_single_segment_wildcards(tree: SchemaTree):
+    assert _paths(tree.select("Modules/*/rVoltage")) == [
+        "Modules/Module1/rVoltage",
+        "Modules/Module2/rVoltage",
+    ]
+    assert _paths(tree.select("Modules/Module2/r*")) == [
+        "Modules/Module2/rVoltage",
+        "Modules/Module2/rCurrent",
+    ]
+    assert _paths(tree.select("Modules/Module?/s*")) == [
+        "Modules/Module1/sBalance",
+        "Modules/Module2/sBalance",
+    ]
+
+
+def test_select_double_star(tree: SchemaTree):
+    assert sorted(_paths(tree.select("**/rVoltage"))) == [
+        "Modules/Module1/rVoltage",
+        "Modules/Module2/rVoltage",
+    ]
+    assert len(tree.select("**")) == len(tree)
+    assert _paths(tree.select("Metadata/**")) == ["Metadata", "Metadata/rBoard"]
+
+
+def test_plan_groups_by_parent_and_skips_functions(tree: SchemaTree):
+    plan = FetchPlan.build(tree, "Modules/*/*")
+    assert [(r.parent_id, r.ids) for r in plan.requests] == [
+        (0x400, [0x401, 0x402, 0x403]),
+        (0x410, [0x411, 0x412, 0x413]),
+    ]
+
+
+def test_plan_splits_at_frame_limit(tree: SchemaTree):
+    nodes = tree.select("Modules/Module1/r*")
+    plan = FetchPlan.build(tree, nodes, frame_limit=12)
+    assert [r.ids for r in plan.requests] == [[0x401], [0x402]]
+    plan = FetchPlan.build(tree, nodes, size_of=lambda n: 1, frame_limit=14)
+    assert [r.ids for r in plan.requests] == [[0x401], [0x402]]
+    plan = FetchPlan.build(tree, nodes, size_of=lambda n: 1, frame_limit=15)
+    assert [r.ids for r in plan.requests] == [[0x401, 0x402]]
+
+
+def _answer(data: bytes) -> ParsedResponse:
+    stream = io.BytesIO(data[1:])
+    parent = cbor2.load(stream)
+    ids = cbor2.loads(stream.read())
+    if parent == 0x410:
+        return ParsedResponse(ThingSetStatus.NOT_FOUND, None, None, b"")
+    return ParsedResponse(
+        ThingSetStatus.CONTENT, "CONTENT", [VALUES.get(i) for i in ids], b""
+    )
+
+
+class _FakeClient(ThingSetClient):
+    def __init__(self):
+        self._protocol = ThingSetProtocol(WireFormat.BINARY)
+        self._pending: Union[ParsedResponse, None] = None
+        self.requests: List[bytes] = []
+
+    def _send(self, data: bytes, node_id):
+        self.requests.append(data)
+        self._pending = _answer(data)
+
+    def _recv(self):
+        resp, self._pending = self._pending, None
+        return resp
+
+    def disconnect(self):
+        pass
+
+
+class _FakeAsyncClient(AsyncThingSetClient):
+    def __init__(self):
+        self._protocol = ThingSetProtocol(WireFormat.BINARY)
+
+    async def _rpc(self, request: bytes, node_id=None, timeout=None):
+        return _answer(request)
+
+    async def close(self):
+        pass
+
+
+def test_execute_sync(tree: SchemaTree):
+    client = _FakeClient()
+    plan = FetchPlan.build(tree, "**/r*")
+    values = plan.execute(client)
+    assert len(client.requests) == len(plan) == 3
+    # Module2's request is refused, so its values are missing.
+    assert values == {
+        "Metadata/rBoard": "native_sim",
+        "Modules/Module1/rVoltage": 3.5,
+        "Modules/Module1/rCurrent": 1.25,
+    }
+
+
+async def test_execute_async(tree: SchemaTree):
+    plan = FetchPlan.build(tree, "Modules/Module1/r*")
+    assert await plan.execute_async(_FakeAsyncClient()) == {
+        "Modules/Module1/rVoltage": 3.5,
+        "Modules/Module1/rCurrent": 1.25,
+    }
@@ -0,0 +1,166 @@
+"""Tests for revalidate_schema: refreshing a known tree against a
+device whose object tree has since changed.
+
+The fake devices answer child-list fetches from a ``children`` map and
+metadata overlay fetches for any subset of IDs from a ``metadata`` map,
+so a test can change the device between discovery and revalidation.
+"""
+
+import copy
+import io
+from typing import Any, Dict, List, Union
+
+import cbor2
+import pytest
+
+from python_thingset import (
+    ParsedResponse,
+    SchemaDiff,
+    ThingSetProtocol,
+    ThingSetStatus,
+    WireFormat,
+)
+from python_thingset.async_client import AsyncThingSetClient
+from python_thingset.client import ThingSetClient
+
+
+CHILDREN: Dict[int, List[int]] = {
+    0x00: [0x0E, 0x0F],
+    0x0E: [0xE00, 0xE04],
+    0x0F: [0xFFF, 0xF03],
+    0xFFF: [0xFF0],
+}
+
+METADATA: Dict[int, Dict[int, Any]] = {
+    0x0E: {26: "DSM", 27: "group", 28: 7},
+    0x0F: {26: "Metadata", 27: "group", 28: 7},
+    0xE00: {26: "xOff", 27: "()->(i32)", 28: 112},
+    0xE04: {26: "rDFUState", 27: "u8", 28: 7},
+    0xFFF: {26: "Nested", 27: "group", 28: 7},
+    0xF03: {26: "rBoard", 27: "string", 28: 7},
+    0xFF0: {26: "rDeep", 27: "u32", 28: 7},
+    0xF05: {26: "rVersion", 27: "u8[]", 28: 7},
+}
+
+
+class _Device:
+    def __init__(self):
+        self.children = copy.deepcopy(CHILDREN)
+        self.metadata = copy.deepcopy(METADATA)
+        self.requests: List[bytes] = []
+
+    def answer(self, data: bytes) -> ParsedResponse:
+        self.requests.append(data)
+        stream = io.BytesIO(data[1:])
+        parent = cbor2.load(stream)
+        remaining = stream.read()
+        ids = [] if remaining in (b"", b"\xf6") else cbor2.loads(remaining)
+        if parent == 0x19:
+            payload: Any = [self.metadata.get(i) for i in ids]
+        else:
+            payload = self.children.get(parent, [])
+        return ParsedResponse(ThingSetStatus.CONTENT, "CONTENT", payload, b"")
+
+    def overlay_ids(self) -> List[int]:
+        return [
+            i
+            for r in self.requests
+            if r[1:3] == cbor2.dumps(0x19)
+            for i in cbor2.loads(r[3:])
+        ]
+
+
+class _FakeClient(ThingSetClient):
+    def __init__(self, device: _Device):
+        self._protocol = ThingSetProtocol(WireFormat.BINARY)
+        self._device = device
+        self._pending: Union[ParsedResponse, None] = None
+
+    def _send(self, data: bytes, node_id):
+        self._pending = self._device.answer(data)
+
+    def _recv(self):
+        resp, self._pending = self._pending, None
+        return resp
+
+    def disconnect(self):
+        pass
+
+
+class _FakeAsyncClient(AsyncThingSetClient):
+    def __init__(self, device: _Device):
+        self._protocol = ThingSetProtocol(WireFormat.BINARY)
+        self._device = device
+
+    async def _rpc(self, request: bytes, node_id=None, timeout=None):
+        return self._device.answer(request)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def device() -> _Device:
+    return _Device()
+
+
+def test_unchanged_device_needs_no_metadata(device: _Device):
+    client = _FakeClient(device)
+    tree = client.discover_schema()
+    device.requests.clear()
+    diff = client.revalidate_schema(tree)
+    assert diff == SchemaDiff()
+    assert not diff
+    assert device.overlay_ids() == []
+    assert len(device.requests) == 4  # one child list per group
+    assert len(tree) == 7
+
+
+def test_added_node_is_the_only_metadata_fetched(device: _Device):
+    client = _FakeClient(device)
+    tree = client.discover_schema()
+    device.children[0x0F].append(0xF05)
+    device.requests.clear()
+    diff = client.revalidate_schema(tree)
+    assert [n.id for n in diff.added] == [0xF05]
+    assert diff.removed == [] and diff.changed == []
+    assert device.overlay_ids() == [0xF05]
+    assert tree.by_path["Metadata/rVersion"].id == 0xF05
+    assert [c.id for c in tree.by_id[0x0F].children] == [0xFFF, 0xF03, 0xF05]
+
+
+def test_removed_subtree(device: _Device):
+    client = _FakeClient(device)
+    tree = client.discover_schema()
+    device.children[0x0F].remove(0xFFF)
+    diff = client.revalidate_schema(tree)
+    assert sorted(n.id for n in diff.removed) == [0xFF0, 0xFFF]
+    assert 0xFFF not in tree.by_id
+    assert "Metadata/Nested/rDeep" not in tree.by_path
+    assert [n.id for n in tree] == [0x0E, 0xE00, 0xE04, 0x0F, 0xF03]
+
+
+def test_moved_node_is_changed(device: _Device):
+    client = _FakeClient(device)
+    tree = client.discover_schema()
+    device.children[0x0F].remove(0xF03)
+    device.children[0x0E].append(0xF03)
+    device.requests.clear()
+    diff = client.revalidate_schema(tree)
+    assert [n.path for n in diff.changed] == ["DSM/rBoard"]
+    assert device.overlay_ids() == [0xF03]
+    assert "Metadata/rBoard" not in tree.by_path
+    assert tree.by_id[0xF03].path == "DSM/rBoard"
+
+
+async def test_async_revalidate(device: _Device):
+    client = _FakeAsyncClient(device)
+    tree = await client.discover_schema()
+    device.children[0x0E].remove(0xE00)
+    device.children[0x0F].append(0xF05)
+    device.requests.clear()
+    diff = await client.revalidate_schema(tree)
+    assert [n.id for n in diff.added] == [0xF05]
+    assert [n.id for n in diff.removed] == [0xE00]
+    assert device.overlay_ids() == [0xF05]
+    assert [c.name for c in tree.by_path["DSM"].children] == ["rDFUState"]
@@ -0,0 +1,194 @@
+"""Tests for SchemaTree serialisation, SchemaCache and
+discover_schema_cached, using a fake client that answers GETs of the
+build-info node as well as the schema walk's FETCHes.
+"""
+
+import io
+from typing import Any, Dict, List, Tuple, Union
+
+import cbor2
+import pytest
+
+from python_thingset import (
+    ParsedResponse,
+    SchemaCache,
+    SchemaTree,
+    ThingSetProtocol,
+    ThingSetStatus,
+    WireFormat,
+)
+from python_thingset.client import ThingSetClient
+
+
+_GET = 0x01
+
+
+class _FakeDevice(ThingSetClient):
+    def __init__(self, canned: Dict[Tuple[Any, Tuple[int, ...]], Any], build: Any):
+        self._protocol = ThingSetProtocol(WireFormat.BINARY)
+        self._canned = canned
+        self.build = build
+        self.requests: List[bytes] = []
+        self._pending: Union[ParsedResponse, None] = None
+
+    def _send(self, data: bytes, node_id):
+        self.requests.append(data)
+        stream = io.BytesIO(data[1:])
+        target = cbor2.load(stream)
+        if data[0] == _GET:
+            payload = self.build.get(target) if isinstance(self.build, dict) else None
+        else:
+            remaining = stream.read()
+            ids = () if remaining in (b"", b"\xf6") else tuple(cbor2.loads(remaining))
+            payload = self._canned.get((target, ids))
+        self._pending = ParsedResponse(
+            status_code=ThingSetStatus.CONTENT if payload is not None else ThingSetStatus.NOT_FOUND,
+            status_string=None,
+            data=payload,
+            raw=b"",
+        )
+
+    def _recv(self):
+        resp, self._pending = self._pending, None
+        return resp
+
+    def disconnect(self):
+        pass
+
+
+CANNED = {
+    (0, ()): [0x0E, 0x0F],
+    (0x19, (0x0E, 0x0F)): [
+        {26: "DSM", 27: "group", 28: 7},
+        {26: "Metadata", 27: "group", 28: 7},
+    ],
+    (0x0E, ()): [0xE04],
+    (0x0F, ()): [0xF01, 0xF03],
+    (0x19, (0xE04, 0xF01, 0xF03)): [
+        {26: "rDFUState", 27: "u8", 28: 7},
+        {26: "rBuildHash", 27: "string", 28: 7},
+        {26: "rBoard", 27: "string", 28: 7},
+    ],
+}
+
+BUILD_A = {0x0F: {0xF01: "05a736ef", 0xF03: "native_sim"}}
+BUILD_B = {0x0F: {0xF01: "9c0ffee1", 0xF03: "native_sim"}}
+
+
+def _get_count(device: _FakeDevice) -> int:
+    return sum(1 for r in device.requests if r[0] == _GET)
+
+
+def test_tree_dumps_loads_round_trip():
+    tree = _FakeDevice(CANNED, BUILD_A).discover_schema()
+    restored = SchemaTree.loads(tree.dumps())
+    assert [str(n) for n in restored] == [str(n) for n in tree]
+    assert restored.by_path["Metadata/rBoard"].id == 0xF03
+    assert restored.by_id[0xE04].access == 7
+    assert [c.id for c in restored.by_id[0x0F].children] == [0xF01, 0xF03]
+
+
+def test_loads_rejects_garbage():
+    with pytest.raises(ValueError):
+        SchemaTree.loads(b"\xff\x00")
+    with pytest.raises(ValueError):
+        SchemaTree.loads(cbor2.dumps([[1, 2]]))
+
+
+def test_cache_store_and_load(tmp_path):
+    tree = _FakeDevice(CANNED, BUILD_A).discover_schema()
+    cache = SchemaCache(tmp_path)
+    assert cache.load(0xBADB1B0000000001) is None
+    cache.store(0xBADB1B0000000001, b"fp", tree)
+    entry = cache.load(0xBADB1B0000000001)
+    assert entry.fingerprint == b"fp"
+    assert entry.root_id == 0
+    assert entry.checked_at > 0
+    assert len(entry.tree) == len(tree)
+    assert (tmp_path / "badb1b0000000001.tsschema").exists()
+
+
+def test_cache_string_keys_are_sanitised(tmp_path):
+    cache = SchemaCache(tmp_path)
+    cache.store("can0:10/x", b"fp", SchemaTree(root=[], by_id={}, by_path={}))
+    assert cache.load("can0:10/x") is not None
+    assert [p.parent for p in tmp_path.iterdir()] == [tmp_path]
+
+
+def test_unwritable_cache_is_ignored(tmp_path):
+    (tmp_path / "file").write_bytes(b"")
+    cache = SchemaCache(tmp_path / "file" / "cache")
+    device = _FakeDevice(CANNED, BUILD_A)
+    tree = device.discover_schema_cached(cache, "dev")
+    assert tree.by_path["DSM/rDFUState"].id == 0xE04
+    assert cache.load("dev") is None
+
+
+def test_corrupt_cache_file_is_ignored(tmp_path):
+    cache = SchemaCache(tmp_path)
+    (tmp_path / "192.0.2.1.tsschema").write_bytes(b"not cbor at all \xff")
+    assert cache.load("192.0.2.1") is None
+
+
+def test_invalidate(tmp_path):
+    cache = SchemaCache(tmp_path)
+    cache.store("dev", b"fp", SchemaTree(root=[], by_id={}, by_path={}))
+    cache.invalidate("dev")
+    cache.invalidate("dev")  # missing entry is fine
+    assert cache.load("dev") is None
+
+
+def test_cold_cache_walks_and_stores(tmp_path):
+    cache = SchemaCache(tmp_path)
+    device = _FakeDevice(CANNED, BUILD_A)
+    tree = device.discover_schema_cached(cache, "dev")
+    assert tree.by_path["DSM/rDFUState"].id == 0xE04
+    assert cache.load("dev") is not None
+
+
+def test_warm_cache_costs_one_get(tmp_path):
+    cache = SchemaCache(tmp_path)
+    _FakeDevice(CANNED, BUILD_A).discover_schema_cached(cache, "dev")
+
+    device = _FakeDevice(CANNED, BUILD_A)
+    tree = device.discover_schema_cached(cache, "dev")
+    assert len(device.requests) == 1
+    assert _get_count(device) == 1
+    assert tree.by_path["Metadata/rBoard"].id == 0xF03
+
+
+def test_firmware_change_rewalks(tmp_path):
+    cache = SchemaCache(tmp_path)
+    _FakeDevice(CANNED, BUILD_A).discover_schema_cached(cache, "dev")
+
+    device = _FakeDevice(CANNED, BUILD_B)
+    device.discover_schema_cached(cache, "dev")
+    # A full walk: metadata is fetched again, in case a node was
+    # renamed or retyped under the same ID
+    assert any(r[1:3] == cbor2.dumps(0x19) for r in device.requests)
+    again = _FakeDevice(CANNED, BUILD_B)
+    again.discover_schema_cached(cache, "dev")
+    assert len(again.requests) == 1
+
+
+def test_firmware_change_revalidates_on_request(tmp_path):
+    cache = SchemaCache(tmp_path)
+    _FakeDevice(CANNED, BUILD_A).discover_schema_cached(cache, "dev")
+
+    device = _FakeDevice(CANNED, BUILD_B)
+    device.discover_schema_cached(cache, "dev", revalidate=True)
+    # Child lists are re-read; nothing moved, so no metadata is needed.
+    assert len(device.requests) == 1 + 3
+    assert not any(r[1:3] == cbor2.dumps(0x19) for r in device.requests)
+    # ... and the refreshed entry is now warm for the new build
+    again = _FakeDevice(CANNED, BUILD_B)
+    again.discover_schema_cached(cache, "dev")
+    assert len(again.requests) == 1
+
+
+def test_unreadable_fingerprint_walks_without_caching(tmp_path):
+    cache = SchemaCache(tmp_path)
+    device = _FakeDevice(CANNED, build=None)
+    tree = device.discover_schema_cached(cache, "dev")
+    assert len(tree) == 5
+    assert cache.load("dev") is None
@@ -0,0 +1,234 @@
+"""Tests for DeviceTwin: report-fed values, staleness and
+reconciliation by fetch."""
+
+import asyncio
+import io
+from typing import Any, Dict, List, Union
+
+import cbor2
+import pytest
+
+from python_thingset import (
+    DeviceTwin,
+    ParsedResponse,
+    SchemaDiff,
+    SchemaTree,
+    ThingSetProtocol,
+    ThingSetReport,
+    ThingSetStatus,
+    WireFormat,
+)
+from python_thingset.async_client import AsyncThingSetClient
+from python_thingset.client import ThingSetClient
+
+
+TREE_DATA = [
+    [0x0F, "Metadata", "group", 7, [
+        [0xF03, "rBoard", "string", 7, []],
+    ]],
+    [0x40, "Module", "group", 7, [
+        [0x401, "rVoltage", "f32", 7, []],
+        [0x402, "rCurrent", "f32", 7, []],
+        [0x403, "sSecret", "u8", 2, []],
+        [0x404, "xReset", "()->()", 112, []],
+    ]],
+]
+
+VALUES: Dict[int, Any] = {0x401: 3.5, 0x402: 1.25, 0xF03: "native_sim"}
+
+EUI = 0xBADB1B0000000001
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _answer(data: bytes) -> ParsedResponse:
+    stream = io.BytesIO(data[1:])
+    cbor2.load(stream)
+    ids = cbor2.loads(stream.read())
+    if any(i not in VALUES for i in ids):
+        return ParsedResponse(ThingSetStatus.FORBIDDEN, None, None, b"")
+    return ParsedResponse(
+        ThingSetStatus.CONTENT, "CONTENT", [VALUES.get(i) for i in ids], b""
+    )
+
+
+class _FakeClient(ThingSetClient):
+    def __init__(self):
+        self._protocol = ThingSetProtocol(WireFormat.BINARY)
+        self._pending: Union[ParsedResponse, None] = None
+        self.requests: List[bytes] = []
+
+    def _send(self, data: bytes, node_id):
+        self.requests.append(data)
+        self._pending = _answer(data)
+
+    def _recv(self):
+        resp, self._pending = self._pending, None
+        return resp
+
+    def disconnect(self):
+        pass
+
+
+class _FakeAsyncClient(AsyncThingSetClient):
+    def __init__(self):
+        self._protocol = ThingSetProtocol(WireFormat.BINARY)
+        self.requests: List[bytes] = []
+
+    async def _rpc(self, request: bytes, node_id=None, timeout=None):
+        self.requests.append(request)
+        return _answer(request)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def clock() -> _Clock:
+    return _Clock()
+
+
+@pytest.fixture
+def twin(clock: _Clock) -> DeviceTwin:
+    tree = SchemaTree.loads(cbor2.dumps(TREE_DATA))
+    return DeviceTwin(tree, eui=EUI, max_age=30.0, clock=clock)
+
+
+def test_reports_update_values(twin: DeviceTwin, clock: _Clock):
+    twin.apply_report(ThingSetReport(1, {0x401: 3.75, 0x999: 7}, EUI))
+    assert twin["Module/rVoltage"] == twin[0x401] == 3.75
+    assert twin[0x999] == 7
+    assert "Module/rCurrent" not in twin
+    assert "Module/nope" not in twin
+    assert twin.get("Module/rCurrent") is None
+    clock.now += 5
+    assert twin.age(0x401) == 5
+    assert twin.age("Module/rCurrent") is None
+
+
+def test_group_maps_stored_per_child(twin: DeviceTwin):
+    assert twin.update({0x40: {0x401: 3.5, 0x402: 1.0}}) == 2
+    assert twin.snapshot() == {"Module/rVoltage": 3.5, "Module/rCurrent": 1.0}
+    assert 0x40 not in twin
+
+
+def test_snapshot(twin: DeviceTwin):
+    twin.update({0x401: 3.5, 0x999: 1})
+    assert twin.snapshot() == {"Module/rVoltage": 3.5}
+    assert twin.snapshot(by_id=True) == {0x401: 3.5, 0x999: 1}
+
+
+def test_stale_skips_groups_functions_and_fresh_values(
+    twin: DeviceTwin, clock: _Clock
+):
+    assert [n.id for n in twin.stale()] == [0xF03, 0x401, 0x402, 0x403]
+    twin.update({0x401: 3.5})
+    assert [n.id for n in twin.stale()] == [0xF03, 0x402, 0x403]
+    clock.now += 30
+    assert 0x401 in [n.id for n in twin.stale()]
+
+
+def test_value_nodes_follow_schema_changes(twin: DeviceTwin):
+    assert [n.id for n in twin.value_nodes()] == [0xF03, 0x401, 0x402, 0x403]
+    updated = TREE_DATA + [[0x50, "Cell", "group", 7, [[0x501, "rTemp", "f32", 7, []]]]]
+    twin.tree = SchemaTree.loads(cbor2.dumps(updated))
+    assert 0x501 in [n.id for n in twin.value_nodes()]
+
+    class _Revalidating:
+        def revalidate_schema(self, tree, root_id, node_id):
+            # Back to the original schema, in place
+            original = SchemaTree.loads(cbor2.dumps(TREE_DATA))
+            tree.root, tree.by_id, tree.by_path = (
+                original.root,
+                original.by_id,
+                original.by_path,
+            )
+            return SchemaDiff(removed=[])
+
+    tree = twin.tree
+    twin.revalidate(_Revalidating())
+    assert twin.tree is tree
+    assert 0x501 not in [n.id for n in twin.value_nodes()]
+
+
+def test_reconcile_reads_only_what_reports_miss(twin: DeviceTwin):
+    client = _FakeClient()
+    twin.update({0x401: 3.75, 0x403: 1})
+    assert twin.reconcile(client) == 2
+    # One fetch per parent: Metadata, and Module for rCurrent
+    assert len(client.requests) == 2
+    assert twin["Module/rVoltage"] == 3.75
+    assert twin["Module/rCurrent"] == 1.25
+    assert twin["Metadata/rBoard"] == "native_sim"
+    assert twin.reconcile(client) == 0
+    assert len(client.requests) == 2
+
+
+def test_refused_reads_back_off(twin: DeviceTwin, clock: _Clock):
+    client = _FakeClient()
+    # sSecret isn't readable, so the Module fetch is refused
+    assert twin.reconcile(client) == 1
+    assert "Module/rCurrent" not in twin
+    clock.now += 10
+    assert twin.reconcile(client) == 0
+    assert len(client.requests) == 2
+    clock.now += 21
+    twin.update({0xF03: "x"})
+    twin.reconcile(client)
+    assert len(client.requests) == 3
+
+
+def test_accepts():
+    tree = SchemaTree.loads(cbor2.dumps(TREE_DATA))
+    twin = DeviceTwin(tree, eui=EUI, source="192.0.2.1")
+    assert twin.accepts(("192.0.2.9", 9002), ThingSetReport(1, {}, EUI))
+    assert not twin.accepts(("192.0.2.1", 9002), ThingSetReport(1, {}, EUI + 1))
+    assert twin.accepts(("192.0.2.1", 9002), ThingSetReport(1, {}, None))
+    assert not twin.accepts(("192.0.2.2", 9002), ThingSetReport(1, {}, None))
+    assert DeviceTwin(tree).accepts((0x10, "can0"), ThingSetReport(None, {}, None))
+    assert not DeviceTwin(tree, eui=EUI).accepts(
+        (0x10, "can0"), ThingSetReport(None, {}, None)
+    )
+
+
+async def _reports(items, done: asyncio.Event = None):
+    for item in items:
+        yield item
+    if done is not None:
+        await done.wait()
+
+
+async def test_follow(twin: DeviceTwin):
+    await twin.follow(
+        _reports(
+            [
+                (("192.0.2.1", 9002), ThingSetReport(1, {0x401: 3.0}, EUI)),
+                (("192.0.2.2", 9002), ThingSetReport(1, {0x402: 9.0}, EUI + 1)),
+            ]
+        )
+    )
+    assert twin.snapshot() == {"Module/rVoltage": 3.0}
+
+
+async def test_run_reconciles_after_first_interval(twin: DeviceTwin):
+    client = _FakeAsyncClient()
+    done = asyncio.Event()
+    reports = _reports(
+        [(("192.0.2.1", 9002), ThingSetReport(1, {0x401: 3.0, 0x402: 2.0}, EUI))],
+        done,
+    )
+    task = asyncio.ensure_future(twin.run(client, reports, interval=0.01))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # Reported values were never read
+    assert twin["Module/rVoltage"] == 3.0
+    assert twin["Metadata/rBoard"] == "native_sim"
+    assert len(client.requests) == 2